@@ -3,8 +3,23 @@
 from __future__ import annotations
 
 import json
+import math
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .archive import ARCHIVE_FILE, ArchiveCodecError, ArchiveReader
+from .binformat import (
+    BINARY_FILE,
+    HEADER as BINARY_HEADER,
+    BinaryEncoder,
+    count_binary_events,
+    iter_binary_events,
+    load_string_table,
+)
+from .bloom import BLOOM_FILE, build_bloom_for_file, load_bloom
+from .lazy import split_event_line
+from .ids import trace_id_time_ns
+from .storage import EVENTS_FILE, TraceLocation, _window_ns, find_trace_dir, iter_trace_dirs
 
 
 def _strip_crc(line: str) -> str:
@@ -20,15 +35,124 @@ def _strip_crc(line: str) -> str:
     return line
 
 
+def _query_needles(query: str) -> List[str]:
+    """Forms ``query`` can take inside JSON text: as written by the Rust writer
+    (non-ASCII kept) and with ``\\uXXXX`` escapes, as ``json.dumps`` writes."""
+    needles = [json.dumps(query, ensure_ascii=False)[1:-1]]
+    ascii_form = json.dumps(query)[1:-1]
+    if ascii_form != needles[0]:
+        needles.append(ascii_form)
+    return needles
+
+
+def _finish_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    visited = stats["traces_skipped"] + stats["traces_scanned"]
+    stats["skip_ratio"] = stats["traces_skipped"] / visited if visited else 0.0
+    return stats
+
+
+def _trace_name(lines: List[str], default: str) -> str:
+    """``trace_name`` from a trace's first line, if it is a ``trace_start``."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(_strip_crc(line))
+        except json.JSONDecodeError:
+            return default
+        if data.get("kind") == "trace_start":
+            return (data.get("payload") or {}).get("trace_name") or default
+        return default
+    return default
+
+
+def _read_meta(loc: TraceLocation) -> Dict[str, Any]:
+    """Name, project, start time and event count of a trace."""
+    events_path = loc.events_file
+    meta: Dict[str, Any] = {
+        "id": loc.id,
+        "name": loc.id,
+        "project": None,
+        "ts": loc.dir.stat().st_mtime,
+        "event_count": 0,
+    }
+
+    try:
+        data: Optional[Dict[str, Any]] = None
+        if loc.is_archived:
+            # Name and count come from the archive header and its
+            # uncompressed head line; no block is decompressed.
+            archive = ArchiveReader(loc.dir / ARCHIVE_FILE)
+            head = archive.head.decode("utf-8").strip()
+            data = json.loads(_strip_crc(head)) if head else None
+            meta["event_count"] = archive.event_count
+        elif not events_path.exists() and (loc.dir / BINARY_FILE).exists():
+            data = next(iter_binary_events(loc.dir / BINARY_FILE), None)
+            meta["event_count"] = count_binary_events(loc.dir / BINARY_FILE)
+        elif events_path.exists():
+            with events_path.open("r", encoding="utf-8") as f:
+                first_line = f.readline().strip()
+                data = json.loads(_strip_crc(first_line)) if first_line else None
+                f.seek(0)
+                meta["event_count"] = sum(
+                    1 for ln in f if ln.strip()
+                )
+        if data and data.get("kind") == "trace_start":
+            payload = data.get("payload") or {}
+            meta["name"] = payload.get("trace_name") or meta["name"]
+            meta["project"] = payload.get("project")
+            if "ts_unix_ns" in data:
+                meta["ts"] = data["ts_unix_ns"] / 1e9
+    except (OSError, json.JSONDecodeError, KeyError, ValueError):
+        pass
+    return meta
+
+
 class NativeTraceWriter:
-    """Fallback writer that produces plain JSONL (no CRC)."""
+    """Fallback writer that produces plain JSONL (no CRC).
 
-    def __init__(self, trace_id: str, root: str) -> None:
+    ``bloom_fp``: when set, build a trigram Bloom filter with this
+    false-positive rate and write it next to the events on :meth:`finish`.
+    The filter is built from the file in one pass, so :meth:`emit` does no
+    extra work for it; ``finish`` re-reads the whole trace instead.
+    ``partition``: relative directory (e.g. ``proj/2024/02/29``) to place the
+    trace under instead of directly in ``root``.
+    ``format``: ``"binary"`` writes framed binary records to ``events.bin``
+    (see :mod:`agenttrace.binformat`) instead of JSONL.
+    """
+
+    def __init__(
+        self,
+        trace_id: str,
+        root: str,
+        bloom_fp: Optional[float] = None,
+        partition: Optional[str] = None,
+        format: str = "jsonl",
+    ) -> None:
+        if format not in ("jsonl", "binary"):
+            raise ValueError(f"unknown event format: {format}")
         self._trace_id = trace_id
-        trace_dir = Path(root) / trace_id
+        base = Path(root) / partition if partition else Path(root)
+        trace_dir = base / trace_id
         trace_dir.mkdir(parents=True, exist_ok=True)
-        self._path = trace_dir / "events.jsonl"
-        self._file = self._path.open("a", encoding="utf-8")
+        # Appending makes any existing filter stale.
+        try:
+            (trace_dir / BLOOM_FILE).unlink()
+        except FileNotFoundError:
+            pass
+        self._bloom_fp = bloom_fp
+        self._encoder: Optional[BinaryEncoder] = None
+        if format == "binary":
+            self._path = trace_dir / BINARY_FILE
+            strings = load_string_table(self._path) if self._path.exists() else []
+            self._encoder = BinaryEncoder(strings)
+            self._file = self._path.open("ab")
+            if self._file.tell() == 0:
+                self._file.write(BINARY_HEADER)
+        else:
+            self._path = trace_dir / EVENTS_FILE
+            self._file = self._path.open("a", encoding="utf-8")
 
     def emit(
         self,
@@ -54,13 +178,20 @@ class NativeTraceWriter:
             "attrs": json.loads(attrs_json),
             "payload": json.loads(payload_json),
         }
-        self._file.write(json.dumps(event, separators=(",", ":")) + "\n")
+        if self._encoder is not None:
+            self._file.write(self._encoder.encode(event))
+            self._file.flush()
+            return
+        line = json.dumps(event, separators=(",", ":"))
+        self._file.write(line + "\n")
         self._file.flush()
 
     def finish(self) -> None:
         if self._file and not self._file.closed:
             self._file.flush()
             self._file.close()
+            if self._bloom_fp is not None:
+                build_bloom_for_file(self._path, self._bloom_fp)
 
 
 class NativeTraceReader:
@@ -69,58 +200,288 @@ class NativeTraceReader:
     def __init__(self, root: str) -> None:
         self._root = Path(root)
 
-    def list_traces(self) -> List[Dict[str, Any]]:
-        if not self._root.exists():
-            return []
+    def list_traces(
+        self,
+        project: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """List traces newest first, at most ``limit``.
+
+        ``project`` and the ``since``/``until`` bounds (unix seconds, on the
+        trace start time) prune partitioned directories before they are
+        listed.  Traces with time-ordered IDs are ordered and windowed by the
+        time in their ID, so only the ones returned are opened; legacy IDs
+        need their ``trace_start`` line read to be ordered.
+        """
+        since_ns, until_ns = _window_ns(since, until)
+
+        pending = []
+        for loc in iter_trace_dirs(self._root, project, since_ns, until_ns):
+            ts_ns = trace_id_time_ns(loc.id)
+            meta = None
+            if ts_ns is None:
+                meta = _read_meta(loc)
+                # Same millisecond rounding as the bounds, so a legacy trace
+                # listed with ``since``/``until`` set to its own ``ts`` stays in.
+                ts_ns = math.floor(meta["ts"] * 1e3) * 1_000_000
+            if (since_ns is not None and ts_ns < since_ns) or (until_ns is not None and ts_ns > until_ns):
+                continue
+            pending.append((ts_ns, loc.id, loc, meta))
+        pending.sort(key=lambda item: (item[0], item[1]), reverse=True)
 
         traces: List[Dict[str, Any]] = []
-        for p in self._root.iterdir():
-            if not p.is_dir():
+        for _, _, loc, meta in pending:
+            if limit is not None and len(traces) >= limit:
+                break
+            if meta is None:
+                meta = _read_meta(loc)
+            if project is not None and meta["project"] != project:
                 continue
+            traces.append(meta)
+        return traces
 
-            events_path = p / "events.jsonl"
-            meta: Dict[str, Any] = {
-                "id": p.name,
-                "name": p.name,
-                "project": None,
-                "ts": p.stat().st_mtime,
-                "event_count": 0,
-            }
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        kinds: Optional[Sequence[str]] = None,
+        since: Optional[float] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Substring search over the raw JSON of ``payload``/``attrs``.
+
+        Mirrors the native search: traces are visited most recently written
+        first, events newest first within a trace, and only lines whose raw
+        text contains the query are decoded.  Traces whose Bloom filter rules
+        the query out are not read.  Returns ``(hits, stats)``.
+        """
+        stats: Dict[str, Any] = {
+            "traces_considered": 0,
+            "traces_skipped": 0,
+            "traces_scanned": 0,
+            "traces_unsupported": 0,
+            "skip_ratio": 0.0,
+        }
+        results: List[Dict[str, Any]] = []
+        if not query or limit == 0:
+            return results, stats
+        needles = _query_needles(query)
+        needle_bytes = [n.encode("utf-8") for n in needles]
+        body_needle = needles[0]
+        kind_set = frozenset(kinds) if kinds is not None else None
+        since_ns, _ = _window_ns(since, None)
 
-            if events_path.exists():
+        candidates = []
+        # A trace that started before ``since`` can still hold newer events,
+        # so partitions are not pruned here; the events file mtime is.
+        for loc in iter_trace_dirs(self._root):
+            events_path = loc.data_file
+            try:
+                mtime_ns = events_path.stat().st_mtime_ns
+            except OSError:
+                continue
+            if since_ns is not None and mtime_ns < since_ns:
+                continue
+            candidates.append((mtime_ns, loc.id, events_path))
+        candidates.sort(reverse=True)
+        stats["traces_considered"] = len(candidates)
+
+        for _, trace_id, events_path in candidates:
+            bloom = load_bloom(events_path.parent)
+            if bloom is not None and not any(bloom.may_contain(n) for n in needle_bytes):
+                stats["traces_skipped"] += 1
+                continue
+            stats["traces_scanned"] += 1
+            try:
+                if events_path.name == ARCHIVE_FILE:
+                    text = ArchiveReader(events_path).read_all().decode("utf-8")
+                elif events_path.name == BINARY_FILE:
+                    text = "\n".join(_json_line(e) for e in iter_binary_events(events_path))
+                else:
+                    text = events_path.read_text(encoding="utf-8")
+            except ArchiveCodecError:
+                stats["traces_scanned"] -= 1
+                stats["traces_unsupported"] += 1
+                continue
+            except (OSError, ValueError):
+                continue
+            if not any(n in text for n in needles):
+                continue
+            lines = text.splitlines()
+            trace_name = _trace_name(lines, trace_id)
+            for line in reversed(lines):
+                if not any(n in line for n in needles):
+                    continue
                 try:
-                    with events_path.open("r", encoding="utf-8") as f:
-                        first_line = f.readline().strip()
-                        if first_line:
-                            data = json.loads(_strip_crc(first_line))
-                            if data.get("kind") == "trace_start":
-                                payload = data.get("payload") or {}
-                                meta["name"] = payload.get("trace_name") or meta["name"]
-                                meta["project"] = payload.get("project")
-                                if "ts_unix_ns" in data:
-                                    meta["ts"] = data["ts_unix_ns"] / 1e9
-
-                        f.seek(0)
-                        meta["event_count"] = sum(
-                            1 for ln in f if ln.strip()
-                        )
-                except (OSError, json.JSONDecodeError, KeyError, ValueError):
-                    pass
+                    evt = json.loads(_strip_crc(line.strip()))
+                except json.JSONDecodeError:
+                    continue
+                if kind_set is not None and evt.get("kind") not in kind_set:
+                    continue
+                if since_ns is not None and (evt.get("ts_unix_ns") or 0) < since_ns:
+                    continue
+                if not any(
+                    body_needle in json.dumps(evt.get(key), ensure_ascii=False, separators=(",", ":"))
+                    for key in ("payload", "attrs")
+                    if key in evt
+                ):
+                    continue
+                evt["trace_name"] = trace_name
+                results.append(evt)
+                if limit is not None and len(results) >= limit:
+                    return results, _finish_stats(stats)
+        return results, _finish_stats(stats)
 
-            traces.append(meta)
+    def get_events(self, trace_id: str, lazy: bool = False, **filters: Any) -> List[Any]:
+        """Return the events of a trace, see :meth:`iter_events`."""
+        return list(self.iter_events(trace_id, lazy=lazy, **filters))
 
-        return sorted(traces, key=lambda x: x["ts"], reverse=True)
+    def iter_events(
+        self,
+        trace_id: str,
+        lazy: bool = False,
+        kinds: Optional[Sequence[str]] = None,
+        span_id: Optional[str] = None,
+        level: Optional[str] = None,
+        ts_min: Optional[int] = None,
+        ts_max: Optional[int] = None,
+        seq_min: Optional[int] = None,
+        seq_max: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Iterator[Any]:
+        """Stream the events of a trace that pass the given filters.
 
-    def get_events(self, trace_id: str) -> List[Dict[str, Any]]:
-        path = self._root / trace_id / "events.jsonl"
-        if not path.exists():
+        Filters are checked against the line header before ``attrs``/``payload``
+        are decoded.  ``fields`` projects each event to the listed keys.  With
+        ``lazy=True`` (and no projection) each item is a
+        ``(header, deferred_json)`` pair; see
+        :func:`agenttrace.lazy.split_event_line`.
+        """
+        trace_dir = find_trace_dir(self._root, trace_id)
+        if trace_dir is None:
             raise FileNotFoundError(f"trace not found: {trace_id}")
+        flt = _EventFilter(kinds, span_id, level, ts_min, ts_max, seq_min, seq_max)
+        return self._iter_file(trace_dir, flt, lazy, fields)
+
+    @staticmethod
+    def _open_lines(trace_dir: Path, flt: "_EventFilter") -> Iterator[str]:
+        path = trace_dir / EVENTS_FILE
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                yield from f
+            return
+        # Archived: only decompress blocks whose seq/ts range can match.
+        archive = ArchiveReader(trace_dir / ARCHIVE_FILE)
+        yield from archive.iter_lines(archive.select(flt.seq_min, flt.seq_max, flt.ts_min, flt.ts_max))
+
+    @classmethod
+    def _iter_file(
+        cls, trace_dir: Path, flt: "_EventFilter", lazy: bool, fields: Optional[Sequence[str]]
+    ) -> Iterator[Any]:
+        if not (trace_dir / EVENTS_FILE).exists() and (trace_dir / BINARY_FILE).exists():
+            yield from cls._iter_binary(trace_dir / BINARY_FILE, flt, lazy, fields)
+            return
+        for line in cls._open_lines(trace_dir, flt):
+            line = line.strip()
+            if not line:
+                continue
+            line = _strip_crc(line)
+            if flt.empty and not lazy and fields is None:
+                yield json.loads(line)
+                continue
+
+            header, deferred = split_event_line(line)
+            if not flt.empty:
+                if flt.past_end(header):
+                    return
+                if not flt.matches(header):
+                    continue
+            if fields is not None:
+                if deferred is not None and not all(k in header for k in fields):
+                    header.update(json.loads(deferred))
+                yield {k: header[k] for k in fields if k in header}
+            elif lazy:
+                yield header, deferred
+            else:
+                if deferred is not None:
+                    header.update(json.loads(deferred))
+                yield header
 
-        events: List[Dict[str, Any]] = []
-        with path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
+    @staticmethod
+    def _iter_binary(
+        path: Path, flt: "_EventFilter", lazy: bool, fields: Optional[Sequence[str]]
+    ) -> Iterator[Any]:
+        # Records decode straight to dicts; lazy mode re-serializes the
+        # deferred fields so callers see the same (header, deferred) shape.
+        for event in iter_binary_events(path):
+            if not flt.empty:
+                if flt.past_end(event):
+                    return
+                if not flt.matches(event):
                     continue
-                events.append(json.loads(_strip_crc(line)))
-        return events
+            if fields is not None:
+                yield {k: event[k] for k in fields if k in event}
+            elif lazy:
+                deferred = {k: event.pop(k) for k in ("attrs", "payload") if k in event}
+                yield event, (json.dumps(deferred, separators=(",", ":")) if deferred else None)
+            else:
+                yield event
+
+
+def _json_line(event: Dict[str, Any]) -> str:
+    """An event as the compact JSON line the Rust writer would produce."""
+    return json.dumps(event, separators=(",", ":"), ensure_ascii=False)
+
+
+class _EventFilter:
+    """Header predicates for :meth:`NativeTraceReader.iter_events` (inclusive bounds)."""
+
+    __slots__ = ("kinds", "span_id", "level", "ts_min", "ts_max", "seq_min", "seq_max", "empty")
+
+    def __init__(
+        self,
+        kinds: Optional[Sequence[str]],
+        span_id: Optional[str],
+        level: Optional[str],
+        ts_min: Optional[int],
+        ts_max: Optional[int],
+        seq_min: Optional[int],
+        seq_max: Optional[int],
+    ) -> None:
+        self.kinds = frozenset(kinds) if kinds is not None else None
+        self.span_id = span_id
+        self.level = level
+        self.ts_min = ts_min
+        self.ts_max = ts_max
+        self.seq_min = seq_min
+        self.seq_max = seq_max
+        self.empty = all(
+            v is None for v in (kinds, span_id, level, ts_min, ts_max, seq_min, seq_max)
+        )
+
+    def matches(self, header: Dict[str, Any]) -> bool:
+        if self.kinds is not None and header.get("kind") not in self.kinds:
+            return False
+        if self.span_id is not None and header.get("span_id") != self.span_id:
+            return False
+        if self.level is not None and header.get("level") != self.level:
+            return False
+        if self.ts_min is not None or self.ts_max is not None:
+            ts = header.get("ts_unix_ns")
+            if not isinstance(ts, int):
+                return False
+            if (self.ts_min is not None and ts < self.ts_min) or (self.ts_max is not None and ts > self.ts_max):
+                return False
+        if self.seq_min is not None or self.seq_max is not None:
+            seq = header.get("seq")
+            if not isinstance(seq, int):
+                return False
+            if (self.seq_min is not None and seq < self.seq_min) or (self.seq_max is not None and seq > self.seq_max):
+                return False
+        return True
+
+    def past_end(self, header: Dict[str, Any]) -> bool:
+        """``seq`` is monotonic within a trace, so nothing after ``seq_max`` can match."""
+        seq = header.get("seq")
+        return self.seq_max is not None and isinstance(seq, int) and seq > self.seq_max
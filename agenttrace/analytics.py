@@ -0,0 +1,228 @@
+"""Grouped counts, sums and percentiles across traces.
+
+:func:`aggregate` (also :meth:`TraceReader.aggregate` and ``agenttrace
+stats``) answers questions like "p50/p95/p99 LLM latency and total cost per
+model per project this week".  It works on the same per-event fields as the
+columnar export (:func:`agenttrace.columnar.event_rows`).
+
+Extracting those fields means decoding every metric-carrying event, so the
+result is cached per trace in ``events.metrics`` next to the events: a
+small JSON file of columns for the metric kinds only, tagged with the size
+and mtime of the data file it was built from.  Finished traces are indexed
+once; later queries only read the index.  Rows are then grouped and reduced
+as arrays, with NumPy when it is installed and in pure Python otherwise
+(both use linear interpolation between ranks, so results match).
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "METRICS_FILE",
+    "METRICS",
+    "GROUP_KEYS",
+    "DEFAULT_KINDS",
+    "aggregate",
+    "load_metrics",
+]
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .columnar import event_rows
+from .storage import _data_file, _window_ns, find_trace_dir, is_finished
+
+METRICS_FILE = "events.metrics"
+_VERSION = 2
+
+METRICS = ("duration_ms", "tokens", "cost_usd")
+GROUP_KEYS = ("project", "trace_id", "kind", "model", "tool")
+DEFAULT_KINDS = ("llm_response", "span_end", "tool_result")
+
+#: Kinds kept in the index: the ones whose events carry metrics.
+_INDEXED_KINDS = frozenset({"llm_request", "llm_response", "tool_call", "tool_result", "span_start", "span_end"})
+#: Kinds that keep their ``model``.  A tool result or span end inside an LLM
+#: span inherits the span's model in :func:`~agenttrace.columnar.event_rows`,
+#: which would put tool and span latencies into the model's percentiles.
+_MODEL_KINDS = frozenset({"llm_request", "llm_response"})
+_FIELDS = ("ts", "kind", "model", "tool") + METRICS
+
+
+def _source_stamp(path: Path) -> List[int]:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _build_metrics(reader: Any, trace_id: str) -> Dict[str, list]:
+    columns: Dict[str, list] = {name: [] for name in _FIELDS}
+    for _, ts, _, kind, _, model, tool, duration, tokens, cost in event_rows(
+        reader.iter_events(trace_id, lazy=True), trace_id
+    ):
+        if kind not in _INDEXED_KINDS:
+            continue
+        if kind not in _MODEL_KINDS:
+            model = None
+        for name, value in zip(_FIELDS, (ts, kind, model, tool, duration, tokens, cost)):
+            columns[name].append(None if isinstance(value, float) and math.isnan(value) else value)
+    columns["tokens"] = [None if v is not None and v < 0 else v for v in columns["tokens"]]
+    return columns
+
+
+def load_metrics(reader: Any, trace_id: str, write: bool = True) -> Optional[Dict[str, list]]:
+    """Metric columns of one trace, from its index when that is current.
+
+    A missing or stale index is rebuilt and, for finished traces (when
+    ``write`` is set), saved.  ``None`` if the trace does not exist.
+    """
+    trace_dir = find_trace_dir(Path(reader.root), trace_id)
+    if trace_dir is None:
+        return None
+    path = trace_dir / METRICS_FILE
+    stamp = _source_stamp(_data_file(trace_dir))
+    try:
+        cached = json.loads(path.read_text(encoding="utf-8"))
+        if cached.get("version") == _VERSION and cached.get("source") == stamp:
+            return cached["columns"]
+    except (OSError, ValueError, AttributeError):
+        pass
+    columns = _build_metrics(reader, trace_id)
+    if write and is_finished(_data_file(trace_dir)):
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": _VERSION, "source": stamp, "columns": columns}), encoding="utf-8")
+        os.replace(tmp, path)
+    return columns
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    """Linear interpolation between closest ranks (NumPy's default)."""
+    rank = p / 100 * (len(sorted_values) - 1)
+    lo = math.floor(rank)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (rank - lo)
+
+
+def _reduce_python(values: List[Optional[float]], percentiles: Sequence[float]) -> Dict[str, Any]:
+    present = sorted(v for v in values if v is not None)
+    if not present:
+        return {"count": 0, "sum": 0.0, "mean": None, **{f"p{p:g}": None for p in percentiles}}
+    total = math.fsum(present)
+    out = {"count": len(present), "sum": total, "mean": total / len(present)}
+    out.update({f"p{p:g}": _percentile(present, p) for p in percentiles})
+    return out
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _reduce_groups(
+    codes: List[int], groups: int, metrics: Dict[str, List[Optional[float]]], percentiles: Sequence[float]
+) -> List[Dict[str, Dict[str, Any]]]:
+    """Per group and metric: count, sum, mean and percentiles of the present values."""
+    np = _numpy()
+    out: List[Dict[str, Dict[str, Any]]] = [{} for _ in range(groups)]
+    if np is None:
+        members: List[List[int]] = [[] for _ in range(groups)]
+        for row, code in enumerate(codes):
+            members[code].append(row)
+        for name, values in metrics.items():
+            for code, rows in enumerate(members):
+                out[code][name] = _reduce_python([values[r] for r in rows], percentiles)
+        return out
+
+    code_arr = np.asarray(codes, dtype=np.int64)
+    order = np.argsort(code_arr, kind="stable")
+    bounds = np.searchsorted(code_arr[order], np.arange(groups + 1))
+    for name, values in metrics.items():
+        arr = np.array([np.nan if v is None else v for v in values], dtype=np.float64)[order]
+        for code in range(groups):
+            chunk = arr[bounds[code]:bounds[code + 1]]
+            chunk = chunk[~np.isnan(chunk)]
+            if not len(chunk):
+                out[code][name] = _reduce_python([], percentiles)
+                continue
+            qs = np.percentile(chunk, list(percentiles)) if percentiles else []
+            total = float(chunk.sum())
+            stats = {"count": int(len(chunk)), "sum": total, "mean": total / len(chunk)}
+            stats.update({f"p{p:g}": float(q) for p, q in zip(percentiles, qs)})
+            out[code][name] = stats
+    return out
+
+
+def aggregate(
+    reader: Any,
+    group_by: Sequence[str] = ("model",),
+    kinds: Optional[Sequence[str]] = DEFAULT_KINDS,
+    metrics: Sequence[str] = METRICS,
+    percentiles: Sequence[float] = (50, 95, 99),
+    project: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """Grouped statistics over the metric events of many traces.
+
+    Args:
+        reader: A :class:`~agenttrace.reader.TraceReader`.
+        group_by: Keys from :data:`GROUP_KEYS` to group rows by.
+        kinds: Event kinds to include (``None`` for every indexed kind).
+        metrics: Fields from :data:`METRICS` to reduce.
+        percentiles: Percentiles (0-100) to compute for each metric.
+        project / since / until: Trace selection, as for ``list_traces``;
+            ``since``/``until`` also bound the events' own timestamps.
+
+    Returns one dict per group, largest first: the group key values,
+    ``count`` (matching events) and, per metric, ``<metric>_count`` (events
+    that record it), ``_sum``, ``_mean`` and ``_p<N>``.
+    """
+    if isinstance(group_by, str):
+        group_by = [group_by]
+    if isinstance(kinds, str):
+        kinds = [kinds]
+    unknown = (set(group_by) - set(GROUP_KEYS)) | (set(metrics) - set(METRICS))
+    if unknown:
+        raise ValueError(f"unknown group key or metric: {', '.join(sorted(unknown))}")
+    wanted = None if kinds is None else set(kinds)
+    lo, hi = _window_ns(since, until)
+
+    keys: Dict[Tuple[Any, ...], int] = {}
+    codes: List[int] = []
+    values: Dict[str, List[Optional[float]]] = {name: [] for name in metrics}
+    for trace in reader.list_traces(project=project, since=since, until=until):
+        columns = load_metrics(reader, trace["id"])
+        if not columns:
+            continue
+        context = {"project": trace.get("project"), "trace_id": trace["id"]}
+        for row in range(len(columns["kind"])):
+            if wanted is not None and columns["kind"][row] not in wanted:
+                continue
+            ts = columns["ts"][row]
+            if (lo is not None and ts < lo) or (hi is not None and ts > hi):
+                continue
+            key = tuple(context[k] if k in context else columns[k][row] for k in group_by)
+            code = keys.get(key)
+            if code is None:
+                code = keys[key] = len(keys)
+            codes.append(code)
+            for name in metrics:
+                values[name].append(columns[name][row])
+
+    reduced = _reduce_groups(codes, len(keys), values, percentiles)
+    counts = [0] * len(keys)
+    for code in codes:
+        counts[code] += 1
+    results = []
+    for key, code in keys.items():
+        entry: Dict[str, Any] = dict(zip(group_by, key))
+        entry["count"] = counts[code]
+        for name in metrics:
+            for stat, value in reduced[code][name].items():
+                entry[f"{name}_{stat}"] = value
+        results.append(entry)
+    results.sort(key=lambda e: -e["count"])
+    return results
@@ -0,0 +1,303 @@
+"""Compressed archives for finished traces.
+
+``agenttrace compact`` replaces a cold trace's ``events.jsonl`` with
+``events.archive``: the same lines, split into blocks that are compressed
+independently, plus an index of each block's ``seq``/``ts_unix_ns`` range so
+filtered reads only decompress the blocks they need.  Readers in both
+backends fall back to the archive when ``events.jsonl`` is absent, so call
+sites do not change.
+
+File layout (little-endian), shared with ``crates/agenttrace-core/src/archive.rs``::
+
+    header   "ATAR" | version u8 | codec u8 | reserved u16 | block_count u32
+             | head_len u32 | event_count u64 | index_offset u64
+    head     the first line, uncompressed (``head_len`` bytes)
+    blocks   compressed JSONL chunks (complete lines, CRC suffixes kept)
+    index    per block: offset u64 | compressed_len u32 | raw_len u32
+             | seq_min u64 | seq_max u64 | ts_min u64 | ts_max u64 | crc32 u32
+
+``crc32`` is the zlib CRC-32 of the uncompressed block.  The head copy of
+the ``trace_start`` line lets listings read a trace's metadata without
+decompressing anything, whatever the codec.
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "ARCHIVE_FILE",
+    "CODECS",
+    "ArchiveCodecError",
+    "ArchiveReader",
+    "CompactResult",
+    "available_codecs",
+    "compact_trace",
+    "expand_trace",
+    "read_first_event",
+]
+
+import json
+import lzma
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+ARCHIVE_FILE = "events.archive"
+CODECS = {"zlib": 1, "lzma": 2, "zstd": 3}
+_CODEC_NAMES = {v: k for k, v in CODECS.items()}
+_DEFAULT_LEVELS = {"zlib": 6, "lzma": 6, "zstd": 10}
+
+_MAGIC = b"ATAR"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBBHIIQQ")
+_BLOCK = struct.Struct("<QIIQQQQI")
+_U64_MAX = (1 << 64) - 1
+
+
+class ArchiveCodecError(ValueError):
+    """The archive's codec cannot be decoded in this environment."""
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def available_codecs() -> List[str]:
+    """Codecs usable in this interpreter (``zstd`` needs ``zstandard``)."""
+    return [name for name in CODECS if name != "zstd" or _zstd() is not None]
+
+
+def _compress(codec: str, data: bytes, level: int) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, level)
+    if codec == "lzma":
+        return lzma.compress(data, preset=level)
+    zstd = _zstd()
+    if zstd is None:
+        raise ValueError("zstd codec requires the 'zstandard' package")
+    return zstd.ZstdCompressor(level=level).compress(data)
+
+
+def _decompress(codec: int, data: bytes, raw_len: int) -> bytes:
+    if codec == CODECS["zlib"]:
+        return zlib.decompress(data)
+    if codec == CODECS["lzma"]:
+        return lzma.decompress(data)
+    if codec == CODECS["zstd"]:
+        zstd = _zstd()
+        if zstd is None:
+            raise ArchiveCodecError("archive uses zstd; install 'zstandard' to read it")
+        return zstd.ZstdDecompressor().decompress(data, max_output_size=raw_len)
+    raise ArchiveCodecError(f"unknown archive codec {codec}")
+
+
+@dataclass
+class _Block:
+    offset: int
+    compressed_len: int
+    raw_len: int
+    seq_min: int
+    seq_max: int
+    ts_min: int
+    ts_max: int
+    crc32: int
+
+
+class ArchiveReader:
+    """Random access to the blocks of an ``events.archive`` file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError("not a trace archive")
+            magic, version, codec, _, block_count, head_len, event_count, index_offset = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                raise ValueError("not a trace archive")
+            if version != _VERSION:
+                raise ValueError(f"unsupported archive version {version}")
+            self.head = f.read(head_len)
+            f.seek(index_offset)
+            index = f.read(block_count * _BLOCK.size)
+        if len(index) != block_count * _BLOCK.size:
+            raise ValueError("truncated archive index")
+        self.codec = codec
+        self.codec_name = _CODEC_NAMES.get(codec, str(codec))
+        self.event_count = event_count
+        self.blocks = [_Block(*_BLOCK.unpack_from(index, i * _BLOCK.size)) for i in range(block_count)]
+
+    def read_block(self, i: int) -> bytes:
+        block = self.blocks[i]
+        with self.path.open("rb") as f:
+            f.seek(block.offset)
+            data = _decompress(self.codec, f.read(block.compressed_len), block.raw_len)
+        if zlib.crc32(data) != block.crc32:
+            raise ValueError(f"archive block {i} is corrupt")
+        return data
+
+    def select(
+        self,
+        seq_min: Optional[int] = None,
+        seq_max: Optional[int] = None,
+        ts_min: Optional[int] = None,
+        ts_max: Optional[int] = None,
+    ) -> List[int]:
+        """Indices of the blocks whose ranges overlap the given bounds."""
+        return [
+            i
+            for i, b in enumerate(self.blocks)
+            if (seq_min is None or b.seq_max >= seq_min)
+            and (seq_max is None or b.seq_min <= seq_max)
+            and (ts_min is None or b.ts_max >= ts_min)
+            and (ts_max is None or b.ts_min <= ts_max)
+        ]
+
+    def iter_lines(self, blocks: Optional[List[int]] = None) -> Iterator[str]:
+        """Decoded lines of the given blocks (all by default), in order."""
+        for i in range(len(self.blocks)) if blocks is None else blocks:
+            yield from self.read_block(i).decode("utf-8").splitlines()
+
+    def read_all(self) -> bytes:
+        return b"".join(self.read_block(i) for i in range(len(self.blocks)))
+
+
+@dataclass
+class CompactResult:
+    raw_bytes: int
+    archived_bytes: int
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_bytes / self.archived_bytes if self.archived_bytes else 0.0
+
+
+def _line_bounds(line: bytes):
+    from ._native import _strip_crc
+    from .lazy import split_event_line
+
+    try:
+        header, _ = split_event_line(_strip_crc(line.decode("utf-8").strip()))
+    except (ValueError, UnicodeDecodeError):
+        return None, None
+    seq = header.get("seq")
+    ts = header.get("ts_unix_ns")
+    return (seq if isinstance(seq, int) else None), (ts if isinstance(ts, int) else None)
+
+
+def compact_trace(
+    trace_dir: Path,
+    codec: str = "zlib",
+    level: Optional[int] = None,
+    block_size: int = 64 * 1024,
+) -> CompactResult:
+    """Replace ``trace_dir/events.jsonl`` with a compressed ``events.archive``.
+
+    The archive is written to a temporary file and renamed into place before
+    the JSONL file is removed, so readers always find one of the two.  The
+    caller is responsible for only compacting finished traces.  A missing
+    search Bloom filter is built first, at ``AGENTTRACE_BLOOM_FP``, unless
+    that disables filters.
+    """
+    from .bloom import BLOOM_FILE, build_bloom_for_file
+    from .config import get_bloom_fp_rate
+
+    if codec not in CODECS:
+        raise ValueError(f"unknown codec: {codec}")
+    level = _DEFAULT_LEVELS[codec] if level is None else level
+    trace_dir = Path(trace_dir)
+    events_path = trace_dir / "events.jsonl"
+    fp_rate = get_bloom_fp_rate()
+    if fp_rate is not None and not (trace_dir / BLOOM_FILE).exists():
+        # Search relies on the filter to skip archives without decoding them.
+        build_bloom_for_file(events_path, fp_rate)
+
+    tmp = trace_dir / (ARCHIVE_FILE + ".tmp")
+    index: List[bytes] = []
+    event_count = 0
+    raw_bytes = 0
+    with events_path.open("rb") as src, tmp.open("wb") as out:
+        head = src.readline().rstrip(b"\n")
+        src.seek(0)
+        out.write(b"\0" * _HEADER.size)
+        out.write(head)
+        chunk: List[bytes] = []
+        chunk_len = 0
+        bounds = [_U64_MAX, 0, _U64_MAX, 0]
+
+        def flush() -> None:
+            nonlocal chunk, chunk_len, bounds
+            if not chunk:
+                return
+            data = b"".join(chunk)
+            comp = _compress(codec, data, level)
+            seq_lo, seq_hi, ts_lo, ts_hi = bounds
+            index.append(_BLOCK.pack(
+                out.tell(), len(comp), len(data),
+                0 if seq_lo == _U64_MAX else seq_lo, seq_hi,
+                0 if ts_lo == _U64_MAX else ts_lo, ts_hi,
+                zlib.crc32(data),
+            ))
+            out.write(comp)
+            chunk, chunk_len, bounds = [], 0, [_U64_MAX, 0, _U64_MAX, 0]
+
+        for raw in src:
+            raw_bytes += len(raw)
+            if not raw.strip():
+                continue
+            if not raw.endswith(b"\n"):
+                raw += b"\n"
+            seq, ts = _line_bounds(raw)
+            if seq is not None:
+                bounds[0], bounds[1] = min(bounds[0], seq), max(bounds[1], seq)
+            else:
+                # Unknown seq: this block must never be skipped by seq bounds.
+                bounds[0], bounds[1] = 0, _U64_MAX
+            if ts is not None:
+                bounds[2], bounds[3] = min(bounds[2], ts), max(bounds[3], ts)
+            else:
+                bounds[2], bounds[3] = 0, _U64_MAX
+            chunk.append(raw)
+            chunk_len += len(raw)
+            event_count += 1
+            if chunk_len >= block_size:
+                flush()
+        flush()
+
+        index_offset = out.tell()
+        out.write(b"".join(index))
+        out.seek(0)
+        out.write(_HEADER.pack(_MAGIC, _VERSION, CODECS[codec], 0, len(index), len(head), event_count, index_offset))
+        out.flush()
+        os.fsync(out.fileno())
+        archived_bytes = out.seek(0, os.SEEK_END)
+
+    os.replace(tmp, trace_dir / ARCHIVE_FILE)
+    events_path.unlink()
+    return CompactResult(raw_bytes, archived_bytes)
+
+
+def expand_trace(trace_dir: Path) -> None:
+    """Turn an archived trace back into a plain ``events.jsonl``."""
+    trace_dir = Path(trace_dir)
+    archive = ArchiveReader(trace_dir / ARCHIVE_FILE)
+    tmp = trace_dir / "events.jsonl.tmp"
+    with tmp.open("wb") as out:
+        for i in range(len(archive.blocks)):
+            out.write(archive.read_block(i))
+    os.replace(tmp, trace_dir / "events.jsonl")
+    (trace_dir / ARCHIVE_FILE).unlink()
+
+
+def read_first_event(trace_dir: Path) -> Optional[dict]:
+    """First event of an archived trace, read from the uncompressed head."""
+    from ._native import _strip_crc
+
+    head = ArchiveReader(Path(trace_dir) / ARCHIVE_FILE).head.decode("utf-8").strip()
+    return json.loads(_strip_crc(head)) if head else None
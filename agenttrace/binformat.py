@@ -0,0 +1,318 @@
+"""Binary event encoding, an alternative to JSONL + CRC.
+
+A trace written with ``format="binary"`` stores ``events.bin`` instead of
+``events.jsonl``.  Each event is one length-prefixed, CRC-framed record whose
+body is a compact, MessagePack-style encoding of the event dict.  Map keys
+and the repeated header strings (``trace_id``, ``kind``, ``level``, span ids)
+go into a per-file string table: the first record that uses a string defines
+it, later ones refer to it by index.  Readers of either format produce the
+same dicts.
+
+File layout (little-endian), shared with
+``crates/agenttrace-core/src/binformat.rs``::
+
+    header  "ATEV" | version u8 | reserved u8 * 3
+    record  body_len u32 | crc32 u32 | body
+    body    new_string_count varint | (len varint | utf-8) * count | value
+
+``crc32`` is the zlib CRC-32 of the body.  Values start with a tag byte:
+
+    0 null | 1 false | 2 true | 3 int (zigzag varint) | 4 uint (varint, above
+    the i64 range) | 5 float64 | 6 string (len varint | utf-8) | 7 string-table
+    reference (index varint) | 8 array (count varint | values) | 9 map (count
+    varint | (string or reference key, value) * count) | 10 integer outside
+    the u64 range (decimal string)
+
+A truncated final record (a write in progress) ends the stream silently; a
+CRC mismatch raises :class:`ValueError`.
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "BINARY_FILE",
+    "BinaryEncoder",
+    "BinaryDecoder",
+    "iter_binary_events",
+    "read_binary_header",
+    "first_binary_event",
+    "last_binary_event",
+    "count_binary_events",
+    "load_string_table",
+    "decode_new",
+]
+
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+BINARY_FILE = "events.bin"
+
+MAGIC = b"ATEV"
+VERSION = 1
+HEADER = MAGIC + bytes([VERSION, 0, 0, 0])
+_FRAME = struct.Struct("<II")
+_F64 = struct.Struct("<d")
+
+_NULL, _FALSE, _TRUE, _INT, _UINT, _FLOAT, _STR, _REF, _ARRAY, _MAP, _BIGINT = range(11)
+_I64_MIN, _I64_MAX, _U64_MAX = -(1 << 63), (1 << 63) - 1, (1 << 64) - 1
+
+#: Top-level fields whose string values are interned along with map keys.
+INTERNED_FIELDS = frozenset({"trace_id", "kind", "level", "span_id", "parent_span_id"})
+
+
+def _put_varint(out: bytearray, n: int) -> None:
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+class BinaryEncoder:
+    """Encodes events into framed records, tracking the file's string table."""
+
+    def __init__(self, strings: Optional[List[str]] = None) -> None:
+        self._ids: Dict[str, int] = {s: i for i, s in enumerate(strings or [])}
+        self._new: List[str] = []
+
+    def _intern(self, out: bytearray, s: str) -> None:
+        idx = self._ids.get(s)
+        if idx is None:
+            idx = self._ids[s] = len(self._ids)
+            self._new.append(s)
+        out.append(_REF)
+        _put_varint(out, idx)
+
+    def _value(self, out: bytearray, v: Any) -> None:
+        if v is None:
+            out.append(_NULL)
+        elif v is True:
+            out.append(_TRUE)
+        elif v is False:
+            out.append(_FALSE)
+        elif isinstance(v, int):
+            if _I64_MIN <= v <= _I64_MAX:
+                out.append(_INT)
+                _put_varint(out, (v << 1) ^ (v >> 63))
+            elif 0 <= v <= _U64_MAX:
+                out.append(_UINT)
+                _put_varint(out, v)
+            else:
+                data = str(v).encode("ascii")
+                out.append(_BIGINT)
+                _put_varint(out, len(data))
+                out += data
+        elif isinstance(v, float):
+            out.append(_FLOAT)
+            out += _F64.pack(v)
+        elif isinstance(v, str):
+            data = v.encode("utf-8")
+            out.append(_STR)
+            _put_varint(out, len(data))
+            out += data
+        elif isinstance(v, dict):
+            out.append(_MAP)
+            _put_varint(out, len(v))
+            for key, item in v.items():
+                self._intern(out, key if isinstance(key, str) else str(key))
+                self._value(out, item)
+        elif isinstance(v, (list, tuple)):
+            out.append(_ARRAY)
+            _put_varint(out, len(v))
+            for item in v:
+                self._value(out, item)
+        else:
+            raise TypeError(f"cannot encode {type(v).__name__} in a binary event")
+
+    def encode(self, event: Dict[str, Any]) -> bytes:
+        """One framed record holding ``event``."""
+        value = bytearray()
+        value.append(_MAP)
+        _put_varint(value, len(event))
+        for key, item in event.items():
+            self._intern(value, key)
+            if key in INTERNED_FIELDS and isinstance(item, str):
+                self._intern(value, item)
+            else:
+                self._value(value, item)
+
+        body = bytearray()
+        _put_varint(body, len(self._new))
+        for s in self._new:
+            data = s.encode("utf-8")
+            _put_varint(body, len(data))
+            body += data
+        self._new = []
+        body += value
+        return _FRAME.pack(len(body), zlib.crc32(body)) + bytes(body)
+
+
+class BinaryDecoder:
+    """Decodes record bodies, accumulating the file's string table."""
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+
+    def _defs(self, body: bytes) -> int:
+        """Read the string definitions at the start of ``body``; returns the
+        offset of the value."""
+        count, pos = _get_varint(body, 0)
+        for _ in range(count):
+            n, pos = _get_varint(body, pos)
+            self.strings.append(body[pos:pos + n].decode("utf-8"))
+            pos += n
+        return pos
+
+    def skip(self, body: bytes) -> None:
+        """Take the string definitions of a record without decoding its event."""
+        self._defs(body)
+
+    def decode(self, body: bytes) -> Any:
+        pos = self._defs(body)
+        value, _ = self._value(body, pos)
+        return value
+
+    def _value(self, buf: bytes, pos: int) -> Tuple[Any, int]:
+        tag = buf[pos]
+        pos += 1
+        if tag == _REF:
+            idx, pos = _get_varint(buf, pos)
+            return self.strings[idx], pos
+        if tag == _STR:
+            n, pos = _get_varint(buf, pos)
+            return buf[pos:pos + n].decode("utf-8"), pos + n
+        if tag == _INT:
+            n, pos = _get_varint(buf, pos)
+            return (n >> 1) ^ -(n & 1), pos
+        if tag == _MAP:
+            count, pos = _get_varint(buf, pos)
+            out: Dict[str, Any] = {}
+            for _ in range(count):
+                key, pos = self._value(buf, pos)
+                out[key], pos = self._value(buf, pos)
+            return out, pos
+        if tag == _ARRAY:
+            count, pos = _get_varint(buf, pos)
+            items = []
+            for _ in range(count):
+                item, pos = self._value(buf, pos)
+                items.append(item)
+            return items, pos
+        if tag == _NULL:
+            return None, pos
+        if tag == _TRUE:
+            return True, pos
+        if tag == _FALSE:
+            return False, pos
+        if tag == _FLOAT:
+            return _F64.unpack_from(buf, pos)[0], pos + 8
+        if tag == _UINT:
+            return _get_varint(buf, pos)
+        if tag == _BIGINT:
+            n, pos = _get_varint(buf, pos)
+            return int(buf[pos:pos + n].decode("ascii")), pos + n
+        raise ValueError(f"unknown binary value tag {tag}")
+
+
+def _get_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def read_binary_header(f: BinaryIO) -> None:
+    """Check the file header; an empty file (nothing written yet) is accepted."""
+    header = f.read(len(HEADER))
+    if header and (len(header) < len(HEADER) or header[:4] != MAGIC):
+        raise ValueError("not a binary event file")
+    if header and header[4] != VERSION:
+        raise ValueError(f"unsupported binary event version {header[4]}")
+
+
+def _iter_bodies(f: BinaryIO) -> Iterator[bytes]:
+    read_binary_header(f)
+    index = 0
+    while True:
+        frame = f.read(_FRAME.size)
+        if len(frame) < _FRAME.size:
+            return
+        length, crc = _FRAME.unpack(frame)
+        body = f.read(length)
+        if len(body) < length:
+            return
+        index += 1
+        if zlib.crc32(body) != crc:
+            raise ValueError(f"CRC mismatch in binary record {index}")
+        yield body
+
+
+def iter_binary_events(path: Path) -> Iterator[Dict[str, Any]]:
+    """Decode every complete record of an ``events.bin`` file."""
+    decoder = BinaryDecoder()
+    with open(path, "rb") as f:
+        for body in _iter_bodies(f):
+            yield decoder.decode(body)
+
+
+def first_binary_event(path: Path) -> Optional[Dict[str, Any]]:
+    return next(iter_binary_events(path), None)
+
+
+def last_binary_event(path: Path) -> Optional[Dict[str, Any]]:
+    """The last event; earlier records are only read for their strings."""
+    decoder = BinaryDecoder()
+    last = None
+    with open(path, "rb") as f:
+        for body in _iter_bodies(f):
+            if last is not None:
+                decoder.skip(last)
+            last = body
+    return decoder.decode(last) if last is not None else None
+
+
+def count_binary_events(path: Path) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for _ in _iter_bodies(f))
+
+
+def load_string_table(path: Path) -> List[str]:
+    """String table of an existing file, so a writer can append to it."""
+    decoder = BinaryDecoder()
+    with open(path, "rb") as f:
+        for body in _iter_bodies(f):
+            decoder.skip(body)
+    return decoder.strings
+
+
+def decode_new(data: bytes, decoder: BinaryDecoder, at_start: bool) -> Tuple[List[Dict[str, Any]], int]:
+    """Decode the complete records in ``data`` (bytes appended to a file).
+
+    Returns the events and how many bytes they used; a trailing partial
+    record is left for the next call.  ``at_start`` means ``data`` begins
+    with the file header.
+    """
+    pos = 0
+    if at_start:
+        if len(data) < len(HEADER):
+            return [], 0
+        if data[:4] != MAGIC:
+            raise ValueError("not a binary event file")
+        pos = len(HEADER)
+    events = []
+    while pos + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(data, pos)
+        end = pos + _FRAME.size + length
+        if end > len(data):
+            break
+        body = data[pos + _FRAME.size:end]
+        if zlib.crc32(body) != crc:
+            raise ValueError("CRC mismatch in binary record")
+        events.append(decoder.decode(body))
+        pos = end
+    return events, pos
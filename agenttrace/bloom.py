@@ -0,0 +1,154 @@
+"""Per-trace Bloom filters over byte trigrams.
+
+Search is a substring match, so each filter indexes every 3-byte window of
+the trace's event JSON rather than whole words: a query of 3 or more bytes can
+only occur in a trace if all of its trigrams are present.  The file format and
+hashing match ``crates/agenttrace-core/src/bloom.rs`` so either backend can
+read filters written by the other.
+"""
+
+from __future__ import annotations
+
+__all__ = ["Bloom", "BloomBuilder", "BLOOM_FILE", "build_bloom_for_file"]
+
+import math
+import os
+import struct
+from pathlib import Path
+from typing import Iterable, Optional, Set, Tuple
+
+BLOOM_FILE = "events.bloom"
+_MAGIC = b"ATBF"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBBHQQ")
+_MASK64 = (1 << 64) - 1
+
+
+def _splitmix64(x: int) -> int:
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _pack(gram: Tuple[int, int, int]) -> int:
+    return (gram[0] << 16) | (gram[1] << 8) | gram[2]
+
+
+class BloomBuilder:
+    """Collects the distinct trigrams of the lines written to a trace."""
+
+    def __init__(self) -> None:
+        self._grams: Set[Tuple[int, int, int]] = set()
+
+    def add(self, data: bytes) -> None:
+        self._grams.update(zip(data, data[1:], data[2:]))
+
+    def build(self, fp_rate: float) -> "Bloom":
+        bloom = Bloom.with_capacity(len(self._grams), fp_rate)
+        for gram in self._grams:
+            bloom.insert(_pack(gram))
+        return bloom
+
+
+class Bloom:
+    def __init__(self, k: int, m: int, n: int, bits: bytearray) -> None:
+        self.k = k
+        self.m = m
+        self.n = n
+        self.bits = bits
+
+    @classmethod
+    def with_capacity(cls, n: int, fp_rate: float) -> "Bloom":
+        p = min(max(fp_rate, 1e-9), 0.5)
+        n_f = float(max(n, 1))
+        ln2 = math.log(2)
+        m = int(max(math.ceil(-n_f * math.log(p) / (ln2 * ln2)), 64.0))
+        k = int(min(max(_round_half_away(m / n_f * ln2), 1.0), 16.0))
+        return cls(k, m, n, bytearray((m + 7) // 8))
+
+    def _positions(self, gram: int) -> Iterable[int]:
+        h = _splitmix64(gram)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        m = self.m
+        return (((h1 + i * h2) & _MASK64) % m for i in range(self.k))
+
+    def insert(self, gram: int) -> None:
+        bits = self.bits
+        for bit in self._positions(gram):
+            bits[bit >> 3] |= 1 << (bit & 7)
+
+    def contains_gram(self, gram: int) -> bool:
+        bits = self.bits
+        return all(bits[bit >> 3] & (1 << (bit & 7)) for bit in self._positions(gram))
+
+    def may_contain(self, needle: bytes) -> bool:
+        """``False`` means ``needle`` definitely does not occur in the trace."""
+        if len(needle) < 3:
+            return True
+        return all(self.contains_gram(_pack(g)) for g in set(zip(needle, needle[1:], needle[2:])))
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(_MAGIC, _VERSION, self.k, 0, self.m, self.n) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Bloom":
+        if len(data) < _HEADER.size:
+            raise ValueError("not a bloom filter file")
+        magic, version, k, _, m, n = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("not a bloom filter file")
+        if version != _VERSION:
+            raise ValueError(f"unsupported bloom filter version {version}")
+        bits = bytearray(data[_HEADER.size:])
+        if k == 0 or m == 0 or len(bits) != (m + 7) // 8:
+            raise ValueError("corrupt bloom filter")
+        return cls(k, m, n, bits)
+
+    def write_to(self, path: Path) -> None:
+        """Write atomically (temp file + rename)."""
+        tmp = Path(str(path) + ".tmp")
+        tmp.write_bytes(self.to_bytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def read_from(cls, path: Path) -> "Bloom":
+        return cls.from_bytes(Path(path).read_bytes())
+
+
+def _round_half_away(x: float) -> float:
+    # Rust's f64::round rounds half away from zero; Python's round() is banker's.
+    return math.floor(x + 0.5)
+
+
+def load_bloom(trace_dir: Path) -> Optional[Bloom]:
+    """Return the trace's filter, or ``None`` if missing or unreadable."""
+    try:
+        return Bloom.read_from(Path(trace_dir) / BLOOM_FILE)
+    except (OSError, ValueError):
+        return None
+
+
+def build_bloom_for_file(events_path: Path, fp_rate: float) -> Bloom:
+    """Build and persist the filter for an existing (finished) events file.
+
+    Binary traces are indexed on the JSON text of their events, which is what
+    search matches against.
+    """
+    from ._native import _json_line, _strip_crc
+    from .binformat import BINARY_FILE, iter_binary_events
+
+    builder = BloomBuilder()
+    if Path(events_path).name == BINARY_FILE:
+        for event in iter_binary_events(Path(events_path)):
+            builder.add(_json_line(event).encode("utf-8"))
+    else:
+        with Path(events_path).open("rb") as f:
+            for raw in f:
+                line = raw.strip()
+                if line:
+                    builder.add(_strip_crc(line.decode("utf-8")).encode("utf-8"))
+    bloom = builder.build(fp_rate)
+    bloom.write_to(Path(events_path).parent / BLOOM_FILE)
+    return bloom
@@ -0,0 +1,130 @@
+"""Byte-bounded LRU cache of rendered trace responses for the UI server.
+
+Entries are keyed by ``(trace_id, size, mtime_ns, query)``, where size and
+mtime are those of the trace's data file: a finished trace keeps its key and
+is served from memory, while a trace that is still being written gets a new
+key on every append, so a stale entry is never returned.  When a trace is
+stored under a new stamp, its entries for older stamps are dropped at once.
+
+Values are the encoded response bodies, so the bound is the number of bytes
+actually held and a hit costs neither parsing nor serialization.
+
+:class:`TraceObjectCache` keeps a few structures derived from whole traces
+(such as a :class:`~agenttrace.profile.Profile`) under the same kind of
+stamp, for endpoints that serve them piece by piece.
+"""
+
+from __future__ import annotations
+
+__all__ = ["ResponseCache", "TraceObjectCache", "trace_stamp"]
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from .storage import _data_file, find_trace_dir
+
+Stamp = Tuple[int, int]
+Key = Tuple[str, int, int, Hashable]
+
+
+def trace_stamp(root: Path, trace_id: str) -> Optional[Stamp]:
+    """``(size, mtime_ns)`` of a trace's data file; ``None`` if it does not exist."""
+    trace_dir = find_trace_dir(Path(root), trace_id)
+    if trace_dir is None:
+        return None
+    try:
+        st = _data_file(trace_dir).stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class ResponseCache:
+    """Thread-safe LRU of ``bytes`` values holding at most ``max_bytes``."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Key, bytes]" = OrderedDict()
+        self._by_trace: Dict[str, Set[Key]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, trace_id: str, stamp: Stamp, query: Hashable) -> Optional[bytes]:
+        key = (trace_id, stamp[0], stamp[1], query)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, trace_id: str, stamp: Stamp, query: Hashable, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        key = (trace_id, stamp[0], stamp[1], query)
+        with self._lock:
+            for old in list(self._by_trace.get(trace_id, ())):
+                if old[1:3] != stamp:
+                    self._remove(old)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = value
+            self._by_trace.setdefault(trace_id, set()).add(key)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Key) -> None:
+        value = self._entries.pop(key)
+        self.size -= len(value)
+        keys = self._by_trace[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._by_trace[key[0]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_trace.clear()
+            self.size = 0
+
+
+class TraceObjectCache:
+    """Thread-safe LRU of one object per trace, valid for one stamp."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Stamp, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_build(self, trace_id: str, stamp: Stamp, build: Callable[[], Any]) -> Any:
+        """The cached object for ``(trace_id, stamp)``, else ``build()``.
+
+        ``None`` results are not cached.  Two threads missing at once may
+        both build; the later result wins.
+        """
+        with self._lock:
+            entry = self._entries.get(trace_id)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(trace_id)
+                return entry[1]
+        value = build()
+        if value is not None and self.max_entries > 0:
+            with self._lock:
+                self._entries[trace_id] = (stamp, value)
+                self._entries.move_to_end(trace_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
@@ -4,8 +4,10 @@ from __future__ import annotations
 
 import argparse
 import json
-from typing import Any, Dict, List
+import os
+from typing import Any, Dict
 
+from .config import get_roots
 from .reader import TraceReader
 
 
@@ -34,65 +36,123 @@ def _format_event(evt: Dict[str, Any]) -> str:
             parts.append(f"error={err}")
     return " ".join(parts)
 
-def _format_value(value: Any) -> str:
-    try:
-        return json.dumps(value, ensure_ascii=True)
-    except TypeError:
-        return repr(value)
-
-def _diff_dict(a: Dict[str, Any], b: Dict[str, Any], prefix: str = "") -> List[str]:
-    diffs: List[str] = []
-    keys = set(a.keys()) | set(b.keys())
-    for key in sorted(keys):
-        key_path = f"{prefix}.{key}" if prefix else key
-        if key not in a:
-            diffs.append(f"{key_path}: + {_format_value(b[key])}")
-            continue
-        if key not in b:
-            diffs.append(f"{key_path}: - {_format_value(a[key])}")
-            continue
-        va = a[key]
-        vb = b[key]
-        if isinstance(va, dict) and isinstance(vb, dict):
-            diffs.extend(_diff_dict(va, vb, key_path))
-        elif va != vb:
-            diffs.append(f"{key_path}: {_format_value(va)} -> {_format_value(vb)}")
-    return diffs
-
-def _normalize_event(evt: Dict[str, Any]) -> Dict[str, Any]:
-    out = dict(evt)
-    out.pop("trace_id", None)
-    out.pop("ts_unix_ns", None)
-    out.pop("seq", None)  # Sequence might differ if inserted differently
-    out.pop("id", None)  # DB ID
-    return out
-
-
-def _events_by_seq(events: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
-    mapped: Dict[int, Dict[str, Any]] = {}
-    for idx, evt in enumerate(events):
-        seq = evt.get("seq")
-        if isinstance(seq, int):
-            mapped[seq] = evt
-        else:
-            mapped[idx + 1] = evt
-    return mapped
+
+def _stream_trace(reader: TraceReader, trace_id: str, out: Any, fmt: str) -> None:
+    import sys
+
+    from .export import write_trace
+
+    if write_trace(reader, trace_id, out or sys.stdout, fmt) is None:
+        raise SystemExit(f"trace not found: {trace_id}")
+
+
+def _report_root_errors(reader: Any) -> None:
+    import sys
+
+    for name, error in getattr(reader, "last_errors", {}).items():
+        print(f"warning: {name}: {error}", file=sys.stderr)
+
+
+def _add_root_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument(
+        "--root", action="append",
+        help="Trace root: a path or the URL of an agenttrace ui server (can be repeated; default AGENTTRACE_ROOTS)",
+    )
+    p.add_argument("--root-timeout", type=float, default=5.0, help="Seconds to wait for each root")
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(prog="agenttrace")
     sub = parser.add_subparsers(dest="cmd", required=True)
 
-    sub.add_parser("ls", help="List traces")
+    ls_p = sub.add_parser("ls", help="List traces")
+    ls_p.add_argument("--project", help="Only traces of this project")
+    ls_p.add_argument("--since", type=float, help="Only traces started at or after this unix time")
+    ls_p.add_argument("--until", type=float, help="Only traces started at or before this unix time")
+    ls_p.add_argument("--limit", type=int, help="Only the N most recent traces")
+    _add_root_args(ls_p)
 
     inspect_p = sub.add_parser("inspect", help="Print events for a trace")
     inspect_p.add_argument("trace_id")
+    inspect_p.add_argument("--format", choices=["json", "jsonl"], default="json", help="Trace document or one event per line")
+    inspect_p.add_argument("--out", help="Write to file instead of stdout")
 
     search_p = sub.add_parser("search", help="Search events for text")
     search_p.add_argument("query")
+    search_p.add_argument("--limit", type=int, help="Maximum number of results")
+    search_p.add_argument("--kind", action="append", help="Only match this event kind (can be repeated)")
+    search_p.add_argument("--stats", action="store_true", help="Print Bloom filter skip statistics to stderr")
+    _add_root_args(search_p)
+
+    bloom_p = sub.add_parser("bloom", help="Build search Bloom filters for finished traces that lack one")
+    bloom_p.add_argument("--fp", type=float, default=0.01, help="Target false-positive rate")
+
+    migrate_p = sub.add_parser("migrate", help="Move existing traces between storage layouts")
+    migrate_p.add_argument("--to", choices=["partitioned", "flat"], default="partitioned", help="Target layout")
+    migrate_p.add_argument("--dry-run", action="store_true", help="Only print the moves")
+    migrate_p.add_argument("--include-active", action="store_true", help="Also move traces without a trace_end")
+
+    gc_p = sub.add_parser("gc", help="Delete traces that fall outside the retention rules")
+    gc_p.add_argument("--max-age", help="Delete traces older than this (e.g. 30d, 12h)")
+    gc_p.add_argument("--max-bytes", help="Keep the root under this size (e.g. 20G, 500M)")
+    gc_p.add_argument("--max-per-project", type=int, help="Keep at most N traces per project")
+    gc_p.add_argument("--abandoned-after", help="Also delete unfinished traces idle for this long")
+    gc_p.add_argument("--dry-run", action="store_true", help="Only print what would be deleted")
+
+    compact_p = sub.add_parser("compact", help="Compress finished traces into block archives")
+    compact_p.add_argument("--older-than", default="1d", help="Only traces last written before this (e.g. 7d, 12h)")
+    compact_p.add_argument("--codec", choices=["zlib", "lzma", "zstd"], default="zlib", help="Block compression codec")
+    compact_p.add_argument("--level", type=int, help="Compression level (codec default if omitted)")
+    compact_p.add_argument("--dry-run", action="store_true", help="Only print the traces that would be compacted")
+
+    stats_p = sub.add_parser("stats", help="Latency, token and cost statistics across traces")
+    stats_p.add_argument(
+        "--by", action="append", choices=["project", "trace_id", "kind", "model", "tool", "hour", "day"],
+        help="Group by this key (can be repeated; default: model; hour/day need --rollups)",
+    )
+    stats_p.add_argument("--kind", action="append", help="Only these event kinds (default: llm_response, span_end, tool_result)")
+    stats_p.add_argument("--project", help="Only traces of this project")
+    stats_p.add_argument("--since", type=float, help="Only traces and events at or after this unix time")
+    stats_p.add_argument("--until", type=float, help="Only traces and events at or before this unix time")
+    stats_p.add_argument("--last", help="Only the last period, e.g. 7d or 12h (instead of --since)")
+    stats_p.add_argument("--percentile", action="append", type=float, help="Percentile to report (default: 50, 95, 99)")
+    stats_p.add_argument("--rollups", action="store_true", help="Answer from the hourly rollups (see `rollup`)")
+    stats_p.add_argument("--json", action="store_true", help="Print the full result as JSON")
+
+    rollup_p = sub.add_parser("rollup", help="Fold finished traces into the hourly metric rollups")
+    rollup_p.add_argument("--max-traces", type=int, help="Fold at most N traces in this pass")
+
+    dataset_p = sub.add_parser("dataset", help="Write LLM request/response pairs of many traces as sharded JSONL")
+    dataset_p.add_argument("--out", required=True, help="Output directory")
+    dataset_p.add_argument("--project", help="Only traces of this project")
+    dataset_p.add_argument("--model", action="append", help="Only pairs for this model (can be repeated)")
+    dataset_p.add_argument("--status", action="append", choices=["ok", "error", "unfinished"], help="Only traces with this status (can be repeated)")
+    dataset_p.add_argument("--since", type=float, help="Only traces started at or after this unix time")
+    dataset_p.add_argument("--until", type=float, help="Only traces started at or before this unix time")
+    dataset_p.add_argument("--last", help="Only the last period, e.g. 7d or 12h (instead of --since)")
+    dataset_p.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    dataset_p.add_argument("--shard-size", type=int, default=10000, help="Records per output file")
+    dataset_p.add_argument("--quiet", action="store_true", help="Do not report progress")
+
+    cluster_p = sub.add_parser("cluster", help="Group traces by the path they took")
+    cluster_p.add_argument("--project", help="Only traces of this project")
+    cluster_p.add_argument("--since", type=float, help="Only traces started at or after this unix time")
+    cluster_p.add_argument("--until", type=float, help="Only traces started at or before this unix time")
+    cluster_p.add_argument("--last", help="Only the last period, e.g. 7d or 12h (instead of --since)")
+    cluster_p.add_argument("--threshold", type=float, default=0.7, help="Minimum similarity (0-1) to link two traces")
+    cluster_p.add_argument("--limit", type=int, default=20, help="Print at most N clusters")
+    cluster_p.add_argument("--json", action="store_true", help="Print every cluster with its traces as JSON")
+
+    profile_p = sub.add_parser("profile", help="Span tree with self/total time and the critical path")
+    profile_p.add_argument("trace_id")
+    profile_p.add_argument("--folded", action="store_true", help="Print folded stacks (self time in us) for flame graphs")
+    profile_p.add_argument("--critical", action="store_true", help="Only print the critical path")
+    profile_p.add_argument("--out", help="Write to file instead of stdout")
 
     diff_p = sub.add_parser("diff", help="Diff two traces")
     diff_p.add_argument("trace_a")
     diff_p.add_argument("trace_b")
+    diff_p.add_argument("--summary", action="store_true", help="Only print counts of equal, changed, added and removed events")
 
     replay_p = sub.add_parser("replay", help="Replay a trace timeline")
     replay_p.add_argument("trace_id")
@@ -100,18 +160,47 @@ def main() -> None:
     replay_p.add_argument("--kind", action="append", help="Filter by event kind (can be repeated)")
     replay_p.add_argument("--span", help="Filter by span_id")
 
+    tail_p = sub.add_parser("tail", help="Follow a trace while it is being written")
+    tail_p.add_argument("trace_id")
+    tail_p.add_argument("--from-seq", type=int, default=0, help="Skip events before this seq")
+    tail_p.add_argument("--poll", type=float, default=0.5, help="Polling interval in seconds")
+    tail_p.add_argument("--no-inotify", action="store_true", help="Always poll instead of using inotify")
+    tail_p.add_argument("--forever", action="store_true", help="Keep following after trace_end")
+
     export_p = sub.add_parser("export", help="Export trace as JSON")
-    export_p.add_argument("trace_id")
-    export_p.add_argument("--out", help="Write JSON to file instead of stdout")
+    export_p.add_argument("trace_id", nargs="?", help="Trace to export (with --columnar: only this trace)")
+    export_p.add_argument("--out", help="Write to file instead of stdout (with --columnar: output directory)")
+    export_p.add_argument(
+        "--format", choices=["json", "jsonl", "chrome-trace"], default="json",
+        help="Trace document, one event per line, or Chrome/Perfetto trace events",
+    )
+    export_p.add_argument("--columnar", action="store_true", help="Write event fields of many traces as NumPy columns")
+    export_p.add_argument("--project", help="With --columnar: only traces of this project")
+    export_p.add_argument("--since", type=float, help="With --columnar: only traces started at or after this unix time")
+    export_p.add_argument("--until", type=float, help="With --columnar: only traces started at or before this unix time")
 
     ui_p = sub.add_parser("ui", help="Start the visualization UI")
     ui_p.add_argument("--port", type=int, default=8000, help="Port to run server on")
     ui_p.add_argument("--host", default="127.0.0.1", help="Host to bind to")
+    ui_p.add_argument(
+        "--gc-interval", type=float, default=300.0,
+        help="Seconds between rollup and retention passes (rules from AGENTTRACE_RETENTION_*)",
+    )
+    ui_p.add_argument(
+        "--rollups", action="store_true", default=None,
+        help="Keep the hourly rollups of local roots up to date (default AGENTTRACE_UI_ROLLUPS)",
+    )
+    _add_root_args(ui_p)
 
     args = parser.parse_args()
 
     reader = None
-    if args.cmd in ["ls", "inspect", "search", "diff", "replay", "export"]:
+    roots = getattr(args, "root", None) or (get_roots() if os.getenv("AGENTTRACE_ROOTS") else None)
+    if args.cmd in ["ls", "search"] and roots:
+        from .federation import FederatedReader
+
+        reader = FederatedReader(roots, timeout=args.root_timeout)
+    elif args.cmd in ["ls", "inspect", "search", "stats", "rollup", "dataset", "cluster", "profile", "diff", "replay", "tail", "export"]:
         try:
             reader = TraceReader()
         except Exception as e:
@@ -121,80 +210,325 @@ def main() -> None:
 
     if args.cmd == "ls":
         if reader:
-            for t in reader.list_traces():
+            for t in reader.list_traces(
+                project=args.project, since=args.since, until=args.until, limit=args.limit
+            ):
                 status = t.get('status', '')
                 suffix = f"\t[{status}]" if status else ""
+                if "root" in t:
+                    suffix += f"\t{t['root']}"
                 print(f"{t['id']}\t{t['name']}\t({t['event_count']} events){suffix}")
+            _report_root_errors(reader)
         return
 
     if args.cmd == "inspect":
         if reader:
-            trace = reader.get_trace(args.trace_id)
-            if not trace:
-                raise SystemExit(f"trace not found: {args.trace_id}")
-            print(json.dumps(trace, indent=2))
+            _stream_trace(reader, args.trace_id, args.out, args.format)
         return
 
     if args.cmd == "search":
         if reader and hasattr(reader, "search"):
-            results = reader.search(args.query)
+            results = reader.search(args.query, limit=args.limit, kinds=args.kind)
             for r in results:
-                print(f"{r['trace_id'][:8]}... | {r['kind']} | {r.get('trace_name', '')}")
+                print(f"{r['trace_id']} | {r['kind']} | {r.get('trace_name', '')}")
                 print(f"  {str(r.get('payload', ''))[:100]}...")
                 print()
+            if args.stats:
+                import sys
+                st = reader.last_search_stats
+                print(
+                    f"traces: {st.get('traces_considered', 0)} considered, "
+                    f"{st.get('traces_skipped', 0)} skipped by bloom, "
+                    f"{st.get('traces_scanned', 0)} scanned "
+                    f"(skip ratio {st.get('skip_ratio', 0.0):.2f})",
+                    file=sys.stderr,
+                )
+            _report_root_errors(reader)
         else:
             print("Search is not available with the current storage backend.")
         return
 
-    if args.cmd == "diff":
+    if args.cmd == "bloom":
+        from .bloom import BLOOM_FILE, build_bloom_for_file
+        from .config import get_root_dir
+        from .storage import is_finished, iter_trace_dirs
+
+        built = 0
+        for loc in sorted(iter_trace_dirs(get_root_dir()), key=lambda l: str(l.dir)):
+            # Archived and binary traces get their filter when they are
+            # compacted or written.
+            if not loc.events_file.exists() or (loc.dir / BLOOM_FILE).exists() or not is_finished(loc.events_file):
+                continue
+            build_bloom_for_file(loc.events_file, args.fp)
+            built += 1
+        print(f"Built {built} bloom filter(s)")
+        return
+
+    if args.cmd == "migrate":
+        from .config import get_root_dir
+        from .storage import migrate_layout
+
+        root = get_root_dir()
+        moves = migrate_layout(root, to=args.to, include_active=args.include_active, dry_run=args.dry_run)
+        for old, new in moves:
+            print(f"{old.relative_to(root)} -> {new.relative_to(root)}")
+        verb = "Would move" if args.dry_run else "Moved"
+        print(f"{verb} {len(moves)} trace(s) to the {args.to} layout")
+        return
+
+    if args.cmd == "gc":
+        from .config import get_retention_policy, get_root_dir
+        from .retention import collect, parse_duration, parse_size
+
+        policy = get_retention_policy()
+        try:
+            if args.max_age:
+                policy.max_age_s = parse_duration(args.max_age)
+            if args.max_bytes:
+                policy.max_bytes = parse_size(args.max_bytes)
+            if args.abandoned_after:
+                policy.abandoned_after_s = parse_duration(args.abandoned_after)
+        except ValueError as e:
+            raise SystemExit(f"invalid retention value: {e}")
+        if args.max_per_project is not None:
+            policy.max_traces_per_project = args.max_per_project
+        if policy.is_empty():
+            raise SystemExit("no retention rules: pass --max-age, --max-bytes or --max-per-project")
+
+        report = collect(get_root_dir(), policy, dry_run=args.dry_run)
+        for trace_id, reason, size in report.deleted:
+            print(f"{trace_id}\t{reason}\t{size} bytes")
+        verb = "Would delete" if args.dry_run else "Deleted"
+        print(
+            f"{verb} {len(report.deleted)} of {report.traces_seen} trace(s), "
+            f"{report.freed_bytes} bytes; {len(report.skipped_active)} active trace(s) kept"
+        )
+        return
+
+    if args.cmd == "stats":
         if reader:
-            t1 = reader.get_trace(args.trace_a)
-            t2 = reader.get_trace(args.trace_b)
-            if not t1: raise SystemExit(f"Trace not found: {args.trace_a}")
-            if not t2: raise SystemExit(f"Trace not found: {args.trace_b}")
+            since = args.since
+            if args.last:
+                import time
+
+                from .retention import parse_duration
+
+                try:
+                    since = time.time() - parse_duration(args.last)
+                except ValueError as e:
+                    raise SystemExit(f"invalid --last: {e}")
+            percentiles = args.percentile or [50, 95, 99]
+            try:
+                rows = reader.aggregate(
+                    group_by=args.by or ["model"],
+                    kinds=args.kind or ("llm_response", "span_end", "tool_result"),
+                    percentiles=percentiles,
+                    project=args.project,
+                    since=since,
+                    until=args.until,
+                    rollups=args.rollups,
+                )
+            except ValueError as e:
+                raise SystemExit(str(e))
+            if args.json:
+                print(json.dumps(rows, indent=2))
+                return
+            keys = args.by or ["model"]
+            pcts = [f"p{p:g}" for p in percentiles]
+            header = keys + ["count"] + [f"{p}_ms" for p in pcts] + ["tokens", "cost_usd"]
+            print("\t".join(header))
+            for row in rows:
+                cells = [str(row[k]) if row[k] is not None else "-" for k in keys] + [str(row["count"])]
+                cells += [f"{row[f'duration_ms_{p}']:.1f}" if row[f"duration_ms_{p}"] is not None else "-" for p in pcts]
+                cells.append(str(int(row["tokens_sum"])))
+                cells.append(f"{row['cost_usd_sum']:.4f}")
+                print("\t".join(cells))
+        return
 
-            events_a = t1["events"]
-            events_b = t2["events"]
-            map_a = _events_by_seq(events_a)
-            map_b = _events_by_seq(events_b)
-            all_seqs = sorted(set(map_a.keys()) | set(map_b.keys()))
+    if args.cmd == "rollup":
+        if reader:
+            from .rollups import update_rollups
 
-            print(f"Diffing {args.trace_a} vs {args.trace_b}")
-            for seq in all_seqs:
-                ea = map_a.get(seq)
-                eb = map_b.get(seq)
+            report = update_rollups(reader, max_traces=args.max_traces)
+            print(
+                f"Rolled up {report.traces_added} trace(s), {report.events_added} event(s) "
+                f"into {report.days_written} day file(s); {report.traces_pending} unfinished trace(s) left"
+            )
+        return
 
-                seq_str = f"Seq {seq}:"
-                if not ea:
-                    print(f"{seq_str} + {eb['kind']}")
-                    continue
-                if not eb:
-                    print(f"{seq_str} - {ea['kind']}")
-                    continue
+    if args.cmd == "dataset":
+        if reader:
+            import sys
+            import time
+
+            from .dataset import DatasetFilters, build_dataset
+            from .retention import parse_duration
+
+            since = args.since
+            if args.last:
+                try:
+                    since = time.time() - parse_duration(args.last)
+                except ValueError as e:
+                    raise SystemExit(f"invalid --last: {e}")
+
+            def progress(done: int, total: int, pairs: int) -> None:
+                print(f"\r{done}/{total} traces, {pairs} pairs", end="", file=sys.stderr, flush=True)
+
+            filters = DatasetFilters(
+                project=args.project, models=args.model, status=args.status, since=since, until=args.until,
+            )
+            try:
+                report = build_dataset(
+                    reader, args.out, filters, workers=args.workers, shard_size=args.shard_size,
+                    progress=None if args.quiet else progress,
+                )
+            except ValueError as e:
+                raise SystemExit(str(e))
+            if not args.quiet and report.traces:
+                print(file=sys.stderr)
+            print(
+                f"Wrote {report.pairs} pairs from {report.traces} traces to {len(report.shards)} shard(s) "
+                f"in {args.out}; {report.unpaired} unanswered request(s) skipped"
+            )
+        return
 
-                na = _normalize_event(ea)
-                nb = _normalize_event(eb)
-                if na == nb:
+    if args.cmd == "cluster":
+        if reader:
+            import time
+
+            from .fingerprint import cluster, load_fingerprint
+            from .retention import parse_duration
+
+            since = args.since
+            if args.last:
+                try:
+                    since = time.time() - parse_duration(args.last)
+                except ValueError as e:
+                    raise SystemExit(f"invalid --last: {e}")
+            fingerprints = {}
+            for t in reader.list_traces(project=args.project, since=since, until=args.until):
+                fp = load_fingerprint(reader, t["id"])
+                if fp is not None:
+                    fingerprints[t["id"]] = fp
+            try:
+                clusters = cluster(fingerprints, threshold=args.threshold)
+            except ValueError as e:
+                raise SystemExit(str(e))
+            if args.json:
+                from dataclasses import asdict
+
+                print(json.dumps([asdict(c) for c in clusters], indent=2))
+                return
+            print(f"{len(fingerprints)} traces in {len(clusters)} clusters")
+            for i, c in enumerate(clusters[:args.limit], 1):
+                print(f"#{i}\t{len(c.traces)} traces\t{c.paths} paths\te.g. {c.representative}")
+                print("  " + " > ".join(c.summary))
+        return
+
+    if args.cmd == "profile":
+        if reader:
+            profile = reader.profile(args.trace_id)
+            if profile is None:
+                raise SystemExit(f"trace not found: {args.trace_id}")
+            if args.folded:
+                lines = profile.folded()
+            else:
+                spans = profile.critical_path() if args.critical else profile.walk()
+                lines = [f"{'total_ms':>10} {'self_ms':>10}  span"]
+                for span, depth in spans:
+                    flag = "" if span.closed else "  (unfinished)"
+                    lines.append(f"{span.total_ms:>10.1f} {span.self_ms:>10.1f}  {'  ' * depth}{span.name}{flag}")
+            if args.out:
+                with open(args.out, "w", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            else:
+                print("\n".join(lines))
+        return
+
+    if args.cmd == "compact":
+        import time
+
+        from .archive import available_codecs, compact_trace
+        from .binformat import BINARY_FILE
+        from .config import get_root_dir
+        from .retention import parse_duration
+        from .storage import is_finished, iter_trace_dirs
+
+        if args.codec not in available_codecs():
+            raise SystemExit(f"codec {args.codec} is not available (install 'zstandard')")
+        try:
+            cutoff = time.time() - parse_duration(args.older_than)
+        except ValueError as e:
+            raise SystemExit(f"invalid --older-than: {e}")
+
+        count = raw = archived = skipped = 0
+        for loc in sorted(iter_trace_dirs(get_root_dir()), key=lambda l: str(l.dir)):
+            data_file = loc.data_file
+            try:
+                if loc.is_archived or data_file.stat().st_mtime > cutoff or not is_finished(data_file):
                     continue
+            except OSError:
+                continue
+            if data_file.name == BINARY_FILE:
+                # Archives hold JSONL lines; binary traces are left as they are.
+                print(f"{loc.id}\tskipped (binary format)")
+                skipped += 1
+                continue
+            if args.dry_run:
+                print(loc.id)
+                count += 1
+                continue
+            result = compact_trace(loc.dir, codec=args.codec, level=args.level)
+            print(f"{loc.id}\t{result.raw_bytes} -> {result.archived_bytes} bytes ({result.ratio:.1f}x)")
+            count += 1
+            raw += result.raw_bytes
+            archived += result.archived_bytes
+        note = f", skipped {skipped} binary trace(s)" if skipped else ""
+        if args.dry_run:
+            print(f"Would compact {count} trace(s){note}")
+        else:
+            ratio = raw / archived if archived else 0.0
+            print(f"Compacted {count} trace(s), {raw} -> {archived} bytes ({ratio:.1f}x){note}")
+        return
+
+    if args.cmd == "diff":
+        if reader:
+            from .diff import diff_events
+
+            t1 = reader.get_trace(args.trace_a, lazy=True)
+            t2 = reader.get_trace(args.trace_b, lazy=True)
+            if not t1: raise SystemExit(f"Trace not found: {args.trace_a}")
+            if not t2: raise SystemExit(f"Trace not found: {args.trace_b}")
 
-                print(f"{seq_str} {ea['kind']}")
-                diffs = _diff_dict(na, nb)
-                for d in diffs:
-                    print(f"  {d}")
+            result = diff_events(t1["events"], t2["events"])
+            print(f"Diffing {args.trace_a} vs {args.trace_b}")
+            if args.summary:
+                print(
+                    f"{result.equal} equal, {result.count('changed')} changed, "
+                    f"{result.count('added')} added, {result.count('removed')} removed"
+                )
+                for kind, ops in sorted(result.by_kind().items()):
+                    print(f"  {kind}\t" + ", ".join(f"{n} {op}" for op, n in sorted(ops.items())))
+                return
+            for entry in result.entries:
+                if entry.op == "added":
+                    print(f"Seq {entry.seq_b}: + {entry.kind}")
+                elif entry.op == "removed":
+                    print(f"Seq {entry.seq_a}: - {entry.kind}")
+                else:
+                    seq_str = f"Seq {entry.seq_a}" if entry.seq_a == entry.seq_b else f"Seq {entry.seq_a} -> {entry.seq_b}"
+                    print(f"{seq_str}: {entry.kind}")
+                    for d in entry.changes:
+                        print(f"  {d}")
         return
 
     if args.cmd == "replay":
         if reader:
-            trace = reader.get_trace(args.trace_id)
+            trace = reader.get_trace(args.trace_id, lazy=True, kinds=args.kind, span_id=args.span)
             if not trace:
                 raise SystemExit(f"trace not found: {args.trace_id}")
 
             events = trace["events"]
-            if args.kind:
-                kinds = set(args.kind)
-                events = [e for e in events if e.get("kind") in kinds]
-            if args.span:
-                events = [e for e in events if e.get("span_id") == args.span]
             start_ns = None
             for evt in events:
                 ts = evt.get("ts_unix_ns")
@@ -212,24 +546,58 @@ def main() -> None:
                         break
         return
 
-    if args.cmd == "export":
+    if args.cmd == "tail":
         if reader:
-            trace = reader.get_trace(args.trace_id)
-            if not trace:
+            start_ns = None
+            try:
+                # follow() looks the trace up when called, not when iterated.
+                events = reader.follow(
+                    args.trace_id,
+                    from_seq=args.from_seq,
+                    poll_interval=args.poll,
+                    use_inotify=not args.no_inotify,
+                    stop_at_end=not args.forever,
+                )
+                for evt in events:
+                    ts = evt.get("ts_unix_ns")
+                    if start_ns is None and ts:
+                        start_ns = ts
+                    delta_s = 0.0
+                    if start_ns and ts:
+                        delta_s = (ts - start_ns) / 1_000_000_000
+                    print(f"[+{delta_s:0.2f}s] {_format_event(evt)}", flush=True)
+            except FileNotFoundError:
                 raise SystemExit(f"trace not found: {args.trace_id}")
-            output = json.dumps(trace, indent=2)
-            if args.out:
-                with open(args.out, "w", encoding="utf-8") as f:
-                    f.write(output)
-            else:
-                print(output)
+            except KeyboardInterrupt:
+                print("\nStopped.")
+        return
+
+    if args.cmd == "export":
+        if reader and args.columnar:
+            from .columnar import export_columnar
+
+            if not args.out:
+                raise SystemExit("--columnar needs --out <directory>")
+            result = export_columnar(
+                reader, args.out, project=args.project, since=args.since, until=args.until,
+                trace_ids=[args.trace_id] if args.trace_id else None,
+            )
+            print(f"Exported {result.rows} events from {result.traces} traces to {args.out}")
+            return
+        if not args.trace_id:
+            raise SystemExit("export needs a trace_id (or --columnar)")
+        if reader:
+            _stream_trace(reader, args.trace_id, args.out, args.format)
         return
 
     if args.cmd == "ui":
         try:
             from .server import start_server
             print(f"Starting UI at http://{args.host}:{args.port}")
-            start_server(host=args.host, port=args.port)
+            start_server(
+                host=args.host, port=args.port, gc_interval=args.gc_interval,
+                roots=args.root, root_timeout=args.root_timeout, rollups=args.rollups,
+            )
         except ImportError as e:
             print(f"Error: {e}")
             print("Please install UI dependencies: pip install agenttrace[ui] (or fastapi uvicorn)")
@@ -0,0 +1,265 @@
+"""Columnar export of event fields for bulk analytics.
+
+``agenttrace export --columnar`` scans many traces and writes one ``.npy``
+file per column, so millions of events can be aggregated with NumPy without
+building a dict per event::
+
+    import numpy as np
+    ts = np.load("out/ts.npy", mmap_mode="r")
+
+Layout of the output directory:
+
+- ``<column>.npy`` for every entry of :data:`COLUMNS` (NumPy format 1.0,
+  little-endian, one row per event, all columns the same length).
+- String columns (``trace``, ``kind``, ``level``, ``model``, ``tool``) hold
+  ``int32`` indices into a shared string heap; ``-1`` means absent.
+- ``strings.bin`` is the heap (UTF-8, concatenated) and
+  ``string_offsets.npy`` its ``int64`` offsets: string ``i`` is
+  ``strings.bin[offsets[i]:offsets[i + 1]]``.
+- ``columns.json`` lists the columns, their dtypes, the row count and the
+  traces exported.
+
+Missing numbers are ``NaN`` (``duration_ms``, ``cost_usd``) or ``-1``
+(``tokens``).  ``model`` and ``tool`` are carried from a span's request to
+its response, and ``duration_ms`` falls back to the time since the span's
+first event when the payload does not record it.  NumPy is only needed to
+read the output (:func:`load_columnar`); writing uses the standard library.
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "COLUMNS",
+    "STRING_COLUMNS",
+    "ColumnarResult",
+    "event_rows",
+    "export_columnar",
+    "load_columnar",
+]
+
+import json
+import math
+import sys
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .pricing import estimate_cost
+
+#: ``(name, NumPy dtype, array typecode)`` of every exported column.
+COLUMNS: List[Tuple[str, str, str]] = [
+    ("trace", "<i4", "i"),
+    ("ts", "<i8", "q"),
+    ("seq", "<i8", "q"),
+    ("kind", "<i4", "i"),
+    ("level", "<i4", "i"),
+    ("model", "<i4", "i"),
+    ("tool", "<i4", "i"),
+    ("duration_ms", "<f8", "d"),
+    ("tokens", "<i8", "q"),
+    ("cost_usd", "<f8", "d"),
+]
+STRING_COLUMNS = frozenset({"trace", "kind", "level", "model", "tool"})
+
+#: Kinds whose ``attrs``/``payload`` are decoded for metrics; other events
+#: only contribute their header fields.
+_METRIC_KINDS = frozenset({
+    "llm_request", "llm_response", "tool_call", "tool_result", "span_start", "span_end",
+})
+
+_NPY_HEADER_LEN = 128
+_FLUSH_ROWS = 65536
+
+Row = Tuple[str, int, int, str, Optional[str], Optional[str], Optional[str], float, int, float]
+
+
+def _number(*candidates: Any) -> Optional[float]:
+    for value in candidates:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    return None
+
+
+def _tokens(payload: Dict[str, Any]) -> Tuple[int, int, int]:
+    """``(total, input, output)`` token counts of a payload, ``-1`` if unknown."""
+    usage = payload.get("usage")
+    usage = usage if isinstance(usage, dict) else {}
+    prompt = _number(usage.get("prompt_tokens"), usage.get("input_tokens"))
+    completion = _number(usage.get("completion_tokens"), usage.get("output_tokens"))
+    total = _number(usage.get("total_tokens"), payload.get("tokens"))
+    if total is None and (prompt is not None or completion is not None):
+        total = (prompt or 0) + (completion or 0)
+    as_int = lambda v: -1 if v is None else int(v)  # noqa: E731
+    return as_int(total), as_int(prompt), as_int(completion)
+
+
+def event_rows(events: Iterable[Dict[str, Any]], trace_id: str) -> Iterator[Row]:
+    """One row of :data:`COLUMNS` values per event of a trace, in order.
+
+    ``events`` may be :class:`~agenttrace.lazy.LazyEvent` objects; only the
+    kinds that carry metrics have their ``attrs``/``payload`` decoded.
+    """
+    spans: Dict[str, List[Any]] = {}  # span_id -> [first ts, model, tool]
+    for evt in events:
+        kind = evt.get("kind")
+        ts = evt.get("ts_unix_ns")
+        ts = ts if isinstance(ts, int) else -1
+        seq = evt.get("seq")
+        seq = seq if isinstance(seq, int) else -1
+        span_id = evt.get("span_id")
+        span = spans.setdefault(span_id, [ts, None, None]) if span_id else None
+        model = tool = None
+        duration = cost = math.nan
+        tokens = -1
+        if kind in _METRIC_KINDS:
+            attrs = evt.get("attrs")
+            attrs = attrs if isinstance(attrs, dict) else {}
+            payload = evt.get("payload")
+            payload = payload if isinstance(payload, dict) else {}
+            model = attrs.get("model") or payload.get("model") or (span[1] if span else None)
+            tool = attrs.get("tool") or payload.get("tool") or (span[2] if span else None)
+            if span is not None:
+                span[1], span[2] = model, tool
+            value = _number(payload.get("duration_ms"), attrs.get("duration_ms"))
+            if value is None and span is not None and kind in ("llm_response", "tool_result", "span_end"):
+                value = (ts - span[0]) / 1e6 if ts >= 0 and span[0] >= 0 else None
+            duration = math.nan if value is None else value
+            tokens, prompt, completion = _tokens(payload)
+            value = _number(payload.get("cost_usd"), attrs.get("cost_usd"))
+            if value is None and model and (prompt >= 0 or completion >= 0):
+                value = estimate_cost(str(model), max(prompt, 0), max(completion, 0))
+            cost = math.nan if value is None else value
+        yield (
+            trace_id, ts, seq, kind if isinstance(kind, str) else None, evt.get("level"),
+            model if isinstance(model, str) else None, tool if isinstance(tool, str) else None,
+            duration, tokens, cost,
+        )
+
+
+class _NpyColumn:
+    """Appends values to a 1-D ``.npy`` file; the shape is filled in on close."""
+
+    def __init__(self, path: Path, dtype: str, typecode: str) -> None:
+        self.dtype = dtype
+        self.rows = 0
+        self._buf = array(typecode)
+        self._f = open(path, "wb")
+        self._f.write(b"\0" * _NPY_HEADER_LEN)
+
+    def append(self, value: Any) -> None:
+        self._buf.append(value)
+        if len(self._buf) >= _FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        if sys.byteorder == "big":
+            self._buf.byteswap()
+        self._buf.tofile(self._f)
+        self.rows += len(self._buf)
+        del self._buf[:]
+
+    def close(self) -> None:
+        self._flush()
+        self._f.seek(0)
+        self._f.write(_npy_header(self.dtype, self.rows))
+        self._f.close()
+
+
+def _npy_header(dtype: str, rows: int) -> bytes:
+    header = f"{{'descr': '{dtype}', 'fortran_order': False, 'shape': ({rows},), }}"
+    pad = _NPY_HEADER_LEN - 10 - len(header) - 1
+    return b"\x93NUMPY\x01\x00" + (_NPY_HEADER_LEN - 10).to_bytes(2, "little") + header.encode("ascii") + b" " * pad + b"\n"
+
+
+@dataclass
+class ColumnarResult:
+    rows: int
+    traces: int
+    strings: int
+
+
+def export_columnar(
+    reader: Any,
+    out_dir: Path,
+    project: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    trace_ids: Optional[List[str]] = None,
+) -> ColumnarResult:
+    """Write the events of many traces to ``out_dir`` as columns.
+
+    Traces are those of ``reader.list_traces(project, since, until)`` (oldest
+    first), or exactly ``trace_ids`` when given.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if trace_ids is None:
+        trace_ids = [t["id"] for t in reversed(reader.list_traces(project=project, since=since, until=until))]
+
+    strings: Dict[str, int] = {}
+
+    def code(value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        idx = strings.get(value)
+        if idx is None:
+            idx = strings[value] = len(strings)
+        return idx
+
+    columns = [_NpyColumn(out_dir / f"{name}.npy", dtype, typecode) for name, dtype, typecode in COLUMNS]
+    string_cols = [name in STRING_COLUMNS for name, _, _ in COLUMNS]
+    exported = []
+    try:
+        for trace_id in trace_ids:
+            count = 0
+            for row in event_rows(reader.iter_events(trace_id, lazy=True), trace_id):
+                for column, is_string, value in zip(columns, string_cols, row):
+                    column.append(code(value) if is_string else value)
+                count += 1
+            if count:
+                exported.append(trace_id)
+    finally:
+        for column in columns:
+            column.close()
+
+    offsets = _NpyColumn(out_dir / "string_offsets.npy", "<i8", "q")
+    with open(out_dir / "strings.bin", "wb") as heap:
+        pos = 0
+        offsets.append(0)
+        for value in strings:
+            data = value.encode("utf-8")
+            heap.write(data)
+            pos += len(data)
+            offsets.append(pos)
+    offsets.close()
+
+    manifest = {
+        "version": 1,
+        "rows": columns[0].rows,
+        "columns": {name: dtype for name, dtype, _ in COLUMNS},
+        "string_columns": sorted(STRING_COLUMNS),
+        "strings": len(strings),
+        "traces": exported,
+    }
+    (out_dir / "columns.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return ColumnarResult(columns[0].rows, len(exported), len(strings))
+
+
+def load_columnar(path: Path) -> Tuple[Dict[str, Any], List[str]]:
+    """Memory-map an exported column set: ``(columns, strings)``.
+
+    ``columns`` maps each column name to a read-only NumPy array; ``strings``
+    is the decoded heap that string columns index into.  Requires NumPy.
+    """
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("load_columnar requires numpy (pip install numpy)") from e
+    path = Path(path)
+    manifest = json.loads((path / "columns.json").read_text(encoding="utf-8"))
+    columns = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in manifest["columns"]}
+    offsets = np.load(path / "string_offsets.npy")
+    heap = (path / "strings.bin").read_bytes()
+    strings = [heap[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+    return columns, strings
@@ -2,7 +2,20 @@
 
 from __future__ import annotations
 
-__all__ = ["get_root_dir", "get_store_full", "get_max_field_len", "get_redact_keys"]
+__all__ = [
+    "get_root_dir",
+    "get_store_full",
+    "get_max_field_len",
+    "get_redact_keys",
+    "get_bloom_fp_rate",
+    "get_layout",
+    "get_event_format",
+    "get_retention_policy",
+    "get_ui_cache_bytes",
+    "get_ui_workers",
+    "get_ui_rollups",
+    "get_roots",
+]
 
 import os
 from pathlib import Path
@@ -42,3 +55,102 @@ def get_redact_keys() -> set[str]:
         return set()
     items = [item.strip().lower() for item in raw.split(",") if item.strip()]
     return set(items)
+
+
+def get_bloom_fp_rate() -> float | None:
+    """False-positive rate for per-trace search Bloom filters.
+
+    ``None`` disables them.
+    """
+    raw = os.getenv("AGENTTRACE_BLOOM_FP")
+    if raw is None or not raw.strip():
+        return 0.01
+    if raw.strip().lower() in {"0", "off", "false", "no"}:
+        return None
+    try:
+        val = float(raw)
+    except ValueError:
+        return 0.01
+    if not 0.0 < val < 1.0:
+        return 0.01
+    return val
+
+
+def get_layout() -> str:
+    """Storage layout for new traces: ``flat`` (default) or ``partitioned``."""
+    raw = os.getenv("AGENTTRACE_LAYOUT", "flat").strip().lower()
+    return "partitioned" if raw == "partitioned" else "flat"
+
+
+def get_event_format() -> str:
+    """On-disk event format for new traces: ``jsonl`` (default) or ``binary``."""
+    raw = os.getenv("AGENTTRACE_FORMAT", "jsonl").strip().lower()
+    return "binary" if raw == "binary" else "jsonl"
+
+
+def get_retention_policy():
+    """Retention rules from ``AGENTTRACE_RETENTION_*`` (all unset: no rules).
+
+    Returns an :class:`agenttrace.retention.RetentionPolicy`.
+    """
+    from .retention import RetentionPolicy, parse_duration, parse_size
+
+    def _get(name: str, parse):
+        raw = os.getenv(name)
+        if raw is None or not raw.strip():
+            return None
+        try:
+            return parse(raw)
+        except ValueError:
+            return None
+
+    return RetentionPolicy(
+        max_age_s=_get("AGENTTRACE_RETENTION_MAX_AGE", parse_duration),
+        max_bytes=_get("AGENTTRACE_RETENTION_MAX_BYTES", parse_size),
+        max_traces_per_project=_get("AGENTTRACE_RETENTION_MAX_PER_PROJECT", int),
+        abandoned_after_s=_get("AGENTTRACE_RETENTION_ABANDONED_AFTER", parse_duration),
+    )
+
+
+def get_ui_cache_bytes() -> int:
+    """Memory budget of the UI server's response cache (``0`` disables it)."""
+    from .retention import parse_size
+
+    raw = os.getenv("AGENTTRACE_UI_CACHE")
+    if raw is None or not raw.strip():
+        return 256 * 1024 * 1024
+    if raw.strip().lower() in {"0", "off", "false", "no"}:
+        return 0
+    try:
+        return parse_size(raw)
+    except ValueError:
+        return 256 * 1024 * 1024
+
+
+def get_ui_workers() -> int:
+    """Worker threads the UI server runs reader work on (default 4)."""
+    raw = os.getenv("AGENTTRACE_UI_WORKERS")
+    if not raw:
+        return 4
+    try:
+        val = int(raw)
+    except ValueError:
+        return 4
+    return max(val, 1)
+
+
+def get_ui_rollups() -> bool:
+    """Whether the UI server keeps the hourly rollups up to date (default off).
+
+    The pass writes ``_rollups/`` and per-trace index files into every local
+    root, so it is opt-in like retention.
+    """
+    return _parse_bool(os.getenv("AGENTTRACE_UI_ROLLUPS"), default=False)
+
+
+def get_roots() -> list[str]:
+    """Trace roots to read from: ``AGENTTRACE_ROOTS`` (comma-separated paths
+    or ``http(s)://`` URLs of AgentTrace servers), else the single root."""
+    raw = os.getenv("AGENTTRACE_ROOTS", "")
+    roots = [item.strip() for item in raw.split(",") if item.strip()]
+    return roots or [str(get_root_dir())]
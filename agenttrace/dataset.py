@@ -0,0 +1,258 @@
+"""Evaluation and fine-tuning datasets from recorded LLM calls.
+
+``agenttrace dataset`` pairs every ``llm_request`` with the ``llm_response``
+of the same span and writes one JSON record per pair::
+
+    {"trace_id": ..., "span_id": ..., "project": ..., "model": ...,
+     "ts_unix_ns": ..., "messages": [...], "response": ...,
+     "usage": {...}, "duration_ms": ..., "cost_usd": ...}
+
+``messages`` is the request's ``messages`` (or LangChain ``prompts``) and
+``response`` the response's ``content`` (or ``response``).  Requests
+without a span are paired with the next response without one; requests that
+never got a response are counted as unpaired and left out.
+
+Traces are read in a process pool, each worker returning the finished lines
+of one trace.  Results are consumed in trace-ID order (IDs are time-ordered)
+and cut into shards of ``shard_size`` records, so the same traces and
+filters always produce the same files, whatever the number of workers.
+"""
+
+from __future__ import annotations
+
+__all__ = ["DatasetReport", "DatasetFilters", "extract_pairs", "build_dataset"]
+
+import json
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+
+SHARD_PATTERN = "pairs-{:05d}.jsonl"
+MANIFEST_FILE = "manifest.json"
+
+#: Trace statuses accepted by ``DatasetFilters.status``.
+STATUSES = ("ok", "error", "unfinished")
+
+
+@dataclass
+class DatasetFilters:
+    """Which pairs to keep.
+
+    ``project``, ``since`` and ``until`` select traces as for
+    ``list_traces``; ``models`` keeps pairs whose model is listed and
+    ``status`` traces whose ``trace_end`` status is listed (``unfinished``
+    for traces without one).
+    """
+
+    project: Optional[str] = None
+    models: Optional[Sequence[str]] = None
+    status: Optional[Sequence[str]] = None
+    since: Optional[float] = None
+    until: Optional[float] = None
+
+
+@dataclass
+class DatasetReport:
+    traces: int = 0
+    pairs: int = 0
+    unpaired: int = 0
+    shards: List[str] = field(default_factory=list)
+
+
+def _first(mapping: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        value = mapping.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+def _pair(request: Dict[str, Any], response: Dict[str, Any], trace_id: str, project: Optional[str]) -> Dict[str, Any]:
+    req_payload = request.get("payload") or {}
+    req_attrs = request.get("attrs") or {}
+    resp_payload = response.get("payload") or {}
+    resp_attrs = response.get("attrs") or {}
+    return {
+        "trace_id": trace_id,
+        "span_id": request.get("span_id"),
+        "project": project,
+        "model": _first(req_payload, "model") or _first(req_attrs, "model") or _first(resp_payload, "model")
+        or _first(resp_attrs, "model"),
+        "ts_unix_ns": request.get("ts_unix_ns"),
+        "messages": _first(req_payload, "messages", "prompts", "prompt"),
+        "response": _first(resp_payload, "content", "response", "text"),
+        "usage": resp_payload.get("usage") or None,
+        "duration_ms": _first(resp_payload, "duration_ms") or _first(resp_attrs, "duration_ms"),
+        "cost_usd": _first(resp_payload, "cost_usd"),
+    }
+
+
+def extract_pairs(events: Iterable[Dict[str, Any]], trace_id: str) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+    """Request/response pairs of one trace, in response order.
+
+    Returns ``(pairs, unpaired requests, trace status)``; the status is the
+    ``trace_end`` payload's ``status``, or ``"unfinished"``.
+    """
+    project = None
+    status = "unfinished"
+    by_span: Dict[str, Dict[str, Any]] = {}
+    anonymous: Deque[Dict[str, Any]] = deque()
+    pairs: List[Dict[str, Any]] = []
+    for evt in events:
+        kind = evt.get("kind")
+        if kind == "llm_request":
+            span_id = evt.get("span_id")
+            if span_id:
+                by_span[span_id] = evt
+            else:
+                anonymous.append(evt)
+        elif kind == "llm_response":
+            span_id = evt.get("span_id")
+            request = by_span.pop(span_id, None) if span_id else (anonymous.popleft() if anonymous else None)
+            if request is not None:
+                pairs.append(_pair(request, evt, trace_id, project))
+        elif kind == "trace_start":
+            project = (evt.get("payload") or {}).get("project")
+        elif kind == "trace_end":
+            status = (evt.get("payload") or {}).get("status") or "ok"
+    return pairs, len(by_span) + len(anonymous), status
+
+
+_worker_reader = None
+
+
+def _trace_lines(root: str, trace_id: str, filters: DatasetFilters) -> Tuple[List[str], int]:
+    """Worker: the output lines of one trace and its unpaired request count."""
+    global _worker_reader
+    from .reader import TraceReader
+
+    if _worker_reader is None or str(_worker_reader.root) != root:
+        _worker_reader = TraceReader(Path(root))
+    pairs, unpaired, status = extract_pairs(_worker_reader.iter_events(trace_id), trace_id)
+    if filters.status is not None and status not in filters.status:
+        return [], 0
+    if filters.models is not None:
+        pairs = [p for p in pairs if p["model"] in filters.models]
+    return [json.dumps(p, ensure_ascii=False, default=str) for p in pairs], unpaired
+
+
+class _Shards:
+    def __init__(self, out_dir: Path, shard_size: int) -> None:
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.names: List[str] = []
+        self._file: Optional[TextIO] = None
+        self._rows = 0
+
+    def write(self, line: str) -> None:
+        if self._file is None or self._rows >= self.shard_size:
+            self.close()
+            name = SHARD_PATTERN.format(len(self.names))
+            self.names.append(name)
+            self._file = open(self.out_dir / name, "w", encoding="utf-8", buffering=1 << 20)
+            self._rows = 0
+        self._file.write(line)
+        self._file.write("\n")
+        self._rows += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _InlineExecutor(Executor):
+    """Runs tasks in the calling process (``workers=1``)."""
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def build_dataset(
+    reader: Any,
+    out_dir: Path,
+    filters: Optional[DatasetFilters] = None,
+    workers: Optional[int] = None,
+    shard_size: int = 10000,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+) -> DatasetReport:
+    """Write the request/response pairs of many traces as sharded JSONL.
+
+    Args:
+        reader: A :class:`~agenttrace.reader.TraceReader`.
+        out_dir: Output directory; gets ``pairs-00000.jsonl``... and
+            ``manifest.json``.
+        filters: Trace and pair selection.
+        workers: Worker processes (default: CPU count); ``1`` reads in
+            this process.
+        shard_size: Records per shard.
+        progress: Called as ``progress(traces_done, traces_total, pairs)``
+            after every trace.
+    """
+    filters = filters or DatasetFilters()
+    unknown = set(filters.status or ()) - set(STATUSES)
+    if unknown:
+        raise ValueError(f"unknown status: {', '.join(sorted(unknown))}")
+    if shard_size < 1:
+        raise ValueError("shard_size must be positive")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for stale in out_dir.glob("pairs-*.jsonl"):
+        stale.unlink()
+    trace_ids = sorted(
+        t["id"] for t in reader.list_traces(project=filters.project, since=filters.since, until=filters.until)
+    )
+    workers = workers or os.cpu_count() or 1
+    executor: Executor = _InlineExecutor() if workers <= 1 else ProcessPoolExecutor(max_workers=workers)
+
+    report = DatasetReport()
+    shards = _Shards(out_dir, shard_size)
+    root = str(reader.root)
+    # Keep a bounded window of traces in flight and consume them in order.
+    window: Deque[Future] = deque()
+    pending = iter(trace_ids)
+    try:
+        with executor:
+            for trace_id in pending:
+                window.append(executor.submit(_trace_lines, root, trace_id, filters))
+                if len(window) >= workers * 4:
+                    break
+            while window:
+                lines, unpaired = window.popleft().result()
+                next_id = next(pending, None)
+                if next_id is not None:
+                    window.append(executor.submit(_trace_lines, root, next_id, filters))
+                for line in lines:
+                    shards.write(line)
+                report.traces += 1
+                report.pairs += len(lines)
+                report.unpaired += unpaired
+                if progress is not None:
+                    progress(report.traces, len(trace_ids), report.pairs)
+    finally:
+        shards.close()
+
+    report.shards = shards.names
+    manifest = {
+        "version": 1,
+        "pairs": report.pairs,
+        "traces": report.traces,
+        "shards": report.shards,
+        "filters": {
+            "project": filters.project,
+            "models": list(filters.models) if filters.models is not None else None,
+            "status": list(filters.status) if filters.status is not None else None,
+            "since": filters.since,
+            "until": filters.until,
+        },
+    }
+    (out_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return report
@@ -0,0 +1,220 @@
+"""Alignment-based diff of two traces.
+
+Events are compared after normalization (``trace_id``, ``ts_unix_ns``,
+``seq`` and ``id`` are dropped), so a re-run of the same agent diffs clean.
+Each normalized event is reduced to a key (for lazy events, the header plus
+the raw deferred JSON, without decoding it), keys are interned to integers
+and the two sequences are aligned with Myers' O(ND) algorithm after
+trimming their common prefix and suffix.  An inserted event therefore shows
+up as one addition instead of shifting everything after it.
+
+Runs of events that did not align are matched up again by ``kind`` (with the
+same algorithm), and only those pairs are decoded and deep-diffed.  When the
+traces differ in more than ``max_cost`` places the middle is treated as one
+changed block, which bounds the work on unrelated traces.
+"""
+
+from __future__ import annotations
+
+__all__ = ["DiffEntry", "TraceDiff", "diff_events", "diff_dict", "normalize_event"]
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from .lazy import LazyEvent
+
+_VOLATILE = ("trace_id", "ts_unix_ns", "seq", "id")
+
+
+def _format_value(value: Any) -> str:
+    try:
+        return json.dumps(value, ensure_ascii=True)
+    except TypeError:
+        return repr(value)
+
+
+def diff_dict(a: Dict[str, Any], b: Dict[str, Any], prefix: str = "") -> List[str]:
+    """``path: old -> new`` lines for the keys that differ, recursing into dicts."""
+    diffs: List[str] = []
+    keys = set(a.keys()) | set(b.keys())
+    for key in sorted(keys):
+        key_path = f"{prefix}.{key}" if prefix else key
+        if key not in a:
+            diffs.append(f"{key_path}: + {_format_value(b[key])}")
+            continue
+        if key not in b:
+            diffs.append(f"{key_path}: - {_format_value(a[key])}")
+            continue
+        va = a[key]
+        vb = b[key]
+        if isinstance(va, dict) and isinstance(vb, dict):
+            diffs.extend(diff_dict(va, vb, key_path))
+        elif va != vb:
+            diffs.append(f"{key_path}: {_format_value(va)} -> {_format_value(vb)}")
+    return diffs
+
+
+def normalize_event(evt: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(evt)
+    for key in _VOLATILE:
+        out.pop(key, None)  # seq may differ if events were inserted
+    return out
+
+
+def _event_key(evt: Dict[str, Any]) -> Hashable:
+    if isinstance(evt, LazyEvent) and evt.deferred_json is not None:
+        header = tuple(sorted((k, v) for k, v in dict.items(evt) if k not in _VOLATILE))
+        return header, evt.deferred_json
+    return json.dumps(normalize_event(evt), sort_keys=True, default=repr)
+
+
+def _myers(a: Sequence[int], b: Sequence[int], max_cost: int) -> Optional[List[Tuple[int, int]]]:
+    """Index pairs of a shortest edit script's matches, or ``None`` when it
+    needs more than ``max_cost`` insertions and deletions."""
+    n, m = len(a), len(b)
+    limit = min(n + m, max_cost)
+    off = limit + 1
+    v = [0] * (2 * limit + 3)
+    trace: List[List[int]] = []
+    for d in range(limit + 1):
+        # Furthest x per diagonal k in [-d, d] before this round.
+        trace.append(v[off - d:off + d + 1])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[off + k - 1] < v[off + k + 1]):
+                x = v[off + k + 1]
+            else:
+                x = v[off + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[off + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace: List[List[int]], x: int, y: int) -> List[Tuple[int, int]]:
+    matches: List[Tuple[int, int]] = []
+    for d in range(len(trace) - 1, 0, -1):
+        prev = trace[d]
+        k = x - y
+        if k == -d or (k != d and prev[k - 1 + d] < prev[k + 1 + d]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = prev[prev_k + d]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((x, y))
+        x, y = prev_x, prev_y
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        matches.append((x, y))
+    matches.reverse()
+    return matches
+
+
+def _align(a: Sequence[int], b: Sequence[int], max_cost: int) -> List[Tuple[int, int]]:
+    """Matched index pairs of ``a`` and ``b``; common ends are trimmed first."""
+    n, m = len(a), len(b)
+    head = 0
+    while head < n and head < m and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < n - head and tail < m - head and a[n - 1 - tail] == b[m - 1 - tail]:
+        tail += 1
+    middle = _myers(a[head:n - tail], b[head:m - tail], max_cost) or []
+    return (
+        [(i, i) for i in range(head)]
+        + [(x + head, y + head) for x, y in middle]
+        + [(n - tail + i, m - tail + i) for i in range(tail)]
+    )
+
+
+@dataclass
+class DiffEntry:
+    #: ``"changed"``, ``"added"`` (only in b) or ``"removed"`` (only in a).
+    op: str
+    kind: Optional[str]
+    #: Positions in each trace's event list (``None`` on the missing side).
+    index_a: Optional[int]
+    index_b: Optional[int]
+    seq_a: Optional[int] = None
+    seq_b: Optional[int] = None
+    #: ``diff_dict`` lines of the normalized events, for ``changed``.
+    changes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TraceDiff:
+    equal: int = 0
+    entries: List[DiffEntry] = field(default_factory=list)
+
+    def count(self, op: str) -> int:
+        return sum(1 for e in self.entries if e.op == op)
+
+    def by_kind(self) -> Dict[str, Dict[str, int]]:
+        """``{kind: {op: count}}`` over the differing events."""
+        out: Dict[str, Dict[str, int]] = {}
+        for entry in self.entries:
+            ops = out.setdefault(entry.kind or "?", {})
+            ops[entry.op] = ops.get(entry.op, 0) + 1
+        return out
+
+
+def diff_events(events_a: List[Dict[str, Any]], events_b: List[Dict[str, Any]], max_cost: int = 2000) -> TraceDiff:
+    """Align two event lists and deep-diff the pairs that differ."""
+    interned: Dict[Hashable, int] = {}
+    keys_a = [interned.setdefault(_event_key(e), len(interned)) for e in events_a]
+    keys_b = [interned.setdefault(_event_key(e), len(interned)) for e in events_b]
+    matches = _align(keys_a, keys_b, max_cost)
+    matches.append((len(events_a), len(events_b)))
+
+    result = TraceDiff()
+    kinds: Dict[Any, int] = {}
+    ia = ib = 0
+    for ma, mb in matches:
+        if ia < ma or ib < mb:
+            # A run that did not align: match its events up again by kind.
+            run_a = list(range(ia, ma))
+            run_b = list(range(ib, mb))
+            kinds_a = [kinds.setdefault(events_a[i].get("kind"), len(kinds)) for i in run_a]
+            kinds_b = [kinds.setdefault(events_b[i].get("kind"), len(kinds)) for i in run_b]
+            pairs = _myers(kinds_a, kinds_b, max_cost)
+            if pairs is None:
+                pairs = [(i, i) for i in range(min(len(run_a), len(run_b))) if kinds_a[i] == kinds_b[i]]
+            pa = pb = 0
+            for xa, xb in pairs + [(len(run_a), len(run_b))]:
+                result.entries.extend(_entry("removed", events_a[run_a[i]], run_a[i], None) for i in range(pa, xa))
+                result.entries.extend(_entry("added", events_b[run_b[i]], None, run_b[i]) for i in range(pb, xb))
+                if xa < len(run_a):
+                    _compare(result, events_a, events_b, run_a[xa], run_b[xb])
+                pa, pb = xa + 1, xb + 1
+        if ma < len(events_a):
+            result.equal += 1
+        ia, ib = ma + 1, mb + 1
+    return result
+
+
+def _entry(op: str, evt: Dict[str, Any], index_a: Optional[int], index_b: Optional[int]) -> DiffEntry:
+    seq = evt.get("seq")
+    return DiffEntry(
+        op, evt.get("kind"), index_a, index_b,
+        seq_a=seq if index_a is not None else None,
+        seq_b=seq if index_b is not None else None,
+    )
+
+
+def _compare(result: TraceDiff, events_a: List[Dict[str, Any]], events_b: List[Dict[str, Any]], ia: int, ib: int) -> None:
+    ea, eb = events_a[ia], events_b[ib]
+    changes = diff_dict(normalize_event(ea), normalize_event(eb))
+    if not changes:
+        # Same content written differently (e.g. key order).
+        result.equal += 1
+        return
+    result.entries.append(DiffEntry("changed", ea.get("kind"), ia, ib, ea.get("seq"), eb.get("seq"), changes))
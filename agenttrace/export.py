@@ -0,0 +1,247 @@
+"""Streaming export of a single trace.
+
+``agenttrace export`` and ``inspect`` write a trace event by event instead of
+building the full trace dict and one string for it, so memory use does not
+grow with the trace.  Two formats:
+
+- ``json``: the same document as ``json.dumps(reader.get_trace(id),
+  indent=2)``: ``id``, ``trace_name``, ``project`` and the ``events`` list.
+- ``jsonl``: one compact event per line, as stored but without CRC suffixes.
+- ``chrome-trace``: the Trace Event Format read by ``chrome://tracing``,
+  Perfetto and speedscope.  Every span (``span_start``/``span_end``,
+  ``llm_request``/``llm_response``, ``tool_call``/``tool_result``) becomes a
+  complete (``X``) event written when the span closes, so only open spans
+  are held in memory.  Spans are laid out in lanes (``tid``): a span goes
+  on its parent's lane when it nests inside it and on the first free lane
+  otherwise, so concurrent spans never share one.  Spans are matched by
+  trace and span ID together, as span IDs are only unique within a trace.
+  ``error`` events, and closing events whose span was never opened (marked
+  ``"unmatched": true``), are instant (``i``) events; spans still open at the
+  end are closed at the last event with ``"unfinished": true``.
+
+:func:`iter_json_array` encodes any sequence of JSON values as an array in
+chunks, for streaming HTTP responses.
+"""
+
+from __future__ import annotations
+
+__all__ = ["EXPORT_FORMATS", "iter_json_array", "write_trace"]
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from .profile import _span_name
+from .storage import find_trace_dir
+
+EXPORT_FORMATS = ("json", "jsonl", "chrome-trace")
+
+#: Write buffer for file output.
+BUFFER_SIZE = 1 << 20
+
+
+def _header(trace_id: str, first: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    trace_name = trace_id
+    project = None
+    if first is not None and first.get("kind") == "trace_start":
+        payload = first.get("payload") or {}
+        trace_name = payload.get("trace_name") or trace_id
+        project = payload.get("project")
+    return {"id": trace_id, "trace_name": trace_name, "project": project}
+
+
+def _write_json(out: TextIO, trace_id: str, events: Iterator[Dict[str, Any]]) -> int:
+    first = next(events, None)
+    head = json.dumps(_header(trace_id, first), indent=2)
+    # Reopen the header object to append the events list.
+    out.write(head[:-2] + ',\n  "events": [')
+    count = 0
+    if first is not None:
+        for evt in _chain(first, events):
+            out.write(",\n    " if count else "\n    ")
+            out.write(json.dumps(evt, indent=2).replace("\n", "\n    "))
+            count += 1
+        out.write("\n  ")
+    out.write("]\n}\n")
+    return count
+
+
+def _write_jsonl(out: TextIO, events: Iterator[Dict[str, Any]]) -> int:
+    count = 0
+    for evt in events:
+        out.write(json.dumps(evt, separators=(",", ":")))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def iter_json_array(items: Iterable[Any], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Compact JSON array of ``items`` in chunks of about ``chunk_size`` bytes.
+
+    The concatenated chunks equal ``json.dumps(list(items), separators=(",",
+    ":"))``; values the encoder does not know are written with ``str``.
+    """
+    parts: List[str] = ["["]
+    size = 1
+    first = True
+    for item in items:
+        text = json.dumps(item, separators=(",", ":"), default=str)
+        if not first:
+            parts.append(",")
+            size += 1
+        parts.append(text)
+        size += len(text)
+        first = False
+        if size >= chunk_size:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    parts.append("]")
+    yield "".join(parts).encode("utf-8")
+
+
+_OPEN_KINDS = frozenset({"span_start", "llm_request", "tool_call", "retrieval_start"})
+_CLOSE_KINDS = frozenset({"span_end", "llm_response", "tool_result", "retrieval_end"})
+_CATEGORIES = {"span": "span", "llm": "llm", "tool": "tool", "retrieval": "retrieval"}
+
+
+#: Span IDs are only unique within a trace, so spans are keyed by both.
+_SpanKey = Tuple[Optional[str], str]
+
+
+class _Lanes:
+    """Assigns spans to ``tid`` lanes so that spans on one lane nest."""
+
+    def __init__(self) -> None:
+        self.stacks: List[List[_SpanKey]] = []
+        self.lane_of: Dict[_SpanKey, int] = {}
+
+    def open(self, span_id: _SpanKey, parent_id: Optional[_SpanKey]) -> int:
+        lane = self.lane_of.get(parent_id) if parent_id else None
+        if lane is None or self.stacks[lane][-1] != parent_id:
+            lane = next((i for i, stack in enumerate(self.stacks) if not stack), len(self.stacks))
+            if lane == len(self.stacks):
+                self.stacks.append([])
+        self.stacks[lane].append(span_id)
+        self.lane_of[span_id] = lane
+        return lane
+
+    def close(self, span_id: _SpanKey) -> int:
+        lane = self.lane_of.pop(span_id)
+        self.stacks[lane].remove(span_id)
+        return lane
+
+
+def _span_args(open_evt: Dict[str, Any], close_evt: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    args: Dict[str, Any] = {"span_id": open_evt.get("span_id")}
+    if open_evt.get("parent_span_id"):
+        args["parent_span_id"] = open_evt.get("parent_span_id")
+    payload = (close_evt or {}).get("payload")
+    if isinstance(payload, dict):
+        for key in ("duration_ms", "cost_usd", "usage", "status"):
+            if payload.get(key) is not None:
+                args[key] = payload[key]
+    return args
+
+
+def _write_chrome(out: TextIO, trace_id: str, events: Iterator[Dict[str, Any]]) -> int:
+    lanes = _Lanes()
+    open_spans: Dict[_SpanKey, Tuple[Dict[str, Any], str, int, int]] = {}  # -> (event, name, ts_ns, lane)
+    trace_name = trace_id
+    last_ts = 0
+    written = 0
+
+    def emit(record: Dict[str, Any]) -> None:
+        nonlocal written
+        out.write(",\n" if written else "\n")
+        out.write(json.dumps(record, separators=(",", ":"), default=str))
+        written += 1
+
+    def complete(key: _SpanKey, end_ns: int, close_evt: Optional[Dict[str, Any]]) -> None:
+        evt, name, start_ns, _ = open_spans.pop(key)
+        lane = lanes.close(key)
+        args = _span_args(evt, close_evt)
+        if close_evt is None:
+            args["unfinished"] = True
+        emit({
+            "name": name, "cat": _CATEGORIES.get(name.split(":")[0], "span"), "ph": "X",
+            "ts": start_ns / 1000, "dur": max(end_ns - start_ns, 0) / 1000,
+            "pid": 1, "tid": lane, "args": args,
+        })
+
+    out.write('{"traceEvents":[')
+    count = 0
+    for evt in events:
+        count += 1
+        kind = evt.get("kind")
+        ts = evt.get("ts_unix_ns")
+        if not isinstance(ts, int):
+            continue
+        last_ts = max(last_ts, ts)
+        span_id = evt.get("span_id")
+        owner = evt.get("trace_id")
+        key = (owner, span_id)
+        if kind == "trace_start":
+            trace_name = str((evt.get("payload") or {}).get("trace_name") or trace_id)
+        elif kind in _OPEN_KINDS and span_id and key not in open_spans:
+            parent_id = evt.get("parent_span_id")
+            lane = lanes.open(key, (owner, parent_id) if parent_id else None)
+            open_spans[key] = (evt, _span_name(evt), ts, lane)
+        elif kind in _CLOSE_KINDS and key in open_spans:
+            complete(key, ts, evt)
+        elif kind in _CLOSE_KINDS:
+            # A close without its open (never written, or lost to a crash):
+            # keep it visible as an instant rather than dropping it.
+            name = _span_name(evt)
+            args = _span_args(evt, evt)
+            args["unmatched"] = True
+            emit({
+                "name": name, "cat": _CATEGORIES.get(name.split(":")[0], "span"), "ph": "i", "s": "t",
+                "ts": ts / 1000, "pid": 1, "tid": lanes.lane_of.get((owner, evt.get("parent_span_id")), 0),
+                "args": args,
+            })
+        elif kind == "error":
+            lane = lanes.lane_of.get(key, 0) if span_id else 0
+            payload = evt.get("payload") or {}
+            emit({
+                "name": "error", "cat": "error", "ph": "i", "s": "t", "ts": ts / 1000,
+                "pid": 1, "tid": lane, "args": {"error": payload.get("error"), "span_id": span_id},
+            })
+    for key in list(open_spans):
+        complete(key, last_ts, None)
+
+    emit({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": trace_name}})
+    for lane in range(max(len(lanes.stacks), 1)):
+        emit({"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": f"lane {lane}"}})
+    out.write('\n],"displayTimeUnit":"ms","otherData":{"trace_id":%s}}\n' % json.dumps(trace_id))
+    return count
+
+
+def _chain(first: Dict[str, Any], rest: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    yield first
+    yield from rest
+
+
+def write_trace(reader: Any, trace_id: str, out: Any, format: str = "json") -> Optional[int]:
+    """Stream one trace to ``out`` (a text stream or a path).
+
+    Returns the number of events read, or ``None`` (writing nothing) when
+    the trace does not exist.  Paths are written through a 1 MiB buffer.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format: {format!r}")
+    if find_trace_dir(Path(reader.root), trace_id) is None:
+        return None
+    # Chrome traces only decode the events that name a span or an error.
+    events = iter(reader.iter_events(trace_id, lazy=format == "chrome-trace"))
+    if isinstance(out, (str, Path)):
+        with open(out, "w", encoding="utf-8", buffering=BUFFER_SIZE) as f:
+            return _write_events(f, trace_id, events, format)
+    return _write_events(out, trace_id, events, format)
+
+
+def _write_events(out: TextIO, trace_id: str, events: Iterator[Dict[str, Any]], format: str) -> int:
+    if format == "jsonl":
+        return _write_jsonl(out, events)
+    if format == "chrome-trace":
+        return _write_chrome(out, trace_id, events)
+    return _write_json(out, trace_id, events)
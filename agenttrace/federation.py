@@ -0,0 +1,344 @@
+"""Reading traces from many roots at once.
+
+A :class:`FederatedReader` lists, searches and fetches traces across several
+roots: local trace directories (e.g. per-node roots synced to a shared
+volume) and remote AgentTrace UI servers, reached through their REST API by
+:class:`RemoteRoot`.  Roots are given as paths or ``http(s)://`` URLs, e.g.
+from ``AGENTTRACE_ROOTS``.
+
+Every query fans out to all roots concurrently and waits at most
+``timeout`` seconds; a root that fails or does not answer in time is left
+out and named in :attr:`FederatedReader.last_errors`.  Results are merged
+newest first and carry the name of their root in ``"root"``.
+
+Trace listings are cached per root for ``catalog_ttl`` seconds (10 by
+default).  When a root fails, its last listing is used instead, so a slow
+node makes the list stale rather than incomplete.  The listings also remember which root holds
+which trace, so fetching a listed trace asks only that root.
+"""
+
+from __future__ import annotations
+
+__all__ = ["FederatedReader", "RemoteRoot", "open_root"]
+
+import heapq
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, TypeVar, Union
+
+from .reader import TraceReader
+from .storage import _window_ns, find_trace_dir
+
+T = TypeVar("T")
+
+#: ``get_trace``/``page_events`` filters a remote server accepts, by query parameter.
+_REMOTE_FILTERS = {"kinds": "kind", "span_id": "span", "level": "level"}
+
+
+class RemoteRoot:
+    """Client for the REST API of another ``agenttrace ui`` server.
+
+    Mirrors the :class:`~agenttrace.reader.TraceReader` calls the federated
+    reader needs.  Requests time out after ``timeout`` seconds.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def __repr__(self) -> str:
+        return f"RemoteRoot({self.url!r})"
+
+    def request(
+        self,
+        path: str,
+        query: Union[str, Mapping[str, Any], None] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Open ``path`` on the server; returns the response (also for HTTP
+        errors, as :class:`urllib.error.HTTPError`), to be closed by the
+        caller.  ``query`` is a query string or a dict of parameters, where
+        ``None`` values are left out and lists are repeated."""
+        if isinstance(query, Mapping):
+            query = urllib.parse.urlencode({k: v for k, v in query.items() if v is not None}, doseq=True)
+        url = self.url + path + (f"?{query}" if query else "")
+        req = urllib.request.Request(url, headers=dict(headers or {}))
+        try:
+            return urllib.request.urlopen(req, timeout=self.timeout if timeout is None else timeout)
+        except urllib.error.HTTPError as e:
+            return e
+
+    def _get_json(self, path: str, query: Mapping[str, Any]) -> Any:
+        with self.request(path, query) as resp:
+            body = resp.read()
+            status = resp.getcode()
+        if status == 404:
+            return None
+        if status >= 400:
+            raise OSError(f"{self.url}{path}: HTTP {status}")
+        return json.loads(body)
+
+    @staticmethod
+    def _filters(filters: Mapping[str, Any]) -> Dict[str, Any]:
+        query = {}
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key not in _REMOTE_FILTERS:
+                raise ValueError(f"filter not supported for remote roots: {key}")
+            query[_REMOTE_FILTERS[key]] = [value] if key == "kinds" and isinstance(value, str) else value
+        return query
+
+    def list_traces(
+        self,
+        project: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        return self._get_json("/api/traces", {"project": project, "since": since, "until": until, "limit": limit}) or []
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        kinds: Optional[Sequence[str]] = None,
+        since: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        hits = self._get_json("/api/search", {"q": query, "limit": limit, "kind": kinds}) or []
+        if since is not None:
+            since_ns, _ = _window_ns(since, None)
+            hits = [h for h in hits if (h.get("ts_unix_ns") or 0) >= since_ns]
+        return hits
+
+    def get_trace(self, trace_id: str, **filters: Any) -> Optional[Dict[str, Any]]:
+        return self._get_json(f"/api/traces/{urllib.parse.quote(trace_id)}", self._filters(filters))
+
+    def page_events(
+        self,
+        trace_id: str,
+        cursor: Optional[int] = None,
+        limit: int = 500,
+        summary: bool = False,
+        **filters: Any,
+    ) -> Optional[Dict[str, Any]]:
+        query = {"cursor": cursor, "limit": limit, "summary": "true" if summary else None, **self._filters(filters)}
+        return self._get_json(f"/api/traces/{urllib.parse.quote(trace_id)}/events", query)
+
+    def iter_events(self, trace_id: str, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """The events of a trace, fetched 5000 at a time."""
+        cursor = None
+        while True:
+            page = self.page_events(trace_id, cursor=cursor, limit=5000, **filters)
+            if page is None:
+                return
+            yield from page["events"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+
+    def has_trace(self, trace_id: str) -> bool:
+        return self.page_events(trace_id, limit=1, summary=True) is not None
+
+
+Source = Union[TraceReader, RemoteRoot]
+
+
+def open_root(root: Union[str, Path, Source], timeout: float = 5.0) -> Tuple[str, Source]:
+    """``(name, source)`` for a path, URL, reader or remote root."""
+    if isinstance(root, TraceReader):
+        return str(root.root), root
+    if isinstance(root, RemoteRoot):
+        return root.url, root
+    text = str(root)
+    if text.startswith(("http://", "https://")):
+        remote = RemoteRoot(text, timeout=timeout)
+        return remote.url, remote
+    return text, TraceReader(Path(text))
+
+
+class FederatedReader:
+    """List, search and fetch traces across several local or remote roots.
+
+    Args:
+        roots: Paths, ``http(s)://`` URLs of AgentTrace servers, or
+            :class:`TraceReader`/:class:`RemoteRoot` objects.  Earlier
+            roots win when several hold the same trace ID.
+        timeout: Seconds to wait for each fan-out (and for each remote
+            request).
+        catalog_ttl: Seconds a root's trace listing is reused.
+    """
+
+    def __init__(
+        self,
+        roots: Sequence[Union[str, Path, Source]],
+        timeout: float = 5.0,
+        catalog_ttl: float = 10.0,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        if not roots:
+            raise ValueError("at least one root is required")
+        self.sources: List[Tuple[str, Source]] = [open_root(root, timeout) for root in roots]
+        self.timeout = timeout
+        self.catalog_ttl = catalog_ttl
+        #: Root name -> error of the most recent fan-out that root failed.
+        self.last_errors: Dict[str, str] = {}
+        self.last_search_stats: Dict[str, Any] = {}
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or min(32, 2 * len(self.sources)), thread_name_prefix="agenttrace-fed"
+        )
+        self._catalogs: Dict[Tuple[str, Any], Tuple[float, List[Dict[str, Any]]]] = {}
+        self._owners: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def local_readers(self) -> List[TraceReader]:
+        return [src for _, src in self.sources if isinstance(src, TraceReader)]
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fan_out(self, call: Callable[[str, Source], T]) -> List[Tuple[str, Optional[T]]]:
+        """``call(name, source)`` for every root at once; ``None`` results
+        for roots that failed or timed out (see :attr:`last_errors`)."""
+        futures = [(name, self._pool.submit(call, name, src)) for name, src in self.sources]
+        wait([f for _, f in futures], timeout=self.timeout)
+        results: List[Tuple[str, Optional[T]]] = []
+        errors: Dict[str, str] = {}
+        for name, future in futures:
+            if not future.done():
+                future.cancel()
+                errors[name] = f"timed out after {self.timeout:g}s"
+                results.append((name, None))
+            elif future.exception() is not None:
+                errors[name] = str(future.exception()) or type(future.exception()).__name__
+                results.append((name, None))
+            else:
+                results.append((name, future.result()))
+        self.last_errors = errors
+        return results
+
+    def _remember(self, name: str, items: List[Dict[str, Any]], key: str) -> List[Dict[str, Any]]:
+        tagged = []
+        with self._lock:
+            for item in items:
+                trace_id = item.get(key)
+                if isinstance(trace_id, str):
+                    self._owners.setdefault(trace_id, name)
+                tagged.append({**item, "root": name})
+        return tagged
+
+    def list_traces(
+        self,
+        project: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Traces of all roots, newest first, at most ``limit``; see
+        :meth:`TraceReader.list_traces`."""
+        query = (project, since, until, limit)
+
+        def fetch(name: str, src: Source) -> List[Dict[str, Any]]:
+            with self._lock:
+                cached = self._catalogs.get((name, query))
+            if cached is not None and time.monotonic() - cached[0] < self.catalog_ttl:
+                return cached[1]
+            traces = self._remember(name, src.list_traces(project=project, since=since, until=until, limit=limit), "id")
+            with self._lock:
+                self._catalogs[(name, query)] = (time.monotonic(), traces)
+            return traces
+
+        lists = []
+        for name, traces in self._fan_out(fetch):
+            if traces is None:
+                with self._lock:
+                    stale = self._catalogs.get((name, query))
+                traces = stale[1] if stale is not None else []
+            lists.append(traces)
+        merged = heapq.merge(*lists, key=lambda t: -(t.get("ts") or 0))
+        return list(merged if limit is None else itertools.islice(merged, limit))
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        kinds: Optional[Sequence[str]] = None,
+        since: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Matching events of all roots, newest first; see
+        :meth:`TraceReader.search`.  ``last_search_stats`` adds up the
+        statistics of the local roots."""
+        stats: Dict[str, Any] = {}
+
+        def run(name: str, src: Source) -> List[Dict[str, Any]]:
+            if isinstance(src, TraceReader):
+                # A reader per call: ``last_search_stats`` is per instance.
+                reader = TraceReader(src.root)
+                hits = reader.search(query, limit=limit, kinds=kinds, since=since)
+                with self._lock:
+                    for key, value in reader.last_search_stats.items():
+                        if key != "skip_ratio":
+                            stats[key] = stats.get(key, 0) + value
+            else:
+                hits = src.search(query, limit=limit, kinds=kinds, since=since)
+            return self._remember(name, hits, "trace_id")
+
+        hits = [hit for _, found in self._fan_out(run) for hit in found or ()]
+        hits.sort(key=lambda h: -(h.get("ts_unix_ns") or 0))
+        considered = stats.get("traces_considered", 0)
+        stats["skip_ratio"] = stats.get("traces_skipped", 0) / considered if considered else 0.0
+        self.last_search_stats = stats
+        return hits if limit is None else hits[:limit]
+
+    def locate(self, trace_id: str) -> Optional[Tuple[str, Source]]:
+        """``(name, source)`` of the root holding ``trace_id``, or ``None``."""
+        with self._lock:
+            owner = self._owners.get(trace_id)
+        for name, src in self.sources:
+            if name == owner and isinstance(src, RemoteRoot):
+                return name, src
+        # Local roots are checked directly (a directory lookup), in order.
+        for name, src in self.sources:
+            if isinstance(src, TraceReader) and find_trace_dir(Path(src.root), trace_id) is not None:
+                return name, src
+        remotes = [name for name, src in self.sources if isinstance(src, RemoteRoot)]
+        if not remotes:
+            return None
+
+        def has(name: str, src: Source) -> bool:
+            return isinstance(src, RemoteRoot) and src.has_trace(trace_id)
+
+        for name, found in self._fan_out(has):
+            if found:
+                with self._lock:
+                    self._owners[trace_id] = name
+                return name, dict(self.sources)[name]
+        return None
+
+    def get_trace(self, trace_id: str, **filters: Any) -> Optional[Dict[str, Any]]:
+        """The trace from whichever root holds it; see :meth:`TraceReader.get_trace`."""
+        found = self.locate(trace_id)
+        return found[1].get_trace(trace_id, **filters) if found is not None else None
+
+    def page_events(self, trace_id: str, cursor: Optional[int] = None, limit: int = 500, summary: bool = False, **filters: Any) -> Optional[Dict[str, Any]]:
+        """See :meth:`TraceReader.page_events`."""
+        found = self.locate(trace_id)
+        if found is None:
+            return None
+        return found[1].page_events(trace_id, cursor=cursor, limit=limit, summary=summary, **filters)
+
+    def iter_events(self, trace_id: str, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """See :meth:`TraceReader.iter_events`; a missing trace yields nothing."""
+        found = self.locate(trace_id)
+        if found is None:
+            return iter(())
+        return found[1].iter_events(trace_id, **filters)
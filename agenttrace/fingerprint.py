@@ -0,0 +1,215 @@
+"""Structural fingerprints of traces and clustering by behaviour.
+
+A trace's structure is the sequence of its events reduced to a token each:
+the ``kind``, plus the tool for ``tool_call``/``tool_result`` and the model
+for ``llm_request``/``llm_response`` (the same fields the columnar export
+extracts, carried across a span).  Timestamps, IDs and payloads play no
+part, so two runs that took the same path have the same structure.
+
+The fingerprint of a trace holds:
+
+- ``path``: a hash of the token sequence with repeats collapsed
+  (``tool_call:search`` five times in a row counts once), for grouping runs
+  that took exactly the same path;
+- ``minhash``: a MinHash signature of the trace's token 3-grams, whose
+  agreement between two traces estimates the Jaccard similarity of their
+  3-gram sets.
+
+Fingerprints are cached per trace in ``events.fingerprint`` like the
+``events.metrics`` index.  :func:`cluster` groups traces with
+locality-sensitive hashing: signatures are cut into bands, traces sharing a
+band are candidates, and candidates are merged when their estimated
+similarity reaches the threshold.  Each trace is compared with at most a
+few representatives per bucket, and traces with an already seen exact path
+with none, so the work grows linearly with the traces.
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "FINGERPRINT_FILE",
+    "NUM_PERM",
+    "Cluster",
+    "structure_tokens",
+    "fingerprint",
+    "load_fingerprint",
+    "similarity",
+    "cluster",
+]
+
+import hashlib
+import json
+import os
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .columnar import event_rows
+from .storage import _data_file, find_trace_dir, is_finished
+
+FINGERPRINT_FILE = "events.fingerprint"
+_VERSION = 1
+
+NUM_PERM = 64
+SHINGLE = 3
+_PRIME = (1 << 61) - 1
+#: Traces per LSH bucket a new trace is compared with.
+_BUCKET_REPS = 4
+
+_rng = random.Random(0x5EED)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_TOOL_KINDS = frozenset({"tool_call", "tool_result"})
+_MODEL_KINDS = frozenset({"llm_request", "llm_response"})
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def structure_tokens(events: Iterable[Dict[str, Any]], trace_id: str = "") -> List[str]:
+    """One ``kind[:tool|model]`` token per event, in order."""
+    tokens = []
+    for _, _, _, kind, _, model, tool, _, _, _ in event_rows(events, trace_id):
+        token = kind or "?"
+        if kind in _TOOL_KINDS and tool:
+            token = f"{token}:{tool}"
+        elif kind in _MODEL_KINDS and model:
+            token = f"{token}:{model}"
+        tokens.append(token)
+    return tokens
+
+
+def _collapse(tokens: Sequence[str]) -> List[str]:
+    return [t for i, t in enumerate(tokens) if i == 0 or t != tokens[i - 1]]
+
+
+def fingerprint(tokens: Sequence[str]) -> Dict[str, Any]:
+    """``{"path", "length", "minhash", "summary"}`` for a token sequence."""
+    path = _collapse(tokens)
+    width = min(SHINGLE, len(tokens)) or 1
+    shingles = {_hash64("\x1f".join(tokens[i:i + width])) for i in range(max(len(tokens) - width + 1, 1))}
+    minhash = [min((a * s + b) % _PRIME for s in shingles) for a, b in _PERMS]
+    return {
+        "path": format(_hash64("\x1f".join(path)), "016x"),
+        "length": len(tokens),
+        "minhash": minhash,
+        # Enough of the path to tell clusters apart when printed.
+        "summary": path[:12] + (["..."] if len(path) > 12 else []),
+    }
+
+
+def load_fingerprint(reader: Any, trace_id: str, write: bool = True) -> Optional[Dict[str, Any]]:
+    """Fingerprint of one trace, from ``events.fingerprint`` when current.
+
+    Built and, for finished traces (when ``write`` is set), saved otherwise.
+    ``None`` if the trace does not exist.
+    """
+    trace_dir = find_trace_dir(Path(reader.root), trace_id)
+    if trace_dir is None:
+        return None
+    path = trace_dir / FINGERPRINT_FILE
+    st = _data_file(trace_dir).stat()
+    stamp = [st.st_size, st.st_mtime_ns]
+    try:
+        cached = json.loads(path.read_text(encoding="utf-8"))
+        if cached.get("version") == _VERSION and cached.get("source") == stamp:
+            return cached["fingerprint"]
+    except (OSError, ValueError, AttributeError):
+        pass
+    result = fingerprint(structure_tokens(reader.iter_events(trace_id, lazy=True), trace_id))
+    if write and is_finished(_data_file(trace_dir)):
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": _VERSION, "source": stamp, "fingerprint": result}), encoding="utf-8")
+        os.replace(tmp, path)
+    return result
+
+
+def similarity(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """Estimated Jaccard similarity of two fingerprints' 3-gram sets."""
+    if a["path"] == b["path"]:
+        return 1.0
+    return sum(x == y for x, y in zip(a["minhash"], b["minhash"])) / NUM_PERM
+
+
+@dataclass
+class Cluster:
+    #: The first trace (in ID order) of the cluster.
+    representative: str
+    traces: List[str] = field(default_factory=list)
+    #: Distinct exact paths among the members.
+    paths: int = 1
+    summary: List[str] = field(default_factory=list)
+
+
+def _bands(threshold: float) -> int:
+    """Band count whose LSH S-curve, ``(1/b) ** (1/r)``, is just below ``threshold``."""
+    for bands in (1, 2, 4, 8, 16, 32):
+        if (1 / bands) ** (bands / NUM_PERM) <= threshold:
+            return bands
+    return NUM_PERM
+
+
+def cluster(fingerprints: Dict[str, Dict[str, Any]], threshold: float = 0.7) -> List[Cluster]:
+    """Group traces whose estimated similarity is at least ``threshold``.
+
+    Args:
+        fingerprints: ``{trace_id: fingerprint}``.
+        threshold: Minimum estimated Jaccard similarity (0-1) for two
+            traces to be linked; clusters are the connected components.
+
+    Returns clusters largest first.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    ids = sorted(fingerprints)
+    parent = {trace_id: trace_id for trace_id in ids}
+
+    def find(x: str) -> str:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(x: str, y: str) -> None:
+        rx, ry = find(x), find(y)
+        if rx != ry:
+            parent[max(rx, ry)] = min(rx, ry)
+
+    bands = _bands(threshold)
+    rows = NUM_PERM // bands
+    paths_seen: Dict[str, str] = {}
+    buckets: Dict[Any, List[str]] = {}
+    for trace_id in ids:
+        fp = fingerprints[trace_id]
+        # Same exact path: always one cluster.
+        first = paths_seen.setdefault(fp["path"], trace_id)
+        if first != trace_id:
+            union(first, trace_id)
+            continue
+        sig = fp["minhash"]
+        for band in range(bands):
+            reps = buckets.setdefault((band, tuple(sig[band * rows:(band + 1) * rows])), [])
+            for rep in reps:
+                if find(rep) == find(trace_id):
+                    break
+                if similarity(fingerprints[rep], fp) >= threshold:
+                    union(rep, trace_id)
+                    break
+            else:
+                if len(reps) < _BUCKET_REPS:
+                    reps.append(trace_id)
+
+    groups: Dict[str, Cluster] = {}
+    paths: Dict[str, set] = {}
+    for trace_id in ids:
+        root = find(trace_id)
+        group = groups.get(root)
+        if group is None:
+            group = groups[root] = Cluster(root, summary=fingerprints[root].get("summary", []))
+        group.traces.append(trace_id)
+        paths.setdefault(root, set()).add(fingerprints[trace_id]["path"])
+    for root, group in groups.items():
+        group.paths = len(paths[root])
+    return sorted(groups.values(), key=lambda c: (-len(c.traces), c.representative))
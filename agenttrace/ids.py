@@ -0,0 +1,67 @@
+"""Time-ordered trace IDs.
+
+New traces get UUIDv7-style IDs rendered as 32 hex characters (the same shape
+as the ``uuid4().hex`` IDs of older traces): a 48-bit unix millisecond
+timestamp, the version nibble ``7``, a 12-bit counter that keeps IDs created
+in the same millisecond ordered, and random bits.  Sorting IDs as strings
+therefore sorts traces by creation time, and the time can be read back from
+the ID without touching the trace's files.  Mirrors
+``crates/agenttrace-core/src/ids.rs``.
+"""
+
+from __future__ import annotations
+
+__all__ = ["new_trace_id", "trace_id_time_ns", "is_time_ordered"]
+
+import os
+import threading
+import time
+from typing import Optional
+
+_lock = threading.Lock()
+_last_ms = -1
+_counter = 0
+
+
+def new_trace_id() -> str:
+    """Return a new time-ordered trace ID (monotonic within the process)."""
+    global _last_ms, _counter
+    rand = int.from_bytes(os.urandom(10), "big")
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _last_ms:
+            # Same (or an earlier, if the clock stepped back) millisecond:
+            # bump the counter, borrowing the next millisecond on overflow.
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms += 1
+                _counter = 0
+            ms = _last_ms
+        else:
+            _last_ms = ms
+            _counter = (rand >> 68) & 0x7FF  # random start, leaves headroom
+        counter = _counter
+    value = (ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= rand & ((1 << 62) - 1)
+    return f"{value:032x}"
+
+
+def is_time_ordered(trace_id: str) -> bool:
+    """True for IDs produced by :func:`new_trace_id` (or any UUIDv7 hex)."""
+    if len(trace_id) != 32 or trace_id[12] != "7" or trace_id[16] not in "89ab":
+        return False
+    try:
+        int(trace_id, 16)
+    except ValueError:
+        return False
+    return True
+
+
+def trace_id_time_ns(trace_id: str) -> Optional[int]:
+    """Creation time encoded in a time-ordered ID (ms precision), else ``None``."""
+    if not is_time_ordered(trace_id):
+        return None
+    return int(trace_id[:12], 16) * 1_000_000
@@ -0,0 +1,184 @@
+"""Lazily decoded event dicts.
+
+Most consumers of a trace only look at header fields (``kind``, ``seq``,
+``ts_unix_ns``, ``span_id``...).  ``LazyEvent`` keeps those eagerly and holds
+``attrs``/``payload`` as the raw JSON text they were read from until one of
+them is first accessed.
+"""
+
+from __future__ import annotations
+
+__all__ = ["LazyEvent", "HEADER_FIELDS", "split_event_line"]
+
+import json
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Top-level fields written by both backends ahead of ``attrs``/``payload``.
+# A missing header field is simply absent (the Rust writer omits null span
+# ids), so looking one up never forces the deferred part to be decoded.
+HEADER_FIELDS = frozenset({
+    "schema_version",
+    "trace_id",
+    "seq",
+    "ts_unix_ns",
+    "kind",
+    "span_id",
+    "parent_span_id",
+    "level",
+})
+
+_ATTRS_KEY = ',"attrs":'
+_MISSING = object()
+
+
+class LazyEvent(dict):
+    """Event dict whose non-header fields are decoded on first access.
+
+    Behaves like the plain dict returned by the eager reader: item access,
+    ``get``, ``in``, iteration, equality, ``dict(evt)`` and ``json.dumps``
+    all work and transparently decode the deferred fields when needed.
+    """
+
+    __slots__ = ("_deferred",)
+
+    def __init__(self, header: Dict[str, Any], deferred: Optional[str] = None) -> None:
+        dict.__init__(self, header)
+        self._deferred = deferred
+
+    @property
+    def deferred_json(self) -> Optional[str]:
+        """Raw JSON object text of the still-undecoded fields, if any."""
+        return self._deferred
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._deferred is None
+
+    def _decode(self) -> None:
+        raw = self._deferred
+        if raw is None:
+            return
+        self._deferred = None
+        for key, value in json.loads(raw).items():
+            dict.setdefault(self, key, value)
+
+    def _needs_decode(self, key: Any) -> bool:
+        return (
+            self._deferred is not None
+            and key not in HEADER_FIELDS
+            and not dict.__contains__(self, key)
+        )
+
+    # -- single-key access ------------------------------------------------
+
+    def __getitem__(self, key: Any) -> Any:
+        if self._needs_decode(key):
+            self._decode()
+        return dict.__getitem__(self, key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if self._needs_decode(key):
+            self._decode()
+        return dict.get(self, key, default)
+
+    def __contains__(self, key: Any) -> bool:
+        if self._needs_decode(key):
+            self._decode()
+        return dict.__contains__(self, key)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        if self._needs_decode(key):
+            self._decode()
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        if self._needs_decode(key):
+            self._decode()
+        dict.__delitem__(self, key)
+
+    def pop(self, key: Any, default: Any = _MISSING) -> Any:
+        if self._needs_decode(key):
+            self._decode()
+        if default is _MISSING:
+            return dict.pop(self, key)
+        return dict.pop(self, key, default)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if self._needs_decode(key):
+            self._decode()
+        return dict.setdefault(self, key, default)
+
+    # -- whole-dict operations decode first ---------------------------------
+
+    def __iter__(self) -> Iterator[Any]:
+        self._decode()
+        return dict.__iter__(self)
+
+    def __len__(self) -> int:
+        self._decode()
+        return dict.__len__(self)
+
+    def keys(self):  # type: ignore[override]
+        self._decode()
+        return dict.keys(self)
+
+    def values(self):  # type: ignore[override]
+        self._decode()
+        return dict.values(self)
+
+    def items(self):  # type: ignore[override]
+        self._decode()
+        return dict.items(self)
+
+    def popitem(self) -> Tuple[Any, Any]:
+        self._decode()
+        return dict.popitem(self)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self._decode()
+        dict.update(self, *args, **kwargs)
+
+    def copy(self) -> Dict[str, Any]:  # type: ignore[override]
+        self._decode()
+        return dict(dict.items(self))
+
+    def __eq__(self, other: object) -> bool:
+        self._decode()
+        if isinstance(other, LazyEvent):
+            other._decode()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other: object) -> bool:
+        return not self.__eq__(other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        self._decode()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        return (dict, (self.copy(),))
+
+
+def split_event_line(line: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Split one JSON event line into ``(header, deferred_json)``.
+
+    Both writers emit compact JSON with the scalar header fields first and
+    ``attrs``/``payload`` last, so the header can be parsed on its own and the
+    remainder kept as text.  Lines that do not have that shape are decoded
+    eagerly and returned with ``deferred_json=None``.
+    """
+    idx = line.find(_ATTRS_KEY)
+    if idx > 0 and line.endswith("}"):
+        head = line[:idx]
+        # Only split when every header value is a scalar; otherwise the
+        # ``"attrs":`` we found could belong to a nested object.
+        if "{" not in head[1:] and "[" not in head:
+            try:
+                header = json.loads(head + "}")
+            except json.JSONDecodeError:
+                header = None
+            if isinstance(header, dict):
+                return header, "{" + line[idx + 1:]
+    return json.loads(line), None
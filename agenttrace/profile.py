@@ -0,0 +1,271 @@
+"""Span trees, self/total time, critical path and flame-graph stacks.
+
+:func:`build_profile` (also :meth:`TraceReader.profile` and ``agenttrace
+profile``) reconstructs the span tree of a trace in one pass over its
+events.  A span is every event sharing a ``span_id``: ``span_start`` ..
+``span_end``, ``llm_request`` .. ``llm_response``, ``tool_call`` ..
+``tool_result``.  It runs from its first to its last event and hangs under
+the ``parent_span_id`` of any of them, or under the trace itself.  Spans
+that never closed run to the last event of the trace.
+
+Total time is a span's wall time.  Self time is the part of it not covered
+by any child: children that overlap (parallel tool calls) are merged into
+one interval first, so self time is never negative and parallel work is not
+counted twice.
+
+The critical path is the chain of spans the trace's end actually waited
+for: starting from the end of a span, the child that finished last, then
+the child that finished last before that one started, and so on, recursing
+into each.  :meth:`Profile.folded` writes self times as folded stacks
+(``trace;agent;llm:gpt-4o 1520``, in microseconds) for ``flamegraph.pl``
+or speedscope.
+
+Each span also counts the events, errors (``error`` events or level
+``error``), tokens and cost of its subtree, with tokens and cost taken as in
+:mod:`agenttrace.analytics`.  :meth:`Profile.summary` and
+:meth:`Profile.children` serve the tree to the UI one level at a time.
+"""
+
+from __future__ import annotations
+
+__all__ = ["Span", "Profile", "build_profile"]
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .columnar import event_rows
+
+#: Events that close a span.
+_END_KINDS = frozenset({"span_end", "llm_response", "tool_result", "retrieval_end"})
+
+
+@dataclass
+class Span:
+    span_id: str
+    name: str
+    start_ns: int
+    end_ns: int
+    parent_id: Optional[str] = None
+    #: ``False`` when the span never got its closing event.
+    closed: bool = True
+    children: List["Span"] = field(default_factory=list)
+    self_ns: int = 0
+    #: Totals over the span and all its descendants.
+    events: int = 0
+    errors: int = 0
+    tokens: int = 0
+    cost_usd: float = 0.0
+
+    @property
+    def total_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    @property
+    def self_ms(self) -> float:
+        return self.self_ns / 1e6
+
+
+def _span_name(evt: Dict[str, Any]) -> str:
+    kind = evt.get("kind")
+    attrs = evt.get("attrs")
+    attrs = attrs if isinstance(attrs, dict) else {}
+    payload = evt.get("payload")
+    payload = payload if isinstance(payload, dict) else {}
+    if kind == "span_start":
+        return str(payload.get("name") or attrs.get("name") or "span")
+    if kind in ("llm_request", "llm_response"):
+        model = attrs.get("model") or payload.get("model")
+        return f"llm:{model}" if model else "llm"
+    if kind in ("tool_call", "tool_result"):
+        tool = attrs.get("tool") or payload.get("tool")
+        return f"tool:{tool}" if tool else "tool"
+    if kind in ("retrieval_start", "retrieval_end", "retrieval"):
+        return "retrieval"
+    return str(kind or "span")
+
+
+def _merged_ns(intervals: List[Tuple[int, int]]) -> int:
+    """Length of the union of ``(start, end)`` intervals."""
+    covered = 0
+    cur_start = cur_end = None
+    for start, end in sorted(intervals):
+        if cur_end is None or start > cur_end:
+            if cur_end is not None:
+                covered += cur_end - cur_start
+            cur_start, cur_end = start, end
+        elif end > cur_end:
+            cur_end = end
+    if cur_end is not None:
+        covered += cur_end - cur_start
+    return covered
+
+
+@dataclass
+class Profile:
+    trace_id: str
+    #: Synthetic span covering the whole trace; top-level spans are its children.
+    root: Span
+    spans: Dict[str, Span]
+
+    def walk(self) -> Iterable[Tuple[Span, int]]:
+        """``(span, depth)`` for every span, depth first in start order."""
+        stack = [(self.root, 0)]
+        while stack:
+            span, depth = stack.pop()
+            yield span, depth
+            stack.extend((child, depth + 1) for child in reversed(span.children))
+
+    def critical_path(self) -> List[Tuple[Span, int]]:
+        """``(span, depth)`` of the spans on the critical path, in time order."""
+        out: List[Tuple[Span, int]] = []
+        stack = [(self.root, 0)]
+        while stack:
+            span, depth = stack.pop()
+            out.append((span, depth))
+            chain = []
+            t = span.end_ns
+            candidates = sorted(span.children, key=lambda c: c.end_ns, reverse=True)
+            for child in candidates:
+                if child.end_ns <= t:
+                    chain.append(child)
+                    t = child.start_ns
+            # chain is latest first; visit in time order.
+            stack.extend((child, depth + 1) for child in chain)
+        return out
+
+    def folded(self) -> List[str]:
+        """Folded stacks of self time in microseconds, one line per stack."""
+        totals: Dict[str, int] = {}
+        stack: List[Tuple[Span, str]] = [(self.root, self.root.name.replace(";", ","))]
+        while stack:
+            span, path = stack.pop()
+            if span.self_ns > 0:
+                totals[path] = totals.get(path, 0) + span.self_ns // 1000
+            stack.extend((child, f"{path};{child.name.replace(';', ',')}") for child in span.children)
+        return [f"{path} {us}" for path, us in sorted(totals.items()) if us > 0]
+
+    def node(self, span: Span) -> Dict[str, Any]:
+        """JSON-ready view of one span, without its children."""
+        return {
+            "span_id": span.span_id or None,
+            "name": span.name,
+            "start_ms": (span.start_ns - self.root.start_ns) / 1e6,
+            "total_ms": span.total_ms,
+            "self_ms": span.self_ms,
+            "closed": span.closed,
+            "children": len(span.children),
+            "events": span.events,
+            "errors": span.errors,
+            "tokens": span.tokens,
+            "cost_usd": round(span.cost_usd, 6),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals of the whole trace, its top-level spans and critical path."""
+        return {
+            "trace_id": self.trace_id,
+            **self.node(self.root),
+            "spans": len(self.spans),
+            "critical_path": [span.span_id for span, _ in self.critical_path()[1:]],
+        }
+
+    def children(self, span_id: Optional[str] = None, offset: int = 0, limit: int = 200) -> Optional[Dict[str, Any]]:
+        """One page of the children of ``span_id`` (the trace's top-level
+        spans by default), in start order; ``None`` for an unknown span."""
+        parent = self.root if not span_id else self.spans.get(span_id)
+        if parent is None:
+            return None
+        page = parent.children[offset:offset + limit]
+        end = offset + len(page)
+        return {
+            "parent": span_id or None,
+            "total": len(parent.children),
+            "nodes": [self.node(child) for child in page],
+            "next_offset": end if end < len(parent.children) else None,
+        }
+
+
+def build_profile(events: Iterable[Dict[str, Any]], trace_id: str) -> Profile:
+    """Span tree of one trace from its events (in file order)."""
+    spans: Dict[str, Span] = {}
+    trace_name = trace_id
+    first_ts: Optional[int] = None
+    last_ts: Optional[int] = None
+    # Events outside any span count towards the trace itself.
+    root = Span("", trace_name, 0, 0)
+    current: List[Dict[str, Any]] = []
+
+    def tap(it: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        # event_rows yields one row per event it pulls, so ``current`` holds
+        # the event of the row being read.
+        for evt in it:
+            current[:] = [evt]
+            yield evt
+
+    for row in event_rows(tap(events), trace_id):
+        evt = current[0]
+        ts = evt.get("ts_unix_ns")
+        if not isinstance(ts, int):
+            continue
+        first_ts = ts if first_ts is None else min(first_ts, ts)
+        last_ts = ts if last_ts is None else max(last_ts, ts)
+        kind = evt.get("kind")
+        span_id = evt.get("span_id") if kind != "trace_start" else None
+        if kind == "trace_start":
+            trace_name = str((evt.get("payload") or {}).get("trace_name") or trace_id)
+        owner = spans.get(span_id, root) if span_id else root
+        if span_id and owner is root:
+            owner = spans[span_id] = Span(span_id, _span_name(evt), ts, ts, closed=False)
+        owner.events += 1
+        if kind == "error" or evt.get("level") == "error":
+            owner.errors += 1
+        tokens, cost = row[8], row[9]
+        if tokens > 0:
+            owner.tokens += tokens
+        if not math.isnan(cost):
+            owner.cost_usd += cost
+        if not span_id:
+            continue
+        span = owner
+        if ts > span.end_ns:
+            span.end_ns = ts
+        elif ts < span.start_ns:
+            span.start_ns = ts
+        if span.parent_id is None and evt.get("parent_span_id"):
+            span.parent_id = evt.get("parent_span_id")
+        if kind in _END_KINDS:
+            span.closed = True
+
+    start = first_ts or 0
+    end = last_ts or start
+    root.name, root.start_ns, root.end_ns = trace_name, start, end
+    for span in spans.values():
+        if not span.closed:
+            span.end_ns = max(span.end_ns, end)
+    for span in sorted(spans.values(), key=lambda s: (s.start_ns, s.span_id)):
+        parent = spans.get(span.parent_id) if span.parent_id else None
+        # Guard against parent cycles: only attach under an ancestor chain
+        # that reaches the root.
+        seen = {span.span_id}
+        node = parent
+        while node is not None and node.span_id not in seen:
+            seen.add(node.span_id)
+            node = spans.get(node.parent_id) if node.parent_id else None
+        if parent is None or node is not None:
+            parent = root
+        parent.children.append(span)
+
+    for span in [root, *spans.values()]:
+        lo, hi = span.start_ns, span.end_ns
+        covered = _merged_ns([(max(c.start_ns, lo), min(c.end_ns, hi)) for c in span.children if c.end_ns > lo and c.start_ns < hi])
+        span.self_ns = (hi - lo) - covered
+    profile = Profile(trace_id, root, spans)
+    # Children come after their parent in walk order: add them up backwards.
+    for span, _ in reversed(list(profile.walk())):
+        for child in span.children:
+            span.events += child.events
+            span.errors += child.errors
+            span.tokens += child.tokens
+            span.cost_usd += child.cost_usd
+    return profile
@@ -5,37 +5,113 @@ from __future__ import annotations
 __all__ = ["TraceReader"]
 
 from pathlib import Path
-from typing import Any, Dict, Iterator, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence
 
-from ._backend import NativeTraceReader
+from . import _native
+from ._backend import NATIVE_AVAILABLE, NativeTraceReader
 from .config import get_root_dir
+from .lazy import HEADER_FIELDS, LazyEvent
+from .storage import _data_file, _is_archived, find_trace_dir
+
+if TYPE_CHECKING:
+    from .profile import Profile
 
 
 class TraceReader:
-    def __init__(self, root: Optional[Path] = None):
+    def __init__(self, root: Optional[Path] = None, lazy: bool = False):
+        """
+        Args:
+            root: Trace root directory (defaults to ``AGENTTRACE_ROOT``).
+            lazy: Return :class:`~agenttrace.lazy.LazyEvent` objects whose
+                ``attrs``/``payload`` are only decoded when accessed.
+        """
         self.root = root or get_root_dir()
+        self.lazy = lazy
         self._reader = NativeTraceReader(str(self.root))
+        self._fallback: Optional[_native.NativeTraceReader] = None
+        #: Counters from the most recent :meth:`search` (traces considered,
+        #: skipped via Bloom filters, scanned, and the resulting skip ratio).
+        self.last_search_stats: Dict[str, Any] = {}
 
-    def list_traces(self) -> List[Dict[str, Any]]:
-        """List all traces with metadata."""
-        return self._reader.list_traces()
+    def _python_reader(self) -> "_native.NativeTraceReader":
+        if self._fallback is None:
+            self._fallback = _native.NativeTraceReader(str(self.root))
+        return self._fallback
 
-    def get_trace(self, trace_id: str) -> Optional[Dict[str, Any]]:
-        """Get full trace details including all events."""
+    def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Call the backend, retrying in pure Python for archives the native
+        reader cannot decode (it raises ``NotImplementedError`` for codecs it
+        was built without, e.g. ``lzma``)."""
         try:
-            events = self._reader.get_events(trace_id)
+            return getattr(self._reader, method)(*args, **kwargs)
+        except NotImplementedError:
+            return getattr(self._python_reader(), method)(*args, **kwargs)
+
+    def _load_events(self, trace_id: str, lazy: Optional[bool], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if lazy is None:
+            lazy = self.lazy
+        if not lazy or filters.get("fields") is not None:
+            return self._call("get_events", trace_id, **filters)
+        return [
+            LazyEvent(header, deferred)
+            for header, deferred in self._call("get_events", trace_id, lazy=True, **filters)
+        ]
+
+    def list_traces(
+        self,
+        project: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """List traces with metadata, newest first.
+
+        Args:
+            project: Only traces of this project.
+            since / until: Only traces started within these unix timestamps
+                (seconds, inclusive).
+            limit: Return at most this many (the most recent) traces.
+
+        With the partitioned layout, project and date partitions outside
+        these bounds are skipped without being listed.  Traces with
+        time-ordered IDs (see :mod:`agenttrace.ids`) are ordered and windowed
+        by the time in their ID, so "latest N" only opens N trace files.
+        """
+        return self._reader.list_traces(project=project, since=since, until=until, limit=limit)
+
+    def get_trace(self, trace_id: str, lazy: Optional[bool] = None, **filters: Any) -> Optional[Dict[str, Any]]:
+        """Get full trace details including all events.
+
+        ``lazy`` overrides the reader-wide setting for this call.
+
+        Keyword filters are pushed down to the backend, which rejects events
+        from their header before decoding them:
+
+        - ``kinds``: iterable of event kinds to keep
+        - ``span_id`` / ``level``: exact match
+        - ``ts_min`` / ``ts_max``: inclusive ``ts_unix_ns`` bounds
+        - ``seq_min`` / ``seq_max``: inclusive ``seq`` bounds
+        - ``fields``: keep only these top-level keys of each event
+        """
+        filters = _clean_filters(filters)
+        try:
+            events = self._load_events(trace_id, lazy, filters)
         except FileNotFoundError:
             return None
 
         # Extract metadata from the trace_start event if available
+        first = events[0] if events else None
+        if filters and (first is None or first.get("kind") != "trace_start" or "payload" not in first):
+            # The filters may have dropped it; re-read just the first line.
+            head = self._call("get_events", trace_id, kinds=["trace_start"], seq_max=1)
+            first = head[0] if head else None
+
         trace_name = trace_id
         project = None
-        if events:
-            first = events[0]
-            if first.get("kind") == "trace_start":
-                payload = first.get("payload") or {}
-                trace_name = payload.get("trace_name") or trace_id
-                project = payload.get("project")
+        if first is not None and first.get("kind") == "trace_start":
+            payload = first.get("payload") or {}
+            trace_name = payload.get("trace_name") or trace_id
+            project = payload.get("project")
 
         return {
             "id": trace_id,
@@ -44,28 +120,187 @@ class TraceReader:
             "events": events,
         }
 
-    def iter_events(self, trace_id: str) -> Iterator[Dict[str, Any]]:
-        """Lazy generator for events in a trace."""
-        trace = self.get_trace(trace_id)
-        if not trace:
-            return iter([])
-        yield from trace["events"]
+    def iter_events(self, trace_id: str, lazy: Optional[bool] = None, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """Stream the events of a trace one at a time.
+
+        Accepts the same filters as :meth:`get_trace`.  A missing trace yields
+        nothing.
+        """
+        filters = _clean_filters(filters)
+        if lazy is None:
+            lazy = self.lazy
+        lazy = lazy and filters.get("fields") is None
+        try:
+            it = self._call("iter_events", trace_id, lazy=lazy, **filters)
+        except FileNotFoundError:
+            return
+        if lazy:
+            for header, deferred in it:
+                yield LazyEvent(header, deferred)
+        else:
+            yield from it
 
-    def search(self, query: str) -> List[Dict[str, Any]]:
+    def page_events(
+        self,
+        trace_id: str,
+        cursor: Optional[int] = None,
+        limit: int = 500,
+        summary: bool = False,
+        **filters: Any,
+    ) -> Optional[Dict[str, Any]]:
+        """One window of a trace's events, for paging through large traces.
+
+        Returns ``{"events": [...], "next_cursor": seq | None}``: up to
+        ``limit`` events with ``seq`` greater than ``cursor``, and the cursor
+        of the next window (``None`` after the last one).  Accepts the
+        filters of :meth:`get_trace`.  With ``summary`` only the header
+        fields of each event are returned and payloads are never decoded.
+        ``None`` if the trace does not exist.
+        """
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        if find_trace_dir(Path(self.root), trace_id) is None:
+            return None
+        if cursor is not None:
+            seq_min = filters.get("seq_min")
+            filters["seq_min"] = cursor + 1 if seq_min is None else max(seq_min, cursor + 1)
+        events: List[Dict[str, Any]] = []
+        next_cursor = None
+        for evt in self.iter_events(trace_id, lazy=True if summary else None, **filters):
+            if len(events) == limit:
+                next_cursor = events[-1].get("seq")
+                break
+            if summary:
+                evt = {k: v for k, v in dict.items(evt) if k in HEADER_FIELDS}
+            events.append(evt)
+        return {"events": events, "next_cursor": next_cursor}
+
+    def follow(
+        self,
+        trace_id: str,
+        from_seq: int = 0,
+        poll_interval: float = 0.5,
+        use_inotify: bool = True,
+        stop_at_end: bool = True,
+        idle_timeout: Optional[float] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield events of a live trace as they are written.
+
+        Only newly appended complete lines are read on each refresh, so
+        following a long-running agent costs O(new events).  ``from_seq``
+        skips events with a lower ``seq``.  See
+        :func:`agenttrace.tail.follow_file` for the remaining options.
+        An archived trace is finished, so its events are yielded at once.
+        """
+        trace_dir = find_trace_dir(Path(self.root), trace_id)
+        if trace_dir is None:
+            raise FileNotFoundError(f"trace not found: {trace_id}")
+        if _is_archived(trace_dir):
+            return self.iter_events(trace_id, lazy=False, seq_min=from_seq or None)
+        from .tail import follow_file
+
+        return follow_file(
+            _data_file(trace_dir),
+            from_seq=from_seq,
+            poll_interval=poll_interval,
+            use_inotify=use_inotify,
+            stop_at_end=stop_at_end,
+            idle_timeout=idle_timeout,
+        )
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        kinds: Optional[Sequence[str]] = None,
+        since: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
         """Search for events matching the query across all traces.
 
-        Performs a simple substring match on event payloads.
+        Matches ``query`` as a substring of the raw JSON text of each event's
+        ``payload`` or ``attrs``.  Results are ordered newest first (most
+        recently written trace, then latest event) and carry the owning
+        trace's ``trace_name``.  Finished traces with a Bloom filter that
+        rules the query out are skipped without being read; see
+        :attr:`last_search_stats`.
+
+        Args:
+            limit: Stop after this many results.
+            kinds: Only match events of these kinds.
+            since: Only match events at or after this unix timestamp (seconds).
+        """
+        if isinstance(kinds, str):
+            kinds = [kinds]
+        kinds = list(kinds) if kinds is not None else None
+        hits, self.last_search_stats = self._reader.search(query, limit=limit, kinds=kinds, since=since)
+        if NATIVE_AVAILABLE and self.last_search_stats.get("traces_unsupported"):
+            # Some archives use a codec the native backend lacks; the pure
+            # Python reader handles every codec.
+            hits, self.last_search_stats = self._python_reader().search(
+                query, limit=limit, kinds=kinds, since=since
+            )
+        return hits
+
+    def aggregate(
+        self,
+        group_by: Sequence[str] = ("model",),
+        kinds: Optional[Sequence[str]] = ("llm_response", "span_end", "tool_result"),
+        metrics: Sequence[str] = ("duration_ms", "tokens", "cost_usd"),
+        percentiles: Sequence[float] = (50, 95, 99),
+        project: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        rollups: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Grouped counts, sums and percentiles of event metrics.
+
+        E.g. ``aggregate(group_by=["project", "model"], since=week_ago)``
+        gives LLM latency percentiles and total tokens and cost per model per
+        project.  Per-trace metrics are cached in an ``events.metrics`` index,
+        so repeated queries do not re-read the events.  See
+        :func:`agenttrace.analytics.aggregate` for the arguments and result.
+
+        With ``rollups=True`` the answer comes from the hourly rollups
+        instead (see :mod:`agenttrace.rollups`): hour-granular bounds,
+        sketch-estimated percentiles, ``hour``/``day`` as extra group keys,
+        and no per-trace grouping or ``metrics`` selection.
         """
-        results: List[Dict[str, Any]] = []
-        for trace_meta in self.list_traces():
-            try:
-                events = self._reader.get_events(trace_meta["id"])
-            except FileNotFoundError:
-                continue
-            for evt in events:
-                payload_str = str(evt.get("payload", ""))
-                attrs_str = str(evt.get("attrs", ""))
-                if query in payload_str or query in attrs_str:
-                    evt["trace_name"] = trace_meta.get("name", "")
-                    results.append(evt)
-        return results
+        if rollups:
+            from .rollups import query_rollups
+
+            return query_rollups(
+                Path(self.root), group_by=group_by, kinds=kinds, percentiles=percentiles,
+                project=project, since=since, until=until,
+            )
+        from .analytics import aggregate
+
+        return aggregate(
+            self, group_by=group_by, kinds=kinds, metrics=metrics, percentiles=percentiles,
+            project=project, since=since, until=until,
+        )
+
+    def profile(self, trace_id: str) -> Optional["Profile"]:
+        """Span tree of a trace with self/total time, critical path and
+        folded stacks (see :mod:`agenttrace.profile`); ``None`` if the trace
+        does not exist."""
+        from .profile import build_profile
+
+        if find_trace_dir(Path(self.root), trace_id) is None:
+            return None
+        return build_profile(self.iter_events(trace_id, lazy=True), trace_id)
+
+
+_FILTER_KEYS = frozenset({"kinds", "span_id", "level", "ts_min", "ts_max", "seq_min", "seq_max", "fields"})
+
+
+def _clean_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate filter keywords and drop unset ones."""
+    unknown = set(filters) - _FILTER_KEYS
+    if unknown:
+        raise TypeError(f"unknown event filter(s): {', '.join(sorted(unknown))}")
+    out = {k: v for k, v in filters.items() if v is not None}
+    for key in ("kinds", "fields"):
+        if key in out:
+            value = out[key]
+            out[key] = [value] if isinstance(value, str) else list(value)
+    return out
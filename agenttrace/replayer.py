@@ -17,7 +17,8 @@ class ReplayError(Exception):
 class Replayer:
     def __init__(self, trace_id: str, reader: Optional[TraceReader] = None):
         self.reader = reader or TraceReader()
-        self.trace = self.reader.get_trace(trace_id)
+        # Cursor scans only look at ``kind``; payloads are decoded on demand.
+        self.trace = self.reader.get_trace(trace_id, lazy=True)
         if not self.trace:
             raise ValueError(f"Trace {trace_id} not found")
         
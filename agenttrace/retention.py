@@ -0,0 +1,265 @@
+"""Retention rules and garbage collection for a trace root.
+
+:func:`collect` deletes traces that fall outside a :class:`RetentionPolicy`
+(maximum age, total size, traces per project), oldest first.  Traces that are
+still being written are never touched.  :class:`RetentionWorker` runs it
+periodically in a background thread, e.g. inside the UI server.
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "RetentionPolicy",
+    "GcReport",
+    "collect",
+    "RetentionWorker",
+    "parse_duration",
+    "parse_size",
+]
+
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .ids import trace_id_time_ns
+from .storage import (
+    TraceLocation,
+    _prune_empty,
+    _start_info,
+    is_finished,
+    iter_trace_dirs,
+    project_dir_name,
+)
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds in ``"90"``, ``"45m"``, ``"12h"``, ``"30d"`` or ``"2w"``."""
+    text = text.strip().lower()
+    if text and text[-1] in _DURATION_UNITS:
+        return float(text[:-1]) * _DURATION_UNITS[text[-1]]
+    return float(text)
+
+
+def parse_size(text: str) -> int:
+    """Bytes in ``"1048576"``, ``"500M"``, ``"20G"`` (binary units, optional ``B``/``iB``)."""
+    text = text.strip().lower().removesuffix("ib").removesuffix("b")
+    unit = text[-1] if text and text[-1] in _SIZE_UNITS else ""
+    number = text[: len(text) - len(unit)]
+    return int(float(number) * _SIZE_UNITS[unit])
+
+
+@dataclass
+class RetentionPolicy:
+    """Limits enforced by :func:`collect`.  ``None`` disables a rule."""
+
+    #: Delete traces that started more than this many seconds ago.
+    max_age_s: Optional[float] = None
+    #: Keep the total size of the root at or below this many bytes.
+    max_bytes: Optional[int] = None
+    #: Keep at most this many (most recent) traces per project.
+    max_traces_per_project: Optional[int] = None
+    #: Treat a trace without ``trace_end`` as abandoned, and thus collectable,
+    #: once its events file has not changed for this many seconds.  By default
+    #: unfinished traces are never deleted.
+    abandoned_after_s: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return self.max_age_s is None and self.max_bytes is None and self.max_traces_per_project is None
+
+
+@dataclass
+class GcReport:
+    #: ``(trace_id, reason, bytes)`` for every deleted trace.
+    deleted: List[Tuple[str, str, int]] = field(default_factory=list)
+    #: Traces a rule selected but that are still being written.
+    skipped_active: List[str] = field(default_factory=list)
+    traces_seen: int = 0
+    bytes_before: int = 0
+
+    @property
+    def freed_bytes(self) -> int:
+        return sum(size for _, _, size in self.deleted)
+
+
+@dataclass
+class _Entry:
+    loc: TraceLocation
+    ts_ns: int
+    size: int
+    project: Optional[str] = None
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    try:
+        for entry in os.scandir(path):
+            if entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        pass
+    return total
+
+
+def _entry(loc: TraceLocation, need_project: bool) -> _Entry:
+    ts_ns = trace_id_time_ns(loc.id)
+    project = None
+    if ts_ns is None or (need_project and loc.partition is None):
+        try:
+            project, start_ns = _start_info(loc.events_file)
+        except (OSError, UnicodeDecodeError):
+            start_ns = None
+        if ts_ns is None:
+            ts_ns = start_ns
+        if ts_ns is None:
+            try:
+                ts_ns = loc.data_file.stat().st_mtime_ns
+            except OSError:
+                ts_ns = 0
+    # Group by the partition directory name so flat and partitioned traces
+    # of one project land in the same group.
+    project = loc.partition[0] if loc.partition is not None else project_dir_name(project)
+    return _Entry(loc, ts_ns, _dir_size(loc.dir), project)
+
+
+def _is_active(entry: _Entry, policy: RetentionPolicy, now: float) -> bool:
+    try:
+        if is_finished(entry.loc.events_file):
+            return False
+        mtime = entry.loc.data_file.stat().st_mtime
+    except OSError:
+        return False
+    return policy.abandoned_after_s is None or now - mtime < policy.abandoned_after_s
+
+
+def _delete(root: Path, entry: _Entry) -> None:
+    # Move out of sight first so readers never see a half-deleted trace.
+    trash = root / f".gc-{entry.loc.id}-{os.getpid()}"
+    os.rename(entry.loc.dir, trash)
+    shutil.rmtree(trash, ignore_errors=True)
+    if entry.loc.partition is not None:
+        _prune_empty(entry.loc.dir.parent, root)
+
+
+def collect(
+    root: Path,
+    policy: RetentionPolicy,
+    dry_run: bool = False,
+    max_deletes: Optional[int] = None,
+    now: Optional[float] = None,
+) -> GcReport:
+    """Delete traces under ``root`` that violate ``policy``, oldest first.
+
+    Rules are applied in order: age, traces per project, then total bytes
+    (deleting the oldest remaining traces until the root fits).  Unfinished
+    traces count towards the limits but are never deleted (see
+    :attr:`RetentionPolicy.abandoned_after_s`).  ``max_deletes`` bounds the
+    work done in one call, so a background worker can catch up gradually.
+    """
+    root = Path(root)
+    now = time.time() if now is None else now
+    report = GcReport()
+    if policy.is_empty():
+        return report
+    if not dry_run:
+        # Leftovers of an interrupted earlier run.
+        for trash in root.glob(".gc-*"):
+            shutil.rmtree(trash, ignore_errors=True)
+
+    need_project = policy.max_traces_per_project is not None
+    entries = [_entry(loc, need_project) for loc in iter_trace_dirs(root)]
+    entries.sort(key=lambda e: (e.ts_ns, e.loc.id))  # oldest first
+    report.traces_seen = len(entries)
+    report.bytes_before = sum(e.size for e in entries)
+
+    doomed: Dict[str, str] = {}
+    if policy.max_age_s is not None:
+        cutoff_ns = int((now - policy.max_age_s) * 1e9)
+        for e in entries:
+            if e.ts_ns < cutoff_ns:
+                doomed[e.loc.id] = "age"
+    if policy.max_traces_per_project is not None:
+        by_project: Dict[Optional[str], List[_Entry]] = {}
+        for e in entries:
+            if e.loc.id not in doomed:
+                by_project.setdefault(e.project, []).append(e)
+        for group in by_project.values():
+            excess = len(group) - policy.max_traces_per_project
+            for e in group[: max(excess, 0)]:
+                doomed[e.loc.id] = "project_limit"
+
+    total = report.bytes_before
+    active = set()
+    for e in entries:
+        if e.loc.id in doomed and _is_active(e, policy, now):
+            del doomed[e.loc.id]
+            active.add(e.loc.id)
+    for e in entries:
+        if e.loc.id in doomed:
+            total -= e.size
+    if policy.max_bytes is not None:
+        for e in entries:
+            if total <= policy.max_bytes:
+                break
+            if e.loc.id in doomed or e.loc.id in active:
+                continue
+            if _is_active(e, policy, now):
+                active.add(e.loc.id)
+                continue
+            doomed[e.loc.id] = "size"
+            total -= e.size
+    report.skipped_active = sorted(active)
+
+    for e in entries:
+        reason = doomed.get(e.loc.id)
+        if reason is None:
+            continue
+        if max_deletes is not None and len(report.deleted) >= max_deletes:
+            break
+        if not dry_run:
+            try:
+                _delete(root, e)
+            except OSError:
+                continue
+        report.deleted.append((e.loc.id, reason, e.size))
+    return report
+
+
+class RetentionWorker(threading.Thread):
+    """Daemon thread that calls :func:`collect` every ``interval_s`` seconds.
+
+    Each pass deletes at most ``max_deletes`` traces so a large backlog is
+    worked off incrementally without stalling the host process.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        policy: RetentionPolicy,
+        interval_s: float = 300.0,
+        max_deletes: Optional[int] = 100,
+    ) -> None:
+        super().__init__(name="agenttrace-retention", daemon=True)
+        self.root = Path(root)
+        self.policy = policy
+        self.interval_s = interval_s
+        self.max_deletes = max_deletes
+        self.last_report: Optional[GcReport] = None
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.last_report = collect(self.root, self.policy, max_deletes=self.max_deletes)
+            except OSError:
+                pass
+            self._stop_event.wait(self.interval_s)
+
+    def stop(self) -> None:
+        self._stop_event.set()
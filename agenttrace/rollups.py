@@ -0,0 +1,358 @@
+"""Hourly rollups of event metrics.
+
+``agenttrace rollup`` (and the UI server's background worker) folds every
+finished trace into per-hour records keyed by project, model, tool and
+event kind.  Each record holds the event count, token and cost sums and a
+:class:`~agenttrace.sketch.DDSketch` of ``duration_ms``; sketches merge, so
+a query over months combines a few thousand records instead of reading
+events.  ``agenttrace stats --rollups`` and
+``TraceReader.aggregate(rollups=True)`` query them.
+
+Rollups live under the reserved ``<root>/_rollups`` directory, one JSON file
+per UTC day (``<yyyy>/<mm>/<dd>.json``), next to ``state.json`` which holds
+a high-water mark: the start time of the newest trace looked at so far.  A
+pass only lists traces that started since then, plus the unfinished ones
+it is still waiting for, so its cost follows the number of new traces rather
+than the size of the root.  A trace is folded in once, when it is finished;
+rollups outlive the traces themselves, so run a pass before retention
+deletes them.  Traces copied into the root with a start time older than the
+mark are not picked up.
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "ROLLUP_DIR",
+    "ROLLUP_KEYS",
+    "GROUP_KEYS",
+    "RollupReport",
+    "RollupWorker",
+    "update_rollups",
+    "query_rollups",
+]
+
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .analytics import DEFAULT_KINDS, load_metrics
+from .fingerprint import load_fingerprint
+from .ids import trace_id_time_ns
+from .sketch import DDSketch
+from .storage import _data_file, _numeric_dirs, find_trace_dir, is_finished
+
+ROLLUP_DIR = "_rollups"
+_STATE_FILE = "state.json"
+_VERSION = 1
+
+#: Dimensions every rollup record is keyed by, besides its hour.
+ROLLUP_KEYS = ("project", "model", "tool", "kind")
+#: Keys :func:`query_rollups` can group by.
+GROUP_KEYS = ROLLUP_KEYS + ("hour", "day")
+
+Key = Tuple[int, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+@dataclass
+class RollupReport:
+    traces_added: int = 0
+    events_added: int = 0
+    days_written: int = 0
+    #: Unfinished traces left for a later pass.
+    traces_pending: int = 0
+
+
+class _Record:
+    __slots__ = ("count", "tokens", "tokens_count", "cost", "cost_count", "duration")
+
+    def __init__(self, accuracy: float) -> None:
+        self.count = 0
+        self.tokens = 0
+        self.tokens_count = 0
+        self.cost = 0.0
+        self.cost_count = 0
+        self.duration = DDSketch(accuracy)
+
+    def merge(self, other: "_Record") -> None:
+        self.count += other.count
+        self.tokens += other.tokens
+        self.tokens_count += other.tokens_count
+        self.cost += other.cost
+        self.cost_count += other.cost_count
+        self.duration.merge(other.duration)
+
+    def to_dict(self, key: Key) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"hour": key[0]}
+        out.update(zip(ROLLUP_KEYS, key[1:]))
+        out.update({
+            "count": self.count,
+            "tokens": self.tokens,
+            "tokens_count": self.tokens_count,
+            "cost_usd": self.cost,
+            "cost_count": self.cost_count,
+            "duration_ms": self.duration.to_dict(),
+        })
+        return out
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Tuple[Key, "_Record"]:
+        duration = DDSketch.from_dict(data["duration_ms"])
+        record = cls(duration.relative_accuracy)
+        record.duration = duration
+        record.count = data["count"]
+        record.tokens = data["tokens"]
+        record.tokens_count = data["tokens_count"]
+        record.cost = data["cost_usd"]
+        record.cost_count = data["cost_count"]
+        key = (data["hour"],) + tuple(data.get(k) for k in ROLLUP_KEYS)
+        return key, record  # type: ignore[return-value]
+
+
+def _day_path(base: Path, hour: int) -> Path:
+    t = time.gmtime(hour)
+    return base / f"{t.tm_year:04d}" / f"{t.tm_mon:02d}" / f"{t.tm_mday:02d}.json"
+
+
+def _read_day_file(path: Path) -> Tuple[Dict[Key, _Record], Set[str]]:
+    """Records of one day file and the IDs of the traces folded into it."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}, set()
+    return dict(_Record.from_dict(row) for row in data.get("rows", [])), set(data.get("traces", []))
+
+
+def _read_day(path: Path) -> Dict[Key, _Record]:
+    return _read_day_file(path)[0]
+
+
+def _read_state(path: Path) -> Dict[str, Any]:
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def _start_s(trace: Dict[str, Any]) -> float:
+    """Start time the trace is listed under, as ``list_traces`` windows it."""
+    ts_ns = trace_id_time_ns(trace["id"])
+    return ts_ns / 1e9 if ts_ns is not None else float(trace.get("ts") or 0.0)
+
+
+def _write_json(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def update_rollups(reader: Any, relative_accuracy: float = 0.01, max_traces: Optional[int] = None) -> RollupReport:
+    """Fold finished traces not yet rolled up into the hourly records.
+
+    Traces are taken oldest first, at most ``max_traces`` per pass, from
+    those started since the previous pass's high-water mark and the
+    unfinished ones it left pending.  Their metrics come from the
+    ``events.metrics`` index (built if missing); the pass also caches their
+    ``events.fingerprint``.
+
+    Each day file lists the traces folded into it, and a trace already listed
+    is not merged again, so a pass that dies after writing some day files but
+    before saving ``state.json`` does not count those traces twice.
+    """
+    root = Path(reader.root)
+    base = root / ROLLUP_DIR
+    state_path = base / _STATE_FILE
+    state = _read_state(state_path)
+    since: Optional[float] = state.get("since")
+    # Traces at the mark already looked at (state files without a mark list
+    # every trace folded in).
+    seen: Set[str] = set(state.get("recent", state.get("traces", [])))
+    waiting: Dict[str, Optional[str]] = dict(state.get("pending", {}))
+
+    report = RollupReport()
+    days: Dict[Path, Tuple[Dict[Key, _Record], Set[str]]] = {}
+    changed: Set[Path] = set()
+    added: List[str] = []
+    high = since
+    examined: Dict[str, float] = {}
+    still_waiting: Dict[str, Optional[str]] = {}
+    candidates = itertools.chain(
+        (({"id": trace_id, "project": project}, False) for trace_id, project in waiting.items()),
+        ((trace, True) for trace in reversed(reader.list_traces(since=since))),
+    )
+    for trace, listed in candidates:
+        trace_id = trace["id"]
+        if listed and (trace_id in seen or trace_id in waiting):
+            continue
+        if max_traces is not None and len(added) >= max_traces:
+            if listed:
+                break
+            still_waiting[trace_id] = trace.get("project")
+            continue
+        if listed:
+            examined[trace_id] = start = _start_s(trace)
+            high = start if high is None else max(high, start)
+        trace_dir = find_trace_dir(root, trace_id)
+        if trace_dir is None:
+            continue
+        if not is_finished(_data_file(trace_dir)):
+            still_waiting[trace_id] = trace.get("project")
+            report.traces_pending += 1
+            continue
+        columns = load_metrics(reader, trace_id) or {}
+        load_fingerprint(reader, trace_id)
+        project = trace.get("project")
+        pending: Dict[Path, Dict[Key, _Record]] = {}
+        for row in range(len(columns.get("kind", []))):
+            ts = columns["ts"][row]
+            if ts is None or ts < 0:
+                continue
+            hour = ts // 3_600_000_000_000 * 3600
+            key: Key = (hour, project, columns["model"][row], columns["tool"][row], columns["kind"][row])
+            day = pending.setdefault(_day_path(base, hour), {})
+            record = day.get(key)
+            if record is None:
+                record = day[key] = _Record(relative_accuracy)
+            record.count += 1
+            tokens, cost, duration = columns["tokens"][row], columns["cost_usd"][row], columns["duration_ms"][row]
+            if tokens is not None:
+                record.tokens += tokens
+                record.tokens_count += 1
+            if cost is not None:
+                record.cost += cost
+                record.cost_count += 1
+            if duration is not None and duration >= 0:
+                record.duration.add(duration)
+        for path, records in pending.items():
+            if path not in days:
+                days[path] = _read_day_file(path)
+            day, folded = days[path]
+            if trace_id in folded:
+                continue
+            for key, record in records.items():
+                if key in day:
+                    day[key].merge(record)
+                else:
+                    day[key] = record
+            folded.add(trace_id)
+            changed.add(path)
+            report.events_added += sum(record.count for record in records.values())
+        added.append(trace_id)
+
+    for path in changed:
+        day, folded = days[path]
+        rows = [record.to_dict(key) for key, record in sorted(day.items(), key=lambda kv: str(kv[0]))]
+        _write_json(path, {"version": _VERSION, "rows": rows, "traces": sorted(folded)})
+        report.days_written += 1
+
+    # The next pass lists from ``high`` rounded down to the millisecond; skip
+    # the traces of that last millisecond that were already looked at.
+    recent = {trace_id for trace_id, start in examined.items() if high is not None and start >= high - 1e-3}
+    if since is not None and high is not None and high - since <= 1e-3:
+        recent |= seen
+    new_state = {"version": _VERSION, "since": high, "recent": sorted(recent), "pending": still_waiting}
+    if new_state != state:
+        _write_json(state_path, new_state)
+    report.traces_added = len(added)
+    return report
+
+
+def _iter_day_files(base: Path, since: Optional[float], until: Optional[float]) -> Iterator[Path]:
+    lo = time.gmtime(since)[:3] if since is not None else None
+    hi = time.gmtime(until)[:3] if until is not None else None
+    for y, year in _numeric_dirs(base, 4):
+        for m, month in _numeric_dirs(year, 2):
+            for entry in sorted(month.glob("[0-9][0-9].json")):
+                day = (y, m, int(entry.stem))
+                if (lo is None or day >= tuple(lo)) and (hi is None or day <= tuple(hi)):
+                    yield entry
+
+
+def query_rollups(
+    root: Path,
+    group_by: Sequence[str] = ("model",),
+    kinds: Optional[Sequence[str]] = DEFAULT_KINDS,
+    percentiles: Sequence[float] = (50, 95, 99),
+    project: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """Grouped statistics from the rollups, in the shape of
+    :func:`agenttrace.analytics.aggregate`.
+
+    Time bounds have hour granularity: an hour is included when it overlaps
+    ``[since, until]``.  Percentiles come from merged sketches and are
+    within the sketch's relative accuracy.
+    """
+    if isinstance(group_by, str):
+        group_by = [group_by]
+    if isinstance(kinds, str):
+        kinds = [kinds]
+    unknown = set(group_by) - set(GROUP_KEYS)
+    if unknown:
+        raise ValueError(f"cannot group rollups by: {', '.join(sorted(unknown))}")
+    wanted = None if kinds is None else set(kinds)
+
+    groups: Dict[Tuple[Any, ...], _Record] = {}
+    for path in _iter_day_files(Path(root) / ROLLUP_DIR, since, until):
+        for (hour, *dims), record in _read_day(path).items():
+            values = dict(zip(ROLLUP_KEYS, dims))
+            if (since is not None and hour + 3600 <= since) or (until is not None and hour > until):
+                continue
+            if wanted is not None and values["kind"] not in wanted:
+                continue
+            if project is not None and values["project"] != project:
+                continue
+            values["hour"] = hour
+            values["day"] = time.strftime("%Y-%m-%d", time.gmtime(hour))
+            key = tuple(values[k] for k in group_by)
+            if key in groups:
+                groups[key].merge(record)
+            else:
+                groups[key] = record
+
+    results = []
+    for key, record in groups.items():
+        entry: Dict[str, Any] = dict(zip(group_by, key))
+        sketch = record.duration
+        entry["count"] = record.count
+        entry["duration_ms_count"] = sketch.count
+        entry["duration_ms_sum"] = sketch.sum
+        entry["duration_ms_mean"] = sketch.sum / sketch.count if sketch.count else None
+        entry.update({f"duration_ms_p{p:g}": sketch.quantile(p / 100) for p in percentiles})
+        for name, total, n in (("tokens", record.tokens, record.tokens_count), ("cost_usd", record.cost, record.cost_count)):
+            entry[f"{name}_count"] = n
+            entry[f"{name}_sum"] = total
+            entry[f"{name}_mean"] = total / n if n else None
+        results.append(entry)
+    results.sort(key=lambda e: -e["count"])
+    return results
+
+
+class RollupWorker(threading.Thread):
+    """Daemon thread that calls :func:`update_rollups` every ``interval_s`` seconds."""
+
+    def __init__(self, reader: Any, interval_s: float = 300.0, max_traces: Optional[int] = 500) -> None:
+        super().__init__(name="agenttrace-rollups", daemon=True)
+        self.reader = reader
+        self.interval_s = interval_s
+        self.max_traces = max_traces
+        self.last_report: Optional[RollupReport] = None
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.last_report = update_rollups(self.reader, max_traces=self.max_traces)
+            except OSError:
+                pass
+            self._stop_event.wait(self.interval_s)
+
+    def stop(self) -> None:
+        self._stop_event.set()
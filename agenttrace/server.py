@@ -1,45 +1,438 @@
-"""FastAPI server for the AgentTrace visualization UI."""
+"""FastAPI server for the AgentTrace visualization UI.
+
+Handlers are ``async`` and never touch the disk on the event loop: reader
+work runs on a bounded thread pool (``AGENTTRACE_UI_WORKERS``), so a slow
+search occupies one worker while other requests keep being served.  A
+request whose client disconnects before its work has started is dropped
+from the pool's queue.  Lists are streamed as JSON arrays in chunks, and
+responses over 1 KiB are gzip-compressed for clients that accept it.
+
+Live updates are Server-Sent Events: ``/api/traces/{id}/stream`` pushes the
+events appended to a trace and ``/api/traces/feed`` the traces created, each
+polled a step at a time on the pool rather than holding a worker.
+
+The server reads every root of ``AGENTTRACE_ROOTS`` (or ``agenttrace ui
+--root``) through a :class:`~agenttrace.federation.FederatedReader`.
+Per-trace requests for a trace held by a remote root are forwarded to that
+server as they are.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
 import importlib.resources as resources
+import json
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, TypeVar, Union
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 
+from .cache import ResponseCache, TraceObjectCache, trace_stamp
+from .config import get_retention_policy, get_root_dir, get_roots, get_ui_cache_bytes, get_ui_rollups, get_ui_workers
+from .export import iter_json_array
+from .federation import FederatedReader, RemoteRoot
+from .lazy import HEADER_FIELDS
+from .profile import Profile
 from .reader import TraceReader
+from .retention import RetentionWorker
+from .rollups import RollupWorker
+from .storage import _data_file, find_trace_dir, is_finished
+from .tail import TraceFeed, TraceTail
+
+T = TypeVar("T")
 
 app = FastAPI()
-_reader: Optional[TraceReader] = None
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+_federation: Optional[FederatedReader] = None
+#: Roots and per-root timeout, set by :func:`start_server`.
+_roots: Optional[List[str]] = None
+_root_timeout = 5.0
+_cache: Optional[ResponseCache] = None
+_pool: Optional[ThreadPoolExecutor] = None
+#: Span trees of the most recently viewed traces, served a level at a time.
+_profiles = TraceObjectCache(max_entries=8)
+
+#: How often a request waiting on the pool checks for a disconnected client.
+_DISCONNECT_POLL_S = 0.25
+#: How often live streams look for new events and new traces.
+_STREAM_POLL_S = 0.5
+_FEED_POLL_S = 2.0
+#: Comment line sent on idle streams so proxies keep the connection open.
+_KEEPALIVE_S = 15.0
+_SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+    # Keeps GZipMiddleware off: it would buffer the stream.
+    "Content-Encoding": "identity",
+}
+#: Request and response headers passed through to and from remote roots.
+_PROXY_REQUEST_HEADERS = ("if-none-match", "if-modified-since", "last-event-id")
+_PROXY_RESPONSE_HEADERS = ("content-type", "etag", "last-modified", "cache-control")
+
+
+def _get_federation() -> FederatedReader:
+    global _federation
+    if _federation is None:
+        _federation = FederatedReader(_roots or get_roots(), timeout=_root_timeout)
+    return _federation
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=get_ui_workers(), thread_name_prefix="agenttrace-ui")
+    return _pool
+
+
+async def _run(request: Request, fn: Callable[..., T], *args: Any) -> T:
+    """``fn(*args)`` on the worker pool, abandoned if the client goes away."""
+    future = asyncio.get_running_loop().run_in_executor(_get_pool(), functools.partial(fn, *args))
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=_DISCONNECT_POLL_S)
+        if done:
+            return future.result()
+        if await request.is_disconnected():
+            # Removes the call from the queue if no worker has picked it up.
+            future.cancel()
+            raise HTTPException(status_code=499, detail="Client closed request")
+
+
+async def _json_chunks(items: Iterable[Any]) -> AsyncIterator[bytes]:
+    # Starlette stops iterating (and so encoding) when the client disconnects.
+    chunks = iter_json_array(items)
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(_get_pool(), next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _json_array_response(items: Iterable[Any]) -> StreamingResponse:
+    return StreamingResponse(_json_chunks(items), media_type="application/json")
+
+
+def _sse(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id is not None else "")
+    return (head + "data: " + json.dumps(data, separators=(",", ":"), default=str) + "\n\n").encode("utf-8")
+
+
+async def _poll_sse(poll: Callable[[], List[bytes]], interval: float) -> AsyncIterator[bytes]:
+    """Run ``poll`` on the pool every ``interval`` seconds and send what it
+    returns; an empty message ends the stream."""
+    loop = asyncio.get_running_loop()
+    idle = 0.0
+    while True:
+        messages = await loop.run_in_executor(_get_pool(), poll)
+        for message in messages:
+            if not message:
+                return
+            yield message
+        idle = 0.0 if messages else idle + interval
+        if idle >= _KEEPALIVE_S:
+            yield b": keepalive\n\n"
+            idle = 0.0
+        await asyncio.sleep(interval)
+
+
+def _get_cache() -> Optional[ResponseCache]:
+    global _cache
+    if _cache is None:
+        max_bytes = get_ui_cache_bytes()
+        if max_bytes <= 0:
+            return None
+        _cache = ResponseCache(max_bytes)
+    return _cache
+
+
+def _not_modified(request: Request, etag: str, mtime_ns: int) -> bool:
+    match = request.headers.get("if-none-match")
+    if match is not None:
+        return match.strip() == "*" or etag in [tag.strip() for tag in match.split(",")]
+    since = request.headers.get("if-modified-since")
+    if since:
+        try:
+            return parsedate_to_datetime(since).timestamp() >= mtime_ns // 1_000_000_000
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _cached_body(
+    trace_id: str, stamp: Tuple[int, int], query: Hashable, build: Callable[[Tuple[int, int]], Optional[Any]]
+) -> Optional[bytes]:
+    cache = _get_cache()
+    body = cache.get(trace_id, stamp, query) if cache is not None else None
+    if body is None:
+        data = build(stamp)
+        if data is None:
+            return None
+        body = json.dumps(data, separators=(",", ":"), default=str).encode("utf-8")
+        if cache is not None:
+            cache.put(trace_id, stamp, query, body)
+    return body
+
+
+async def _locate(request: Request, trace_id: str) -> Union[TraceReader, RemoteRoot]:
+    found = await _run(request, _get_federation().locate, trace_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return found[1]
+
+
+async def _proxy(request: Request, remote: RemoteRoot) -> Response:
+    """Forward this request to the remote root that holds the trace."""
+    headers = {k: v for k, v in request.headers.items() if k in _PROXY_REQUEST_HEADERS}
+
+    def fetch() -> Tuple[int, bytes, Dict[str, str]]:
+        with remote.request(request.url.path, request.url.query, headers) as resp:
+            passed = {k: v for k, v in resp.headers.items() if k.lower() in _PROXY_RESPONSE_HEADERS}
+            return resp.getcode(), resp.read(), passed
+
+    try:
+        status, body, passed = await _run(request, fetch)
+    except OSError as e:
+        raise HTTPException(status_code=502, detail=f"{remote.url}: {e}")
+    return Response(content=body, status_code=status, headers=passed)
 
 
-def _get_reader() -> TraceReader:
-    global _reader
-    if _reader is None:
-        _reader = TraceReader()
-    return _reader
+async def _proxy_stream(request: Request, remote: RemoteRoot) -> Response:
+    """Relay a remote Server-Sent Events stream."""
+    headers = {k: v for k, v in request.headers.items() if k in _PROXY_REQUEST_HEADERS}
+    try:
+        # Idle streams send a keepalive every _KEEPALIVE_S.
+        resp = await _run(request, remote.request, request.url.path, request.url.query, headers, 2 * _KEEPALIVE_S)
+    except OSError as e:
+        raise HTTPException(status_code=502, detail=f"{remote.url}: {e}")
+    if resp.getcode() != 200:
+        with resp:
+            return Response(content=resp.read(), status_code=resp.getcode(), media_type="application/json")
+
+    async def relay() -> AsyncIterator[bytes]:
+        try:
+            while True:
+                # Off the worker pool: a read waits for the remote's next event.
+                chunk = await asyncio.to_thread(resp.read1, 64 * 1024)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            resp.close()
+
+    return StreamingResponse(relay(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+async def _trace_response(
+    request: Request,
+    reader: TraceReader,
+    trace_id: str,
+    query: Hashable,
+    build: Callable[[Tuple[int, int]], Optional[Any]],
+) -> Response:
+    """JSON response for a per-trace endpoint, cached by the trace's
+    ``(size, mtime)`` and revalidated by the browser with ``ETag`` /
+    ``Last-Modified``.  ``build(stamp)`` returns ``None`` for a missing
+    trace."""
+    stamp = await _run(request, trace_stamp, reader.root, trace_id)
+    if stamp is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    etag = '"%s"' % hashlib.blake2b(repr((trace_id, stamp, query)).encode("utf-8"), digest_size=16).hexdigest()
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stamp[1] / 1e9, usegmt=True),
+        # Cache, but ask first: an unfinished trace changes under the same URL.
+        "Cache-Control": "no-cache",
+    }
+    if _not_modified(request, etag, stamp[1]):
+        return Response(status_code=304, headers=headers)
+
+    body = await _run(request, _cached_body, trace_id, stamp, query, build)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/api/traces")
-def list_traces() -> List[Dict[str, Any]]:
-    return _get_reader().list_traces()
+async def list_traces(
+    request: Request,
+    project: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: Optional[int] = None,
+) -> StreamingResponse:
+    traces = await _run(
+        request, functools.partial(_get_federation().list_traces, project=project, since=since, until=until, limit=limit)
+    )
+    return _json_array_response(traces)
+
+
+@app.get("/api/traces/feed")
+async def trace_feed(request: Request) -> StreamingResponse:
+    """Server-Sent Events: a ``trace`` event with the metadata of each trace
+    created from now on, in the local roots."""
+    sources = [(name, src) for name, src in _get_federation().sources if isinstance(src, TraceReader)]
+    feeds = await _run(request, lambda: [(name, TraceFeed(src.root)) for name, src in sources])
+
+    def poll() -> List[bytes]:
+        return [_sse("trace", {**meta, "root": name}) for name, feed in feeds for meta in feed.poll()]
+
+    return StreamingResponse(_poll_sse(poll, _FEED_POLL_S), media_type="text/event-stream", headers=_SSE_HEADERS)
 
 
 @app.get("/api/traces/{trace_id}")
-def get_trace(trace_id: str) -> Dict[str, Any]:
-    trace = _get_reader().get_trace(trace_id)
-    if not trace:
+async def get_trace(
+    request: Request,
+    trace_id: str,
+    kind: Optional[List[str]] = Query(None),
+    span: Optional[str] = None,
+    level: Optional[str] = None,
+) -> Response:
+    reader = await _locate(request, trace_id)
+    if isinstance(reader, RemoteRoot):
+        return await _proxy(request, reader)
+    query = ("trace", tuple(kind or ()), span, level)
+    return await _trace_response(
+        request, reader, trace_id, query,
+        lambda stamp: reader.get_trace(trace_id, kinds=kind, span_id=span, level=level),
+    )
+
+
+@app.get("/api/traces/{trace_id}/events")
+async def page_events(
+    request: Request,
+    trace_id: str,
+    cursor: Optional[int] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    kind: Optional[List[str]] = Query(None),
+    span: Optional[str] = None,
+    level: Optional[str] = None,
+    summary: bool = False,
+) -> Response:
+    """A window of events after ``cursor`` (a ``seq``); pass the returned
+    ``next_cursor`` to get the next one.  ``summary`` drops attrs/payload."""
+    reader = await _locate(request, trace_id)
+    if isinstance(reader, RemoteRoot):
+        return await _proxy(request, reader)
+    query = ("events", cursor, limit, tuple(kind or ()), span, level, summary)
+    return await _trace_response(
+        request, reader, trace_id, query,
+        lambda stamp: reader.page_events(
+            trace_id, cursor=cursor, limit=limit, summary=summary, kinds=kind, span_id=span, level=level,
+        ),
+    )
+
+
+def _profile(reader: TraceReader, trace_id: str, stamp: Tuple[int, int]) -> Optional[Profile]:
+    return _profiles.get_or_build(trace_id, stamp, lambda: reader.profile(trace_id))
+
+
+@app.get("/api/traces/{trace_id}/summary")
+async def trace_summary(request: Request, trace_id: str) -> Response:
+    """Event, error, token and cost totals, span count and critical path."""
+    reader = await _locate(request, trace_id)
+    if isinstance(reader, RemoteRoot):
+        return await _proxy(request, reader)
+
+    def build(stamp: Tuple[int, int]) -> Optional[Any]:
+        profile = _profile(reader, trace_id, stamp)
+        return profile.summary() if profile is not None else None
+
+    return await _trace_response(request, reader, trace_id, ("summary",), build)
+
+
+@app.get("/api/traces/{trace_id}/spans")
+async def span_children(
+    request: Request,
+    trace_id: str,
+    parent: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(200, ge=1, le=5000),
+) -> Response:
+    """One page of the child spans of ``parent`` (top-level spans if omitted)."""
+    reader = await _locate(request, trace_id)
+    if isinstance(reader, RemoteRoot):
+        return await _proxy(request, reader)
+
+    def build(stamp: Tuple[int, int]) -> Optional[Any]:
+        profile = _profile(reader, trace_id, stamp)
+        if profile is None:
+            return None
+        page = profile.children(parent, offset=offset, limit=limit)
+        if page is None:
+            raise HTTPException(status_code=404, detail="Span not found")
+        return page
+
+    return await _trace_response(request, reader, trace_id, ("spans", parent, offset, limit), build)
+
+
+@app.get("/api/traces/{trace_id}/stream")
+async def stream_trace(
+    request: Request,
+    trace_id: str,
+    from_seq: int = 0,
+    summary: bool = False,
+) -> Response:
+    """Server-Sent Events: an ``event`` (with ``id`` = ``seq``) for each event
+    at or after ``from_seq`` as it is written, then ``end`` after
+    ``trace_end``.  A reconnecting ``EventSource`` resumes after its
+    ``Last-Event-ID``."""
+    reader = await _locate(request, trace_id)
+    if isinstance(reader, RemoteRoot):
+        return await _proxy_stream(request, reader)
+    last_id = request.headers.get("last-event-id", "")
+    if last_id.isdigit():
+        from_seq = int(last_id) + 1
+    trace_dir = await _run(request, find_trace_dir, Path(reader.root), trace_id)
+    if trace_dir is None:
         raise HTTPException(status_code=404, detail="Trace not found")
-    return trace
+    data_file = _data_file(trace_dir)
+    tail = TraceTail(data_file, from_seq=from_seq)
+    done = False
+
+    def message(evt: Any) -> bytes:
+        if summary:
+            evt = {k: v for k, v in dict.items(evt) if k in HEADER_FIELDS}
+        return _sse("event", evt, evt.get("seq"))
+
+    def poll() -> List[bytes]:
+        nonlocal done
+        if done:
+            return [b""]
+        if tail.offset == 0 and is_finished(data_file):
+            # Nothing more will be written: send the rest from the reader,
+            # which skips earlier events from their header alone.
+            events = reader.iter_events(trace_id, seq_min=from_seq or None)
+            done = True
+        else:
+            events = tail.read_new()
+        messages = []
+        for evt in events:
+            messages.append(message(evt))
+            done = done or evt.get("kind") == "trace_end"
+        if done:
+            messages.append(_sse("end", {"trace_id": trace_id}))
+        return messages
+
+    return StreamingResponse(_poll_sse(poll, _STREAM_POLL_S), media_type="text/event-stream", headers=_SSE_HEADERS)
 
 
 @app.get("/api/search")
-def search_traces(q: str) -> List[Dict[str, Any]]:
+async def search_traces(
+    request: Request,
+    q: str,
+    limit: Optional[int] = None,
+    kind: Optional[List[str]] = Query(None),
+) -> StreamingResponse:
     if not q:
-        return []
-    return _get_reader().search(q)
+        return _json_array_response([])
+    hits = await _run(request, functools.partial(_get_federation().search, q, limit=limit, kinds=kind))
+    return _json_array_response(hits)
 
 
 @app.get("/")
@@ -56,6 +449,47 @@ def serve_ui():
     return FileResponse(html_path)
 
 
-def start_server(host: str = "127.0.0.1", port: int = 8000) -> None:
+def start_server(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    gc_interval: float = 300.0,
+    roots: Optional[List[str]] = None,
+    root_timeout: float = 5.0,
+    rollups: Optional[bool] = None,
+) -> None:
+    """Run the UI server.
+
+    ``roots`` (paths or server URLs; default ``AGENTTRACE_ROOTS``) are all
+    served, each given ``root_timeout`` seconds per request.
+
+    When ``AGENTTRACE_RETENTION_*`` rules are configured, a background
+    :class:`~agenttrace.retention.RetentionWorker` enforces them on
+    ``AGENTTRACE_ROOT`` every ``gc_interval`` seconds while the server runs.
+    With ``rollups`` (default ``AGENTTRACE_UI_ROLLUPS``), a
+    :class:`~agenttrace.rollups.RollupWorker` per local root keeps the
+    hourly rollups up to date on the same interval.  Both write into the
+    roots, so neither runs unless asked for.
+    """
     import uvicorn
-    uvicorn.run(app, host=host, port=port)
+
+    global _roots, _root_timeout
+    _roots, _root_timeout = roots or None, root_timeout
+    policy = get_retention_policy()
+    workers = []
+    if rollups is None:
+        rollups = get_ui_rollups()
+    if rollups and gc_interval > 0:
+        workers.extend(RollupWorker(reader, interval_s=gc_interval) for reader in _get_federation().local_readers)
+    if not policy.is_empty() and gc_interval > 0:
+        workers.append(RetentionWorker(get_root_dir(), policy, interval_s=gc_interval))
+    for worker in workers:
+        worker.start()
+    try:
+        uvicorn.run(app, host=host, port=port)
+    finally:
+        for worker in workers:
+            worker.stop()
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        if _federation is not None:
+            _federation.close()
@@ -0,0 +1,91 @@
+"""Mergeable quantile sketches for latency rollups.
+
+:class:`DDSketch` follows the DDSketch scheme (Masson et al., 2019): values
+fall into logarithmic buckets whose boundaries grow by a factor ``gamma``,
+so every quantile estimate is within ``relative_accuracy`` of a true value.
+Two sketches with the same accuracy merge by adding bucket counts, which is
+what lets hourly rollups be combined into daily or monthly percentiles
+without the raw values.
+"""
+
+from __future__ import annotations
+
+__all__ = ["DDSketch"]
+
+import math
+from typing import Any, Dict, Iterable, Optional
+
+
+class DDSketch:
+    """Quantile sketch over non-negative values with relative error bounds."""
+
+    #: Values at or below this are counted in the zero bucket.
+    MIN_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value < 0 or math.isnan(value):
+            raise ValueError("DDSketch only holds non-negative values")
+        if value <= self.MIN_VALUE:
+            self.zero_count += count
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.count += count
+        self.sum += value * count
+
+    def update(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different accuracy")
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate of the ``q`` quantile (0-1); ``None`` when empty."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                # Midpoint (in relative terms) of (gamma^(key-1), gamma^key].
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "alpha": self.relative_accuracy,
+            "n": self.count,
+            "sum": self.sum,
+            "zero": self.zero_count,
+            "bins": {str(k): v for k, v in sorted(self.bins.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DDSketch":
+        sketch = cls(data.get("alpha", 0.01))
+        sketch.bins = {int(k): int(v) for k, v in data.get("bins", {}).items()}
+        sketch.zero_count = int(data.get("zero", 0))
+        sketch.count = int(data.get("n", 0))
+        sketch.sum = float(data.get("sum", 0.0))
+        return sketch
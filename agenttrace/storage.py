@@ -0,0 +1,326 @@
+"""On-disk layout of a trace root.
+
+Two layouts can coexist under one root:
+
+- flat: ``<root>/<trace_id>/events.jsonl``
+- partitioned: ``<root>/<project>/<yyyy>/<mm>/<dd>/<trace_id>/events.jsonl``,
+  dated by the trace's start time (UTC).
+
+A trace directory holds ``events.jsonl``, or ``events.bin`` for traces
+written in the binary format (:mod:`agenttrace.binformat`), or
+``events.archive`` once compacted (:mod:`agenttrace.archive`).
+
+A top-level directory that holds an events file is a flat trace; any other
+top-level directory is a project partition.  Names starting with ``_`` or
+``.`` are reserved and never treated as traces or projects.  Mirrors
+``crates/agenttrace-core/src/storage.rs``.
+"""
+
+from __future__ import annotations
+
+__all__ = [
+    "EVENTS_FILE",
+    "ARCHIVE_FILE",
+    "BINARY_FILE",
+    "DEFAULT_PROJECT",
+    "TraceLocation",
+    "project_dir_name",
+    "partition_path",
+    "find_trace_dir",
+    "iter_trace_dirs",
+    "is_finished",
+    "migrate_layout",
+]
+
+import json
+import math
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from .archive import ARCHIVE_FILE
+from .binformat import BINARY_FILE
+from .ids import trace_id_time_ns
+
+EVENTS_FILE = "events.jsonl"
+DEFAULT_PROJECT = "default"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]")
+
+Date = Tuple[int, int, int]
+
+
+@dataclass
+class TraceLocation:
+    id: str
+    dir: Path
+    #: ``(project dir name, (year, month, day))``; ``None`` for flat traces.
+    partition: Optional[Tuple[str, Date]] = None
+
+    @property
+    def events_file(self) -> Path:
+        return self.dir / EVENTS_FILE
+
+    @property
+    def data_file(self) -> Path:
+        """The file holding the events: JSONL, binary, or an archive."""
+        return _data_file(self.dir)
+
+    @property
+    def is_archived(self) -> bool:
+        """True once ``agenttrace compact`` replaced the JSONL with an archive."""
+        return _is_archived(self.dir)
+
+
+def project_dir_name(project: Optional[str]) -> str:
+    """Directory name used for a project's partition."""
+    cleaned = _UNSAFE.sub("_", project or "").lstrip("_.")
+    return cleaned or DEFAULT_PROJECT
+
+
+def _civil_date(ts_unix_ns: int) -> Date:
+    t = time.gmtime(ts_unix_ns // 1_000_000_000)
+    return (t.tm_year, t.tm_mon, t.tm_mday)
+
+
+def _window_ns(since: Optional[float], until: Optional[float]) -> Tuple[Optional[int], Optional[int]]:
+    """``since``/``until`` (unix seconds) as inclusive nanosecond bounds.
+
+    A float number of seconds cannot name an exact nanosecond, so the bounds
+    are widened to whole milliseconds; a time that converts to exactly
+    ``since`` or ``until`` is never rounded out of the window.
+    """
+    lo = math.floor(since * 1e3) * 1_000_000 if since is not None else None
+    hi = math.ceil(until * 1e3) * 1_000_000 + 999_999 if until is not None else None
+    return lo, hi
+
+
+def partition_path(project: Optional[str], ts_unix_ns: int) -> str:
+    """Relative partition path ``<project>/<yyyy>/<mm>/<dd>`` for a trace started at ``ts_unix_ns``."""
+    y, m, d = _civil_date(ts_unix_ns)
+    return f"{project_dir_name(project)}/{y:04d}/{m:02d}/{d:02d}"
+
+
+def _is_reserved(name: str) -> bool:
+    return name.startswith(("_", "."))
+
+
+def _is_trace_dir(path: Path) -> bool:
+    return any((path / name).is_file() for name in (EVENTS_FILE, BINARY_FILE, ARCHIVE_FILE))
+
+
+def _data_file(trace_dir: Path) -> Path:
+    for name in (EVENTS_FILE, BINARY_FILE):
+        if (trace_dir / name).exists():
+            return trace_dir / name
+    return trace_dir / ARCHIVE_FILE
+
+
+def _is_archived(trace_dir: Path) -> bool:
+    return not (trace_dir / EVENTS_FILE).exists() and (trace_dir / ARCHIVE_FILE).is_file()
+
+
+def _numeric_dirs(path: Path, width: int) -> List[Tuple[int, Path]]:
+    """Sorted numeric subdirectories of ``path`` (``yyyy``, ``mm`` or ``dd``)."""
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return []
+    out = [
+        (int(e.name), Path(e.path))
+        for e in entries
+        if len(e.name) == width and e.name.isdigit() and e.is_dir()
+    ]
+    out.sort()
+    return out
+
+
+def _in_range(value: tuple, lo: Optional[tuple], hi: Optional[tuple]) -> bool:
+    return (lo is None or value >= lo) and (hi is None or value <= hi)
+
+
+def iter_trace_dirs(
+    root: Path,
+    project: Optional[str] = None,
+    since_ns: Optional[int] = None,
+    until_ns: Optional[int] = None,
+) -> Iterator[TraceLocation]:
+    """Yield every trace directory under ``root``.
+
+    Partitions that cannot hold traces of ``project`` started within
+    ``[since_ns, until_ns]`` are skipped without being listed.  Flat traces are
+    always yielded; callers apply exact filters to their metadata.
+    """
+    root = Path(root)
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    lo = _civil_date(since_ns) if since_ns is not None else None
+    hi = _civil_date(until_ns) if until_ns is not None else None
+    only = project_dir_name(project) if project is not None else None
+    for entry in entries:
+        if _is_reserved(entry.name) or not entry.is_dir():
+            continue
+        path = Path(entry.path)
+        if _is_trace_dir(path):
+            yield TraceLocation(entry.name, path)
+            continue
+        if only is not None and entry.name != only:
+            continue
+        for y, year in _numeric_dirs(path, 4):
+            if not _in_range((y,), lo and lo[:1], hi and hi[:1]):
+                continue
+            for m, month in _numeric_dirs(year, 2):
+                if not _in_range((y, m), lo and lo[:2], hi and hi[:2]):
+                    continue
+                for d, day in _numeric_dirs(month, 2):
+                    if not _in_range((y, m, d), lo, hi):
+                        continue
+                    try:
+                        traces = list(os.scandir(day))
+                    except OSError:
+                        # Removed by retention/archiving while we were listing.
+                        continue
+                    for trace in traces:
+                        trace_dir = Path(trace.path)
+                        if _is_reserved(trace.name) or not _is_trace_dir(trace_dir):
+                            continue
+                        yield TraceLocation(trace.name, trace_dir, (entry.name, (y, m, d)))
+
+
+def find_trace_dir(root: Path, trace_id: str) -> Optional[Path]:
+    """Directory of an existing trace in either layout, or ``None``.
+
+    Flat traces cost a single ``stat``.  A time-ordered ID names its own day
+    partition, so it costs one ``stat`` per project; other partitioned traces
+    one ``stat`` per day partition.  The traces themselves are never listed.
+    """
+    if not trace_id or _is_reserved(trace_id) or "/" in trace_id or "\\" in trace_id:
+        return None
+    root = Path(root)
+    flat = root / trace_id
+    if _is_trace_dir(flat):
+        return flat
+    try:
+        projects = [Path(e.path) for e in os.scandir(root) if not _is_reserved(e.name) and e.is_dir()]
+    except OSError:
+        return None
+    projects = [p for p in projects if not _is_trace_dir(p)]
+    ts_ns = trace_id_time_ns(trace_id)
+    if ts_ns is not None:
+        y, m, d = _civil_date(ts_ns)
+        for project in projects:
+            candidate = project / f"{y:04d}" / f"{m:02d}" / f"{d:02d}" / trace_id
+            if _is_trace_dir(candidate):
+                return candidate
+    for project in projects:
+        for _, year in _numeric_dirs(project, 4):
+            for _, month in _numeric_dirs(year, 2):
+                for _, day in _numeric_dirs(month, 2):
+                    candidate = day / trace_id
+                    if _is_trace_dir(candidate):
+                        return candidate
+    return None
+
+
+def is_finished(events_path: Path) -> bool:
+    """True if the last line of ``events_path`` is a ``trace_end`` event.
+
+    Archived traces are always finished; for binary traces the last record
+    is checked.
+    """
+    from .binformat import last_binary_event
+
+    events_path = _data_file(Path(events_path).parent)
+    if events_path.name == ARCHIVE_FILE:
+        return True
+    if events_path.name == BINARY_FILE:
+        last = last_binary_event(events_path)
+        return last is not None and last.get("kind") == "trace_end"
+    with open(events_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 65536))
+        lines = f.read().strip().splitlines()
+    return bool(lines) and b'"kind":"trace_end"' in lines[-1]
+
+
+def _start_info(events_path: Path) -> Tuple[Optional[str], Optional[int]]:
+    """``(project, ts_unix_ns)`` from a trace's ``trace_start`` line."""
+    from ._native import _strip_crc
+    from .archive import read_first_event
+    from .binformat import first_binary_event
+
+    events_path = _data_file(Path(events_path).parent)
+    try:
+        if events_path.name == ARCHIVE_FILE:
+            data = read_first_event(events_path.parent)
+        elif events_path.name == BINARY_FILE:
+            data = first_binary_event(events_path)
+        else:
+            with open(events_path, "r", encoding="utf-8") as f:
+                first = f.readline().strip()
+            data = json.loads(_strip_crc(first)) if first else None
+    except (json.JSONDecodeError, ValueError):
+        return None, None
+    if not data:
+        return None, None
+    if data.get("kind") != "trace_start":
+        return None, data.get("ts_unix_ns")
+    return (data.get("payload") or {}).get("project"), data.get("ts_unix_ns")
+
+
+def _prune_empty(path: Path, stop: Path) -> None:
+    """Remove now-empty partition directories up to (not including) ``stop``."""
+    while path != stop and path.is_relative_to(stop):
+        try:
+            path.rmdir()
+        except OSError:
+            return
+        path = path.parent
+
+
+def migrate_layout(
+    root: Path,
+    to: str = "partitioned",
+    include_active: bool = False,
+    dry_run: bool = False,
+) -> List[Tuple[Path, Path]]:
+    """Move traces under ``root`` into the ``partitioned`` or ``flat`` layout.
+
+    Traces are moved with ``os.rename`` (in place, no copying).  Unfinished
+    traces are left alone unless ``include_active`` is set, since their
+    writer still holds the old path.  Returns the ``(old, new)`` moves.
+    """
+    if to not in ("partitioned", "flat"):
+        raise ValueError(f"unknown layout: {to}")
+    root = Path(root)
+    moves: List[Tuple[Path, Path]] = []
+    for loc in list(iter_trace_dirs(root)):
+        if (loc.partition is None) == (to == "flat"):
+            continue
+        if not include_active and not is_finished(loc.events_file):
+            continue
+        if to == "flat":
+            target = root / loc.id
+        else:
+            project, ts = _start_info(loc.events_file)
+            # Partition by the ID's time when it has one, as the Tracer does.
+            ts = trace_id_time_ns(loc.id) or ts
+            if ts is None:
+                ts = int(loc.data_file.stat().st_mtime * 1e9)
+            target = root / partition_path(project, ts) / loc.id
+        if target.exists():
+            continue
+        moves.append((loc.dir, target))
+        if dry_run:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.rename(loc.dir, target)
+        if loc.partition is not None:
+            _prune_empty(loc.dir.parent, root)
+    return moves
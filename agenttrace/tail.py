@@ -0,0 +1,216 @@
+"""Incremental reading of traces that are still being written.
+
+:class:`TraceTail` reads the events appended to one trace, :class:`TraceFeed`
+the traces that appeared under a root.  Both are driven by polling, so the
+UI server can run them a step at a time for each connected client.
+"""
+
+from __future__ import annotations
+
+__all__ = ["TraceFeed", "TraceTail", "follow_file"]
+
+import json
+import os
+import select
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from ._native import _read_meta, _strip_crc
+from .binformat import BINARY_FILE, BinaryDecoder, decode_new
+from .storage import TraceLocation, iter_trace_dirs
+
+# inotify(7) constants
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_CLOEXEC = 0o2000000
+
+
+class TraceTail:
+    """Offset-tracked reader for one ``events.jsonl`` (or ``events.bin``) file.
+
+    Each :meth:`read_new` call reads only the bytes appended since the last
+    call and returns the events on complete lines.  A partially written
+    trailing line is left in place and picked up once its newline lands, so a
+    refresh costs O(new events) no matter how large the trace already is.
+    Binary files are read the same way, record by record.
+    """
+
+    def __init__(self, path: Path, from_seq: int = 0) -> None:
+        self.path = Path(path)
+        self.from_seq = from_seq
+        self.offset = 0
+        self._decoder = BinaryDecoder() if self.path.name == BINARY_FILE else None
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """Return the events appended since the previous call."""
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return []
+        if size < self.offset:
+            # Truncated or replaced: start over.
+            self.offset = 0
+            if self._decoder is not None:
+                self._decoder = BinaryDecoder()
+        if size == self.offset:
+            return []
+
+        with self.path.open("rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        if self._decoder is not None:
+            decoded, used = decode_new(data, self._decoder, at_start=self.offset == 0)
+            self.offset += used
+            return [e for e in decoded if not self._skip(e)]
+
+        end = data.rfind(b"\n")
+        if end == -1:
+            return []
+        self.offset += end + 1
+
+        events: List[Dict[str, Any]] = []
+        for raw in data[: end + 1].splitlines():
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            evt = json.loads(_strip_crc(line))
+            if not self._skip(evt):
+                events.append(evt)
+        return events
+
+    def _skip(self, evt: Dict[str, Any]) -> bool:
+        seq = evt.get("seq")
+        return bool(self.from_seq) and isinstance(seq, int) and seq < self.from_seq
+
+
+class TraceFeed:
+    """Traces created under ``root`` since the feed was opened.
+
+    Each :meth:`poll` lists the trace directories and returns the metadata
+    (as in :meth:`TraceReader.list_traces`) of those not seen before, oldest
+    first.  A trace is reported once its first event has been written, so it
+    already has its name and project.  Partitions dated more than
+    ``lookback_s`` ago are not listed.
+    """
+
+    def __init__(self, root: Path, lookback_s: float = 86400.0) -> None:
+        self.root = Path(root)
+        self.lookback_s = lookback_s
+        self._known = {loc.id for loc in self._locations()}
+
+    def _locations(self) -> Iterator[TraceLocation]:
+        return iter_trace_dirs(self.root, since_ns=time.time_ns() - int(self.lookback_s * 1e9))
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """Return the traces that appeared since the previous call."""
+        new = []
+        for loc in self._locations():
+            if loc.id in self._known:
+                continue
+            try:
+                if loc.data_file.stat().st_size == 0:
+                    continue
+            except OSError:
+                continue
+            self._known.add(loc.id)
+            new.append(_read_meta(loc))
+        new.sort(key=lambda meta: (meta["ts"], meta["id"]))
+        return new
+
+
+class _PollWaiter:
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+
+    def wait(self, timeout: float) -> None:
+        time.sleep(min(self.interval, timeout))
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyWaiter:
+    """Block until the watched file changes (Linux only, via ctypes)."""
+
+    def __init__(self, path: Path, interval: float) -> None:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        # IN_NONBLOCK is O_NONBLOCK, which only exists on POSIX builds.
+        fd = libc.inotify_init1(getattr(os, "O_NONBLOCK", 0) | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_DELETE_SELF | _IN_MOVE_SELF
+        if libc.inotify_add_watch(fd, os.fsencode(str(path)), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, "inotify_add_watch failed")
+        self._fd = fd
+        # Still wake up periodically in case an event was coalesced away.
+        self.interval = max(interval, 1.0)
+
+    def wait(self, timeout: float) -> None:
+        ready, _, _ = select.select([self._fd], [], [], min(self.interval, timeout))
+        if ready:
+            try:
+                while os.read(self._fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def _make_waiter(path: Path, poll_interval: float, use_inotify: bool):
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return _InotifyWaiter(path, poll_interval)
+        except (OSError, AttributeError):
+            pass
+    return _PollWaiter(poll_interval)
+
+
+def follow_file(
+    path: Path,
+    from_seq: int = 0,
+    poll_interval: float = 0.5,
+    use_inotify: bool = True,
+    stop_at_end: bool = True,
+    idle_timeout: Optional[float] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield events from ``path`` as they are appended.
+
+    Stops after a ``trace_end`` event when ``stop_at_end`` is set, or once no
+    new data has arrived for ``idle_timeout`` seconds.  On Linux the file is
+    watched with inotify when available; elsewhere it is polled every
+    ``poll_interval`` seconds.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"trace not found: {path}")
+    tail = TraceTail(path, from_seq=from_seq)
+    waiter = _make_waiter(path, poll_interval, use_inotify)
+    last_data = time.monotonic()
+    try:
+        while True:
+            events = tail.read_new()
+            for evt in events:
+                yield evt
+                if stop_at_end and evt.get("kind") == "trace_end":
+                    return
+            now = time.monotonic()
+            if events:
+                last_data = now
+            remaining = None if idle_timeout is None else idle_timeout - (now - last_data)
+            if remaining is not None and remaining <= 0:
+                return
+            waiter.wait(float("inf") if remaining is None else remaining)
+    finally:
+        waiter.close()
@@ -6,14 +6,15 @@ __all__ = ["Tracer", "Event", "trace", "get_current_tracer"]
 
 import json
 import time
-import uuid
 from contextvars import ContextVar
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-from .config import get_root_dir
+from .config import get_bloom_fp_rate, get_event_format, get_layout, get_root_dir
+from .ids import new_trace_id, trace_id_time_ns
 from .redaction import Redactor, RedactionConfig
+from .storage import partition_path
 from ._backend import NativeTraceWriter
 
 _CURRENT_TRACER: ContextVar[Optional["Tracer"]] = ContextVar("current_tracer", default=None)
@@ -42,10 +43,19 @@ class Tracer:
         project: Optional[str] = None,
         root_dir: Optional[Path] = None,
         redaction: Optional[RedactionConfig] = None,
+        format: Optional[str] = None,
     ):
+        """
+        Args:
+            format: On-disk event encoding, ``"jsonl"`` or ``"binary"`` (see
+                :mod:`agenttrace.binformat`).  Defaults to ``AGENTTRACE_FORMAT``.
+        """
+        if format is not None and format not in ("jsonl", "binary"):
+            raise ValueError(f"unknown event format: {format}")
         self.trace_name = trace_name or "trace"
+        self.format = format or get_event_format()
         self.project = project
-        self.trace_id = uuid.uuid4().hex
+        self.trace_id = new_trace_id()
         self._seq = 0
         self._span_seq = 0
         self._redactor = Redactor(redaction)
@@ -67,7 +77,16 @@ class Tracer:
             self._token = None
 
     def start(self) -> str:
-        self._writer = NativeTraceWriter(self.trace_id, str(self._root))
+        partition = None
+        if get_layout() == "partitioned":
+            partition = partition_path(self.project, trace_id_time_ns(self.trace_id) or time.time_ns())
+        self._writer = NativeTraceWriter(
+            self.trace_id,
+            str(self._root),
+            bloom_fp=get_bloom_fp_rate(),
+            partition=partition,
+            format=self.format,
+        )
         self.emit(
             "trace_start",
             payload={"trace_name": self.trace_name, "project": self.project},
@@ -180,5 +199,10 @@ class Tracer:
         return self.emit("error", {"error": repr(err)}, level="error", span_id=span_id, parent_span_id=parent_span_id)
 
 
-def trace(trace_name: str, project: Optional[str] = None, root_dir: Optional[Path] = None) -> Tracer:
-    return Tracer(trace_name=trace_name, project=project, root_dir=root_dir)
+def trace(
+    trace_name: str,
+    project: Optional[str] = None,
+    root_dir: Optional[Path] = None,
+    format: Optional[str] = None,
+) -> Tracer:
+    return Tracer(trace_name=trace_name, project=project, root_dir=root_dir, format=format)
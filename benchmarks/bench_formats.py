@@ -0,0 +1,77 @@
+"""Compare the JSONL and binary event formats: write and read throughput and
+on-disk size.
+
+    python benchmarks/bench_formats.py [--events 20000] [--payload 400]
+
+Needs the package importable (``pip install -e .``).  Runs against the
+active backend (native when ``agenttrace_native`` is installed) and, with
+``--python``, also against the pure-Python fallback.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from agenttrace import _native
+from agenttrace._backend import NATIVE_AVAILABLE, NativeTraceReader, NativeTraceWriter
+
+
+def _events(n: int, payload_size: int):
+    text = ("lorem ipsum dolor sit amet " * (payload_size // 27 + 1))[:payload_size]
+    kinds = ["llm_request", "llm_response", "tool_call", "tool_result"]
+    for seq in range(1, n + 1):
+        kind = kinds[seq % len(kinds)]
+        payload = {"model": "gpt-4o", "text": text, "tokens": seq % 997, "cost_usd": 0.0001 * (seq % 13)}
+        yield seq, kind, json.dumps({"tool": "search", "duration_ms": seq % 250}), json.dumps(payload)
+
+
+def _run(writer_cls, reader_cls, fmt: str, n: int, payload_size: int) -> dict:
+    root = Path(tempfile.mkdtemp(prefix="agenttrace_bench_"))
+    try:
+        events = list(_events(n, payload_size))
+        start = time.perf_counter()
+        w = writer_cls("bench", str(root), format=fmt)
+        for seq, kind, attrs, payload in events:
+            w.emit("bench", seq, 1_700_000_000_000_000_000 + seq, kind, f"s{seq % 50}", None, "info", attrs, payload)
+        w.finish()
+        write_s = time.perf_counter() - start
+
+        size = sum(p.stat().st_size for p in (root / "bench").iterdir() if p.name.startswith("events."))
+        reader = reader_cls(str(root))
+        start = time.perf_counter()
+        count = len(reader.get_events("bench"))
+        read_s = time.perf_counter() - start
+        start = time.perf_counter()
+        filtered = len(reader.get_events("bench", kinds=["tool_call"]))
+        filter_s = time.perf_counter() - start
+        assert count == n and filtered == n // 4
+        return {"write": n / write_s, "read": n / read_s, "filter": n / filter_s, "size": size}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--payload", type=int, default=400, help="Approximate payload text size in bytes")
+    parser.add_argument("--python", action="store_true", help="Also benchmark the pure-Python backend")
+    args = parser.parse_args()
+
+    backends = [("native" if NATIVE_AVAILABLE else "python", NativeTraceWriter, NativeTraceReader)]
+    if args.python and NATIVE_AVAILABLE:
+        backends.append(("python", _native.NativeTraceWriter, _native.NativeTraceReader))
+
+    print(f"{'backend':<8} {'format':<7} {'write ev/s':>12} {'read ev/s':>12} {'filter ev/s':>12} {'bytes':>12}")
+    for name, writer_cls, reader_cls in backends:
+        for fmt in ("jsonl", "binary"):
+            r = _run(writer_cls, reader_cls, fmt, args.events, args.payload)
+            print(f"{name:<8} {fmt:<7} {r['write']:>12,.0f} {r['read']:>12,.0f} {r['filter']:>12,.0f} {r['size']:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+//! Compressed archives for finished traces (`events.archive`).
+//!
+//! Written by `agenttrace compact` (see `agenttrace/archive.py`, which
+//! documents the layout). The JSONL lines are split into independently
+//! compressed blocks with a per-block `seq`/`ts_unix_ns` index, so filtered
+//! reads only decompress the blocks that can match, and the `trace_start`
+//! line is kept uncompressed after the header for cheap listings.
+//!
+//! This crate decodes `zlib` and, with the default `zstd` feature, `zstd`
+//! blocks. `lzma` archives are read by the Python backend only; opening a
+//! block reader on one fails with [`ArchiveError::UnsupportedCodec`].
+
+use std::fs::File;
+use std::io::{Read, Seek, SeekFrom};
+use std::path::{Path, PathBuf};
+use thiserror::Error;
+
+pub const ARCHIVE_FILE: &str = "events.archive";
+
+const MAGIC: &[u8; 4] = b"ATAR";
+const VERSION: u8 = 1;
+const HEADER_LEN: usize = 32;
+const BLOCK_LEN: usize = 52;
+
+pub const CODEC_ZLIB: u8 = 1;
+pub const CODEC_LZMA: u8 = 2;
+pub const CODEC_ZSTD: u8 = 3;
+
+#[derive(Error, Debug)]
+pub enum ArchiveError {
+    #[error("not a trace archive")]
+    NotAnArchive,
+    #[error("unsupported archive version {0}")]
+    UnsupportedVersion(u8),
+    #[error("archive codec {0} is not supported by this build")]
+    UnsupportedCodec(u8),
+    #[error("archive block {0} is corrupt")]
+    Corrupt(usize),
+    #[error(transparent)]
+    Io(#[from] std::io::Error),
+}
+
+/// Index entry of one compressed block.
+#[derive(Debug, Clone, PartialEq)]
+pub struct BlockInfo {
+    pub offset: u64,
+    pub compressed_len: u32,
+    pub raw_len: u32,
+    pub seq_min: u64,
+    pub seq_max: u64,
+    pub ts_min: u64,
+    pub ts_max: u64,
+    /// zlib CRC-32 of the uncompressed block.
+    pub crc32: u32,
+}
+
+fn u32_at(buf: &[u8], at: usize) -> u32 {
+    u32::from_le_bytes(buf[at..at + 4].try_into().unwrap())
+}
+
+fn u64_at(buf: &[u8], at: usize) -> u64 {
+    u64::from_le_bytes(buf[at..at + 8].try_into().unwrap())
+}
+
+/// Header and block index of an archive; blocks are read on demand.
+#[derive(Debug, Clone)]
+pub struct Archive {
+    pub path: PathBuf,
+    pub codec: u8,
+    /// The first line (`trace_start`), uncompressed.
+    pub head: Vec<u8>,
+    pub event_count: u64,
+    pub blocks: Vec<BlockInfo>,
+}
+
+impl Archive {
+    pub fn open(path: impl AsRef<Path>) -> Result<Self, ArchiveError> {
+        let path = path.as_ref().to_path_buf();
+        let mut file = File::open(&path)?;
+        let mut header = [0u8; HEADER_LEN];
+        file.read_exact(&mut header).map_err(|_| ArchiveError::NotAnArchive)?;
+        if &header[..4] != MAGIC {
+            return Err(ArchiveError::NotAnArchive);
+        }
+        if header[4] != VERSION {
+            return Err(ArchiveError::UnsupportedVersion(header[4]));
+        }
+        let codec = header[5];
+        let block_count = u32_at(&header, 8) as usize;
+        let head_len = u32_at(&header, 12) as usize;
+        let event_count = u64_at(&header, 16);
+        let index_offset = u64_at(&header, 24);
+
+        let mut head = vec![0u8; head_len];
+        file.read_exact(&mut head)?;
+        let mut index = vec![0u8; block_count * BLOCK_LEN];
+        file.seek(SeekFrom::Start(index_offset))?;
+        file.read_exact(&mut index)?;
+        let blocks = index
+            .chunks_exact(BLOCK_LEN)
+            .map(|b| BlockInfo {
+                offset: u64_at(b, 0),
+                compressed_len: u32_at(b, 8),
+                raw_len: u32_at(b, 12),
+                seq_min: u64_at(b, 16),
+                seq_max: u64_at(b, 24),
+                ts_min: u64_at(b, 32),
+                ts_max: u64_at(b, 40),
+                crc32: u32_at(b, 48),
+            })
+            .collect();
+        Ok(Self { path, codec, head, event_count, blocks })
+    }
+
+    /// Whether this build can decompress the archive's blocks.
+    pub fn codec_supported(&self) -> bool {
+        match self.codec {
+            CODEC_ZLIB => true,
+            CODEC_ZSTD => cfg!(feature = "zstd"),
+            _ => false,
+        }
+    }
+
+    /// Indices of the blocks whose ranges overlap the given bounds.
+    pub fn select(
+        &self,
+        seq_min: Option<u64>,
+        seq_max: Option<u64>,
+        ts_min: Option<u64>,
+        ts_max: Option<u64>,
+    ) -> Vec<usize> {
+        self.blocks
+            .iter()
+            .enumerate()
+            .filter(|(_, b)| {
+                seq_min.map_or(true, |v| b.seq_max >= v)
+                    && seq_max.map_or(true, |v| b.seq_min <= v)
+                    && ts_min.map_or(true, |v| b.ts_max >= v)
+                    && ts_max.map_or(true, |v| b.ts_min <= v)
+            })
+            .map(|(i, _)| i)
+            .collect()
+    }
+
+    fn decode(&self, file: &mut File, i: usize) -> Result<Vec<u8>, ArchiveError> {
+        let block = &self.blocks[i];
+        let mut comp = vec![0u8; block.compressed_len as usize];
+        file.seek(SeekFrom::Start(block.offset))?;
+        file.read_exact(&mut comp)?;
+        let mut raw = Vec::with_capacity(block.raw_len as usize);
+        match self.codec {
+            CODEC_ZLIB => {
+                flate2::read::ZlibDecoder::new(comp.as_slice())
+                    .read_to_end(&mut raw)
+                    .map_err(|_| ArchiveError::Corrupt(i))?;
+            }
+            #[cfg(feature = "zstd")]
+            CODEC_ZSTD => {
+                raw = zstd::stream::decode_all(comp.as_slice()).map_err(|_| ArchiveError::Corrupt(i))?;
+            }
+            other => return Err(ArchiveError::UnsupportedCodec(other)),
+        }
+        if crc32fast::hash(&raw) != block.crc32 {
+            return Err(ArchiveError::Corrupt(i));
+        }
+        Ok(raw)
+    }
+
+    pub fn read_block(&self, i: usize) -> Result<Vec<u8>, ArchiveError> {
+        self.decode(&mut File::open(&self.path)?, i)
+    }
+
+    /// The whole uncompressed JSONL content.
+    pub fn read_all(&self) -> Result<Vec<u8>, ArchiveError> {
+        let mut reader = self.reader((0..self.blocks.len()).collect())?;
+        let mut out = Vec::new();
+        reader.read_to_end(&mut out)?;
+        Ok(out)
+    }
+
+    /// A [`Read`] over the uncompressed content of `blocks`, decoding one
+    /// block at a time.
+    pub fn reader(&self, blocks: Vec<usize>) -> Result<BlockReader, ArchiveError> {
+        if !self.codec_supported() {
+            return Err(ArchiveError::UnsupportedCodec(self.codec));
+        }
+        Ok(BlockReader {
+            file: File::open(&self.path)?,
+            archive: self.clone(),
+            pending: blocks.into_iter(),
+            current: Vec::new(),
+            pos: 0,
+        })
+    }
+}
+
+pub struct BlockReader {
+    file: File,
+    archive: Archive,
+    pending: std::vec::IntoIter<usize>,
+    current: Vec<u8>,
+    pos: usize,
+}
+
+impl Read for BlockReader {
+    fn read(&mut self, buf: &mut [u8]) -> std::io::Result<usize> {
+        while self.pos == self.current.len() {
+            let Some(i) = self.pending.next() else { return Ok(0) };
+            self.current = self
+                .archive
+                .decode(&mut self.file, i)
+                .map_err(|e| std::io::Error::new(std::io::ErrorKind::InvalidData, e))?;
+            self.pos = 0;
+        }
+        let n = buf.len().min(self.current.len() - self.pos);
+        buf[..n].copy_from_slice(&self.current[self.pos..self.pos + n]);
+        self.pos += n;
+        Ok(n)
+    }
+}
+
+#[cfg(test)]
+pub(crate) mod tests {
+    use super::*;
+    use std::io::Write;
+
+    /// Write an archive the way `agenttrace/archive.py` does, one block per
+    /// `lines_per_block` lines.
+    pub(crate) fn write_archive(dir: &Path, lines: &[String], lines_per_block: usize) -> std::io::Result<()> {
+        let mut body = Vec::new();
+        let mut index = Vec::new();
+        let head = lines.first().map(|l| l.as_bytes().to_vec()).unwrap_or_default();
+        let body_start = (HEADER_LEN + head.len()) as u64;
+        for chunk in lines.chunks(lines_per_block) {
+            let raw: Vec<u8> = chunk.iter().flat_map(|l| format!("{l}\n").into_bytes()).collect();
+            let mut enc = flate2::write::ZlibEncoder::new(Vec::new(), flate2::Compression::default());
+            enc.write_all(&raw)?;
+            let comp = enc.finish()?;
+            let seqs: Vec<u64> = chunk
+                .iter()
+                .map(|l| crate::filter::scan_header(l.split('\t').next().unwrap()).unwrap().seq.unwrap())
+                .collect();
+            let (lo, hi) = (*seqs.iter().min().unwrap(), *seqs.iter().max().unwrap());
+            index.extend((body_start + body.len() as u64).to_le_bytes());
+            index.extend((comp.len() as u32).to_le_bytes());
+            index.extend((raw.len() as u32).to_le_bytes());
+            for v in [lo, hi, 0, u64::MAX] {
+                index.extend(v.to_le_bytes());
+            }
+            index.extend(crc32fast::hash(&raw).to_le_bytes());
+            body.extend(comp);
+        }
+        let mut out = Vec::new();
+        out.extend(MAGIC);
+        out.extend([VERSION, CODEC_ZLIB, 0, 0]);
+        out.extend((index.len() as u32 / BLOCK_LEN as u32).to_le_bytes());
+        out.extend((head.len() as u32).to_le_bytes());
+        out.extend((lines.len() as u64).to_le_bytes());
+        out.extend((body_start + body.len() as u64).to_le_bytes());
+        out.extend(head);
+        out.extend(body);
+        out.extend(index);
+        std::fs::write(dir.join(ARCHIVE_FILE), out)
+    }
+
+    #[test]
+    fn test_archive_blocks_and_select() -> anyhow::Result<()> {
+        let tmp = tempfile::tempdir()?;
+        let lines: Vec<String> = (1..=10).map(|seq| format!(r#"{{"seq":{seq},"kind":"k"}}"#)).collect();
+        write_archive(tmp.path(), &lines, 3)?;
+
+        let archive = Archive::open(tmp.path().join(ARCHIVE_FILE))?;
+        assert_eq!(archive.blocks.len(), 4);
+        assert_eq!(archive.event_count, 10);
+        assert_eq!(archive.head, lines[0].as_bytes());
+        assert_eq!(archive.select(Some(5), Some(6), None, None), vec![1]);
+        let all = String::from_utf8(archive.read_all()?)?;
+        assert_eq!(all.lines().collect::<Vec<_>>(), lines);
+
+        let mut unsupported = archive.clone();
+        unsupported.codec = CODEC_LZMA;
+        assert!(matches!(unsupported.reader(vec![0]), Err(ArchiveError::UnsupportedCodec(CODEC_LZMA))));
+        Ok(())
+    }
+}
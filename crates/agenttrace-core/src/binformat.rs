@@ -0,0 +1,455 @@
+//! Binary event encoding, an alternative to JSONL + CRC (`events.bin`).
+//!
+//! Each event is a length-prefixed, CRC-framed record holding a compact,
+//! MessagePack-style encoding of the event. Map keys and repeated header
+//! strings go into a per-file string table: the record that first uses a
+//! string defines it, later records refer to it by index. The layout and
+//! value tags are documented in `agenttrace/binformat.py`.
+//!
+//! Integers outside the `u64` range (tag 10, only written by Python) decode
+//! to the nearest `f64`, since `serde_json` numbers cannot hold them.
+
+use std::collections::HashMap;
+use std::fs::File;
+use std::io::{BufReader, ErrorKind, Read};
+use std::path::Path;
+use serde_json::{Map, Number, Value};
+use thiserror::Error;
+use crate::event::Event;
+
+pub const BINARY_FILE: &str = "events.bin";
+pub const HEADER: [u8; 8] = *b"ATEV\x01\0\0\0";
+
+const NULL: u8 = 0;
+const FALSE: u8 = 1;
+const TRUE: u8 = 2;
+const INT: u8 = 3;
+const UINT: u8 = 4;
+const FLOAT: u8 = 5;
+const STR: u8 = 6;
+const REF: u8 = 7;
+const ARRAY: u8 = 8;
+const MAP: u8 = 9;
+const BIGINT: u8 = 10;
+
+#[derive(Error, Debug)]
+pub enum BinaryError {
+    #[error("not a binary event file")]
+    BadHeader,
+    #[error("CRC mismatch in binary record {record}: expected {expected:08x}, got {actual:08x}")]
+    CrcMismatch { record: usize, expected: u32, actual: u32 },
+    #[error("malformed binary record {0}")]
+    Malformed(usize),
+    #[error(transparent)]
+    Io(#[from] std::io::Error),
+}
+
+fn put_varint(out: &mut Vec<u8>, mut n: u64) {
+    while n >= 0x80 {
+        out.push((n as u8 & 0x7F) | 0x80);
+        n >>= 7;
+    }
+    out.push(n as u8);
+}
+
+fn put_str(out: &mut Vec<u8>, s: &str) {
+    put_varint(out, s.len() as u64);
+    out.extend_from_slice(s.as_bytes());
+}
+
+/// Encodes events into framed records, tracking the file's string table.
+#[derive(Debug, Default)]
+pub struct Encoder {
+    ids: HashMap<String, u64>,
+    new: Vec<String>,
+}
+
+impl Encoder {
+    /// Continue the string table of an existing file.
+    pub fn with_strings(strings: Vec<String>) -> Self {
+        let ids = strings.into_iter().enumerate().map(|(i, s)| (s, i as u64)).collect();
+        Self { ids, new: Vec::new() }
+    }
+
+    fn intern(&mut self, out: &mut Vec<u8>, s: &str) {
+        let next = self.ids.len() as u64;
+        let id = *self.ids.entry(s.to_string()).or_insert_with(|| {
+            self.new.push(s.to_string());
+            next
+        });
+        out.push(REF);
+        put_varint(out, id);
+    }
+
+    fn value(&mut self, out: &mut Vec<u8>, v: &Value) {
+        match v {
+            Value::Null => out.push(NULL),
+            Value::Bool(false) => out.push(FALSE),
+            Value::Bool(true) => out.push(TRUE),
+            Value::Number(n) => {
+                if let Some(i) = n.as_i64() {
+                    out.push(INT);
+                    put_varint(out, ((i << 1) ^ (i >> 63)) as u64);
+                } else if let Some(u) = n.as_u64() {
+                    out.push(UINT);
+                    put_varint(out, u);
+                } else {
+                    out.push(FLOAT);
+                    out.extend_from_slice(&n.as_f64().unwrap_or(0.0).to_le_bytes());
+                }
+            }
+            Value::String(s) => {
+                out.push(STR);
+                put_str(out, s);
+            }
+            Value::Array(items) => {
+                out.push(ARRAY);
+                put_varint(out, items.len() as u64);
+                for item in items {
+                    self.value(out, item);
+                }
+            }
+            Value::Object(map) => {
+                out.push(MAP);
+                put_varint(out, map.len() as u64);
+                for (k, item) in map {
+                    self.intern(out, k);
+                    self.value(out, item);
+                }
+            }
+        }
+    }
+
+    fn field_str(&mut self, out: &mut Vec<u8>, key: &str, value: &str) {
+        self.intern(out, key);
+        self.intern(out, value);
+    }
+
+    fn field_uint(&mut self, out: &mut Vec<u8>, key: &str, value: u64) {
+        self.intern(out, key);
+        self.value(out, &Value::Number(value.into()));
+    }
+
+    /// One framed record holding `event`, with fields in the same order as
+    /// the JSONL writer.
+    pub fn encode_event(&mut self, event: &Event) -> Vec<u8> {
+        let mut value = Vec::with_capacity(256);
+        let fields = 8 + usize::from(event.span_id.is_some()) + usize::from(event.parent_span_id.is_some());
+        value.push(MAP);
+        put_varint(&mut value, fields as u64);
+        self.field_uint(&mut value, "schema_version", event.schema_version as u64);
+        self.field_str(&mut value, "trace_id", &event.trace_id);
+        self.field_uint(&mut value, "seq", event.seq);
+        self.field_uint(&mut value, "ts_unix_ns", event.ts_unix_ns);
+        self.field_str(&mut value, "kind", &event.kind);
+        if let Some(span_id) = &event.span_id {
+            self.field_str(&mut value, "span_id", span_id);
+        }
+        if let Some(parent) = &event.parent_span_id {
+            self.field_str(&mut value, "parent_span_id", parent);
+        }
+        self.field_str(&mut value, "level", &event.level);
+        self.intern(&mut value, "attrs");
+        value.push(MAP);
+        put_varint(&mut value, event.attrs.len() as u64);
+        for (k, v) in &event.attrs {
+            self.intern(&mut value, k);
+            self.value(&mut value, v);
+        }
+        self.intern(&mut value, "payload");
+        self.value(&mut value, &event.payload);
+        self.frame(value)
+    }
+
+    fn frame(&mut self, value: Vec<u8>) -> Vec<u8> {
+        let mut body = Vec::with_capacity(value.len() + 16);
+        put_varint(&mut body, self.new.len() as u64);
+        for s in self.new.drain(..) {
+            put_str(&mut body, &s);
+        }
+        body.extend_from_slice(&value);
+        let mut record = Vec::with_capacity(body.len() + 8);
+        record.extend_from_slice(&(body.len() as u32).to_le_bytes());
+        record.extend_from_slice(&crc32fast::hash(&body).to_le_bytes());
+        record.extend_from_slice(&body);
+        record
+    }
+}
+
+/// Bounds-checked cursor over one record body.
+struct Cursor<'a> {
+    buf: &'a [u8],
+    pos: usize,
+}
+
+impl<'a> Cursor<'a> {
+    fn byte(&mut self) -> Option<u8> {
+        let b = *self.buf.get(self.pos)?;
+        self.pos += 1;
+        Some(b)
+    }
+
+    fn varint(&mut self) -> Option<u64> {
+        let mut result = 0u64;
+        for shift in (0..64).step_by(7) {
+            let b = self.byte()?;
+            result |= u64::from(b & 0x7F) << shift;
+            if b < 0x80 {
+                return Some(result);
+            }
+        }
+        None
+    }
+
+    fn bytes(&mut self, n: usize) -> Option<&'a [u8]> {
+        let out = self.buf.get(self.pos..self.pos.checked_add(n)?)?;
+        self.pos += n;
+        Some(out)
+    }
+
+    fn str(&mut self) -> Option<&'a str> {
+        let n = self.varint()? as usize;
+        std::str::from_utf8(self.bytes(n)?).ok()
+    }
+}
+
+/// Decodes record bodies, accumulating the file's string table.
+#[derive(Debug, Default)]
+pub struct Decoder {
+    pub strings: Vec<String>,
+}
+
+impl Decoder {
+    fn defs(&mut self, cur: &mut Cursor<'_>) -> Option<()> {
+        for _ in 0..cur.varint()? {
+            self.strings.push(cur.str()?.to_string());
+        }
+        Some(())
+    }
+
+    fn value(&self, cur: &mut Cursor<'_>) -> Option<Value> {
+        Some(match cur.byte()? {
+            NULL => Value::Null,
+            FALSE => Value::Bool(false),
+            TRUE => Value::Bool(true),
+            INT => {
+                let n = cur.varint()?;
+                Value::Number(((n >> 1) as i64 ^ -((n & 1) as i64)).into())
+            }
+            UINT => Value::Number(cur.varint()?.into()),
+            FLOAT => {
+                let f = f64::from_le_bytes(cur.bytes(8)?.try_into().ok()?);
+                Number::from_f64(f).map_or(Value::Null, Value::Number)
+            }
+            STR => Value::String(cur.str()?.to_string()),
+            REF => Value::String(self.strings.get(cur.varint()? as usize)?.clone()),
+            ARRAY => {
+                let n = cur.varint()? as usize;
+                let mut items = Vec::with_capacity(n.min(1024));
+                for _ in 0..n {
+                    items.push(self.value(cur)?);
+                }
+                Value::Array(items)
+            }
+            MAP => {
+                let n = cur.varint()? as usize;
+                let mut map = Map::new();
+                for _ in 0..n {
+                    let Value::String(key) = self.value(cur)? else { return None };
+                    map.insert(key, self.value(cur)?);
+                }
+                Value::Object(map)
+            }
+            BIGINT => {
+                let text = cur.str()?;
+                Number::from_f64(text.parse().ok()?).map_or(Value::Null, Value::Number)
+            }
+            _ => return None,
+        })
+    }
+
+    /// Decode the event of a record body (record number `index` for errors).
+    pub fn decode(&mut self, body: &[u8], index: usize) -> Result<Value, BinaryError> {
+        let mut cur = Cursor { buf: body, pos: 0 };
+        self.defs(&mut cur).ok_or(BinaryError::Malformed(index))?;
+        self.value(&mut cur).ok_or(BinaryError::Malformed(index))
+    }
+
+    /// Take the string definitions of a record without decoding its event.
+    pub fn skip(&mut self, body: &[u8], index: usize) -> Result<(), BinaryError> {
+        self.defs(&mut Cursor { buf: body, pos: 0 }).ok_or(BinaryError::Malformed(index))
+    }
+}
+
+/// Reads framed record bodies. A truncated final record (a write in
+/// progress) ends the stream.
+pub struct Records<R: Read> {
+    reader: R,
+    index: usize,
+    started: bool,
+}
+
+/// Read exactly `buf.len()` bytes; `false` on a clean or partial EOF.
+fn read_full<R: Read>(reader: &mut R, buf: &mut [u8]) -> std::io::Result<bool> {
+    let mut filled = 0;
+    while filled < buf.len() {
+        match reader.read(&mut buf[filled..]) {
+            Ok(0) => return Ok(false),
+            Ok(n) => filled += n,
+            Err(e) if e.kind() == ErrorKind::Interrupted => {}
+            Err(e) => return Err(e),
+        }
+    }
+    Ok(true)
+}
+
+impl<R: Read> Records<R> {
+    pub fn new(reader: R) -> Self {
+        Self { reader, index: 0, started: false }
+    }
+
+    /// Record number (1-based) of the body returned last.
+    pub fn index(&self) -> usize {
+        self.index
+    }
+
+    pub fn next_body(&mut self) -> Option<Result<Vec<u8>, BinaryError>> {
+        if !self.started {
+            self.started = true;
+            let mut header = [0u8; 8];
+            match read_full(&mut self.reader, &mut header) {
+                Ok(true) if header[..4] == HEADER[..4] => {}
+                Ok(false) => return None,
+                Ok(true) => return Some(Err(BinaryError::BadHeader)),
+                Err(e) => return Some(Err(e.into())),
+            }
+        }
+        let mut frame = [0u8; 8];
+        match read_full(&mut self.reader, &mut frame) {
+            Ok(true) => {}
+            Ok(false) => return None,
+            Err(e) => return Some(Err(e.into())),
+        }
+        let len = u32::from_le_bytes(frame[..4].try_into().unwrap()) as usize;
+        let expected = u32::from_le_bytes(frame[4..].try_into().unwrap());
+        let mut body = vec![0u8; len];
+        match read_full(&mut self.reader, &mut body) {
+            Ok(true) => {}
+            Ok(false) => return None,
+            Err(e) => return Some(Err(e.into())),
+        }
+        self.index += 1;
+        let actual = crc32fast::hash(&body);
+        if actual != expected {
+            return Some(Err(BinaryError::CrcMismatch { record: self.index, expected, actual }));
+        }
+        Some(Ok(body))
+    }
+}
+
+/// Streaming iterator over the decoded events of an `events.bin` file.
+pub struct BinaryEvents {
+    records: Records<BufReader<File>>,
+    decoder: Decoder,
+}
+
+impl BinaryEvents {
+    pub fn open(path: &Path) -> Result<Self, BinaryError> {
+        Ok(Self {
+            records: Records::new(BufReader::new(File::open(path)?)),
+            decoder: Decoder::default(),
+        })
+    }
+}
+
+impl Iterator for BinaryEvents {
+    type Item = Result<Value, BinaryError>;
+
+    fn next(&mut self) -> Option<Self::Item> {
+        let body = match self.records.next_body()? {
+            Ok(body) => body,
+            Err(e) => return Some(Err(e)),
+        };
+        Some(self.decoder.decode(&body, self.records.index()))
+    }
+}
+
+/// String table of an existing file, so a writer can append to it.
+pub fn load_strings(path: &Path) -> Result<Vec<String>, BinaryError> {
+    let mut records = Records::new(BufReader::new(File::open(path)?));
+    let mut decoder = Decoder::default();
+    while let Some(body) = records.next_body() {
+        decoder.skip(&body?, records.index())?;
+    }
+    Ok(decoder.strings)
+}
+
+/// The first event and the number of events in the file.
+pub fn first_event_and_count(path: &Path) -> Result<(Option<Value>, u64), BinaryError> {
+    let mut records = Records::new(BufReader::new(File::open(path)?));
+    let mut decoder = Decoder::default();
+    let mut first = None;
+    let mut count = 0u64;
+    while let Some(body) = records.next_body() {
+        let body = body?;
+        count += 1;
+        if first.is_none() {
+            first = Some(decoder.decode(&body, records.index())?);
+        }
+    }
+    Ok((first, count))
+}
+
+/// The file's events rendered as compact JSONL, for text search.
+pub fn to_jsonl(path: &Path) -> Result<Vec<u8>, BinaryError> {
+    let mut out = Vec::new();
+    for event in BinaryEvents::open(path)? {
+        serde_json::to_writer(&mut out, &event?).map_err(std::io::Error::from)?;
+        out.push(b'\n');
+    }
+    Ok(out)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use serde_json::json;
+
+    #[test]
+    fn test_encode_decode_roundtrip() -> anyhow::Result<()> {
+        let tmp = tempfile::tempdir()?;
+        let path = tmp.path().join(BINARY_FILE);
+        let mut enc = Encoder::default();
+        let mut data = HEADER.to_vec();
+        let mut events = Vec::new();
+        for seq in 1..=3u64 {
+            let mut event = Event::new("t".into(), seq, "tool_call".into(), json!({
+                "n": -5, "big": u64::MAX, "f": 0.5, "s": "ünï", "list": [null, true, {"k": []}]
+            }));
+            event.span_id = Some(format!("s{seq}"));
+            let record = enc.encode_event(&event);
+            if seq > 1 {
+                // Keys and kind are table references after the first record.
+                assert!(record.len() < data.len() - HEADER.len());
+            }
+            data.extend(record);
+            events.push(serde_json::to_value(&event)?);
+        }
+        std::fs::write(&path, &data)?;
+
+        let decoded: Vec<Value> = BinaryEvents::open(&path)?.collect::<Result<_, _>>()?;
+        assert_eq!(decoded, events);
+        assert_eq!(first_event_and_count(&path)?.1, 3);
+        assert_eq!(Encoder::with_strings(load_strings(&path)?).ids.len(), enc.ids.len());
+
+        // A torn final record is ignored; a flipped byte fails the CRC.
+        std::fs::write(&path, &data[..data.len() - 2])?;
+        assert_eq!(BinaryEvents::open(&path)?.count(), 2);
+        let mut corrupt = data.clone();
+        corrupt[20] ^= 0xFF;
+        std::fs::write(&path, &corrupt)?;
+        let first = BinaryEvents::open(&path)?.next().unwrap();
+        assert!(matches!(first, Err(BinaryError::CrcMismatch { record: 1, .. })));
+        Ok(())
+    }
+}
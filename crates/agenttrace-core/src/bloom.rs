@@ -0,0 +1,185 @@
+//! Per-trace Bloom filters over byte trigrams.
+//!
+//! Search is a substring match, so the filter indexes every 3-byte window of
+//! each event's JSON text rather than whole words: any query of 3 or more
+//! bytes can only occur in a trace if all of its trigrams are present.
+//!
+//! File layout (`events.bloom`, little-endian), shared with the Python
+//! implementation in `agenttrace/bloom.py`:
+//!
+//! ```text
+//! "ATBF" | version u8 | k u8 | reserved u16 | m_bits u64 | n_items u64 | bits
+//! ```
+
+use std::collections::HashSet;
+use std::io::Write;
+use std::path::Path;
+use anyhow::{bail, Result};
+
+pub const BLOOM_FILE: &str = "events.bloom";
+const MAGIC: &[u8; 4] = b"ATBF";
+const VERSION: u8 = 1;
+const HEADER_LEN: usize = 24;
+
+fn splitmix64(mut x: u64) -> u64 {
+    x = x.wrapping_add(0x9E37_79B9_7F4A_7C15);
+    x = (x ^ (x >> 30)).wrapping_mul(0xBF58_476D_1CE4_E5B9);
+    x = (x ^ (x >> 27)).wrapping_mul(0x94D0_49BB_1331_11EB);
+    x ^ (x >> 31)
+}
+
+/// Iterate the trigrams of `data` packed as `b0 << 16 | b1 << 8 | b2`.
+pub fn trigrams(data: &[u8]) -> impl Iterator<Item = u32> + '_ {
+    data.windows(3)
+        .map(|w| (u32::from(w[0]) << 16) | (u32::from(w[1]) << 8) | u32::from(w[2]))
+}
+
+/// Collects distinct trigrams while a trace is written.
+#[derive(Debug, Default)]
+pub struct BloomBuilder {
+    grams: HashSet<u32>,
+}
+
+impl BloomBuilder {
+    pub fn add(&mut self, data: &[u8]) {
+        self.grams.extend(trigrams(data));
+    }
+
+    pub fn build(&self, fp_rate: f64) -> Bloom {
+        let mut bloom = Bloom::with_capacity(self.grams.len(), fp_rate);
+        for &gram in &self.grams {
+            bloom.insert(gram);
+        }
+        bloom
+    }
+}
+
+#[derive(Debug, Clone, PartialEq)]
+pub struct Bloom {
+    k: u32,
+    m: u64,
+    n: u64,
+    bits: Vec<u8>,
+}
+
+impl Bloom {
+    /// Size a filter for `n` items at the given false-positive rate.
+    pub fn with_capacity(n: usize, fp_rate: f64) -> Self {
+        let p = fp_rate.clamp(1e-9, 0.5);
+        let n_f = n.max(1) as f64;
+        let ln2 = std::f64::consts::LN_2;
+        let m = ((-n_f * p.ln()) / (ln2 * ln2)).ceil().max(64.0) as u64;
+        let k = ((m as f64 / n_f) * ln2).round().clamp(1.0, 16.0) as u32;
+        Self {
+            k,
+            m,
+            n: n as u64,
+            bits: vec![0u8; m.div_ceil(8) as usize],
+        }
+    }
+
+    fn positions(&self, gram: u32) -> impl Iterator<Item = u64> + '_ {
+        let h = splitmix64(u64::from(gram));
+        let h1 = h & 0xFFFF_FFFF;
+        let h2 = (h >> 32) | 1;
+        (0..u64::from(self.k)).map(move |i| h1.wrapping_add(i.wrapping_mul(h2)) % self.m)
+    }
+
+    pub fn insert(&mut self, gram: u32) {
+        let positions: Vec<u64> = self.positions(gram).collect();
+        for bit in positions {
+            self.bits[(bit / 8) as usize] |= 1 << (bit % 8);
+        }
+    }
+
+    pub fn contains_gram(&self, gram: u32) -> bool {
+        self.positions(gram)
+            .all(|bit| self.bits[(bit / 8) as usize] & (1 << (bit % 8)) != 0)
+    }
+
+    /// `false` means `needle` definitely does not occur in the indexed text.
+    /// Needles shorter than a trigram can never be ruled out.
+    pub fn may_contain(&self, needle: &[u8]) -> bool {
+        needle.len() < 3 || trigrams(needle).all(|g| self.contains_gram(g))
+    }
+
+    pub fn to_bytes(&self) -> Vec<u8> {
+        let mut out = Vec::with_capacity(HEADER_LEN + self.bits.len());
+        out.extend_from_slice(MAGIC);
+        out.push(VERSION);
+        out.push(self.k as u8);
+        out.extend_from_slice(&[0u8; 2]);
+        out.extend_from_slice(&self.m.to_le_bytes());
+        out.extend_from_slice(&self.n.to_le_bytes());
+        out.extend_from_slice(&self.bits);
+        out
+    }
+
+    pub fn from_bytes(data: &[u8]) -> Result<Self> {
+        if data.len() < HEADER_LEN || &data[..4] != MAGIC {
+            bail!("not a bloom filter file");
+        }
+        if data[4] != VERSION {
+            bail!("unsupported bloom filter version {}", data[4]);
+        }
+        let k = u32::from(data[5]);
+        let m = u64::from_le_bytes(data[8..16].try_into()?);
+        let n = u64::from_le_bytes(data[16..24].try_into()?);
+        let bits = data[HEADER_LEN..].to_vec();
+        if k == 0 || m == 0 || bits.len() as u64 != m.div_ceil(8) {
+            bail!("corrupt bloom filter");
+        }
+        Ok(Self { k, m, n, bits })
+    }
+
+    /// Write atomically (temp file + rename) so readers never see a
+    /// half-written filter.
+    pub fn write_to(&self, path: &Path) -> Result<()> {
+        let tmp = path.with_extension("bloom.tmp");
+        {
+            let mut file = std::fs::File::create(&tmp)?;
+            file.write_all(&self.to_bytes())?;
+        }
+        std::fs::rename(&tmp, path)?;
+        Ok(())
+    }
+
+    pub fn read_from(path: &Path) -> Result<Self> {
+        Self::from_bytes(&std::fs::read(path)?)
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_bloom_roundtrip_and_lookup() -> Result<()> {
+        let mut builder = BloomBuilder::default();
+        builder.add(br#"{"payload":{"text":"hello world"}}"#);
+        let bloom = builder.build(0.01);
+
+        assert!(bloom.may_contain(b"hello"));
+        assert!(bloom.may_contain(b"lo wor"));
+        assert!(bloom.may_contain(b"xy"));
+        assert!(!bloom.may_contain(b"zebra-unicorn"));
+
+        let decoded = Bloom::from_bytes(&bloom.to_bytes())?;
+        assert_eq!(decoded, bloom);
+        Ok(())
+    }
+
+    #[test]
+    fn test_bloom_known_bits() {
+        // Cross-checked against agenttrace/bloom.py.
+        let mut bloom = Bloom::with_capacity(10, 0.01);
+        bloom.insert(0x616263);
+        assert_eq!((bloom.k, bloom.m), (7, 96));
+        let set: Vec<u64> = (0..bloom.m)
+            .filter(|&b| bloom.bits[(b / 8) as usize] & (1 << (b % 8)) != 0)
+            .collect();
+        assert_eq!(set, EXPECTED_ABC_BITS.to_vec());
+    }
+
+    const EXPECTED_ABC_BITS: [u64; 7] = [9, 24, 36, 51, 66, 78, 93];
+}
@@ -0,0 +1,296 @@
+use std::borrow::Cow;
+use std::collections::HashMap;
+use serde::Deserialize;
+use serde_json::value::RawValue;
+use serde_json::{Map, Value};
+
+/// Predicates evaluated against event header fields before a line is parsed.
+///
+/// All bounds are inclusive. An empty filter matches every event.
+#[derive(Debug, Clone, Default)]
+pub struct EventFilter {
+    pub kinds: Option<Vec<String>>,
+    pub span_id: Option<String>,
+    pub level: Option<String>,
+    pub ts_min: Option<u64>,
+    pub ts_max: Option<u64>,
+    pub seq_min: Option<u64>,
+    pub seq_max: Option<u64>,
+}
+
+/// The subset of header fields the filter looks at. Borrowed where possible
+/// so that skipping a line allocates nothing.
+#[derive(Debug, Default, Deserialize)]
+pub struct EventHeader<'a> {
+    #[serde(borrow, default)]
+    pub kind: Option<Cow<'a, str>>,
+    #[serde(default)]
+    pub seq: Option<u64>,
+    #[serde(default)]
+    pub ts_unix_ns: Option<u64>,
+    #[serde(borrow, default)]
+    pub span_id: Option<Cow<'a, str>>,
+    #[serde(borrow, default)]
+    pub level: Option<Cow<'a, str>>,
+}
+
+const ATTRS_KEY: &str = ",\"attrs\":";
+
+impl EventFilter {
+    pub fn is_empty(&self) -> bool {
+        self.kinds.is_none()
+            && self.span_id.is_none()
+            && self.level.is_none()
+            && self.ts_min.is_none()
+            && self.ts_max.is_none()
+            && self.seq_min.is_none()
+            && self.seq_max.is_none()
+    }
+
+    pub fn matches(&self, header: &EventHeader<'_>) -> bool {
+        if let Some(kinds) = &self.kinds {
+            match header.kind.as_deref() {
+                Some(kind) if kinds.iter().any(|k| k == kind) => {}
+                _ => return false,
+            }
+        }
+        if let Some(span_id) = &self.span_id {
+            if header.span_id.as_deref() != Some(span_id.as_str()) {
+                return false;
+            }
+        }
+        if let Some(level) = &self.level {
+            if header.level.as_deref() != Some(level.as_str()) {
+                return false;
+            }
+        }
+        if self.ts_min.is_some() || self.ts_max.is_some() {
+            let Some(ts) = header.ts_unix_ns else { return false };
+            if self.ts_min.map_or(false, |min| ts < min) || self.ts_max.map_or(false, |max| ts > max) {
+                return false;
+            }
+        }
+        if self.seq_min.is_some() || self.seq_max.is_some() {
+            let Some(seq) = header.seq else { return false };
+            if self.seq_min.map_or(false, |min| seq < min) || self.seq_max.map_or(false, |max| seq > max) {
+                return false;
+            }
+        }
+        true
+    }
+
+    /// `seq` is monotonic within a trace, so once it passes `seq_max` no later
+    /// line can match.
+    pub fn is_past_end(&self, header: &EventHeader<'_>) -> bool {
+        matches!((self.seq_max, header.seq), (Some(max), Some(seq)) if seq > max)
+    }
+}
+
+/// Parse only the header fields of a JSON event line.
+///
+/// Both writers emit compact JSON with scalar header fields ahead of
+/// `attrs`/`payload`, so the prefix up to `,"attrs":` is scanned in place and
+/// the (potentially large) payload is never looked at. String values borrow
+/// from the line; only a value containing an escape is decoded into an owned
+/// string. Lines of any other shape fall back to a full parse.
+pub fn scan_header(json_str: &str) -> Result<EventHeader<'_>, serde_json::Error> {
+    if let Some(idx) = json_str.find(ATTRS_KEY).filter(|&i| i > 0) {
+        if let Some(header) = scan_prefix(&json_str[..idx]) {
+            return Ok(header);
+        }
+    }
+    serde_json::from_str(json_str)
+}
+
+/// A scalar member value in the header prefix: the contents of a string, or
+/// the raw token of a number/literal.
+enum Scalar<'a> {
+    Text(Cow<'a, str>),
+    Token(&'a str),
+}
+
+impl<'a> Scalar<'a> {
+    fn text(self) -> Option<Option<Cow<'a, str>>> {
+        match self {
+            Scalar::Text(text) => Some(Some(text)),
+            Scalar::Token("null") => Some(None),
+            Scalar::Token(_) => None,
+        }
+    }
+
+    fn number(self) -> Option<Option<u64>> {
+        match self {
+            Scalar::Token("null") => Some(None),
+            Scalar::Token(token) => token.parse().ok().map(Some),
+            Scalar::Text(_) => None,
+        }
+    }
+}
+
+/// Header fields from `{"k":v,...` with scalar values only. `None` for
+/// anything else, leaving the caller to do a full parse.
+fn scan_prefix(head: &str) -> Option<EventHeader<'_>> {
+    let bytes = head.as_bytes();
+    if bytes.first() != Some(&b'{') {
+        return None;
+    }
+    let mut header = EventHeader::default();
+    let mut i = skip_ws(bytes, 1);
+    while i < bytes.len() {
+        let (key, escaped, next) = string_at(bytes, i)?;
+        if escaped {
+            return None;
+        }
+        i = skip_ws(bytes, next);
+        if bytes.get(i) != Some(&b':') {
+            return None;
+        }
+        i = skip_ws(bytes, i + 1);
+        let value = if bytes.get(i) == Some(&b'"') {
+            let (raw, escaped, next) = string_at(bytes, i)?;
+            let text = if escaped {
+                Cow::Owned(serde_json::from_str::<String>(&head[i..next]).ok()?)
+            } else {
+                Cow::Borrowed(&head[raw])
+            };
+            i = next;
+            Scalar::Text(text)
+        } else {
+            let end = bytes[i..]
+                .iter()
+                .position(|&b| b == b',' || b.is_ascii_whitespace())
+                .map_or(bytes.len(), |n| i + n);
+            if end == i || matches!(bytes[i], b'{' | b'[') {
+                return None;
+            }
+            let token = &head[i..end];
+            i = end;
+            Scalar::Token(token)
+        };
+        match &head[key] {
+            "kind" => header.kind = value.text()?,
+            "span_id" => header.span_id = value.text()?,
+            "level" => header.level = value.text()?,
+            "seq" => header.seq = value.number()?,
+            "ts_unix_ns" => header.ts_unix_ns = value.number()?,
+            _ => {}
+        }
+        i = skip_ws(bytes, i);
+        match bytes.get(i) {
+            None => break,
+            Some(b',') => i = skip_ws(bytes, i + 1),
+            Some(_) => return None,
+        }
+    }
+    Some(header)
+}
+
+fn skip_ws(bytes: &[u8], mut i: usize) -> usize {
+    while bytes.get(i).map_or(false, u8::is_ascii_whitespace) {
+        i += 1;
+    }
+    i
+}
+
+/// The string starting at `bytes[i] == '"'`: the range of its contents,
+/// whether it contains escapes, and the index just past the closing quote.
+fn string_at(bytes: &[u8], i: usize) -> Option<(std::ops::Range<usize>, bool, usize)> {
+    if bytes.get(i) != Some(&b'"') {
+        return None;
+    }
+    let mut escaped = false;
+    let mut j = i + 1;
+    while j < bytes.len() {
+        match bytes[j] {
+            b'\\' => {
+                escaped = true;
+                j += 2;
+            }
+            b'"' => return Some((i + 1..j, escaped, j + 1)),
+            _ => j += 1,
+        }
+    }
+    None
+}
+
+impl<'a> EventHeader<'a> {
+    /// Header fields of an already decoded event (binary traces).
+    pub fn from_value(event: &'a Value) -> Self {
+        let text = |key: &str| event.get(key).and_then(Value::as_str).map(Cow::Borrowed);
+        EventHeader {
+            kind: text("kind"),
+            seq: event.get("seq").and_then(Value::as_u64),
+            ts_unix_ns: event.get("ts_unix_ns").and_then(Value::as_u64),
+            span_id: text("span_id"),
+            level: text("level"),
+        }
+    }
+}
+
+/// Parse only the requested top-level fields of a JSON event.
+pub fn project(json_str: &str, fields: &[String]) -> Result<Map<String, Value>, serde_json::Error> {
+    let raw: HashMap<String, &RawValue> = serde_json::from_str(json_str)?;
+    let mut out = Map::new();
+    for field in fields {
+        if let Some(value) = raw.get(field) {
+            out.insert(field.clone(), serde_json::from_str(value.get())?);
+        }
+    }
+    Ok(out)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    const LINE: &str = r#"{"schema_version":1,"trace_id":"t","seq":3,"ts_unix_ns":50,"kind":"tool_call","span_id":"s1","level":"info","attrs":{},"payload":{"kind":"nested"}}"#;
+
+    #[test]
+    fn test_scan_header_prefix() {
+        let header = scan_header(LINE).unwrap();
+        assert_eq!(header.kind.as_deref(), Some("tool_call"));
+        assert_eq!(header.seq, Some(3));
+        assert_eq!(header.span_id.as_deref(), Some("s1"));
+        assert!(matches!(header.kind, Some(Cow::Borrowed(_))));
+    }
+
+    #[test]
+    fn test_scan_header_escaped_and_fallback() {
+        let line = r#"{"seq":1,"kind":"tool\"call","span_id":null,"attrs":{}}"#;
+        let header = scan_header(line).unwrap();
+        assert_eq!(header.kind.as_deref(), Some("tool\"call"));
+        assert_eq!(header.span_id, None);
+
+        let line = r#"{"kind":"x","meta":{"a":1},"seq":2,"attrs":{}}"#;
+        let header = scan_header(line).unwrap();
+        assert_eq!((header.kind.as_deref(), header.seq), (Some("x"), Some(2)));
+
+        assert!(scan_header(r#"{"seq":"1","attrs":{}}"#).is_err());
+    }
+
+    #[test]
+    fn test_filter_matches() {
+        let header = scan_header(LINE).unwrap();
+        let mut filter = EventFilter::default();
+        assert!(filter.matches(&header));
+
+        filter.kinds = Some(vec!["tool_call".to_string()]);
+        filter.ts_min = Some(10);
+        filter.seq_max = Some(3);
+        assert!(filter.matches(&header));
+
+        filter.span_id = Some("s2".to_string());
+        assert!(!filter.matches(&header));
+
+        let filter = EventFilter { seq_max: Some(2), ..Default::default() };
+        assert!(filter.is_past_end(&header));
+    }
+
+    #[test]
+    fn test_project() {
+        let fields = vec!["kind".to_string(), "seq".to_string()];
+        let out = project(LINE, &fields).unwrap();
+        assert_eq!(out.len(), 2);
+        assert_eq!(out["kind"], "tool_call");
+    }
+}
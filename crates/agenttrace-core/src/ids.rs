@@ -0,0 +1,58 @@
+//! Time-ordered trace IDs.
+//!
+//! New IDs are UUIDv7 rendered as 32 hex characters, the same shape as the
+//! `uuid4().hex` IDs of older traces. The leading 48 bits are the unix
+//! millisecond timestamp, so sorting IDs as strings sorts traces by creation
+//! time and the time can be read back without opening any file. Mirrors
+//! `agenttrace/ids.py`.
+
+use uuid::Uuid;
+
+/// A new time-ordered trace ID (monotonic within the process).
+pub fn new_trace_id() -> String {
+    Uuid::now_v7().simple().to_string()
+}
+
+/// True for UUIDv7 hex IDs.
+pub fn is_time_ordered(trace_id: &str) -> bool {
+    let b = trace_id.as_bytes();
+    b.len() == 32
+        && b[12] == b'7'
+        && matches!(b[16], b'8' | b'9' | b'a' | b'b')
+        && b.iter().all(u8::is_ascii_hexdigit)
+}
+
+/// Creation time encoded in a time-ordered ID (ms precision). `None` for
+/// other IDs and for times past the range of `u64` nanoseconds.
+pub fn trace_id_time_ns(trace_id: &str) -> Option<u64> {
+    if !is_time_ordered(trace_id) {
+        return None;
+    }
+    u64::from_str_radix(&trace_id[..12], 16).ok()?.checked_mul(1_000_000)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_time_ordered_ids() {
+        let a = new_trace_id();
+        let b = new_trace_id();
+        assert!(a < b);
+        assert!(is_time_ordered(&a));
+        let now_ns = std::time::SystemTime::now()
+            .duration_since(std::time::UNIX_EPOCH)
+            .unwrap()
+            .as_nanos() as u64;
+        let ts = trace_id_time_ns(&a).unwrap();
+        assert!(ts <= now_ns && now_ns - ts < 60_000_000_000);
+
+        // Legacy uuid4 hex and free-form IDs carry no time.
+        assert_eq!(trace_id_time_ns("0f8fad5bd9cb469fa16570867728950e"), None);
+        assert_eq!(trace_id_time_ns("trace-a"), None);
+        // Cross-checked against agenttrace/ids.py.
+        assert_eq!(trace_id_time_ns("018df4bc56007abc8123456789abcdef"), Some(1_709_208_000_000_000_000));
+        assert_eq!(trace_id_time_ns("ffffffffffff7abc8123456789abcdef"), None);
+    }
+}
@@ -1,10 +1,21 @@
+pub mod archive;
+pub mod binformat;
+pub mod bloom;
 pub mod crc;
 pub mod event;
+pub mod filter;
+pub mod ids;
 pub mod reader;
+pub mod search;
 pub mod storage;
 pub mod writer;
 
+pub use archive::{Archive, ArchiveError};
+pub use binformat::BinaryError;
 pub use event::Event;
-pub use reader::{ReadError, TraceMeta, TraceReader};
-pub use storage::StorageLayout;
-pub use writer::TraceWriter;
+pub use filter::EventFilter;
+pub use ids::{new_trace_id, trace_id_time_ns};
+pub use reader::{EventLines, LazyEvent, ReadError, ScannedEvent, TraceMeta, TraceReader};
+pub use search::{search, SearchHit, SearchOptions, SearchStats};
+pub use storage::{PartitionFilter, StorageLayout, TraceLocation};
+pub use writer::{EventFormat, TraceWriter};
@@ -1,10 +1,19 @@
+use std::borrow::Cow;
+use std::fmt;
 use std::fs::File;
-use std::io::{BufRead, BufReader};
+use std::io::{BufRead, BufReader, Read};
 use std::path::Path;
 use anyhow::Result;
+use serde_json::value::RawValue;
+use serde::de::{Deserialize, Deserializer, MapAccess, Visitor};
+use serde_json::Value;
 use thiserror::Error;
+use crate::archive::{Archive, ArchiveError, ARCHIVE_FILE};
+use crate::binformat::{self, BinaryError, BinaryEvents, BINARY_FILE};
 use crate::crc;
-use crate::storage::StorageLayout;
+use crate::filter::{scan_header, EventFilter, EventHeader};
+use crate::ids::trace_id_time_ns;
+use crate::storage::{self, PartitionFilter, StorageLayout, TraceLocation, EVENTS_FILE};
 
 #[derive(Error, Debug)]
 pub enum ReadError {
@@ -20,6 +29,10 @@ pub enum ReadError {
     Io(#[from] std::io::Error),
     #[error(transparent)]
     Json(#[from] serde_json::Error),
+    #[error(transparent)]
+    Archive(#[from] ArchiveError),
+    #[error(transparent)]
+    Binary(#[from] BinaryError),
 }
 
 #[derive(Debug, Clone)]
@@ -35,6 +48,93 @@ pub struct TraceReader {
     layout: StorageLayout,
 }
 
+/// Top-level fields that are not parsed eagerly by [`TraceReader::get_events_lazy`].
+pub const DEFERRED_FIELDS: [&str; 2] = ["attrs", "payload"];
+
+/// An event whose header fields are parsed but whose `attrs`/`payload`
+/// are kept as raw JSON text until the consumer asks for them.
+#[derive(Debug, Clone)]
+pub struct LazyEvent {
+    /// Header members in the order they appear on the line.
+    pub header: Vec<(String, Value)>,
+    /// JSON object text holding the deferred members, e.g.
+    /// `{"attrs":{...},"payload":{...}}`; `None` if the line had neither.
+    pub deferred: Option<String>,
+}
+
+impl LazyEvent {
+    /// The header member `key`, if present.
+    pub fn get(&self, key: &str) -> Option<&Value> {
+        self.header.iter().find(|(k, _)| k == key).map(|(_, v)| v)
+    }
+}
+
+/// Top-level members of a JSON object in line order, values left unparsed.
+struct RawMembers<'a>(Vec<(Cow<'a, str>, &'a RawValue)>);
+
+#[derive(serde::Deserialize)]
+struct RawKey<'a>(#[serde(borrow)] Cow<'a, str>);
+
+impl<'de> Deserialize<'de> for RawMembers<'de> {
+    fn deserialize<D: Deserializer<'de>>(deserializer: D) -> std::result::Result<Self, D::Error> {
+        struct MembersVisitor;
+
+        impl<'de> Visitor<'de> for MembersVisitor {
+            type Value = RawMembers<'de>;
+
+            fn expecting(&self, f: &mut fmt::Formatter) -> fmt::Result {
+                f.write_str("a JSON object")
+            }
+
+            fn visit_map<A: MapAccess<'de>>(self, mut map: A) -> std::result::Result<Self::Value, A::Error> {
+                let mut members = Vec::with_capacity(map.size_hint().unwrap_or(10));
+                while let Some(RawKey(key)) = map.next_key()? {
+                    members.push((key, map.next_value()?));
+                }
+                Ok(RawMembers(members))
+            }
+        }
+
+        deserializer.deserialize_map(MembersVisitor)
+    }
+}
+
+/// Parse the header of one JSON event, keeping [`DEFERRED_FIELDS`] as raw text.
+///
+/// Members keep their line order, so the deferred text is the same bytes the
+/// pure-Python reader (`agenttrace.lazy.split_event_line`) produces for a
+/// line written by either writer.
+pub fn split_lazy(json_str: &str) -> std::result::Result<LazyEvent, serde_json::Error> {
+    let RawMembers(members) = serde_json::from_str(json_str)?;
+    let mut header = Vec::with_capacity(members.len());
+    let mut deferred = String::new();
+    for (key, raw) in members {
+        if DEFERRED_FIELDS.contains(&&*key) {
+            deferred.push(if deferred.is_empty() { '{' } else { ',' });
+            deferred.push_str(&serde_json::to_string(&key)?);
+            deferred.push(':');
+            deferred.push_str(raw.get());
+        } else {
+            header.push((key.into_owned(), serde_json::from_str(raw.get())?));
+        }
+    }
+    let deferred = if deferred.is_empty() {
+        None
+    } else {
+        deferred.push('}');
+        Some(deferred)
+    };
+    Ok(LazyEvent { header, deferred })
+}
+
+/// Return the JSON portion of a line without verifying its CRC suffix.
+fn strip_crc(line: &str) -> &str {
+    match line.rfind('\t') {
+        Some(tab_pos) if line.len() - tab_pos - 1 == 8 => &line[..tab_pos],
+        _ => line,
+    }
+}
+
 /// Split a JSONL line into the JSON portion and verify its CRC if present.
 /// Returns the JSON portion as a string slice.
 /// Handles both new format (with `\t<8-hex-crc>`) and legacy (plain JSON).
@@ -59,6 +159,89 @@ fn split_and_verify(line: &str, line_num: usize) -> std::result::Result<&str, Re
     Ok(line)
 }
 
+/// Name, project, start time and event count of a trace.
+fn read_meta(loc: &TraceLocation) -> TraceMeta {
+    let id = loc.id.clone();
+    let dir_mtime = std::fs::metadata(&loc.dir)
+        .ok()
+        .and_then(|m| m.modified().ok())
+        .and_then(|t| t.duration_since(std::time::UNIX_EPOCH).ok())
+        .map(|d| d.as_secs_f64())
+        .unwrap_or(0.0);
+
+    let mut meta = TraceMeta {
+        id: id.clone(),
+        name: id.clone(),
+        project: None,
+        ts: dir_mtime,
+        event_count: 0,
+    };
+
+    if loc.is_archived() {
+        // Header and uncompressed head line only; no block is decoded.
+        if let Ok(archive) = Archive::open(loc.data_file()) {
+            let head = String::from_utf8_lossy(&archive.head);
+            apply_start_line(&mut meta, head.trim());
+            meta.event_count = archive.event_count;
+        }
+        return meta;
+    }
+
+    let events_path = loc.data_file();
+    if events_path.file_name().map_or(false, |n| n == BINARY_FILE) {
+        if let Ok((first, count)) = binformat::first_event_and_count(&events_path) {
+            if let Some(first) = first {
+                apply_start_event(&mut meta, &first);
+            }
+            meta.event_count = count;
+        }
+        return meta;
+    }
+    if events_path.exists() {
+        if let Ok(file) = File::open(&events_path) {
+            let reader = BufReader::new(file);
+            let mut line_count: u64 = 0;
+            for (i, line_result) in reader.lines().enumerate() {
+                let Ok(line) = line_result else { break };
+                let trimmed = line.trim();
+                if trimmed.is_empty() {
+                    continue;
+                }
+                line_count += 1;
+
+                // Extract metadata from the first non-empty line
+                if line_count == 1 {
+                    apply_start_line(&mut meta, split_and_verify(trimmed, i + 1).unwrap_or(trimmed));
+                }
+            }
+            meta.event_count = line_count;
+        }
+    }
+    meta
+}
+
+/// Fill name, project and start time from a `trace_start` line.
+fn apply_start_line(meta: &mut TraceMeta, json_str: &str) {
+    if let Ok(value) = serde_json::from_str::<Value>(strip_crc(json_str)) {
+        apply_start_event(meta, &value);
+    }
+}
+
+fn apply_start_event(meta: &mut TraceMeta, value: &Value) {
+    if value.get("kind").and_then(|v| v.as_str()) != Some("trace_start") {
+        return;
+    }
+    if let Some(payload) = value.get("payload").and_then(|v| v.as_object()) {
+        if let Some(name) = payload.get("trace_name").and_then(|v| v.as_str()) {
+            meta.name = name.to_string();
+        }
+        meta.project = payload.get("project").and_then(|v| v.as_str()).map(|s| s.to_string());
+    }
+    if let Some(ts_ns) = value.get("ts_unix_ns").and_then(|v| v.as_u64()) {
+        meta.ts = ts_ns as f64 / 1e9;
+    }
+}
+
 impl TraceReader {
     pub fn new(root: impl AsRef<Path>) -> Self {
         Self {
@@ -66,102 +249,219 @@ impl TraceReader {
         }
     }
 
+    /// Directory of an existing trace, in either storage layout.
+    pub fn trace_dir(&self, trace_id: &str) -> Option<std::path::PathBuf> {
+        self.layout.resolve(trace_id)
+    }
+
     pub fn list_traces(&self) -> Result<Vec<TraceMeta>> {
-        let mut traces = Vec::new();
-        if !self.layout.root.exists() {
-            return Ok(traces);
-        }
+        self.list_traces_filtered(&PartitionFilter::default(), None)
+    }
 
-        for entry in std::fs::read_dir(&self.layout.root)? {
-            let entry = entry?;
-            if !entry.file_type()?.is_dir() {
+    /// List traces, newest first, keeping only those of `filter.project`
+    /// that started within `[since_ns, until_ns]`, up to `limit` of them.
+    ///
+    /// Partitioned directories outside the filter are pruned without being
+    /// listed. Traces with time-ordered IDs are placed and windowed by the
+    /// time in their ID, so only the ones returned are opened; legacy IDs
+    /// need their `trace_start` line read to be ordered.
+    pub fn list_traces_filtered(&self, filter: &PartitionFilter, limit: Option<usize>) -> Result<Vec<TraceMeta>> {
+        let mut pending: Vec<(u64, TraceLocation, Option<TraceMeta>)> = Vec::new();
+        for loc in self.layout.trace_dirs(filter)? {
+            let (ts_ns, meta) = match trace_id_time_ns(&loc.id) {
+                Some(ts_ns) => (ts_ns, None),
+                None => {
+                    let meta = read_meta(&loc);
+                    // Millisecond precision, like the bounds built from float seconds.
+                    (((meta.ts * 1e3).floor().max(0.0) as u64).saturating_mul(1_000_000), Some(meta))
+                }
+            };
+            if filter.since_ns.map_or(false, |since| ts_ns < since)
+                || filter.until_ns.map_or(false, |until| ts_ns > until)
+            {
                 continue;
             }
+            pending.push((ts_ns, loc, meta));
+        }
+        pending.sort_by(|a, b| b.0.cmp(&a.0).then_with(|| b.1.id.cmp(&a.1.id)));
 
-            let id = entry.file_name().to_string_lossy().to_string();
-            let dir_mtime = entry
-                .metadata()
-                .ok()
-                .and_then(|m| m.modified().ok())
-                .and_then(|t| t.duration_since(std::time::UNIX_EPOCH).ok())
-                .map(|d| d.as_secs_f64())
-                .unwrap_or(0.0);
-
-            let mut meta = TraceMeta {
-                id: id.clone(),
-                name: id.clone(),
-                project: None,
-                ts: dir_mtime,
-                event_count: 0,
-            };
-
-            let events_path = self.layout.events_file(&id);
-            if events_path.exists() {
-                if let Ok(file) = File::open(&events_path) {
-                    let reader = BufReader::new(file);
-                    let mut line_count: u64 = 0;
-                    for (i, line_result) in reader.lines().enumerate() {
-                        let Ok(line) = line_result else { break };
-                        let trimmed = line.trim();
-                        if trimmed.is_empty() {
-                            continue;
-                        }
-                        line_count += 1;
-
-                        // Extract metadata from the first non-empty line
-                        if line_count == 1 {
-                            let json_str = split_and_verify(trimmed, i + 1).unwrap_or(trimmed);
-                            if let Ok(value) = serde_json::from_str::<serde_json::Value>(json_str) {
-                                if value.get("kind").and_then(|v| v.as_str()) == Some("trace_start") {
-                                    if let Some(payload) = value.get("payload").and_then(|v| v.as_object()) {
-                                        if let Some(name) = payload.get("trace_name").and_then(|v| v.as_str()) {
-                                            meta.name = name.to_string();
-                                        }
-                                        meta.project = payload.get("project").and_then(|v| v.as_str()).map(|s| s.to_string());
-                                    }
-                                    if let Some(ts_ns) = value.get("ts_unix_ns").and_then(|v| v.as_u64()) {
-                                        meta.ts = ts_ns as f64 / 1e9;
-                                    }
-                                }
-                            }
-                        }
-                    }
-                    meta.event_count = line_count;
-                }
+        let mut traces = Vec::new();
+        for (_, loc, meta) in pending {
+            if limit.map_or(false, |limit| traces.len() >= limit) {
+                break;
+            }
+            let meta = meta.unwrap_or_else(|| read_meta(&loc));
+            if filter.project.is_some() && meta.project != filter.project {
+                continue;
             }
-
             traces.push(meta);
         }
-
-        traces.sort_by(|a, b| b.ts.partial_cmp(&a.ts).unwrap_or(std::cmp::Ordering::Equal));
         Ok(traces)
     }
 
+    /// Open a trace for a filtered, streaming scan of its lines.
+    pub fn scan(&self, trace_id: &str, filter: EventFilter) -> std::result::Result<EventLines, ReadError> {
+        let Some(dir) = self.layout.resolve(trace_id) else {
+            return Err(ReadError::TraceNotFound(trace_id.to_string()));
+        };
+        let path = storage::data_file(&dir);
+        let source = match path.file_name().and_then(|n| n.to_str()) {
+            Some(EVENTS_FILE) => Source::Text(BufReader::new(Box::new(File::open(path)?))),
+            Some(BINARY_FILE) => Source::Binary(BinaryEvents::open(&path)?),
+            _ => {
+                // Archived: only decompress blocks whose seq/ts range can match.
+                let archive = Archive::open(dir.join(ARCHIVE_FILE))?;
+                let blocks = archive.select(filter.seq_min, filter.seq_max, filter.ts_min, filter.ts_max);
+                Source::Text(BufReader::new(Box::new(archive.reader(blocks)?)))
+            }
+        };
+        Ok(EventLines {
+            source,
+            filter,
+            line_num: 0,
+            buf: String::new(),
+            done: false,
+        })
+    }
+
     /// Read all events for a trace, verifying CRC for each line.
     /// Returns events as `serde_json::Value` dicts to preserve any extra fields.
     pub fn get_events(&self, trace_id: &str) -> std::result::Result<Vec<serde_json::Value>, ReadError> {
-        let path = self.layout.events_file(trace_id);
-        if !path.exists() {
-            return Err(ReadError::TraceNotFound(trace_id.to_string()));
+        let mut lines = self.scan(trace_id, EventFilter::default())?;
+        std::iter::from_fn(|| lines.next_event())
+            .map(|event| event?.into_value())
+            .collect()
+    }
+
+    /// Like [`get_events`](Self::get_events) but only the header fields are
+    /// parsed; `attrs`/`payload` stay as raw JSON text.
+    pub fn get_events_lazy(&self, trace_id: &str) -> std::result::Result<Vec<LazyEvent>, ReadError> {
+        self.scan(trace_id, EventFilter::default())?
+            .map(|line| Ok(split_lazy(&line?)?))
+            .collect()
+    }
+}
+
+/// An event yielded by [`EventLines::next_event`]: JSON text for JSONL and
+/// archived traces, an already decoded value for binary ones.
+#[derive(Debug)]
+pub enum ScannedEvent {
+    Line(String),
+    Value(Value),
+}
+
+impl ScannedEvent {
+    pub fn into_json(self) -> std::result::Result<String, ReadError> {
+        match self {
+            ScannedEvent::Line(line) => Ok(line),
+            ScannedEvent::Value(value) => Ok(serde_json::to_string(&value)?),
         }
+    }
 
-        let file = File::open(&path)?;
-        let reader = BufReader::new(file);
-        let mut events = Vec::new();
+    pub fn into_value(self) -> std::result::Result<Value, ReadError> {
+        match self {
+            ScannedEvent::Line(line) => Ok(serde_json::from_str(&line)?),
+            ScannedEvent::Value(value) => Ok(value),
+        }
+    }
+}
 
-        for (i, line_result) in reader.lines().enumerate() {
-            let line = line_result?;
-            let trimmed = line.trim();
-            if trimmed.is_empty() {
-                continue;
+enum Source {
+    Text(BufReader<Box<dyn Read + Send>>),
+    Binary(BinaryEvents),
+}
+
+/// Streaming iterator over the JSON text of the events that pass a filter.
+///
+/// Non-matching lines are rejected from their header alone (see
+/// [`scan_header`]); CRC verification and full parsing only happen for lines
+/// that are yielded. Binary traces are decoded record by record and
+/// serialized back to JSON; use [`next_event`](Self::next_event) to take the
+/// decoded values instead.
+pub struct EventLines {
+    source: Source,
+    filter: EventFilter,
+    line_num: usize,
+    buf: String,
+    done: bool,
+}
+
+impl EventLines {
+    /// The next matching event, without re-serializing binary records.
+    pub fn next_event(&mut self) -> Option<std::result::Result<ScannedEvent, ReadError>> {
+        let Source::Binary(events) = &mut self.source else {
+            return self.next_line().map(|line| line.map(ScannedEvent::Line));
+        };
+        while !self.done {
+            match events.next() {
+                None => self.done = true,
+                Some(Ok(event)) => {
+                    let header = EventHeader::from_value(&event);
+                    if self.filter.is_past_end(&header) {
+                        self.done = true;
+                        break;
+                    }
+                    if self.filter.matches(&header) {
+                        return Some(Ok(ScannedEvent::Value(event)));
+                    }
+                }
+                Some(Err(err)) => {
+                    self.done = true;
+                    return Some(Err(err.into()));
+                }
             }
+        }
+        None
+    }
 
-            let json_str = split_and_verify(trimmed, i + 1)?;
-            let value: serde_json::Value = serde_json::from_str(json_str)?;
-            events.push(value);
+    fn next_line(&mut self) -> Option<std::result::Result<String, ReadError>> {
+        let Source::Text(reader) = &mut self.source else { return None };
+        while !self.done {
+            self.buf.clear();
+            match reader.read_line(&mut self.buf) {
+                Ok(0) => self.done = true,
+                Ok(_) => {
+                    self.line_num += 1;
+                    let trimmed = self.buf.trim();
+                    if trimmed.is_empty() {
+                        continue;
+                    }
+                    if !self.filter.is_empty() {
+                        let json_part = strip_crc(trimmed);
+                        let header = match scan_header(json_part) {
+                            Ok(header) => header,
+                            Err(err) => {
+                                self.done = true;
+                                return Some(Err(err.into()));
+                            }
+                        };
+                        if self.filter.is_past_end(&header) {
+                            self.done = true;
+                            break;
+                        }
+                        if !self.filter.matches(&header) {
+                            continue;
+                        }
+                    }
+                    return Some(
+                        split_and_verify(trimmed, self.line_num).map(|json_str| json_str.to_string()),
+                    );
+                }
+                Err(err) => {
+                    self.done = true;
+                    return Some(Err(err.into()));
+                }
+            }
         }
+        None
+    }
+}
+
+impl Iterator for EventLines {
+    type Item = std::result::Result<String, ReadError>;
 
-        Ok(events)
+    fn next(&mut self) -> Option<Self::Item> {
+        self.next_event().map(|event| event?.into_json())
     }
 }
 
@@ -235,6 +535,123 @@ mod tests {
         Ok(())
     }
 
+    #[test]
+    fn test_split_lazy_keeps_line_order() -> anyhow::Result<()> {
+        let line = r#"{"schema_version":1,"trace_id":"t","seq":1,"ts_unix_ns":5,"kind":"k","attrs":{"z":1,"a":2},"payload":{"zz":[1,{"b":2,"a":1}],"aa":"x"}}"#;
+        let event = split_lazy(line)?;
+        // Byte-identical to agenttrace.lazy.split_event_line.
+        let idx = line.find(",\"attrs\":").unwrap();
+        assert_eq!(event.deferred.as_deref(), Some(format!("{{{}", &line[idx + 1..]).as_str()));
+        let keys: Vec<&str> = event.header.iter().map(|(k, _)| k.as_str()).collect();
+        assert_eq!(keys, ["schema_version", "trace_id", "seq", "ts_unix_ns", "kind"]);
+        Ok(())
+    }
+
+    #[test]
+    fn test_reader_lazy_split() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        let trace_id = "lazy-trace";
+
+        {
+            let mut writer = TraceWriter::start(trace_id, tmp.path())?;
+            let event = Event::new(trace_id.to_string(), 1, "test".to_string(), json!({"a": [1, 2]}));
+            writer.emit(&event)?;
+        }
+
+        let reader = TraceReader::new(tmp.path());
+        let events = reader.get_events_lazy(trace_id)?;
+        assert_eq!(events.len(), 1);
+        assert_eq!(events[0].get("kind"), Some(&json!("test")));
+        assert!(events[0].get("payload").is_none());
+
+        let deferred: Value = serde_json::from_str(events[0].deferred.as_deref().unwrap())?;
+        assert_eq!(deferred["payload"], json!({"a": [1, 2]}));
+        assert_eq!(deferred["attrs"], json!({}));
+
+        Ok(())
+    }
+
+    #[test]
+    fn test_reader_archived_trace() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        let trace_id = "archived";
+        {
+            let mut writer = TraceWriter::start(trace_id, tmp.path())?;
+            let start = json!({"trace_name": "cold", "project": "p"});
+            writer.emit(&Event::new(trace_id.to_string(), 1, "trace_start".to_string(), start))?;
+            for seq in 2..=9 {
+                writer.emit(&Event::new(trace_id.to_string(), seq, "tool_call".to_string(), json!({})))?;
+            }
+        }
+        let dir = tmp.path().join(trace_id);
+        let lines: Vec<String> = std::fs::read_to_string(dir.join(EVENTS_FILE))?.lines().map(String::from).collect();
+        crate::archive::tests::write_archive(&dir, &lines, 2)?;
+        std::fs::remove_file(dir.join(EVENTS_FILE))?;
+
+        let reader = TraceReader::new(tmp.path());
+        let traces = reader.list_traces()?;
+        assert_eq!((traces[0].name.as_str(), traces[0].event_count), ("cold", 9));
+        assert_eq!(reader.get_events(trace_id)?.len(), 9);
+        let filter = EventFilter { seq_min: Some(5), seq_max: Some(6), ..Default::default() };
+        let lines: Vec<String> = reader.scan(trace_id, filter)?.collect::<std::result::Result<_, _>>()?;
+        assert_eq!(lines.len(), 2);
+        assert!(lines[0].contains("\"seq\":5"));
+        Ok(())
+    }
+
+    #[test]
+    fn test_reader_binary_trace() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        let trace_id = "binary";
+        {
+            let mut writer = TraceWriter::open(trace_id, tmp.path(), None, crate::writer::EventFormat::Binary)?;
+            let start = json!({"trace_name": "bin", "project": "p"});
+            writer.emit(&Event::new(trace_id.to_string(), 1, "trace_start".to_string(), start))?;
+            for seq in 2..=5 {
+                writer.emit(&Event::new(trace_id.to_string(), seq, "tool_call".to_string(), json!({"n": seq})))?;
+            }
+        }
+
+        let reader = TraceReader::new(tmp.path());
+        let traces = reader.list_traces()?;
+        assert_eq!((traces[0].name.as_str(), traces[0].event_count), ("bin", 5));
+        let events = reader.get_events(trace_id)?;
+        assert_eq!(events.len(), 5);
+        assert_eq!(events[4]["payload"], json!({"n": 5}));
+
+        let filter = EventFilter { kinds: Some(vec!["tool_call".to_string()]), seq_max: Some(3), ..Default::default() };
+        let lines: Vec<String> = reader.scan(trace_id, filter)?.collect::<std::result::Result<_, _>>()?;
+        assert_eq!(lines.len(), 2);
+        assert_eq!(serde_json::from_str::<Value>(&lines[0])?, events[1]);
+        assert_eq!(reader.get_events_lazy(trace_id)?[2].get("seq"), Some(&json!(3)));
+        Ok(())
+    }
+
+    #[test]
+    fn test_reader_scan_filter() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        let trace_id = "filter-trace";
+
+        {
+            let mut writer = TraceWriter::start(trace_id, tmp.path())?;
+            for (seq, kind) in [(1, "trace_start"), (2, "tool_call"), (3, "llm_request"), (4, "tool_call")] {
+                writer.emit(&Event::new(trace_id.to_string(), seq, kind.to_string(), json!({})))?;
+            }
+        }
+
+        let reader = TraceReader::new(tmp.path());
+        let filter = EventFilter {
+            kinds: Some(vec!["tool_call".to_string()]),
+            seq_max: Some(3),
+            ..Default::default()
+        };
+        let lines: Vec<String> = reader.scan(trace_id, filter)?.collect::<std::result::Result<_, _>>()?;
+        assert_eq!(lines.len(), 1);
+        assert!(lines[0].contains("\"seq\":2"));
+
+        Ok(())
+    }
+
     #[test]
     fn test_list_traces() -> anyhow::Result<()> {
         let tmp = tempdir()?;
@@ -259,4 +676,59 @@ mod tests {
 
         Ok(())
     }
+
+    #[test]
+    fn test_partitioned_layout() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        let day_ns = 1_709_208_000_000_000_000;
+        let partition = crate::storage::partition_path(Some("proj"), day_ns);
+        {
+            let mut writer = TraceWriter::start_in("part-trace", tmp.path(), &partition)?;
+            let mut event = Event::new("part-trace".to_string(), 1, "trace_start".to_string(), json!({"project": "proj"}));
+            event.ts_unix_ns = day_ns;
+            writer.emit(&event)?;
+        }
+        {
+            let mut writer = TraceWriter::start("flat-trace", tmp.path())?;
+            writer.emit(&Event::new("flat-trace".to_string(), 1, "trace_start".to_string(), json!({})))?;
+        }
+
+        let reader = TraceReader::new(tmp.path());
+        assert_eq!(reader.trace_dir("part-trace"), Some(tmp.path().join(&partition).join("part-trace")));
+        assert_eq!(reader.get_events("part-trace")?.len(), 1);
+        assert_eq!(reader.list_traces()?.len(), 2);
+
+        let filter = PartitionFilter { project: Some("proj".to_string()), ..Default::default() };
+        let traces = reader.list_traces_filtered(&filter, None)?;
+        assert_eq!(traces.len(), 1);
+        assert_eq!(traces[0].id, "part-trace");
+
+        let filter = PartitionFilter { until_ns: Some(day_ns + 1), ..Default::default() };
+        let ids: Vec<String> = reader.list_traces_filtered(&filter, None)?.into_iter().map(|t| t.id).collect();
+        assert_eq!(ids, vec!["part-trace".to_string()]);
+        Ok(())
+    }
+
+    #[test]
+    fn test_list_traces_time_ordered_ids() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        let ids: Vec<String> = (0..3).map(|_| crate::ids::new_trace_id()).collect();
+        for id in &ids {
+            let mut writer = TraceWriter::start(id, tmp.path())?;
+            writer.emit(&Event::new(id.clone(), 1, "trace_start".to_string(), json!({})))?;
+        }
+
+        let reader = TraceReader::new(tmp.path());
+        let latest: Vec<String> = reader
+            .list_traces_filtered(&PartitionFilter::default(), Some(2))?
+            .into_iter()
+            .map(|t| t.id)
+            .collect();
+        assert_eq!(latest, vec![ids[2].clone(), ids[1].clone()]);
+
+        let until = crate::ids::trace_id_time_ns(&ids[0]).unwrap() - 1;
+        let filter = PartitionFilter { until_ns: Some(until), ..Default::default() };
+        assert!(reader.list_traces_filtered(&filter, None)?.is_empty());
+        Ok(())
+    }
 }
@@ -0,0 +1,442 @@
+use std::collections::HashMap;
+use std::path::{Path, PathBuf};
+use std::sync::atomic::{AtomicUsize, Ordering};
+use std::time::UNIX_EPOCH;
+use anyhow::Result;
+use memchr::{memchr, memmem, memrchr};
+use serde_json::value::RawValue;
+use serde_json::Value;
+use crate::archive::{Archive, ArchiveError, ARCHIVE_FILE};
+use crate::binformat::{self, BINARY_FILE};
+use crate::bloom::{Bloom, BLOOM_FILE};
+use crate::crc;
+use crate::storage::{PartitionFilter, StorageLayout};
+
+/// Options for [`search`].
+#[derive(Debug, Clone, Default)]
+pub struct SearchOptions {
+    pub query: String,
+    /// Stop after this many hits.
+    pub limit: Option<usize>,
+    /// Only consider events of these kinds.
+    pub kinds: Option<Vec<String>>,
+    /// Only consider events with `ts_unix_ns >= since_ns`; traces whose
+    /// events file was last modified before this are not opened at all.
+    pub since_ns: Option<u64>,
+}
+
+#[derive(Debug, Clone)]
+pub struct SearchHit {
+    pub trace_id: String,
+    pub trace_name: String,
+    pub event: Value,
+}
+
+/// Counters describing how much of the root a search had to read.
+#[derive(Debug, Clone, Default, PartialEq)]
+pub struct SearchStats {
+    /// Traces that passed the `since` pruning.
+    pub traces_considered: usize,
+    /// Traces ruled out by their Bloom filter without reading events.
+    pub traces_skipped: usize,
+    /// Traces whose events file was read.
+    pub traces_scanned: usize,
+    /// Archived traces whose codec this build cannot decode; they are left
+    /// out of the results (the Python backend can search them).
+    pub traces_unsupported: usize,
+}
+
+impl SearchStats {
+    /// Fraction of visited traces that the Bloom filters let us skip.
+    pub fn skip_ratio(&self) -> f64 {
+        let visited = self.traces_skipped + self.traces_scanned;
+        if visited == 0 {
+            0.0
+        } else {
+            self.traces_skipped as f64 / visited as f64
+        }
+    }
+}
+
+struct Candidate {
+    id: String,
+    path: PathBuf,
+    mtime_ns: u64,
+}
+
+/// Byte patterns a query can appear as inside JSON text: escaped as the Rust
+/// writer does (UTF-8 kept as is) and with non-ASCII as `\uXXXX` escapes, as
+/// Python's `json.dumps` writes by default.
+pub fn query_needles(query: &str) -> Vec<Vec<u8>> {
+    let escaped = serde_json::to_string(query).unwrap_or_default();
+    let escaped = escaped[1..escaped.len() - 1].to_string();
+    let mut ascii = String::with_capacity(escaped.len());
+    for ch in escaped.chars() {
+        if ch.is_ascii() {
+            ascii.push(ch);
+        } else {
+            let mut buf = [0u16; 2];
+            for unit in ch.encode_utf16(&mut buf) {
+                ascii.push_str(&format!("\\u{:04x}", unit));
+            }
+        }
+    }
+    let mut needles = vec![escaped.into_bytes()];
+    if ascii.as_bytes() != needles[0].as_slice() {
+        needles.push(ascii.into_bytes());
+    }
+    needles
+}
+
+fn list_candidates(root: &Path, since_ns: Option<u64>) -> Result<Vec<Candidate>> {
+    let mut out = Vec::new();
+    // A trace that started before `since` can still hold newer events, so
+    // partitions are not pruned here; the events file mtime is.
+    for loc in StorageLayout::new(root).trace_dirs(&PartitionFilter::default())? {
+        let path = loc.data_file();
+        let Ok(meta) = std::fs::metadata(&path) else { continue };
+        let mtime_ns = meta
+            .modified()
+            .ok()
+            .and_then(|t| t.duration_since(UNIX_EPOCH).ok())
+            .map(|d| d.as_nanos() as u64)
+            .unwrap_or(0);
+        if since_ns.map_or(false, |since| mtime_ns < since) {
+            continue;
+        }
+        out.push(Candidate {
+            id: loc.id,
+            path,
+            mtime_ns,
+        });
+    }
+    out.sort_by(|a, b| b.mtime_ns.cmp(&a.mtime_ns).then_with(|| b.id.cmp(&a.id)));
+    Ok(out)
+}
+
+/// JSON portion of a line if its CRC suffix (when present) is valid.
+fn verified_json(line: &[u8]) -> Option<&[u8]> {
+    if line.len() > 9 && line[line.len() - 9] == b'\t' {
+        let (json, suffix) = line.split_at(line.len() - 9);
+        let expected = std::str::from_utf8(&suffix[1..]).ok()?;
+        if crc::format_hex(crc::calculate(json)) != expected {
+            return None;
+        }
+        return Some(json);
+    }
+    Some(line)
+}
+
+fn trace_name(data: &[u8], fallback: &str) -> String {
+    let end = memchr(b'\n', data).unwrap_or(data.len());
+    verified_json(data[..end].trim_ascii())
+        .and_then(|json| serde_json::from_slice::<Value>(json).ok())
+        .filter(|v| v.get("kind").and_then(Value::as_str) == Some("trace_start"))
+        .and_then(|v| v.pointer("/payload/trace_name").and_then(Value::as_str).map(str::to_string))
+        .unwrap_or_else(|| fallback.to_string())
+}
+
+/// Check a candidate line: header predicates, then the needle must occur in
+/// the raw text of `payload` or `attrs` (not in header fields or key names).
+fn confirm(json: &[u8], needles: &[memmem::Finder<'_>], opts: &SearchOptions) -> Option<Value> {
+    let fields: HashMap<&str, &RawValue> = serde_json::from_slice(json).ok()?;
+    if let Some(kinds) = &opts.kinds {
+        let kind: &str = serde_json::from_str(fields.get("kind")?.get()).ok()?;
+        if !kinds.iter().any(|k| k == kind) {
+            return None;
+        }
+    }
+    if let Some(since) = opts.since_ns {
+        let ts: u64 = serde_json::from_str(fields.get("ts_unix_ns")?.get()).ok()?;
+        if ts < since {
+            return None;
+        }
+    }
+    let in_body = ["payload", "attrs"].iter().any(|key| {
+        fields
+            .get(key)
+            .map_or(false, |raw| needles.iter().any(|f| f.find(raw.get().as_bytes()).is_some()))
+    });
+    if !in_body {
+        return None;
+    }
+    serde_json::from_slice(json).ok()
+}
+
+/// Whether the trace's Bloom filter (if any) rules the query out.
+fn bloom_excludes(cand: &Candidate, needle_bytes: &[Vec<u8>]) -> bool {
+    let Some(dir) = cand.path.parent() else { return false };
+    match Bloom::read_from(&dir.join(BLOOM_FILE)) {
+        Ok(bloom) => !needle_bytes.iter().any(|n| bloom.may_contain(n)),
+        Err(_) => false,
+    }
+}
+
+/// Raw JSONL bytes of a trace, decompressing it if archived and rendering
+/// it as JSONL if binary.
+fn read_trace(path: &Path) -> std::result::Result<Vec<u8>, ArchiveError> {
+    let name = path.file_name().and_then(|n| n.to_str());
+    if name == Some(ARCHIVE_FILE) {
+        Archive::open(path)?.read_all()
+    } else if name == Some(BINARY_FILE) {
+        binformat::to_jsonl(path).map_err(|e| ArchiveError::Io(std::io::Error::new(std::io::ErrorKind::InvalidData, e)))
+    } else {
+        Ok(std::fs::read(path)?)
+    }
+}
+
+/// Scan one trace file; hits are returned newest (highest line) first.
+/// `None` if the trace is an archive in a codec this build cannot decode.
+fn scan_trace(cand: &Candidate, needles: &[memmem::Finder<'_>], opts: &SearchOptions) -> Option<Vec<SearchHit>> {
+    let data = match read_trace(&cand.path) {
+        Ok(data) => data,
+        Err(ArchiveError::UnsupportedCodec(_)) => return None,
+        Err(_) => return Some(Vec::new()),
+    };
+
+    // Collect the distinct lines that contain any needle.
+    let mut lines: Vec<(usize, usize)> = Vec::new();
+    for finder in needles {
+        let mut pos = 0;
+        while let Some(found) = finder.find(&data[pos..]) {
+            let at = pos + found;
+            let start = memrchr(b'\n', &data[..at]).map_or(0, |i| i + 1);
+            let end = memchr(b'\n', &data[at..]).map_or(data.len(), |i| at + i);
+            lines.push((start, end));
+            pos = end;
+            if pos >= data.len() {
+                break;
+            }
+        }
+    }
+    if lines.is_empty() {
+        return Some(Vec::new());
+    }
+    lines.sort_unstable();
+    lines.dedup();
+
+    let name = trace_name(&data, &cand.id);
+    let mut hits = Vec::new();
+    for &(start, end) in lines.iter().rev() {
+        let Some(json) = verified_json(data[start..end].trim_ascii()) else { continue };
+        if let Some(event) = confirm(json, needles, opts) {
+            hits.push(SearchHit {
+                trace_id: cand.id.clone(),
+                trace_name: name.clone(),
+                event,
+            });
+            if opts.limit.map_or(false, |limit| hits.len() >= limit) {
+                break;
+            }
+        }
+    }
+    Some(hits)
+}
+
+/// Full-text search over the raw JSON of every trace under `root`.
+///
+/// Traces are scanned in parallel, most recently written first, with a
+/// SIMD substring search over the file bytes; only lines that contain the
+/// query are parsed. Traces whose Bloom filter rules the query out are
+/// skipped without being read. Hits are passed to `on_hit` in recency order
+/// (newest trace first, newest event first within a trace); returning
+/// `false` from `on_hit`, or reaching `opts.limit`, stops the scan early.
+pub fn search(root: &Path, opts: &SearchOptions, mut on_hit: impl FnMut(SearchHit) -> bool) -> Result<SearchStats> {
+    let mut stats = SearchStats::default();
+    if opts.query.is_empty() || opts.limit == Some(0) {
+        return Ok(stats);
+    }
+    let needle_bytes = query_needles(&opts.query);
+    let needles: Vec<memmem::Finder<'_>> = needle_bytes.iter().map(|n| memmem::Finder::new(n)).collect();
+    let candidates = list_candidates(root, opts.since_ns)?;
+    stats.traces_considered = candidates.len();
+    let skipped = AtomicUsize::new(0);
+    let scanned = AtomicUsize::new(0);
+    let unsupported = AtomicUsize::new(0);
+
+    let workers = std::thread::available_parallelism().map_or(4, |n| n.get());
+    let mut remaining = opts.limit;
+    // Work in batches so that a satisfied limit stops the scan without
+    // reading the rest of the root, while results stay in recency order.
+    for batch in candidates.chunks(workers * 4) {
+        let next = AtomicUsize::new(0);
+        let mut results: Vec<Vec<SearchHit>> = Vec::with_capacity(batch.len());
+        results.resize_with(batch.len(), Vec::new);
+        let per_trace = SearchOptions { limit: remaining, ..opts.clone() };
+
+        std::thread::scope(|scope| {
+            let handles: Vec<_> = (0..workers.min(batch.len()))
+                .map(|_| {
+                    scope.spawn(|| {
+                        let mut local = Vec::new();
+                        loop {
+                            let i = next.fetch_add(1, Ordering::Relaxed);
+                            if i >= batch.len() {
+                                break;
+                            }
+                            if bloom_excludes(&batch[i], &needle_bytes) {
+                                skipped.fetch_add(1, Ordering::Relaxed);
+                                continue;
+                            }
+                            match scan_trace(&batch[i], &needles, &per_trace) {
+                                Some(hits) => {
+                                    scanned.fetch_add(1, Ordering::Relaxed);
+                                    local.push((i, hits));
+                                }
+                                None => {
+                                    unsupported.fetch_add(1, Ordering::Relaxed);
+                                }
+                            }
+                        }
+                        local
+                    })
+                })
+                .collect();
+            for handle in handles {
+                for (i, hits) in handle.join().unwrap_or_default() {
+                    results[i] = hits;
+                }
+            }
+        });
+
+        stats.traces_skipped = skipped.load(Ordering::Relaxed);
+        stats.traces_scanned = scanned.load(Ordering::Relaxed);
+        stats.traces_unsupported = unsupported.load(Ordering::Relaxed);
+        for hit in results.into_iter().flatten() {
+            if !on_hit(hit) {
+                return Ok(stats);
+            }
+            if let Some(left) = remaining.as_mut() {
+                *left -= 1;
+                if *left == 0 {
+                    return Ok(stats);
+                }
+            }
+        }
+    }
+    Ok(stats)
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::event::Event;
+    use crate::writer::TraceWriter;
+    use serde_json::json;
+    use tempfile::tempdir;
+
+    #[test]
+    fn test_query_needles_escapes() {
+        let needles = query_needles("café \"x\"");
+        assert_eq!(needles[0], "café \\\"x\\\"".as_bytes());
+        assert_eq!(needles[1], b"caf\\u00e9 \\\"x\\\"");
+    }
+
+    #[test]
+    fn test_search_payload_only_and_limit() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        {
+            let mut writer = TraceWriter::start("t1", tmp.path())?;
+            writer.emit(&Event::new("t1".into(), 1, "trace_start".into(), json!({"trace_name": "demo"})))?;
+            for seq in 2..6 {
+                writer.emit(&Event::new("t1".into(), seq, "user_input".into(), json!({"text": format!("needle {seq}")})))?;
+            }
+            // Matches only in a header field: not a hit.
+            writer.emit(&Event::new("t1".into(), 6, "needle".into(), json!({})))?;
+        }
+
+        let opts = SearchOptions { query: "needle".into(), limit: Some(2), ..Default::default() };
+        let mut hits = Vec::new();
+        search(tmp.path(), &opts, |hit| {
+            hits.push(hit);
+            true
+        })?;
+        assert_eq!(hits.len(), 2);
+        assert_eq!(hits[0].trace_name, "demo");
+        assert_eq!(hits[0].event["seq"], 5);
+        assert_eq!(hits[1].event["seq"], 4);
+
+        let opts = SearchOptions {
+            query: "needle".into(),
+            kinds: Some(vec!["trace_start".into()]),
+            ..Default::default()
+        };
+        let mut count = 0;
+        search(tmp.path(), &opts, |_| {
+            count += 1;
+            true
+        })?;
+        assert_eq!(count, 0);
+        Ok(())
+    }
+
+    #[test]
+    fn test_search_archived_traces() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        for id in ["zlib", "lzma"] {
+            let dir = tmp.path().join(id);
+            std::fs::create_dir_all(&dir)?;
+            let lines = vec![format!(r#"{{"seq":1,"kind":"user_input","payload":{{"text":"archived {id}"}}}}"#)];
+            crate::archive::tests::write_archive(&dir, &lines, 1)?;
+        }
+        // Relabel one archive as lzma, which this crate cannot decode.
+        let path = tmp.path().join("lzma").join(ARCHIVE_FILE);
+        let mut bytes = std::fs::read(&path)?;
+        bytes[5] = crate::archive::CODEC_LZMA;
+        std::fs::write(&path, bytes)?;
+
+        let opts = SearchOptions { query: "archived".into(), ..Default::default() };
+        let mut hits = Vec::new();
+        let stats = search(tmp.path(), &opts, |hit| {
+            hits.push(hit);
+            true
+        })?;
+        assert_eq!(hits.len(), 1);
+        assert_eq!(hits[0].trace_id, "zlib");
+        assert_eq!(stats.traces_scanned, 1);
+        assert_eq!(stats.traces_unsupported, 1);
+        Ok(())
+    }
+
+    #[test]
+    fn test_search_binary_trace() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        let mut writer = TraceWriter::open("bin", tmp.path(), None, crate::writer::EventFormat::Binary)?;
+        writer.emit(&Event::new("bin".into(), 1, "user_input".into(), json!({"text": "binary needle"})))?;
+        writer.finish()?;
+
+        let opts = SearchOptions { query: "needle".into(), ..Default::default() };
+        let mut hits = Vec::new();
+        search(tmp.path(), &opts, |hit| {
+            hits.push(hit);
+            true
+        })?;
+        assert_eq!(hits.len(), 1);
+        assert_eq!(hits[0].trace_id, "bin");
+        Ok(())
+    }
+
+    #[test]
+    fn test_search_skips_traces_by_bloom() -> anyhow::Result<()> {
+        let tmp = tempdir()?;
+        for (id, text) in [("a", "alpha words"), ("b", "beta words")] {
+            let mut writer = TraceWriter::start(id, tmp.path())?.with_bloom(0.001);
+            writer.emit(&Event::new(id.into(), 1, "user_input".into(), json!({"text": text})))?;
+            writer.finish()?;
+        }
+
+        let opts = SearchOptions { query: "alpha".into(), ..Default::default() };
+        let mut hits = Vec::new();
+        let stats = search(tmp.path(), &opts, |hit| {
+            hits.push(hit);
+            true
+        })?;
+        assert_eq!(hits.len(), 1);
+        assert_eq!(hits[0].trace_id, "a");
+        assert_eq!(stats.traces_considered, 2);
+        assert_eq!(stats.traces_skipped, 1);
+        assert_eq!(stats.traces_scanned, 1);
+        assert_eq!(stats.skip_ratio(), 0.5);
+        Ok(())
+    }
+}
@@ -1,10 +1,163 @@
+//! On-disk layout of a trace root.
+//!
+//! Two layouts can coexist under one root:
+//!
+//! - flat: `<root>/<trace_id>/events.jsonl`
+//! - partitioned: `<root>/<project>/<yyyy>/<mm>/<dd>/<trace_id>/events.jsonl`,
+//!   dated by the trace's start time (UTC).
+//!
+//! A trace directory holds `events.jsonl`, or `events.bin` for traces written
+//! in the binary format, or `events.archive` once compacted.
+//!
+//! A top-level directory that holds an events file is a flat trace; any other
+//! top-level directory is a project partition. Names starting with `_` or `.`
+//! are reserved and never treated as traces or projects.
+
 use std::path::{Path, PathBuf};
 use anyhow::Result;
+use crate::archive::ARCHIVE_FILE;
+use crate::binformat::BINARY_FILE;
+use crate::ids::trace_id_time_ns;
+
+pub const EVENTS_FILE: &str = "events.jsonl";
+/// Partition name for traces without a project.
+pub const DEFAULT_PROJECT: &str = "default";
+
+const NS_PER_DAY: i64 = 86_400_000_000_000;
 
 pub struct StorageLayout {
     pub root: PathBuf,
 }
 
+/// A trace directory found under the root.
+#[derive(Debug, Clone)]
+pub struct TraceLocation {
+    pub id: String,
+    pub dir: PathBuf,
+    /// Partition `(project dir name, (year, month, day))`; `None` for flat traces.
+    pub partition: Option<(String, (i32, u32, u32))>,
+}
+
+impl TraceLocation {
+    pub fn events_file(&self) -> PathBuf {
+        self.dir.join(EVENTS_FILE)
+    }
+
+    /// True once `agenttrace compact` replaced the JSONL with an archive.
+    pub fn is_archived(&self) -> bool {
+        is_archived(&self.dir)
+    }
+
+    /// The file holding the events: JSONL, binary, or an archive.
+    pub fn data_file(&self) -> PathBuf {
+        data_file(&self.dir)
+    }
+}
+
+/// Restricts which partitions [`StorageLayout::trace_dirs`] descends into.
+/// Flat traces are never pruned.
+#[derive(Debug, Clone, Default)]
+pub struct PartitionFilter {
+    pub project: Option<String>,
+    pub since_ns: Option<u64>,
+    pub until_ns: Option<u64>,
+}
+
+impl PartitionFilter {
+    fn bounds(&self) -> (Option<(i32, u32, u32)>, Option<(i32, u32, u32)>) {
+        (self.since_ns.map(civil_date), self.until_ns.map(civil_date))
+    }
+}
+
+fn in_range<T: PartialOrd>(value: T, lo: Option<T>, hi: Option<T>) -> bool {
+    lo.map_or(true, |lo| value >= lo) && hi.map_or(true, |hi| value <= hi)
+}
+
+/// UTC calendar date of a unix timestamp in nanoseconds.
+pub fn civil_date(ts_unix_ns: u64) -> (i32, u32, u32) {
+    civil_from_days((ts_unix_ns as i64).div_euclid(NS_PER_DAY))
+}
+
+// Howard Hinnant's days -> civil date algorithm.
+fn civil_from_days(days: i64) -> (i32, u32, u32) {
+    let z = days + 719_468;
+    let era = z.div_euclid(146_097);
+    let doe = z.rem_euclid(146_097);
+    let yoe = (doe - doe / 1460 + doe / 36_524 - doe / 146_096) / 365;
+    let doy = doe - (365 * yoe + yoe / 4 - yoe / 100);
+    let mp = (5 * doy + 2) / 153;
+    let d = (doy - (153 * mp + 2) / 5 + 1) as u32;
+    let m = if mp < 10 { mp + 3 } else { mp - 9 } as u32;
+    let y = (yoe + era * 400 + i64::from(m <= 2)) as i32;
+    (y, m, d)
+}
+
+/// Directory name used for a project's partition.
+pub fn project_dir_name(project: Option<&str>) -> String {
+    let cleaned: String = project
+        .unwrap_or("")
+        .chars()
+        .map(|c| if c.is_ascii_alphanumeric() || matches!(c, '-' | '_' | '.') { c } else { '_' })
+        .collect();
+    let cleaned = cleaned.trim_start_matches(['_', '.']);
+    if cleaned.is_empty() {
+        DEFAULT_PROJECT.to_string()
+    } else {
+        cleaned.to_string()
+    }
+}
+
+/// Relative partition path `<project>/<yyyy>/<mm>/<dd>` for a trace started at `ts_unix_ns`.
+pub fn partition_path(project: Option<&str>, ts_unix_ns: u64) -> PathBuf {
+    let (y, m, d) = civil_date(ts_unix_ns);
+    PathBuf::from(project_dir_name(project))
+        .join(format!("{y:04}"))
+        .join(format!("{m:02}"))
+        .join(format!("{d:02}"))
+}
+
+fn is_reserved(name: &str) -> bool {
+    name.starts_with('_') || name.starts_with('.')
+}
+
+fn is_trace_dir(dir: &Path) -> bool {
+    [EVENTS_FILE, BINARY_FILE, ARCHIVE_FILE].iter().any(|name| dir.join(name).is_file())
+}
+
+/// The events file of a trace directory: `events.jsonl` if present, then
+/// `events.bin`, then `events.archive`.
+pub fn data_file(dir: &Path) -> PathBuf {
+    for name in [EVENTS_FILE, BINARY_FILE] {
+        let path = dir.join(name);
+        if path.exists() {
+            return path;
+        }
+    }
+    dir.join(ARCHIVE_FILE)
+}
+
+/// Whether a trace directory holds an archive instead of `events.jsonl`.
+pub fn is_archived(dir: &Path) -> bool {
+    !dir.join(EVENTS_FILE).exists() && dir.join(ARCHIVE_FILE).is_file()
+}
+
+/// Sorted numeric subdirectories of `dir` (`yyyy`, `mm` or `dd`).
+fn numeric_dirs(dir: &Path, width: usize) -> Vec<(u32, PathBuf)> {
+    let Ok(entries) = std::fs::read_dir(dir) else { return Vec::new() };
+    let mut out: Vec<(u32, PathBuf)> = entries
+        .flatten()
+        .filter_map(|e| {
+            let name = e.file_name().to_string_lossy().to_string();
+            if name.len() != width || !e.file_type().ok()?.is_dir() {
+                return None;
+            }
+            Some((name.parse().ok()?, e.path()))
+        })
+        .collect();
+    out.sort();
+    out
+}
+
 impl StorageLayout {
     pub fn new(root: impl AsRef<Path>) -> Self {
         Self {
@@ -12,12 +165,13 @@ impl StorageLayout {
         }
     }
 
+    /// Flat location of a trace; see [`resolve`](Self::resolve) for lookups.
     pub fn trace_dir(&self, trace_id: &str) -> PathBuf {
         self.root.join(trace_id)
     }
 
     pub fn events_file(&self, trace_id: &str) -> PathBuf {
-        self.trace_dir(trace_id).join("events.jsonl")
+        self.trace_dir(trace_id).join(EVENTS_FILE)
     }
 
     pub fn ensure_trace_dir(&self, trace_id: &str) -> Result<PathBuf> {
@@ -25,4 +179,153 @@ impl StorageLayout {
         std::fs::create_dir_all(&path)?;
         Ok(path)
     }
+
+    /// Find the directory of an existing trace in either layout.
+    ///
+    /// Flat traces are a single `stat`. A time-ordered ID names its own day
+    /// partition, so it costs one `stat` per project; other partitioned
+    /// traces one `stat` per day partition. The traces themselves are never
+    /// listed.
+    pub fn resolve(&self, trace_id: &str) -> Option<PathBuf> {
+        if trace_id.is_empty() || is_reserved(trace_id) || trace_id.contains(['/', '\\']) {
+            return None;
+        }
+        let flat = self.trace_dir(trace_id);
+        if is_trace_dir(&flat) {
+            return Some(flat);
+        }
+        let projects = self.project_dirs();
+        if let Some(ts_ns) = trace_id_time_ns(trace_id) {
+            let (y, m, d) = civil_date(ts_ns);
+            let day = format!("{y:04}/{m:02}/{d:02}");
+            for project in &projects {
+                let dir = project.join(&day).join(trace_id);
+                if is_trace_dir(&dir) {
+                    return Some(dir);
+                }
+            }
+        }
+        for project in projects {
+            for (_, year) in numeric_dirs(&project, 4) {
+                for (_, month) in numeric_dirs(&year, 2) {
+                    for (_, day) in numeric_dirs(&month, 2) {
+                        let dir = day.join(trace_id);
+                        if is_trace_dir(&dir) {
+                            return Some(dir);
+                        }
+                    }
+                }
+            }
+        }
+        None
+    }
+
+    fn project_dirs(&self) -> Vec<PathBuf> {
+        let Ok(entries) = std::fs::read_dir(&self.root) else { return Vec::new() };
+        entries
+            .flatten()
+            .filter(|e| e.file_type().map_or(false, |t| t.is_dir()))
+            .filter(|e| !is_reserved(&e.file_name().to_string_lossy()))
+            .map(|e| e.path())
+            .filter(|p| !is_trace_dir(p))
+            .collect()
+    }
+
+    /// Every trace directory under the root, pruning partitions that cannot
+    /// match `filter` by project name and start date.
+    pub fn trace_dirs(&self, filter: &PartitionFilter) -> Result<Vec<TraceLocation>> {
+        let mut out = Vec::new();
+        if !self.root.exists() {
+            return Ok(out);
+        }
+        let (lo, hi) = filter.bounds();
+        let only = filter.project.as_deref().map(|p| project_dir_name(Some(p)));
+        for entry in std::fs::read_dir(&self.root)? {
+            let entry = entry?;
+            let name = entry.file_name().to_string_lossy().to_string();
+            if is_reserved(&name) || !entry.file_type()?.is_dir() {
+                continue;
+            }
+            let path = entry.path();
+            if is_trace_dir(&path) {
+                out.push(TraceLocation { id: name, dir: path, partition: None });
+                continue;
+            }
+            if only.as_deref().map_or(false, |p| p != name) {
+                continue;
+            }
+            for (y, year) in numeric_dirs(&path, 4) {
+                let y = y as i32;
+                if !in_range(y, lo.map(|d| d.0), hi.map(|d| d.0)) {
+                    continue;
+                }
+                for (m, month) in numeric_dirs(&year, 2) {
+                    if !in_range((y, m), lo.map(|d| (d.0, d.1)), hi.map(|d| (d.0, d.1))) {
+                        continue;
+                    }
+                    for (d, day) in numeric_dirs(&month, 2) {
+                        if !in_range((y, m, d), lo, hi) {
+                            continue;
+                        }
+                        for trace in std::fs::read_dir(&day)?.flatten() {
+                            let id = trace.file_name().to_string_lossy().to_string();
+                            let dir = trace.path();
+                            if is_reserved(&id) || !is_trace_dir(&dir) {
+                                continue;
+                            }
+                            out.push(TraceLocation {
+                                id,
+                                dir,
+                                partition: Some((name.clone(), (y, m, d))),
+                            });
+                        }
+                    }
+                }
+            }
+        }
+        Ok(out)
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use tempfile::TempDir;
+
+    #[test]
+    fn test_civil_date_and_partition_path() {
+        assert_eq!(civil_date(0), (1970, 1, 1));
+        // 2024-02-29T12:00:00Z
+        assert_eq!(civil_date(1_709_208_000_000_000_000), (2024, 2, 29));
+        assert_eq!(
+            partition_path(Some("my app/v2"), 1_709_208_000_000_000_000),
+            PathBuf::from("my_app_v2/2024/02/29")
+        );
+        assert_eq!(project_dir_name(None), DEFAULT_PROJECT);
+        assert_eq!(project_dir_name(Some("_x")), "x");
+    }
+
+    #[test]
+    fn test_resolve_and_prune() -> Result<()> {
+        let tmp = TempDir::new()?;
+        let layout = StorageLayout::new(tmp.path());
+        let flat = layout.ensure_trace_dir("flat1")?;
+        std::fs::write(flat.join(EVENTS_FILE), "")?;
+        let day = tmp.path().join(partition_path(Some("p"), 1_709_208_000_000_000_000)).join("part1");
+        std::fs::create_dir_all(&day)?;
+        std::fs::write(day.join(EVENTS_FILE), "")?;
+        std::fs::create_dir_all(tmp.path().join("_rollups"))?;
+
+        assert_eq!(layout.resolve("flat1"), Some(flat));
+        assert_eq!(layout.resolve("part1"), Some(day));
+        assert_eq!(layout.resolve("missing"), None);
+
+        assert_eq!(layout.trace_dirs(&PartitionFilter::default())?.len(), 2);
+        let other = PartitionFilter { project: Some("q".into()), ..Default::default() };
+        assert_eq!(layout.trace_dirs(&other)?.len(), 1);
+        let later = PartitionFilter { since_ns: Some(1_709_308_000_000_000_000), ..Default::default() };
+        let ids: Vec<String> = layout.trace_dirs(&later)?.into_iter().map(|t| t.id).collect();
+        assert_eq!(ids, vec!["flat1".to_string()]);
+        Ok(())
+    }
 }
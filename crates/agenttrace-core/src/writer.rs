@@ -1,37 +1,127 @@
 use std::fs::{File, OpenOptions};
 use std::io::{Write, BufWriter};
 use anyhow::{Result, Context};
+use std::path::PathBuf;
+use crate::binformat::{self, Encoder, BINARY_FILE, HEADER};
+use crate::bloom::{BloomBuilder, BLOOM_FILE};
 use crate::event::Event;
 use crate::crc;
-use crate::storage::StorageLayout;
+use crate::storage::{StorageLayout, EVENTS_FILE};
+
+/// On-disk encoding of a trace's events.
+#[derive(Debug, Clone, Copy, PartialEq, Eq, Default)]
+pub enum EventFormat {
+    /// `events.jsonl`: one JSON line per event with a CRC-32C suffix.
+    #[default]
+    Jsonl,
+    /// `events.bin`: CRC-framed binary records (see [`crate::binformat`]).
+    Binary,
+}
+
+impl std::str::FromStr for EventFormat {
+    type Err = anyhow::Error;
+
+    fn from_str(s: &str) -> Result<Self> {
+        match s {
+            "jsonl" => Ok(Self::Jsonl),
+            "binary" => Ok(Self::Binary),
+            other => anyhow::bail!("unknown event format: {other}"),
+        }
+    }
+}
 
 pub struct TraceWriter {
     pub trace_id: String,
     writer: BufWriter<File>,
+    trace_dir: PathBuf,
+    bloom: Option<(BloomBuilder, f64)>,
+    /// Set for [`EventFormat::Binary`].
+    encoder: Option<Encoder>,
 }
 
 impl TraceWriter {
+    /// Start a trace in the flat layout, `<root>/<trace_id>/`.
     pub fn start(trace_id: &str, root: &std::path::Path) -> Result<Self> {
-        let layout = StorageLayout::new(root);
-        layout.ensure_trace_dir(trace_id)?;
-        let path = layout.events_file(trace_id);
-        
+        Self::open(trace_id, root, None, EventFormat::Jsonl)
+    }
+
+    /// Start a trace under a partition directory relative to `root`, e.g.
+    /// one returned by [`partition_path`](crate::storage::partition_path).
+    pub fn start_in(trace_id: &str, root: &std::path::Path, partition: &std::path::Path) -> Result<Self> {
+        Self::open(trace_id, root, Some(partition), EventFormat::Jsonl)
+    }
+
+    /// Start a trace in either layout (flat when `partition` is `None`),
+    /// writing events in `format`. An existing trace is appended to.
+    pub fn open(
+        trace_id: &str,
+        root: &std::path::Path,
+        partition: Option<&std::path::Path>,
+        format: EventFormat,
+    ) -> Result<Self> {
+        let trace_dir = match partition {
+            Some(partition) => {
+                let dir = root.join(partition).join(trace_id);
+                std::fs::create_dir_all(&dir)?;
+                dir
+            }
+            None => StorageLayout::new(root).ensure_trace_dir(trace_id)?,
+        };
+        let path = trace_dir.join(match format {
+            EventFormat::Jsonl => EVENTS_FILE,
+            EventFormat::Binary => BINARY_FILE,
+        });
+        // Appending makes any existing filter stale.
+        let _ = std::fs::remove_file(trace_dir.join(BLOOM_FILE));
+
         let file = OpenOptions::new()
             .create(true)
             .append(true)
             .open(&path)
             .with_context(|| format!("Failed to open events file at {:?}", path))?;
-            
+        let mut writer = BufWriter::new(file);
+
+        let encoder = match format {
+            EventFormat::Jsonl => None,
+            EventFormat::Binary if writer.get_ref().metadata()?.len() == 0 => {
+                writer.write_all(&HEADER)?;
+                Some(Encoder::default())
+            }
+            // Later records may refer to strings defined earlier in the file.
+            EventFormat::Binary => Some(Encoder::with_strings(binformat::load_strings(&path)?)),
+        };
+
         Ok(Self {
             trace_id: trace_id.to_string(),
-            writer: BufWriter::new(file),
+            writer,
+            trace_dir,
+            bloom: None,
+            encoder,
         })
     }
 
+    /// Build a trigram Bloom filter over the written events and persist it
+    /// as `events.bloom` when the trace finishes.
+    pub fn with_bloom(mut self, fp_rate: f64) -> Self {
+        self.bloom = Some((BloomBuilder::default(), fp_rate));
+        self
+    }
+
     pub fn emit(&mut self, event: &Event) -> Result<()> {
+        if let Some(encoder) = self.encoder.as_mut() {
+            if let Some((builder, _)) = self.bloom.as_mut() {
+                // The filter indexes the JSON text that search scans.
+                builder.add(serde_json::to_string(event)?.as_bytes());
+            }
+            self.writer.write_all(&encoder.encode_event(event))?;
+            return Ok(());
+        }
         let json = serde_json::to_string(event)?;
         let crc_val = crc::calculate(json.as_bytes());
         let crc_hex = crc::format_hex(crc_val);
+        if let Some((builder, _)) = self.bloom.as_mut() {
+            builder.add(json.as_bytes());
+        }
 
         writeln!(self.writer, "{}	{}", json, crc_hex)?;
         Ok(())
@@ -45,6 +135,9 @@ impl TraceWriter {
 
     pub fn finish(mut self) -> Result<()> {
         self.writer.flush()?;
+        if let Some((builder, fp_rate)) = self.bloom.take() {
+            builder.build(fp_rate).write_to(&self.trace_dir.join(BLOOM_FILE))?;
+        }
         Ok(())
     }
 }
@@ -80,4 +173,40 @@ mod tests {
 
         Ok(())
     }
+
+    #[test]
+    fn test_writer_bloom_on_finish() -> Result<()> {
+        let tmp = tempdir()?;
+        let trace_id = "bloom-trace";
+        let mut writer = TraceWriter::start(trace_id, tmp.path())?.with_bloom(0.01);
+        writer.emit(&Event::new(trace_id.to_string(), 1, "test".to_string(), json!({"text": "searchable"})))?;
+        let bloom_path = tmp.path().join(trace_id).join(BLOOM_FILE);
+        assert!(!bloom_path.exists());
+        writer.finish()?;
+
+        let bloom = crate::bloom::Bloom::read_from(&bloom_path)?;
+        assert!(bloom.may_contain(b"searchable"));
+        assert!(!bloom.may_contain(b"not-in-this-trace"));
+        Ok(())
+    }
+
+    #[test]
+    fn test_writer_binary_format() -> Result<()> {
+        let tmp = tempdir()?;
+        let trace_id = "binary-trace";
+        for seq in 1..=2 {
+            // The second writer appends, continuing the file's string table.
+            let mut writer = TraceWriter::open(trace_id, tmp.path(), None, EventFormat::Binary)?;
+            writer.emit(&Event::new(trace_id.to_string(), seq, "test".to_string(), json!({"seq": seq})))?;
+            writer.finish()?;
+        }
+        let dir = tmp.path().join(trace_id);
+        assert!(!dir.join(EVENTS_FILE).exists());
+
+        let events: Vec<_> = binformat::BinaryEvents::open(&dir.join(BINARY_FILE))?.collect::<std::result::Result<_, _>>()?;
+        assert_eq!(events.len(), 2);
+        assert_eq!(events[1]["kind"], "test");
+        assert_eq!(events[1]["payload"], json!({"seq": 2}));
+        Ok(())
+    }
 }
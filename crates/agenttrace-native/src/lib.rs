@@ -1,10 +1,14 @@
-use agenttrace_core::{Event, TraceReader, TraceWriter};
-use pyo3::exceptions::{PyFileNotFoundError, PyRuntimeError, PyValueError};
+use agenttrace_core::reader::split_lazy;
+use agenttrace_core::{
+    filter, search, ArchiveError, Event, EventFilter, EventFormat, EventLines, PartitionFilter, ReadError,
+    ScannedEvent, SearchOptions, TraceReader, TraceWriter,
+};
+use pyo3::exceptions::{PyFileNotFoundError, PyNotImplementedError, PyRuntimeError, PyValueError};
 use pyo3::prelude::*;
-use pyo3::types::{PyDict, PyList};
+use pyo3::types::{PyDict, PyList, PyTuple};
 use serde_json::Value;
 use std::collections::HashMap;
-use std::path::Path;
+use std::path::{Path, PathBuf};
 
 // ---------------------------------------------------------------------------
 // NativeTraceWriter
@@ -18,10 +22,26 @@ struct NativeTraceWriter {
 
 #[pymethods]
 impl NativeTraceWriter {
+    /// `bloom_fp`: when set, build a trigram Bloom filter with this
+    /// false-positive rate and write it next to the events on `finish()`.
+    /// `partition`: relative directory (e.g. `proj/2024/02/29`) to place the
+    /// trace under instead of directly in `root`.
+    /// `format`: `"jsonl"` (`events.jsonl`) or `"binary"` (`events.bin`).
     #[new]
-    fn new(trace_id: String, root: String) -> PyResult<Self> {
-        let writer = TraceWriter::start(&trace_id, Path::new(&root))
-            .map_err(|err| PyRuntimeError::new_err(err.to_string()))?;
+    #[pyo3(signature = (trace_id, root, bloom_fp = None, partition = None, format = "jsonl"))]
+    fn new(
+        trace_id: String,
+        root: String,
+        bloom_fp: Option<f64>,
+        partition: Option<String>,
+        format: &str,
+    ) -> PyResult<Self> {
+        let format = format.parse::<EventFormat>().map_err(|err| PyValueError::new_err(err.to_string()))?;
+        let started = TraceWriter::open(&trace_id, Path::new(&root), partition.as_deref().map(Path::new), format);
+        let mut writer = started.map_err(|err| PyRuntimeError::new_err(err.to_string()))?;
+        if let Some(fp_rate) = bloom_fp {
+            writer = writer.with_bloom(fp_rate);
+        }
         Ok(Self {
             trace_id,
             writer: Some(writer),
@@ -90,6 +110,7 @@ impl NativeTraceWriter {
 #[pyclass]
 struct NativeTraceReader {
     reader: TraceReader,
+    root: PathBuf,
 }
 
 #[pymethods]
@@ -97,14 +118,31 @@ impl NativeTraceReader {
     #[new]
     fn new(root: String) -> Self {
         Self {
-            reader: TraceReader::new(root),
+            reader: TraceReader::new(&root),
+            root: PathBuf::from(root),
         }
     }
 
-    fn list_traces(&self, py: Python<'_>) -> PyResult<PyObject> {
-        let traces = self
-            .reader
-            .list_traces()
+    /// List traces newest first, at most `limit`. `project` and the
+    /// `since`/`until` bounds (unix seconds, on the trace start time) prune
+    /// partitioned directories before they are listed; traces with
+    /// time-ordered IDs are ordered and windowed without opening them.
+    #[pyo3(signature = (project = None, since = None, until = None, limit = None))]
+    fn list_traces(
+        &self,
+        py: Python<'_>,
+        project: Option<String>,
+        since: Option<f64>,
+        until: Option<f64>,
+        limit: Option<usize>,
+    ) -> PyResult<PyObject> {
+        let filter = PartitionFilter {
+            project,
+            since_ns: since.map(since_ns),
+            until_ns: until.map(until_ns),
+        };
+        let traces = py
+            .allow_threads(|| self.reader.list_traces_filtered(&filter, limit))
             .map_err(|e| PyRuntimeError::new_err(e.to_string()))?;
 
         let list = PyList::empty_bound(py);
@@ -120,23 +158,135 @@ impl NativeTraceReader {
         Ok(list.into())
     }
 
-    fn get_events(&self, py: Python<'_>, trace_id: String) -> PyResult<PyObject> {
-        let events = self.reader.get_events(&trace_id).map_err(|e| {
-            // Map TraceNotFound to Python FileNotFoundError, others to RuntimeError
-            let msg = e.to_string();
-            if msg.starts_with("trace not found") {
-                PyFileNotFoundError::new_err(msg)
-            } else {
-                PyRuntimeError::new_err(msg)
-            }
-        })?;
-
+    /// Return the events of a trace as dicts.
+    ///
+    /// Filters are evaluated on each line's header before it is parsed, so
+    /// non-matching events never become Python objects. `fields` projects
+    /// each event down to the listed top-level keys. With `lazy=True` (and no
+    /// projection) each item is a `(header_dict, deferred_json)` tuple where
+    /// `attrs`/`payload` are left as raw JSON text.
+    #[pyo3(signature = (
+        trace_id, lazy = false, kinds = None, span_id = None, level = None,
+        ts_min = None, ts_max = None, seq_min = None, seq_max = None, fields = None
+    ))]
+    #[allow(clippy::too_many_arguments)]
+    fn get_events(
+        &self,
+        py: Python<'_>,
+        trace_id: String,
+        lazy: bool,
+        kinds: Option<Vec<String>>,
+        span_id: Option<String>,
+        level: Option<String>,
+        ts_min: Option<u64>,
+        ts_max: Option<u64>,
+        seq_min: Option<u64>,
+        seq_max: Option<u64>,
+        fields: Option<Vec<String>>,
+    ) -> PyResult<PyObject> {
+        let filter = EventFilter { kinds, span_id, level, ts_min, ts_max, seq_min, seq_max };
+        let mut lines = self.reader.scan(&trace_id, filter).map_err(read_error_to_py)?;
         let list = PyList::empty_bound(py);
-        for value in &events {
-            list.append(json_to_py(py, value)?)?;
+        while let Some(event) = lines.next_event() {
+            let event = event.map_err(read_error_to_py)?;
+            list.append(event_to_py(py, event, lazy, fields.as_deref())?)?;
         }
         Ok(list.into())
     }
+
+    /// Streaming variant of [`get_events`]: returns an iterator that reads
+    /// and converts one matching event at a time.
+    #[pyo3(signature = (
+        trace_id, lazy = false, kinds = None, span_id = None, level = None,
+        ts_min = None, ts_max = None, seq_min = None, seq_max = None, fields = None
+    ))]
+    #[allow(clippy::too_many_arguments)]
+    fn iter_events(
+        &self,
+        trace_id: String,
+        lazy: bool,
+        kinds: Option<Vec<String>>,
+        span_id: Option<String>,
+        level: Option<String>,
+        ts_min: Option<u64>,
+        ts_max: Option<u64>,
+        seq_min: Option<u64>,
+        seq_max: Option<u64>,
+        fields: Option<Vec<String>>,
+    ) -> PyResult<NativeEventIter> {
+        let filter = EventFilter { kinds, span_id, level, ts_min, ts_max, seq_min, seq_max };
+        let lines = self.reader.scan(&trace_id, filter).map_err(read_error_to_py)?;
+        Ok(NativeEventIter { lines, lazy, fields })
+    }
+
+    /// Substring search over the raw JSON of `payload`/`attrs` across all
+    /// traces, newest first. `since` is a unix timestamp in seconds.
+    ///
+    /// Returns `(hits, stats)` where `stats` counts the traces considered,
+    /// skipped via Bloom filters and actually scanned.
+    #[pyo3(signature = (query, limit = None, kinds = None, since = None))]
+    fn search(
+        &self,
+        py: Python<'_>,
+        query: String,
+        limit: Option<usize>,
+        kinds: Option<Vec<String>>,
+        since: Option<f64>,
+    ) -> PyResult<PyObject> {
+        let opts = SearchOptions {
+            query,
+            limit,
+            kinds,
+            since_ns: since.map(since_ns),
+        };
+        let root = self.root.clone();
+        let (hits, stats) = py
+            .allow_threads(move || {
+                let mut hits = Vec::new();
+                search(&root, &opts, |hit| {
+                    hits.push(hit);
+                    true
+                })
+                .map(|stats| (hits, stats))
+            })
+            .map_err(|e| PyRuntimeError::new_err(e.to_string()))?;
+
+        let list = PyList::empty_bound(py);
+        for hit in &hits {
+            let event = json_to_py(py, &hit.event)?;
+            event.bind(py).set_item("trace_name", &hit.trace_name)?;
+            list.append(event)?;
+        }
+        let stats_dict = PyDict::new_bound(py);
+        stats_dict.set_item("traces_considered", stats.traces_considered)?;
+        stats_dict.set_item("traces_skipped", stats.traces_skipped)?;
+        stats_dict.set_item("traces_scanned", stats.traces_scanned)?;
+        stats_dict.set_item("traces_unsupported", stats.traces_unsupported)?;
+        stats_dict.set_item("skip_ratio", stats.skip_ratio())?;
+        Ok(PyTuple::new_bound(py, [list.into_py(py), stats_dict.into_py(py)]).into())
+    }
+}
+
+#[pyclass]
+struct NativeEventIter {
+    lines: EventLines,
+    lazy: bool,
+    fields: Option<Vec<String>>,
+}
+
+#[pymethods]
+impl NativeEventIter {
+    fn __iter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf
+    }
+
+    fn __next__(mut slf: PyRefMut<'_, Self>, py: Python<'_>) -> PyResult<Option<PyObject>> {
+        let Some(event) = slf.lines.next_event() else {
+            return Ok(None);
+        };
+        let event = event.map_err(read_error_to_py)?;
+        event_to_py(py, event, slf.lazy, slf.fields.as_deref()).map(Some)
+    }
 }
 
 // ---------------------------------------------------------------------------
@@ -147,6 +297,7 @@ impl NativeTraceReader {
 fn agenttrace_native(m: &Bound<'_, pyo3::types::PyModule>) -> PyResult<()> {
     m.add_class::<NativeTraceWriter>()?;
     m.add_class::<NativeTraceReader>()?;
+    m.add_class::<NativeEventIter>()?;
     Ok(())
 }
 
@@ -154,6 +305,59 @@ fn agenttrace_native(m: &Bound<'_, pyo3::types::PyModule>) -> PyResult<()> {
 // Helpers
 // ---------------------------------------------------------------------------
 
+/// `since` (unix seconds) as an inclusive ns bound. Float seconds cannot name
+/// an exact nanosecond, so bounds are widened to whole milliseconds.
+fn since_ns(s: f64) -> u64 {
+    ((s * 1e3).floor().max(0.0) as u64).saturating_mul(1_000_000)
+}
+
+/// `until` (unix seconds) as an inclusive ns bound at the end of its millisecond.
+fn until_ns(s: f64) -> u64 {
+    ((s * 1e3).ceil().max(0.0) as u64)
+        .saturating_mul(1_000_000)
+        .saturating_add(999_999)
+}
+
+/// Convert one scanned event into the Python shape requested. Events of
+/// binary traces arrive decoded and are converted without a JSON round trip.
+fn event_to_py(py: Python<'_>, event: ScannedEvent, lazy: bool, fields: Option<&[String]>) -> PyResult<PyObject> {
+    match event {
+        ScannedEvent::Value(value) if !lazy && fields.is_none() => json_to_py(py, &value),
+        other => line_to_py(py, &other.into_json().map_err(read_error_to_py)?, lazy, fields),
+    }
+}
+
+/// Convert one verified JSON event line into the Python shape requested.
+fn line_to_py(py: Python<'_>, line: &str, lazy: bool, fields: Option<&[String]>) -> PyResult<PyObject> {
+    let json_err = |e: serde_json::Error| read_error_to_py(ReadError::from(e));
+    if let Some(fields) = fields {
+        let projected = filter::project(line, fields).map_err(json_err)?;
+        return json_to_py(py, &Value::Object(projected));
+    }
+    if lazy {
+        let event = split_lazy(line).map_err(json_err)?;
+        let header = PyDict::new_bound(py);
+        for (k, v) in &event.header {
+            header.set_item(k, json_to_py(py, v)?)?;
+        }
+        let pair = PyTuple::new_bound(py, [header.into_py(py), event.deferred.into_py(py)]);
+        return Ok(pair.into());
+    }
+    let value: Value = serde_json::from_str(line).map_err(json_err)?;
+    json_to_py(py, &value)
+}
+
+/// Map `TraceNotFound` to Python `FileNotFoundError`, archives in a codec this
+/// build lacks to `NotImplementedError` (the reader retries in Python), others
+/// to `RuntimeError`.
+fn read_error_to_py(err: ReadError) -> PyErr {
+    match err {
+        ReadError::TraceNotFound(_) => PyFileNotFoundError::new_err(err.to_string()),
+        ReadError::Archive(ArchiveError::UnsupportedCodec(_)) => PyNotImplementedError::new_err(err.to_string()),
+        other => PyRuntimeError::new_err(other.to_string()),
+    }
+}
+
 fn json_to_py(py: Python<'_>, value: &Value) -> PyResult<PyObject> {
     match value {
         Value::Null => Ok(py.None()),
@@ -0,0 +1,122 @@
+"""Tests for cross-trace aggregation."""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from agenttrace import analytics
+from agenttrace._native import NativeTraceWriter
+from agenttrace.analytics import METRICS_FILE
+from agenttrace.reader import TraceReader
+from agenttrace.rollups import update_rollups
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_stats_"))
+
+
+def _write(root: Path, trace_id: str, project: str, durations, finish: bool = True) -> None:
+    w = NativeTraceWriter(trace_id, str(root))
+    w.emit(trace_id, 1, 1_000, "trace_start", None, None, "info", "{}",
+           json.dumps({"trace_name": trace_id, "project": project}))
+    seq = 2
+    for i, duration in enumerate(durations):
+        span = f"s{i}"
+        model = "gpt-4o" if i % 2 == 0 else "claude-3-haiku"
+        w.emit(trace_id, seq, 2_000 + seq, "llm_request", span, None, "info", "{}", json.dumps({"model": model}))
+        w.emit(trace_id, seq + 1, 3_000 + seq, "llm_response", span, None, "info", "{}", json.dumps({
+            "duration_ms": duration, "cost_usd": 0.5, "usage": {"total_tokens": 10},
+        }))
+        seq += 2
+    if finish:
+        w.emit(trace_id, seq, 9_000, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+
+
+def test_aggregate_groups_and_percentiles():
+    root = _make_tmp()
+    _write(root, "a", "p1", [10, 100, 20, 200, 30])
+    _write(root, "b", "p2", [40, 400])
+
+    rows = TraceReader(root).aggregate(group_by=["model"])
+    by_model = {r["model"]: r for r in rows}
+    gpt = by_model["gpt-4o"]  # durations 10, 20, 30, 40
+    assert gpt["count"] == 4
+    assert gpt["duration_ms_p50"] == pytest.approx(25.0)
+    assert gpt["duration_ms_p95"] == pytest.approx(38.5)
+    assert gpt["cost_usd_sum"] == pytest.approx(2.0)
+    assert gpt["tokens_sum"] == 40
+    assert by_model["claude-3-haiku"]["duration_ms_p99"] == pytest.approx(396.0)  # 100, 200, 400
+
+    rows = TraceReader(root).aggregate(group_by=["project", "model"], project="p2")
+    assert sorted((r["project"], r["model"], r["count"]) for r in rows) == [
+        ("p2", "claude-3-haiku", 1), ("p2", "gpt-4o", 1),
+    ]
+    with pytest.raises(ValueError):
+        TraceReader(root).aggregate(group_by=["nope"])
+
+
+def test_tool_latency_stays_out_of_model_percentiles():
+    root = _make_tmp()
+    w = NativeTraceWriter("t", str(root))
+    w.emit("t", 1, 1_000, "trace_start", None, None, "info", "{}", json.dumps({"trace_name": "t"}))
+    for i in range(10):
+        seq = 2 + 3 * i
+        w.emit("t", seq, 2_000, "llm_request", "agent", None, "info", "{}", json.dumps({"model": "gpt-4o"}))
+        w.emit("t", seq + 1, 3_000, "llm_response", "agent", None, "info", "{}", json.dumps({"duration_ms": 10}))
+        # A slow tool in the same span inherits the span's model.
+        w.emit("t", seq + 2, 4_000, "tool_result", "agent", None, "info", "{}",
+               json.dumps({"tool": "search", "duration_ms": 60_000}))
+    w.emit("t", 40, 9_000, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+
+    reader = TraceReader(root)
+    by_model = {r["model"]: r for r in reader.aggregate(group_by=["model"])}
+    assert by_model["gpt-4o"]["count"] == 10
+    assert by_model["gpt-4o"]["duration_ms_p99"] == pytest.approx(10.0)
+    update_rollups(reader)
+    by_model = {r["model"]: r for r in reader.aggregate(group_by=["model"], rollups=True)}
+    assert by_model["gpt-4o"]["duration_ms_p99"] == pytest.approx(10.0, rel=0.02)
+    by_tool = {r["tool"]: r for r in TraceReader(root).aggregate(group_by=["tool"], kinds=["tool_result"])}
+    assert by_tool["search"]["duration_ms_p99"] == pytest.approx(60_000.0)
+
+def test_aggregate_uses_index_for_finished_traces(monkeypatch):
+    root = _make_tmp()
+    _write(root, "done", "p", [10, 20])
+    _write(root, "live", "p", [30], finish=False)
+    reader = TraceReader(root)
+    first = reader.aggregate(group_by=["trace_id"])
+
+    assert (root / "done" / METRICS_FILE).exists()
+    assert not (root / "live" / METRICS_FILE).exists()
+
+    built = []
+    original = analytics._build_metrics
+    monkeypatch.setattr(analytics, "_build_metrics", lambda r, t: built.append(t) or original(r, t))
+    assert reader.aggregate(group_by=["trace_id"]) == first
+    assert built == ["live"]
+
+    # Appending makes the index stale; it is rebuilt from the new events.
+    w = NativeTraceWriter("done", str(root))
+    w.emit("done", 99, 99_000, "tool_result", "t1", None, "info", "{}", json.dumps({"duration_ms": 5}))
+    w.finish()
+    rows = {r["trace_id"]: r for r in reader.aggregate(group_by=["trace_id"])}
+    assert rows["done"]["count"] == 3 and "done" in built
+
+
+def test_aggregate_python_matches_numpy(monkeypatch):
+    pytest.importorskip("numpy")
+    root = _make_tmp()
+    _write(root, "a", "p1", [1.5, 7, 3, 9.25, 11, 2, 8])
+    with_numpy = TraceReader(root).aggregate(group_by=["model"], percentiles=(10, 50, 90))
+    monkeypatch.setattr(analytics, "_numpy", lambda: None)
+    without = TraceReader(root).aggregate(group_by=["model"], percentiles=(10, 50, 90))
+    assert len(with_numpy) == len(without)
+    for a, b in zip(with_numpy, without):
+        assert a.keys() == b.keys()
+        for key in a:
+            assert a[key] == (pytest.approx(b[key]) if isinstance(b[key], float) else b[key])
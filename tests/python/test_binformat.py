@@ -0,0 +1,102 @@
+"""Tests for the binary event format."""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from agenttrace.binformat import BINARY_FILE, BinaryDecoder, BinaryEncoder, iter_binary_events
+from agenttrace.reader import TraceReader
+from agenttrace.storage import is_finished
+from agenttrace.tail import TraceTail
+from agenttrace.tracer import Tracer
+from agenttrace._native import NativeTraceWriter
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_bin_"))
+
+
+def _write(root: Path, fmt: str, trace_id: str = "t1", finish: bool = True) -> None:
+    w = NativeTraceWriter(trace_id, str(root), bloom_fp=0.01, format=fmt)
+    w.emit(trace_id, 1, 1000, "trace_start", None, None, "info", "{}",
+           json.dumps({"trace_name": "bin", "project": "p"}))
+    w.emit(trace_id, 2, 2000, "llm_response", "s1", None, "info", json.dumps({"model": "m"}),
+           json.dumps({"text": "héllo wörld", "tokens": 12, "cost": 0.25, "neg": -7,
+                       "big": 2**64 + 1, "u64": 2**63 + 5, "list": [1, None, True, {"k": "v"}]}))
+    w.emit(trace_id, 3, 3000, "tool_call", "s2", "s1", "warn", "{}", json.dumps({"tool": "grep"}))
+    if finish:
+        w.emit(trace_id, 4, 4000, "trace_end", None, None, "info", "{}", json.dumps({"status": "ok"}))
+    w.finish()
+
+
+def test_encoder_roundtrip_and_string_table():
+    enc, dec = BinaryEncoder(), BinaryDecoder()
+    events = [
+        {"kind": "tool_call", "seq": 1, "payload": {"x": -(2**63), "y": 1.5, "z": "ü" * 200}},
+        {"kind": "tool_call", "seq": 2, "payload": {"x": 2**70, "y": [], "z": {}}},
+    ]
+    records = [enc.encode(e) for e in events]
+    # The second record reuses every key and the kind from the table.
+    assert len(records[1]) < len(records[0])
+    assert [dec.decode(r[8:]) for r in records] == events
+
+
+def test_reader_produces_same_dicts_as_jsonl():
+    jsonl_root, bin_root = _make_tmp(), _make_tmp()
+    _write(jsonl_root, "jsonl")
+    _write(bin_root, "binary")
+    assert (bin_root / "t1" / BINARY_FILE).exists()
+    assert not (bin_root / "t1" / "events.jsonl").exists()
+    a, b = TraceReader(root=jsonl_root), TraceReader(root=bin_root)
+
+    assert a.get_trace("t1") == b.get_trace("t1")
+    assert a.get_trace("t1", lazy=True)["events"] == b.get_trace("t1", lazy=True)["events"]
+    for filters in ({"kinds": ["tool_call"]}, {"seq_min": 2, "seq_max": 3}, {"fields": ["seq", "kind"]}):
+        assert a.get_trace("t1", **filters) == b.get_trace("t1", **filters)
+    assert a.list_traces() == b.list_traces()
+    assert b.list_traces()[0]["event_count"] == 4
+
+    hits = b.search("héllo")
+    assert [h["seq"] for h in hits] == [2]
+    b.search("absent")
+    assert b.last_search_stats["traces_skipped"] == 1
+    assert [e["seq"] for e in b.follow("t1", from_seq=3)] == [3, 4]
+
+
+def test_tracer_binary_format():
+    root = _make_tmp()
+    with Tracer("bin-trace", root_dir=root, format="binary") as t:
+        t.user_input("hi")
+    trace_dir = root / t.trace_id
+    assert is_finished(trace_dir / "events.jsonl")
+    kinds = [e["kind"] for e in TraceReader(root=root).get_trace(t.trace_id)["events"]]
+    assert kinds == ["trace_start", "user_input", "trace_end"]
+    with pytest.raises(ValueError):
+        Tracer("x", root_dir=root, format="xml")
+
+
+def test_append_tail_and_corruption():
+    root = _make_tmp()
+    _write(root, "binary", finish=False)
+    path = root / "t1" / BINARY_FILE
+    assert not is_finished(path)
+    tail = TraceTail(path)
+    assert len(tail.read_new()) == 3
+
+    # Reopening appends with the existing string table.
+    w = NativeTraceWriter("t1", str(root), format="binary")
+    w.emit("t1", 4, 4000, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+    assert [e["kind"] for e in tail.read_new()] == ["trace_end"]
+    assert is_finished(path)
+
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])  # torn final record: ignored
+    assert len(list(iter_binary_events(path))) == 3
+    path.write_bytes(data[:20] + bytes([data[20] ^ 0xFF]) + data[21:])
+    with pytest.raises(ValueError):
+        list(iter_binary_events(path))
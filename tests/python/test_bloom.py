@@ -0,0 +1,106 @@
+"""Tests for per-trace search Bloom filters."""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+
+from agenttrace.bloom import BLOOM_FILE, Bloom, BloomBuilder, build_bloom_for_file, load_bloom
+from agenttrace.reader import TraceReader
+from agenttrace._native import NativeTraceWriter
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_bloom_"))
+
+
+def _write_trace(root: Path, trace_id: str, text: str, bloom_fp=0.01) -> None:
+    w = NativeTraceWriter(trace_id, str(root), bloom_fp=bloom_fp)
+    w.emit(trace_id, 1, 100, "trace_start", None, None, "info", "{}",
+           json.dumps({"trace_name": trace_id}))
+    w.emit(trace_id, 2, 200, "user_input", None, None, "info", "{}",
+           json.dumps({"text": text}))
+    w.emit(trace_id, 3, 300, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+
+
+def test_bloom_roundtrip_and_lookup():
+    builder = BloomBuilder()
+    builder.add(b'{"payload":{"text":"hello world"}}')
+    bloom = builder.build(0.01)
+
+    assert bloom.may_contain(b"hello")
+    assert bloom.may_contain(b"lo wor")
+    assert bloom.may_contain(b"xy")
+    assert not bloom.may_contain(b"zebra-unicorn")
+
+    decoded = Bloom.from_bytes(bloom.to_bytes())
+    assert (decoded.k, decoded.m, decoded.n, decoded.bits) == (bloom.k, bloom.m, bloom.n, bloom.bits)
+
+
+def test_bloom_known_bits_match_rust():
+    # Same vector as test_bloom_known_bits in crates/agenttrace-core.
+    bloom = Bloom.with_capacity(10, 0.01)
+    bloom.insert(0x616263)
+    assert (bloom.k, bloom.m) == (7, 96)
+    set_bits = [b for b in range(bloom.m) if bloom.bits[b >> 3] & (1 << (b & 7))]
+    assert set_bits == [9, 24, 36, 51, 66, 78, 93]
+
+
+def test_writer_builds_bloom_on_finish():
+    root = _make_tmp()
+    _write_trace(root, "t1", "the quick brown fox")
+    bloom = load_bloom(root / "t1")
+    assert bloom is not None
+    assert bloom.may_contain(b"quick brown")
+
+    _write_trace(root, "t2", "no filter", bloom_fp=None)
+    assert not (root / "t2" / BLOOM_FILE).exists()
+
+
+def test_writer_builds_bloom_from_file_not_per_emit(monkeypatch):
+    calls = []
+    monkeypatch.setattr(BloomBuilder, "add", lambda self, data: calls.append(data))
+    root = _make_tmp()
+    w = NativeTraceWriter("t1", str(root), bloom_fp=0.01)
+    w.emit("t1", 1, 100, "user_input", None, None, "info", "{}", json.dumps({"text": "x"}))
+    assert calls == []
+    monkeypatch.undo()
+    w.finish()
+
+    # Appending rebuilds the filter over the whole trace, old lines included.
+    _write_trace(root, "t1", "appended later")
+    bloom = load_bloom(root / "t1")
+    assert bloom.may_contain(b'"text":"x"') and bloom.may_contain(b"appended later")
+
+    w = NativeTraceWriter("b1", str(root), bloom_fp=0.01, format="binary")
+    w.emit("b1", 1, 100, "user_input", None, None, "info", "{}", json.dumps({"text": "binary body"}))
+    w.finish()
+    assert load_bloom(root / "b1").may_contain(b"binary body")
+    assert [h["trace_id"] for h in TraceReader(root=root).search("binary body")] == ["b1"]
+
+
+def test_search_skips_traces_via_bloom():
+    root = _make_tmp()
+    _write_trace(root, "t1", "apples and oranges")
+    _write_trace(root, "t2", "bananas")
+    _write_trace(root, "t3", "no filter here", bloom_fp=None)
+
+    reader = TraceReader(root=root)
+    hits = reader.search("bananas")
+    assert [h["trace_id"] for h in hits] == ["t2"]
+    stats = reader.last_search_stats
+    assert stats["traces_considered"] == 3
+    assert stats["traces_skipped"] == 1
+    assert stats["traces_scanned"] == 2
+
+
+def test_build_bloom_for_existing_file():
+    root = _make_tmp()
+    _write_trace(root, "t1", "backfilled text", bloom_fp=None)
+    build_bloom_for_file(root / "t1" / "events.jsonl", 0.01)
+    bloom = load_bloom(root / "t1")
+    assert bloom is not None
+    assert bloom.may_contain(b"backfilled")
+    assert not TraceReader(root=root).search("zzzqqq")
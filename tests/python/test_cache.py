@@ -0,0 +1,82 @@
+"""Tests for the UI server's response cache."""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from agenttrace._native import NativeTraceWriter
+from agenttrace.cache import ResponseCache, TraceObjectCache, trace_stamp
+from agenttrace.config import get_ui_cache_bytes
+
+
+def test_cache_is_bounded_by_bytes_and_evicts_lru():
+    cache = ResponseCache(max_bytes=100)
+    cache.put("a", (1, 1), "q", b"x" * 40)
+    cache.put("b", (1, 1), "q", b"x" * 40)
+    assert cache.get("a", (1, 1), "q") == b"x" * 40  # a is now most recent
+    cache.put("c", (1, 1), "q", b"x" * 40)
+    assert cache.size == 80 and len(cache) == 2
+    assert cache.get("b", (1, 1), "q") is None
+    assert cache.get("a", (1, 1), "q") is not None
+    # Values over the whole budget are not cached at all.
+    cache.put("d", (1, 1), "q", b"x" * 101)
+    assert cache.get("d", (1, 1), "q") is None and cache.size == 80
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_appending_to_a_trace_invalidates_its_entries():
+    root = Path(tempfile.mkdtemp(prefix="agenttrace_cache_"))
+    w = NativeTraceWriter("t1", str(root))
+    w.emit("t1", 1, 1, "trace_start", None, None, "info", "{}", json.dumps({"trace_name": "demo"}))
+    stamp = trace_stamp(root, "t1")
+    assert stamp is not None and trace_stamp(root, "missing") is None
+
+    cache = ResponseCache(max_bytes=1 << 20)
+    cache.put("t1", stamp, ("trace",), b"old")
+    cache.put("t1", stamp, ("events", None), b"old page")
+    cache.put("t2", (5, 5), ("trace",), b"other")
+    assert cache.get("t1", trace_stamp(root, "t1"), ("trace",)) == b"old"
+
+    w.emit("t1", 2, 2, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+    new_stamp = trace_stamp(root, "t1")
+    assert new_stamp != stamp
+    assert cache.get("t1", new_stamp, ("trace",)) is None
+
+    # Storing under the new stamp drops every entry for the old one.
+    cache.put("t1", new_stamp, ("trace",), b"new")
+    assert len(cache) == 2 and cache.size == len(b"new") + len(b"other")
+    assert cache.get("t1", stamp, ("events", None)) is None
+    assert cache.get("t2", (5, 5), ("trace",)) == b"other"
+
+
+def test_get_ui_cache_bytes():
+    with mock.patch.dict(os.environ, {}, clear=True):
+        assert get_ui_cache_bytes() == 256 * 1024 * 1024
+    with mock.patch.dict(os.environ, {"AGENTTRACE_UI_CACHE": "64M"}):
+        assert get_ui_cache_bytes() == 64 * 1024 * 1024
+    with mock.patch.dict(os.environ, {"AGENTTRACE_UI_CACHE": "off"}):
+        assert get_ui_cache_bytes() == 0
+
+
+def test_trace_object_cache_rebuilds_on_new_stamp():
+    cache = TraceObjectCache(max_entries=2)
+    builds = []
+
+    def build(value):
+        builds.append(value)
+        return value
+
+    assert cache.get_or_build("a", (1, 1), lambda: build("a1")) == "a1"
+    assert cache.get_or_build("a", (1, 1), lambda: build("again")) == "a1"
+    assert cache.get_or_build("a", (2, 2), lambda: build("a2")) == "a2"
+    cache.get_or_build("b", (1, 1), lambda: build("b"))
+    cache.get_or_build("c", (1, 1), lambda: build("c"))
+    assert len(cache) == 2
+    assert cache.get_or_build("a", (2, 2), lambda: build("a3")) == "a3"  # evicted
+    assert cache.get_or_build("missing", (0, 0), lambda: None) is None and len(cache) == 2
+    assert builds == ["a1", "a2", "b", "c", "a3"]
@@ -61,6 +61,57 @@ def test_cli_inspect_not_found():
     assert result.returncode != 0
 
 
+def test_cli_diff():
+    root = _make_tmp()
+    _write_trace(root, "trace-a", "same")
+    w = NativeTraceWriter("trace-b", str(root))
+    w.emit("trace-b", 1, 100, "trace_start", None, None, "info", "{}", json.dumps({"trace_name": "same", "project": "test"}))
+    w.emit("trace-b", 2, 150, "tool_call", "s0", None, "info", "{}", json.dumps({"input": "x"}))
+    w.emit("trace-b", 3, 200, "user_input", "s1", None, "info", "{}", json.dumps({"text": "bye"}))
+    w.emit("trace-b", 4, 300, "trace_end", None, None, "info", "{}", json.dumps({"status": "ok"}))
+    w.finish()
+
+    result = _run_cli(root, "diff", "trace-a", "trace-b")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[1:] == [
+        "Seq 2: + tool_call",
+        "Seq 2 -> 3: user_input",
+        '  payload.text: "hello" -> "bye"',
+    ]
+    result = _run_cli(root, "diff", "trace-a", "trace-b", "--summary")
+    assert "2 equal, 1 changed, 1 added, 0 removed" in result.stdout
+
+
+def test_cli_cluster():
+    root = _make_tmp()
+    for i in range(3):
+        _write_trace(root, f"trace-c{i}", "same path")
+
+    result = _run_cli(root, "cluster")
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.splitlines()
+    assert lines[0] == "3 traces in 1 clusters"
+    assert lines[2] == "  trace_start > user_input > trace_end"
+    result = _run_cli(root, "cluster", "--json")
+    assert json.loads(result.stdout)[0]["traces"] == ["trace-c0", "trace-c1", "trace-c2"]
+
+
+def test_cli_profile():
+    root = _make_tmp()
+    w = NativeTraceWriter("trace-p", str(root))
+    w.emit("trace-p", 1, 0, "trace_start", None, None, "info", "{}", json.dumps({"trace_name": "prof"}))
+    w.emit("trace-p", 2, 1_000_000, "tool_call", "s1", None, "info", json.dumps({"tool": "calc"}), "{}")
+    w.emit("trace-p", 3, 4_000_000, "tool_result", "s1", None, "info", "{}", "{}")
+    w.emit("trace-p", 4, 5_000_000, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+
+    result = _run_cli(root, "profile", "trace-p")
+    assert result.returncode == 0, result.stderr
+    assert [line.split() for line in result.stdout.splitlines()[1:]] == [["5.0", "2.0", "prof"], ["3.0", "3.0", "tool:calc"]]
+    result = _run_cli(root, "profile", "trace-p", "--folded")
+    assert result.stdout.splitlines() == ["prof 2000", "prof;tool:calc 3000"]
+
+
 def test_cli_export():
     root = _make_tmp()
     _write_trace(root, "trace-3", "export-test")
@@ -83,6 +134,75 @@ def test_cli_export_to_file():
     assert data["trace_name"] == "file-export"
 
 
+def test_cli_export_jsonl():
+    root = _make_tmp()
+    _write_trace(root, "trace-5", "stream")
+
+    result = _run_cli(root, "export", "trace-5", "--format", "jsonl")
+    assert result.returncode == 0, result.stderr
+    assert [json.loads(line)["kind"] for line in result.stdout.splitlines()] == ["trace_start", "user_input", "trace_end"]
+    result = _run_cli(root, "export", "trace-5", "--format", "chrome-trace")
+    assert json.loads(result.stdout)["traceEvents"][0]["args"] == {"name": "stream"}
+
+    out_file = root / "inspect.json"
+    result = _run_cli(root, "inspect", "trace-5", "--out", str(out_file))
+    assert result.returncode == 0 and result.stdout == ""
+    assert json.loads(out_file.read_text())["trace_name"] == "stream"
+
+
+def test_cli_dataset():
+    root = _make_tmp()
+    w = NativeTraceWriter("trace-10", str(root))
+    w.emit("trace-10", 1, 100, "llm_request", "s1", None, "info", "{}", json.dumps({"model": "m", "messages": []}))
+    w.emit("trace-10", 2, 200, "llm_response", "s1", None, "info", "{}", json.dumps({"content": "hi"}))
+    w.finish()
+
+    result = _run_cli(root, "dataset", "--out", str(root / "_ds"), "--workers", "2")
+    assert result.returncode == 0, result.stderr
+    assert "Wrote 1 pairs from 1 traces to 1 shard(s)" in result.stdout
+    assert "1/1 traces, 1 pairs" in result.stderr
+    assert json.loads((root / "_ds" / "pairs-00000.jsonl").read_text())["response"] == "hi"
+
+
+def test_cli_export_columnar():
+    root = _make_tmp()
+    _write_trace(root, "trace-8", "columnar")
+    out_dir = root / "_columns"
+
+    result = _run_cli(root, "export", "--columnar", "--project", "test", "--out", str(out_dir))
+    assert result.returncode == 0, result.stderr
+    assert "Exported 3 events from 1 traces" in result.stdout
+    assert json.loads((out_dir / "columns.json").read_text())["rows"] == 3
+    assert (out_dir / "cost_usd.npy").exists()
+
+
+def test_cli_stats():
+    root = _make_tmp()
+    _write_trace(root, "trace-9", "stats")
+    w = NativeTraceWriter("trace-9", str(root))
+    w.emit("trace-9", 4, 400, "llm_response", "s1", None, "info", json.dumps({"model": "gpt-4o"}),
+           json.dumps({"duration_ms": 12.0, "cost_usd": 0.01, "usage": {"total_tokens": 7}}))
+    w.finish()
+
+    result = _run_cli(root, "stats", "--by", "project", "--by", "model")
+    assert result.returncode == 0, result.stderr
+    lines = result.stdout.splitlines()
+    assert lines[0].split("\t")[:3] == ["project", "model", "count"]
+    assert lines[1].split("\t") == ["test", "gpt-4o", "1", "12.0", "12.0", "12.0", "7", "0.0100"]
+
+    result = _run_cli(root, "stats", "--json", "--last", "1d")
+    assert json.loads(result.stdout) == []
+
+    w = NativeTraceWriter("trace-9", str(root))
+    w.emit("trace-9", 5, 500, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+    result = _run_cli(root, "rollup")
+    assert "Rolled up 1 trace(s), 1 event(s)" in result.stdout
+    result = _run_cli(root, "stats", "--rollups", "--by", "day")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[1].split("\t")[:2] == ["1970-01-01", "1"]
+
+
 def test_cli_search():
     root = _make_tmp()
     _write_trace(root, "trace-5", "search-test")
@@ -90,3 +210,70 @@ def test_cli_search():
     result = _run_cli(root, "search", "hello")
     assert result.returncode == 0
     assert "hello" in result.stdout or "user_input" in result.stdout
+    assert "trace-5 | user_input" in result.stdout
+
+
+def test_cli_tail_missing_trace():
+    result = _run_cli(_make_tmp(), "tail", "nope")
+    assert result.returncode != 0
+    assert "trace not found: nope" in result.stderr
+    assert "Traceback" not in result.stderr
+
+def test_cli_gc():
+    root = _make_tmp()
+    _write_trace(root, "trace-6", "gc-test")  # trace_start at ts=100ns, long ago
+
+    result = _run_cli(root, "gc", "--max-age", "30d", "--dry-run")
+    assert result.returncode == 0
+    assert "Would delete 1 of 1" in result.stdout
+    assert (root / "trace-6").exists()
+
+    result = _run_cli(root, "gc", "--max-age", "30d")
+    assert result.returncode == 0
+    assert not (root / "trace-6").exists()
+
+
+def test_cli_compact():
+    root = _make_tmp()
+    _write_trace(root, "trace-7", "compact-test")
+
+    # Just written: younger than the default --older-than 1d.
+    result = _run_cli(root, "compact")
+    assert "Compacted 0 trace(s)" in result.stdout
+
+    result = _run_cli(root, "compact", "--older-than", "0s", "--codec", "lzma")
+    assert result.returncode == 0, result.stderr
+    assert "Compacted 1 trace(s)" in result.stdout
+    assert (root / "trace-7" / "events.archive").exists()
+    assert not (root / "trace-7" / "events.jsonl").exists()
+
+    result = _run_cli(root, "inspect", "trace-7")
+    assert json.loads(result.stdout)["trace_name"] == "compact-test"
+
+
+def test_cli_compact_reports_binary_traces():
+    root = _make_tmp()
+    _write_trace(root, "text", "compact-test")
+    w = NativeTraceWriter("bin", str(root), format="binary")
+    w.emit("bin", 1, 100, "trace_start", None, None, "info", "{}", json.dumps({"trace_name": "bin"}))
+    w.emit("bin", 2, 200, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+
+    result = _run_cli(root, "compact", "--older-than", "0s")
+    assert result.returncode == 0, result.stderr
+    assert "bin\tskipped (binary format)" in result.stdout
+    assert "Compacted 1 trace(s)" in result.stdout
+    assert "skipped 1 binary trace(s)" in result.stdout
+    assert (root / "bin" / "events.bin").exists()
+
+
+def test_cli_ls_multiple_roots():
+    root_a, root_b = _make_tmp(), _make_tmp()
+    _write_trace(root_a, "trace-a", "node-a")
+    _write_trace(root_b, "trace-b", "node-b")
+
+    result = _run_cli(root_a, "ls", "--root", str(root_a), "--root", str(root_b))
+    assert result.returncode == 0, result.stderr
+    lines = sorted(result.stdout.splitlines())
+    assert lines[0].startswith("trace-a\tnode-a") and lines[0].endswith(str(root_a))
+    assert lines[1].startswith("trace-b\tnode-b") and lines[1].endswith(str(root_b))
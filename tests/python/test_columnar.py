@@ -0,0 +1,92 @@
+"""Tests for the columnar event export."""
+
+from __future__ import annotations
+
+import ast
+import json
+import math
+import tempfile
+from array import array
+from pathlib import Path
+
+import pytest
+
+from agenttrace._native import NativeTraceWriter
+from agenttrace.columnar import COLUMNS, export_columnar, load_columnar
+from agenttrace.reader import TraceReader
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_col_"))
+
+
+def _write(root: Path, trace_id: str, project: str) -> None:
+    w = NativeTraceWriter(trace_id, str(root))
+    w.emit(trace_id, 1, 1_000_000, "trace_start", None, None, "info", "{}",
+           json.dumps({"trace_name": trace_id, "project": project}))
+    w.emit(trace_id, 2, 2_000_000, "llm_request", "s1", None, "info", "{}", json.dumps({"model": "gpt-4o"}))
+    w.emit(trace_id, 3, 9_000_000, "llm_response", "s1", None, "info", "{}",
+           json.dumps({"usage": {"prompt_tokens": 1000, "completion_tokens": 100}}))
+    w.emit(trace_id, 4, 10_000_000, "tool_call", "s2", None, "info", json.dumps({"tool": "grep"}), "{}")
+    w.emit(trace_id, 5, 12_000_000, "tool_result", "s2", None, "warn", "{}",
+           json.dumps({"duration_ms": 1.5, "cost_usd": 0.25}))
+    w.finish()
+
+
+def _read_npy(path: Path) -> list:
+    """Parse a 1-D ``.npy`` file without NumPy."""
+    data = path.read_bytes()
+    assert data[:8] == b"\x93NUMPY\x01\x00"
+    header_len = int.from_bytes(data[8:10], "little")
+    header = ast.literal_eval(data[10:10 + header_len].decode("ascii"))
+    typecode = {"<i4": "i", "<i8": "q", "<f8": "d"}[header["descr"]]
+    values = array(typecode, data[10 + header_len:])
+    assert len(values) == header["shape"][0]
+    return values.tolist()
+
+
+def test_export_columnar_layout_and_values():
+    root, out = _make_tmp(), _make_tmp() / "cols"
+    _write(root, "a", "p1")
+    _write(root, "b", "p2")
+
+    result = export_columnar(TraceReader(root), out, project="p1")
+    assert (result.rows, result.traces) == (5, 1)
+    manifest = json.loads((out / "columns.json").read_text())
+    assert manifest["rows"] == 5 and manifest["traces"] == ["a"]
+
+    cols = {name: _read_npy(out / f"{name}.npy") for name, _, _ in COLUMNS}
+    offsets = _read_npy(out / "string_offsets.npy")
+    heap = (out / "strings.bin").read_bytes()
+    strings = [heap[offsets[i]:offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+    text = lambda name: [strings[i] if i >= 0 else None for i in cols[name]]  # noqa: E731
+
+    assert cols["seq"] == [1, 2, 3, 4, 5]
+    assert text("trace") == ["a"] * 5
+    assert text("kind") == ["trace_start", "llm_request", "llm_response", "tool_call", "tool_result"]
+    assert text("level")[-1] == "warn"
+    # The response inherits its span's model; the result its span's tool.
+    assert text("model") == [None, "gpt-4o", "gpt-4o", None, None]
+    assert text("tool") == [None, None, None, "grep", "grep"]
+    assert cols["tokens"] == [-1, -1, 1100, -1, -1]
+    # Without a recorded duration, the span's elapsed time is used.
+    assert cols["duration_ms"][2] == pytest.approx(7.0)
+    assert cols["duration_ms"][4] == 1.5
+    assert cols["cost_usd"][2] == pytest.approx(1000 * 2.5e-6 + 100 * 10e-6)
+    assert cols["cost_usd"][4] == 0.25
+    assert math.isnan(cols["cost_usd"][0])
+
+
+def test_load_columnar_with_numpy():
+    np = pytest.importorskip("numpy")
+    root, out = _make_tmp(), _make_tmp() / "cols"
+    _write(root, "a", "p1")
+    _write(root, "b", "p2")
+    export_columnar(TraceReader(root), out)
+
+    columns, strings = load_columnar(out)
+    assert isinstance(columns["ts"], np.memmap)
+    assert len(columns["seq"]) == 10
+    kinds = np.array(strings)[columns["kind"]]
+    assert int((kinds == "llm_response").sum()) == 2
+    assert float(np.nansum(columns["cost_usd"])) > 0.5
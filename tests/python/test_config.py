@@ -6,7 +6,7 @@ import os
 from pathlib import Path
 from unittest import mock
 
-from agenttrace.config import get_root_dir, get_store_full, get_max_field_len, get_redact_keys, _parse_bool
+from agenttrace.config import get_root_dir, get_store_full, get_max_field_len, get_redact_keys, get_ui_rollups, get_ui_workers, _parse_bool
 
 
 def test_parse_bool_true_values():
@@ -80,3 +80,19 @@ def test_get_redact_keys_custom():
     with mock.patch.dict(os.environ, {"AGENTTRACE_REDACT": "foo, BAR , baz"}):
         result = get_redact_keys()
         assert result == {"foo", "bar", "baz"}
+
+
+def test_get_ui_workers():
+    with mock.patch.dict(os.environ, {"AGENTTRACE_UI_WORKERS": "8"}):
+        assert get_ui_workers() == 8
+    with mock.patch.dict(os.environ, {"AGENTTRACE_UI_WORKERS": "0"}):
+        assert get_ui_workers() == 1
+    with mock.patch.dict(os.environ, {"AGENTTRACE_UI_WORKERS": "many"}):
+        assert get_ui_workers() == 4
+
+
+def test_get_ui_rollups_opt_in():
+    with mock.patch.dict(os.environ, {}, clear=True):
+        assert get_ui_rollups() is False
+    with mock.patch.dict(os.environ, {"AGENTTRACE_UI_ROLLUPS": "1"}):
+        assert get_ui_rollups() is True
@@ -0,0 +1,72 @@
+"""Tests for dataset export of request/response pairs."""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+
+from agenttrace._native import NativeTraceWriter
+from agenttrace.dataset import DatasetFilters, build_dataset, extract_pairs
+from agenttrace.reader import TraceReader
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_dataset_"))
+
+
+def _write(root: Path, trace_id: str, model: str, calls: int, status: str = "ok") -> None:
+    w = NativeTraceWriter(trace_id, str(root))
+    w.emit(trace_id, 1, 100, "trace_start", None, None, "info", "{}",
+           json.dumps({"trace_name": trace_id, "project": "p"}))
+    seq = 2
+    # Interleaved spans: both requests go out before either response.
+    for i in range(calls):
+        w.emit(trace_id, seq, 200 + seq, "llm_request", f"s{i}", None, "info", "{}",
+               json.dumps({"model": model, "messages": [{"role": "user", "content": f"q{i}"}]}))
+        seq += 1
+    for i in reversed(range(calls)):
+        w.emit(trace_id, seq, 200 + seq, "llm_response", f"s{i}", None, "info", "{}",
+               json.dumps({"content": f"a{i}", "usage": {"total_tokens": i}}))
+        seq += 1
+    w.emit(trace_id, seq, 200 + seq, "llm_request", "dangling", None, "info", "{}", json.dumps({"model": model}))
+    if status:
+        w.emit(trace_id, seq + 1, 300 + seq, "trace_end", None, None, "info", "{}", json.dumps({"status": status}))
+    w.finish()
+
+
+def test_extract_pairs_by_span():
+    root = _make_tmp()
+    _write(root, "t1", "gpt-4o", 2)
+    pairs, unpaired, status = extract_pairs(TraceReader(root).iter_events("t1"), "t1")
+    assert [(p["span_id"], p["messages"][0]["content"], p["response"]) for p in pairs] == [
+        ("s1", "q1", "a1"), ("s0", "q0", "a0"),
+    ]
+    assert pairs[0]["model"] == "gpt-4o" and pairs[0]["project"] == "p"
+    assert (unpaired, status) == (1, "ok")
+
+
+def test_build_dataset_sharded_and_deterministic():
+    root = _make_tmp()
+    _write(root, "t1", "gpt-4o", 3)
+    _write(root, "t2", "claude", 2)
+    _write(root, "t3", "gpt-4o", 2, status="error")
+    _write(root, "t4", "gpt-4o", 1, status="")
+    reader = TraceReader(root)
+
+    seen = []
+    out_a, out_b = root / "_a", root / "_b"
+    report = build_dataset(reader, out_a, workers=1, shard_size=3, progress=lambda *a: seen.append(a))
+    assert (report.traces, report.pairs, report.unpaired) == (4, 8, 4)
+    assert report.shards == ["pairs-00000.jsonl", "pairs-00001.jsonl", "pairs-00002.jsonl"]
+    assert seen[-1] == (4, 4, 8)
+    build_dataset(reader, out_b, workers=2, shard_size=3)
+    for name in report.shards:
+        assert (out_a / name).read_bytes() == (out_b / name).read_bytes()
+    rows = [json.loads(line) for name in report.shards for line in (out_a / name).read_text().splitlines()]
+    assert [r["trace_id"] for r in rows] == ["t1"] * 3 + ["t2"] * 2 + ["t3"] * 2 + ["t4"]
+
+    report = build_dataset(reader, out_a, DatasetFilters(models=["gpt-4o"], status=["ok", "unfinished"]), workers=1)
+    assert (report.pairs, report.shards) == (4, ["pairs-00000.jsonl"])
+    assert not (out_a / "pairs-00001.jsonl").exists()
+    assert json.loads((out_a / "manifest.json").read_text())["filters"]["models"] == ["gpt-4o"]
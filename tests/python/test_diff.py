@@ -0,0 +1,51 @@
+"""Tests for the alignment-based trace diff."""
+
+from __future__ import annotations
+
+import json
+import random
+
+from agenttrace.diff import _myers, diff_events
+from agenttrace.lazy import LazyEvent
+
+
+def _event(seq: int, kind: str, **payload) -> LazyEvent:
+    return LazyEvent(
+        {"trace_id": "t", "seq": seq, "ts_unix_ns": seq * 10, "kind": kind},
+        json.dumps({"attrs": {}, "payload": payload}),
+    )
+
+
+def test_myers_finds_a_longest_common_subsequence():
+    rng = random.Random(3)
+    for _ in range(200):
+        a = [rng.randrange(3) for _ in range(rng.randrange(15))]
+        b = [rng.randrange(3) for _ in range(rng.randrange(15))]
+        lcs = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+        for i in reversed(range(len(a))):
+            for j in reversed(range(len(b))):
+                lcs[i][j] = lcs[i + 1][j + 1] + 1 if a[i] == b[j] else max(lcs[i + 1][j], lcs[i][j + 1])
+        matches = _myers(a, b, 100)
+        assert len(matches) == lcs[0][0]
+        assert all(a[x] == b[y] for x, y in matches)
+    assert _myers([1, 2, 3], [4, 5, 6], 2) is None
+
+
+def test_diff_events_aligns_insertions():
+    a = [_event(i + 1, "tool_call", n=i) for i in range(50)]
+    b = a[:10] + [_event(11, "error", error="boom")] + [_event(e["seq"] + 1, "tool_call", n=e["payload"]["n"]) for e in a[10:]]
+    b[30] = _event(b[30]["seq"], "tool_call", n=-1)
+
+    result = diff_events(a, b)
+    assert result.equal == 49
+    assert [(e.op, e.kind, e.seq_a, e.seq_b) for e in result.entries] == [
+        ("added", "error", None, 11),
+        ("changed", "tool_call", 30, 31),
+    ]
+    assert result.entries[1].changes == ["payload.n: 29 -> -1"]
+    assert result.by_kind() == {"error": {"added": 1}, "tool_call": {"changed": 1}}
+
+    # A kind change is a removal plus an addition, not a change.
+    result = diff_events(a[:3], [a[0], _event(2, "llm_response", n=1), a[2]])
+    assert [(e.op, e.kind) for e in result.entries] == [("removed", "tool_call"), ("added", "llm_response")]
+    assert diff_events([], []).entries == []
@@ -0,0 +1,120 @@
+"""Tests for streaming trace export."""
+
+from __future__ import annotations
+
+import io
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from agenttrace._native import NativeTraceWriter
+from agenttrace.export import iter_json_array, write_trace
+from agenttrace.reader import TraceReader
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_export_"))
+
+
+def test_write_trace_matches_get_trace():
+    root = _make_tmp()
+    w = NativeTraceWriter("t1", str(root))
+    w.emit("t1", 1, 100, "trace_start", None, None, "info", "{}",
+           json.dumps({"trace_name": "naïve", "project": "p"}))
+    w.emit("t1", 2, 200, "llm_response", "s1", None, "info", json.dumps({"model": "m"}),
+           json.dumps({"text": "line\nbreak", "nested": {"list": [1, {"a": None}], "empty": {}}}))
+    w.finish()
+    NativeTraceWriter("bare", str(root)).finish()
+    reader = TraceReader(root)
+
+    for trace_id in ("t1", "bare"):
+        out = io.StringIO()
+        write_trace(reader, trace_id, out)
+        assert out.getvalue() == json.dumps(reader.get_trace(trace_id), indent=2) + "\n"
+
+    path = root / "t1.jsonl"
+    assert write_trace(reader, "t1", path, format="jsonl") == 2
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == reader.get_trace("t1")["events"]
+
+    assert write_trace(reader, "missing", io.StringIO()) is None
+    with pytest.raises(ValueError):
+        write_trace(reader, "t1", io.StringIO(), format="csv")
+
+
+def test_write_trace_chrome_lanes():
+    root = _make_tmp()
+    w = NativeTraceWriter("t2", str(root))
+    ms = 1_000_000
+    events = [
+        (0, "trace_start", None, None, {}, {"trace_name": "chrome"}),
+        (0, "span_start", "agent", None, {}, {"name": "agent"}),
+        (5, "llm_request", "l1", "agent", {"model": "gpt-4o"}, {}),
+        (25, "llm_response", "l1", None, {}, {"usage": {"total_tokens": 3}}),
+        (30, "tool_call", "t1", "agent", {"tool": "search"}, {}),
+        (40, "tool_call", "t2", "agent", {"tool": "fetch"}, {}),
+        (50, "error", "t2", None, {}, {"error": "boom"}),
+        (70, "tool_result", "t1", None, {}, {}),
+        (90, "tool_result", "t2", None, {}, {}),
+        (95, "tool_call", "t3", "agent", {"tool": "late"}, {}),
+        (100, "trace_end", None, None, {}, {}),
+    ]
+    for seq, (t, kind, span, parent, attrs, payload) in enumerate(events, 1):
+        w.emit("t2", seq, t * ms, kind, span, parent, "info", json.dumps(attrs), json.dumps(payload))
+    w.finish()
+
+    out = io.StringIO()
+    assert write_trace(TraceReader(root), "t2", out, format="chrome-trace") == len(events)
+    doc = json.loads(out.getvalue())
+    spans = {e["name"]: e for e in doc["traceEvents"] if e["ph"] == "X"}
+    assert {name: (e["ts"] / 1000, e["dur"] / 1000, e["tid"]) for name, e in spans.items()} == {
+        "llm:gpt-4o": (5, 20, 0),
+        "tool:search": (30, 40, 0),
+        "tool:fetch": (40, 50, 1),  # overlaps search: its own lane
+        "tool:late": (95, 5, 0),
+        "agent": (0, 100, 0),
+    }
+    assert spans["llm:gpt-4o"]["args"]["usage"] == {"total_tokens": 3}
+    assert spans["agent"]["args"]["unfinished"] is True
+    [error] = [e for e in doc["traceEvents"] if e["ph"] == "i"]
+    assert (error["tid"], error["args"]["error"]) == (1, "boom")
+    names = [e["args"]["name"] for e in doc["traceEvents"] if e["ph"] == "M"]
+    assert names == ["chrome", "lane 0", "lane 1"]
+
+
+def test_write_trace_chrome_keys_spans_by_trace():
+    root = _make_tmp()
+    w = NativeTraceWriter("outer", str(root))
+    ms = 1_000_000
+    events = [
+        ("outer", 0, "trace_start", None, {"trace_name": "outer"}),
+        ("outer", 0, "span_start", "s1", {"name": "outer-step"}),
+        ("inner", 10, "span_start", "s1", {"name": "inner-step"}),  # same span_id, other trace
+        ("inner", 20, "span_end", "s1", {}),
+        ("outer", 50, "span_end", "s1", {}),
+        ("outer", 60, "span_end", "gone", {"status": "ok"}),
+    ]
+    for seq, (trace_id, t, kind, span, payload) in enumerate(events, 1):
+        w.emit(trace_id, seq, t * ms, kind, span, None, "info", "{}", json.dumps(payload))
+    w.finish()
+
+    out = io.StringIO()
+    write_trace(TraceReader(root), "outer", out, format="chrome-trace")
+    doc = json.loads(out.getvalue())
+    spans = {e["name"]: (e["ts"] / 1000, e["dur"] / 1000) for e in doc["traceEvents"] if e["ph"] == "X"}
+    assert spans == {"inner-step": (10, 10), "outer-step": (0, 50)}
+    [orphan] = [e for e in doc["traceEvents"] if e["ph"] == "i"]
+    assert orphan["ts"] / 1000 == 60
+    assert orphan["args"] == {"span_id": "gone", "status": "ok", "unmatched": True}
+
+
+def test_iter_json_array_chunks():
+    items = [{"seq": i, "payload": {"text": "x" * 50}} for i in range(200)]
+    chunks = list(iter_json_array(iter(items), chunk_size=1024))
+    assert len(chunks) > 5
+    assert all(len(c) < 1024 + 100 for c in chunks)
+    assert b"".join(chunks) == json.dumps(items, separators=(",", ":")).encode()
+    assert b"".join(iter_json_array([])) == b"[]"
+    assert json.loads(b"".join(iter_json_array([Path("a")]))) == ["a"]
@@ -0,0 +1,122 @@
+"""Tests for reading across several local and remote roots."""
+
+from __future__ import annotations
+
+import json
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from agenttrace._native import NativeTraceWriter
+from agenttrace.federation import FederatedReader
+from agenttrace.reader import TraceReader
+
+S = 1_000_000_000
+
+
+def _root(*traces) -> Path:
+    root = Path(tempfile.mkdtemp(prefix="agenttrace_fed_"))
+    for trace_id, start_s in traces:
+        w = NativeTraceWriter(trace_id, str(root))
+        w.emit(trace_id, 1, start_s * S, "trace_start", None, None, "info", "{}", json.dumps({"trace_name": trace_id}))
+        w.emit(trace_id, 2, start_s * S + 1, "user_input", None, None, "info", "{}", json.dumps({"text": f"needle {trace_id}"}))
+        w.emit(trace_id, 3, start_s * S + 2, "trace_end", None, None, "info", "{}", "{}")
+        w.finish()
+    return root
+
+
+class _StandIn:
+    """The REST API of ``agenttrace ui`` over one root, on a local port."""
+
+    def __init__(self, root: Path) -> None:
+        reader = TraceReader(root)
+        self.delay = 0.0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(stand_in.delay)
+                url = urllib.parse.urlsplit(self.path)
+                q = urllib.parse.parse_qs(url.query)
+                one = lambda key, cast=str: cast(q[key][0]) if key in q else None  # noqa: E731
+                parts = url.path.strip("/").split("/")
+                if parts == ["api", "traces"]:
+                    body = reader.list_traces(limit=one("limit", int))
+                elif parts == ["api", "search"]:
+                    body = reader.search(one("q"), limit=one("limit", int), kinds=q.get("kind"))
+                elif parts[:2] == ["api", "traces"] and len(parts) == 3:
+                    body = reader.get_trace(parts[2], kinds=q.get("kind"))
+                elif parts[:2] == ["api", "traces"] and parts[3:] == ["events"]:
+                    body = reader.page_events(
+                        parts[2], cursor=one("cursor", int), limit=one("limit", int) or 500, summary="summary" in q
+                    )
+                else:
+                    body = None
+                data = json.dumps(body).encode()
+                self.send_response(404 if body is None else 200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_federated_list_search_and_fetch():
+    a = _root(("a1", 100), ("a2", 300))
+    b = _root(("b1", 200))
+    remote = _StandIn(_root(("r1", 250), ("r2", 50)))
+    try:
+        fed = FederatedReader([a, b, remote.url], timeout=5)
+        traces = fed.list_traces()
+        assert [t["id"] for t in traces] == ["a2", "r1", "b1", "a1", "r2"]
+        assert [t["root"] for t in traces[:3]] == [str(a), remote.url, str(b)]
+        assert [t["id"] for t in fed.list_traces(limit=2)] == ["a2", "r1"]
+
+        hits = fed.search("needle", kinds=["user_input"])
+        assert [h["trace_id"] for h in hits] == ["a2", "r1", "b1", "a1", "r2"]
+        assert [h["trace_id"] for h in fed.search("needle", limit=2)] == ["a2", "r1"]
+        assert fed.last_search_stats["traces_considered"] == 3  # local roots only
+
+        assert fed.get_trace("r1")["trace_name"] == "r1"
+        assert [e["kind"] for e in fed.get_trace("r2", kinds=["trace_end"])["events"]] == ["trace_end"]
+        assert fed.get_trace("b1")["trace_name"] == "b1"
+        page = fed.page_events("r1", cursor=1, limit=1, summary=True)
+        assert ([e["seq"] for e in page["events"]], page["next_cursor"]) == ([2], 2)
+        assert [e["seq"] for e in fed.iter_events("r2")] == [1, 2, 3]
+        assert fed.get_trace("missing") is None and fed.last_errors == {}
+        fed.close()
+    finally:
+        remote.close()
+
+
+def test_slow_root_times_out_and_falls_back_to_its_catalog():
+    local = _root(("l1", 100))
+    remote = _StandIn(_root(("r1", 200)))
+    try:
+        fed = FederatedReader([local, remote.url], timeout=0.5, catalog_ttl=0)
+        assert [t["id"] for t in fed.list_traces()] == ["r1", "l1"]
+
+        remote.delay = 2.0
+        started = time.monotonic()
+        # The remote listing is stale but still there; search has no cache.
+        assert [t["id"] for t in fed.list_traces()] == ["r1", "l1"]
+        assert "timed out" in fed.last_errors[remote.url]
+        assert [h["trace_id"] for h in fed.search("needle")] == ["l1"]
+        assert time.monotonic() - started < 1.8
+        fed.close()
+    finally:
+        remote.delay = 0.0
+        remote.close()
@@ -0,0 +1,57 @@
+"""Tests for structural fingerprints and clustering."""
+
+from __future__ import annotations
+
+import json
+import random
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from agenttrace._native import NativeTraceWriter
+from agenttrace.fingerprint import FINGERPRINT_FILE, cluster, fingerprint, load_fingerprint, similarity
+from agenttrace.reader import TraceReader
+
+LOOP = ["llm_request:gpt-4o", "llm_response:gpt-4o", "tool_call:search", "tool_result:search"]
+SEARCH = ["trace_start"] + LOOP * 4 + ["trace_end"]
+SQL = ["trace_start", "llm_request:gpt-4o", "llm_response:gpt-4o", "tool_call:sql", "tool_result:sql", "error", "trace_end"]
+
+
+def test_load_fingerprint_tokens_and_cache():
+    root = Path(tempfile.mkdtemp(prefix="agenttrace_fp_"))
+    w = NativeTraceWriter("t1", str(root))
+    w.emit("t1", 1, 100, "trace_start", None, None, "info", "{}", "{}")
+    w.emit("t1", 2, 200, "tool_call", "s1", None, "info", json.dumps({"tool": "search"}), "{}")
+    w.emit("t1", 3, 300, "tool_result", "s1", None, "info", "{}", json.dumps({"result": 1}))
+    w.emit("t1", 4, 400, "tool_call", "s2", None, "info", json.dumps({"tool": "search"}), "{}")
+    w.emit("t1", 5, 500, "tool_result", "s2", None, "info", "{}", "{}")
+    w.emit("t1", 6, 600, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+    reader = TraceReader(root)
+
+    fp = load_fingerprint(reader, "t1")
+    expected = ["trace_start", "tool_call:search", "tool_result:search", "tool_call:search", "tool_result:search", "trace_end"]
+    assert fp == fingerprint(expected)
+    assert (root / "t1" / FINGERPRINT_FILE).exists()
+    assert load_fingerprint(reader, "t1") == fp
+    assert load_fingerprint(reader, "missing") is None
+
+
+def test_cluster_groups_by_path():
+    rng = random.Random(5)
+    fps = {}
+    for i in range(200):
+        # Search runs loop a varying number of times: different exact paths.
+        tokens = ["trace_start"] + LOOP * rng.randint(2, 6) + ["trace_end"] if i % 3 else SQL
+        fps[f"t{i:03d}"] = fingerprint(tokens)
+
+    assert similarity(fingerprint(SEARCH), fingerprint(SEARCH * 2)) > 0.5
+    assert similarity(fingerprint(SEARCH), fingerprint(SQL)) < 0.3
+    clusters = cluster(fps)
+    assert [len(c.traces) for c in clusters] == [133, 67]
+    assert clusters[0].paths > 1 and clusters[1].paths == 1
+    assert clusters[1].representative == "t000" and clusters[1].summary == SQL
+    assert len(cluster({"a": fingerprint(SEARCH), "b": fingerprint(SEARCH + ["error"])}, threshold=1.0)) == 2
+    with pytest.raises(ValueError):
+        cluster(fps, threshold=0)
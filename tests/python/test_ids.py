@@ -0,0 +1,67 @@
+"""Tests for time-ordered trace IDs."""
+
+from __future__ import annotations
+
+import json
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from agenttrace import Tracer
+from agenttrace.ids import is_time_ordered, new_trace_id, trace_id_time_ns
+from agenttrace.reader import TraceReader
+from agenttrace._native import NativeTraceWriter
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_ids_"))
+
+
+def test_new_trace_ids_sort_by_time():
+    before = time.time_ns()
+    ids = [new_trace_id() for _ in range(1000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert all(len(i) == 32 and is_time_ordered(i) for i in ids)
+    ts = trace_id_time_ns(ids[0])
+    assert before - 1_000_000 <= ts <= time.time_ns()
+
+
+def test_legacy_ids_have_no_time():
+    assert trace_id_time_ns(uuid.uuid4().hex) is None
+    assert trace_id_time_ns("trace-1") is None
+    # Same vector as test_time_ordered_ids in crates/agenttrace-core.
+    assert trace_id_time_ns("018df4bc56007abc8123456789abcdef") == 1_709_208_000_000_000_000
+
+
+def test_tracer_uses_time_ordered_ids():
+    root = _make_tmp()
+    with Tracer(root_dir=root) as tracer:
+        pass
+    assert is_time_ordered(tracer.trace_id)
+
+
+def test_list_traces_latest_and_window_from_ids():
+    root = _make_tmp()
+    ids = []
+    for _ in range(3):
+        ids.append(new_trace_id())
+        time.sleep(0.002)
+    for trace_id in ids:
+        w = NativeTraceWriter(trace_id, str(root))
+        w.emit(trace_id, 1, time.time_ns(), "trace_start", None, None, "info", "{}",
+               json.dumps({"trace_name": trace_id}))
+        w.finish()
+    legacy = uuid.uuid4().hex
+    w = NativeTraceWriter(legacy, str(root))
+    w.emit(legacy, 1, 100, "trace_start", None, None, "info", "{}", "{}")
+    w.finish()
+
+    reader = TraceReader(root=root)
+    assert [t["id"] for t in reader.list_traces(limit=2)] == [ids[2], ids[1]]
+    assert [t["id"] for t in reader.list_traces()] == [ids[2], ids[1], ids[0], legacy]
+
+    since = trace_id_time_ns(ids[1]) / 1e9
+    assert {t["id"] for t in reader.list_traces(since=since)} == {ids[1], ids[2]}
+    assert [t["id"] for t in reader.list_traces(until=1.0)] == [legacy]
@@ -0,0 +1,97 @@
+"""Tests for span-tree profiling."""
+
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+
+from agenttrace._native import NativeTraceWriter
+from agenttrace.reader import TraceReader
+
+MS = 1_000_000
+
+
+def _write(root: Path) -> None:
+    # agent [0, 100ms]: llm [5, 25], then two parallel tools [30, 70] and
+    # [40, 90]; an unfinished span starts when agent ends.
+    w = NativeTraceWriter("t1", str(root))
+    events = [
+        (0, "trace_start", None, None, {}, {"trace_name": "demo"}),
+        (0, "span_start", "agent", None, {}, {"name": "agent"}),
+        (5, "llm_request", "l1", "agent", {"model": "gpt-4o"}, {}),
+        (25, "llm_response", "l1", None, {}, {"content": "x"}),
+        (30, "tool_call", "t1", "agent", {"tool": "search"}, {}),
+        (40, "tool_call", "t2", "agent", {"tool": "fetch"}, {}),
+        (70, "tool_result", "t1", None, {}, {}),
+        (90, "tool_result", "t2", None, {}, {}),
+        (100, "span_end", "agent", None, {}, {"duration_ms": 100}),
+        (100, "span_start", "late", None, {}, {"name": "late"}),
+        (110, "trace_end", None, None, {}, {"status": "ok"}),
+    ]
+    for seq, (ms, kind, span, parent, attrs, payload) in enumerate(events, 1):
+        w.emit("t1", seq, ms * MS, kind, span, parent, "info", json.dumps(attrs), json.dumps(payload))
+    w.finish()
+
+
+def test_profile_tree_self_time_and_critical_path():
+    root = Path(tempfile.mkdtemp(prefix="agenttrace_profile_"))
+    _write(root)
+    profile = TraceReader(root).profile("t1")
+
+    tree = [(depth, span.name, span.total_ms, span.self_ms) for span, depth in profile.walk()]
+    assert tree == [
+        (0, "demo", 110.0, 0.0),
+        (1, "agent", 100.0, 100 - 20 - 60),  # tools overlap: [30, 90] counted once
+        (2, "llm:gpt-4o", 20.0, 20.0),
+        (2, "tool:search", 40.0, 40.0),
+        (2, "tool:fetch", 50.0, 50.0),
+        (1, "late", 10.0, 10.0),
+    ]
+    assert not profile.spans["late"].closed
+
+    assert [(span.name, depth) for span, depth in profile.critical_path()] == [
+        ("demo", 0), ("agent", 1), ("llm:gpt-4o", 2), ("tool:fetch", 2), ("late", 1),
+    ]
+    assert profile.folded() == [
+        "demo;agent 20000",
+        "demo;agent;llm:gpt-4o 20000",
+        "demo;agent;tool:fetch 50000",
+        "demo;agent;tool:search 40000",
+        "demo;late 10000",
+    ]
+    assert TraceReader(root).profile("missing") is None
+
+
+def test_profile_rollups_and_children_pages():
+    root = Path(tempfile.mkdtemp(prefix="agenttrace_profile_"))
+    w = NativeTraceWriter("t2", str(root))
+    events = [
+        (0, "trace_start", None, None, {}, {"trace_name": "demo"}),
+        (0, "span_start", "agent", None, {}, {"name": "agent"}),
+        (1, "llm_request", "l1", "agent", {"model": "gpt-4o"}, {}),
+        (2, "llm_response", "l1", None, {}, {"usage": {"total_tokens": 30}, "cost_usd": 0.5}),
+        (3, "tool_call", "t1", "agent", {"tool": "search"}, {}),
+        (4, "error", "t1", None, {}, {"message": "boom"}),
+        (5, "tool_result", "t1", None, {}, {}),
+        (6, "span_end", "agent", None, {}, {}),
+        (7, "trace_end", None, None, {}, {"status": "ok"}),
+    ]
+    for seq, (ms, kind, span, parent, attrs, payload) in enumerate(events, 1):
+        w.emit("t2", seq, ms * MS, kind, span, parent, "info", json.dumps(attrs), json.dumps(payload))
+    w.finish()
+    profile = TraceReader(root).profile("t2")
+
+    summary = profile.summary()
+    assert (summary["events"], summary["errors"], summary["tokens"], summary["cost_usd"]) == (9, 1, 30, 0.5)
+    assert (summary["spans"], summary["children"], summary["span_id"]) == (3, 1, None)
+    assert summary["critical_path"] == ["agent", "l1", "t1"]
+
+    [agent] = profile.children()["nodes"]
+    assert (agent["span_id"], agent["events"], agent["errors"], agent["children"]) == ("agent", 7, 1, 2)
+    page = profile.children("agent", limit=1)
+    assert (page["total"], page["next_offset"], page["nodes"][0]["name"]) == (2, 1, "llm:gpt-4o")
+    page = profile.children("agent", offset=1, limit=1)
+    assert page["next_offset"] is None
+    assert (page["nodes"][0]["name"], page["nodes"][0]["errors"], page["nodes"][0]["start_ms"]) == ("tool:search", 1, 3.0)
+    assert profile.children("missing") is None
@@ -6,6 +6,10 @@ import json
 import tempfile
 from pathlib import Path
 
+import pytest
+
+from agenttrace import _native
+from agenttrace.lazy import LazyEvent, split_event_line
 from agenttrace.reader import TraceReader
 from agenttrace._native import NativeTraceWriter
 
@@ -91,3 +95,126 @@ def test_reader_search_no_results():
     reader = TraceReader(root=root)
     results = reader.search("nonexistent_query_xyz")
     assert results == []
+
+
+def test_reader_lazy_events_match_eager():
+    root = _make_tmp()
+    _write_trace(root, "t1", "lazy", project="p", events=2)
+
+    eager = TraceReader(root=root).get_trace("t1")["events"]
+    lazy = TraceReader(root=root, lazy=True).get_trace("t1")["events"]
+    assert all(isinstance(e, LazyEvent) for e in lazy)
+    assert lazy == eager
+    assert json.loads(json.dumps(lazy)) == eager
+
+
+def test_lazy_event_decodes_payload_on_access():
+    root = _make_tmp()
+    _write_trace(root, "t1", "lazy", events=1)
+
+    reader = TraceReader(root=root)
+    evt = reader.get_trace("t1", lazy=True)["events"][1]
+    assert evt["kind"] == "user_input"
+    assert evt.get("span_id") is None
+    assert not evt.is_decoded
+    assert evt["payload"] == {"text": "msg-0"}
+    assert evt.is_decoded
+    assert dict(evt)["attrs"] == {}
+
+
+def test_split_event_line_falls_back_for_nested_header():
+    line = '{"kind":"x","meta":{"attrs":1},"attrs":{},"payload":{"a":1}}'
+    header, deferred = split_event_line(line)
+    assert deferred is None
+    assert header["payload"] == {"a": 1}
+
+
+def test_lazy_deferred_json_is_line_order_in_both_backends():
+    root = _make_tmp()
+    w = NativeTraceWriter("t1", str(root))
+    w.emit("t1", 1, 100, "user_input", "s1", None, "info", '{"z":1,"a":2}',
+           '{"zz":[1,{"b":2,"a":1}],"aa":"x"}')
+    w.finish()
+    line = (root / "t1" / "events.jsonl").read_text(encoding="utf-8").strip().split("\t")[0]
+    expected = "{" + line[line.index(',"attrs":') + 1:]
+
+    [(header, deferred)] = list(_native.NativeTraceReader(str(root)).iter_events("t1", lazy=True))
+    assert deferred == expected
+    assert list(header) == [k for k in json.loads(line) if k not in ("attrs", "payload")]
+
+    native = pytest.importorskip("agenttrace_native")
+    [(native_header, native_deferred)] = list(native.NativeTraceReader(str(root)).iter_events("t1", lazy=True))
+    assert native_deferred == expected
+    assert list(native_header) == list(header)
+
+def test_reader_filter_pushdown():
+    root = _make_tmp()
+    _write_trace(root, "t1", "filters", project="p", events=4)
+
+    reader = TraceReader(root=root)
+    trace = reader.get_trace("t1", kinds=["user_input"], seq_min=3, seq_max=4)
+    assert [e["seq"] for e in trace["events"]] == [3, 4]
+    # Metadata still comes from trace_start even though it was filtered out.
+    assert trace["trace_name"] == "filters"
+    assert trace["project"] == "p"
+
+    assert [e["kind"] for e in reader.iter_events("t1", ts_min=999)] == ["trace_end"]
+    assert list(reader.iter_events("t1", kinds="trace_end", lazy=True))[0]["payload"] == {"status": "ok"}
+
+
+def test_reader_projection():
+    root = _make_tmp()
+    _write_trace(root, "t1", "proj", events=1)
+
+    reader = TraceReader(root=root)
+    events = reader.get_trace("t1", fields=["seq", "kind"])["events"]
+    assert events[1] == {"seq": 2, "kind": "user_input"}
+
+
+def test_reader_search_newest_first_with_limit():
+    root = _make_tmp()
+    _write_trace(root, "t1", "searchtest", events=3)
+
+    reader = TraceReader(root=root)
+    results = reader.search("msg-", limit=2)
+    assert [r["payload"]["text"] for r in results] == ["msg-2", "msg-1"]
+    assert results[0]["trace_name"] == "searchtest"
+
+
+def test_reader_search_ignores_header_matches():
+    root = _make_tmp()
+    _write_trace(root, "t1", "searchtest", events=1)
+
+    reader = TraceReader(root=root)
+    assert reader.search("user_input") == []
+    assert reader.search("msg-0", kinds=["trace_end"]) == []
+
+
+def test_reader_search_non_ascii():
+    root = _make_tmp()
+    w = NativeTraceWriter("t1", str(root))
+    w.emit("t1", 1, 100, "user_input", None, None, "info", "{}", json.dumps({"text": "café au lait"}))
+    w.finish()
+
+    reader = TraceReader(root=root)
+    assert len(reader.search("café")) == 1
+
+
+def test_reader_page_events():
+    root = _make_tmp()
+    _write_trace(root, "t1", "paged", events=10)
+    reader = TraceReader(root=root)
+
+    seqs, cursor = [], None
+    while True:
+        page = reader.page_events("t1", cursor=cursor, limit=4)
+        seqs.extend(e["seq"] for e in page["events"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seqs == list(range(1, 13))
+
+    page = reader.page_events("t1", cursor=2, limit=3, summary=True, kinds=["user_input"])
+    assert [e["seq"] for e in page["events"]] == [3, 4, 5] and page["next_cursor"] == 5
+    assert all("payload" not in e and e["kind"] == "user_input" for e in page["events"])
+    assert reader.page_events("missing") is None
@@ -0,0 +1,137 @@
+"""Tests for retention rules and the trace garbage collector."""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from agenttrace.config import get_retention_policy
+from agenttrace.reader import TraceReader
+from agenttrace.retention import RetentionPolicy, RetentionWorker, collect, parse_duration, parse_size
+from agenttrace.storage import partition_path
+from agenttrace._native import NativeTraceWriter
+
+DAY = 86400
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_gc_"))
+
+
+def _write_trace(root: Path, trace_id: str, ts_s: float, project="p", finish=True, partition=None, size=0):
+    ts = int(ts_s * 1e9)
+    w = NativeTraceWriter(trace_id, str(root), partition=partition)
+    w.emit(trace_id, 1, ts, "trace_start", None, None, "info", "{}",
+           json.dumps({"trace_name": trace_id, "project": project}))
+    if size:
+        w.emit(trace_id, 2, ts + 1, "user_input", None, None, "info", "{}",
+               json.dumps({"text": "x" * size}))
+    if finish:
+        w.emit(trace_id, 3, ts + 2, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+
+
+def _ids(root: Path):
+    return {t["id"] for t in TraceReader(root=root).list_traces()}
+
+
+def test_parse_helpers():
+    assert parse_duration("30d") == 30 * DAY
+    assert parse_duration("90") == 90
+    assert parse_size("500M") == 500 * 1024**2
+    assert parse_size("2GiB") == 2 * 1024**3
+    assert parse_size("1024") == 1024
+
+
+def test_gc_max_age_keeps_active_traces():
+    root = _make_tmp()
+    now = time.time()
+    _write_trace(root, "old", now - 10 * DAY)
+    _write_trace(root, "old-live", now - 10 * DAY, finish=False)
+    _write_trace(root, "new", now - 1 * DAY, partition=partition_path("p", int((now - DAY) * 1e9)))
+
+    policy = RetentionPolicy(max_age_s=7 * DAY)
+    dry = collect(root, policy, dry_run=True, now=now)
+    assert [d[0] for d in dry.deleted] == ["old"]
+    assert _ids(root) == {"old", "old-live", "new"}
+
+    report = collect(root, policy, now=now)
+    assert [(d[0], d[1]) for d in report.deleted] == [("old", "age")]
+    assert report.skipped_active == ["old-live"]
+    assert _ids(root) == {"old-live", "new"}
+
+    # Unfinished traces become collectable once abandoned.
+    policy.abandoned_after_s = 0
+    collect(root, policy, now=now + 1)
+    assert _ids(root) == {"new"}
+
+
+def test_gc_max_traces_per_project():
+    root = _make_tmp()
+    now = time.time()
+    for i in range(4):
+        _write_trace(root, f"a{i}", now - 100 + i, project="a")
+    _write_trace(root, "b0", now - 200, project="b")
+
+    report = collect(root, RetentionPolicy(max_traces_per_project=2), now=now)
+    assert sorted(d[0] for d in report.deleted) == ["a0", "a1"]
+    assert _ids(root) == {"a2", "a3", "b0"}
+
+
+def test_gc_max_bytes_deletes_oldest_first():
+    root = _make_tmp()
+    now = time.time()
+    for i in range(4):
+        _write_trace(root, f"t{i}", now - 100 + i, size=1000)
+    per_trace = collect(root, RetentionPolicy(max_bytes=0), dry_run=True).bytes_before // 4
+
+    report = collect(root, RetentionPolicy(max_bytes=2 * per_trace + 10), now=now)
+    assert [d[0] for d in report.deleted] == ["t0", "t1"]
+    assert all(d[1] == "size" for d in report.deleted)
+    assert _ids(root) == {"t2", "t3"}
+
+
+def test_gc_partitioned_prunes_empty_dirs_and_limits_work():
+    root = _make_tmp()
+    old = time.time() - 30 * DAY
+    for i in range(3):
+        _write_trace(root, f"p{i}", old + i, partition=partition_path("p", int(old * 1e9)))
+
+    report = collect(root, RetentionPolicy(max_age_s=DAY), max_deletes=2)
+    assert len(report.deleted) == 2
+    collect(root, RetentionPolicy(max_age_s=DAY))
+    assert not (root / "p").exists()
+    assert not list(root.iterdir())
+
+
+def test_retention_worker_runs_in_background():
+    root = _make_tmp()
+    _write_trace(root, "old", time.time() - 10 * DAY)
+    worker = RetentionWorker(root, RetentionPolicy(max_age_s=DAY), interval_s=0.05)
+    worker.start()
+    try:
+        deadline = time.time() + 5
+        while worker.last_report is None and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        worker.stop()
+        worker.join(timeout=5)
+    assert worker.last_report is not None
+    assert not (root / "old").exists()
+
+
+def test_get_retention_policy_from_env():
+    env = {
+        "AGENTTRACE_RETENTION_MAX_AGE": "30d",
+        "AGENTTRACE_RETENTION_MAX_BYTES": "1G",
+        "AGENTTRACE_RETENTION_MAX_PER_PROJECT": "abc",
+    }
+    with mock.patch.dict(os.environ, env):
+        policy = get_retention_policy()
+    assert policy.max_age_s == 30 * DAY
+    assert policy.max_bytes == 1024**3
+    assert policy.max_traces_per_project is None
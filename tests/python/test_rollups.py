@@ -0,0 +1,124 @@
+"""Tests for quantile sketches and hourly rollups."""
+
+from __future__ import annotations
+
+import json
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from agenttrace._native import NativeTraceWriter
+from agenttrace.reader import TraceReader
+from agenttrace.rollups import ROLLUP_DIR, update_rollups
+from agenttrace.sketch import DDSketch
+
+HOUR_NS = 3_600_000_000_000
+T0 = 1_709_208_000 * 1_000_000_000  # 2024-02-29 12:00 UTC
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_rollup_"))
+
+
+def _write(root: Path, trace_id: str, project: str, start_ns: int, durations, finish: bool = True) -> None:
+    w = NativeTraceWriter(trace_id, str(root))
+    w.emit(trace_id, 1, start_ns, "trace_start", None, None, "info", "{}",
+           json.dumps({"trace_name": trace_id, "project": project}))
+    for i, duration in enumerate(durations):
+        w.emit(trace_id, i + 2, start_ns + i * HOUR_NS // 2, "llm_response", f"s{i}", None, "info",
+               json.dumps({"model": "gpt-4o"}),
+               json.dumps({"duration_ms": duration, "cost_usd": 0.1, "usage": {"total_tokens": 5}}))
+    if finish:
+        w.emit(trace_id, len(durations) + 2, start_ns + HOUR_NS * 3, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+
+
+def test_ddsketch_accuracy_and_merge():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1) for _ in range(5000)]
+    a, b = DDSketch(0.01), DDSketch(0.01)
+    a.update(values[:2500])
+    b.update(values[2500:])
+    a.merge(DDSketch.from_dict(json.loads(json.dumps(b.to_dict()))))
+    assert a.count == 5000
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[round(q * (len(ordered) - 1))]
+        assert a.quantile(q) == pytest.approx(exact, rel=0.03)
+    with pytest.raises(ValueError):
+        a.merge(DDSketch(0.05))
+    assert DDSketch().quantile(0.5) is None
+
+
+def test_rollups_incremental_and_query():
+    root = _make_tmp()
+    _write(root, "a", "p1", T0, [10, 20, 30, 40])
+    _write(root, "b", "p2", T0 + 24 * HOUR_NS, [100])
+    _write(root, "live", "p1", T0, [1], finish=False)
+    reader = TraceReader(root)
+
+    report = update_rollups(reader)
+    assert (report.traces_added, report.events_added, report.traces_pending) == (2, 5, 1)
+    assert (root / ROLLUP_DIR / "2024" / "02" / "29.json").exists()
+    assert (root / ROLLUP_DIR / "2024" / "03" / "01.json").exists()
+    assert update_rollups(reader).traces_added == 0
+
+    rows = reader.aggregate(group_by=["project"], rollups=True)
+    by_project = {r["project"]: r for r in rows}
+    assert by_project["p1"]["count"] == 4
+    assert by_project["p1"]["tokens_sum"] == 20
+    assert by_project["p1"]["cost_usd_sum"] == pytest.approx(0.4)
+    assert by_project["p1"]["duration_ms_p50"] == pytest.approx(20, rel=0.02)
+    assert by_project["p1"]["duration_ms_sum"] == pytest.approx(100)
+
+    hours = reader.aggregate(group_by=["hour"], project="p1", rollups=True)
+    assert sorted((r["hour"], r["count"]) for r in hours) == [(T0 // 10**9, 2), (T0 // 10**9 + 3600, 2)]
+    window = reader.aggregate(group_by=["day"], since=T0 / 1e9 + 86400, rollups=True)
+    assert [(r["day"], r["count"]) for r in window] == [("2024-03-01", 1)]
+    with pytest.raises(ValueError):
+        reader.aggregate(group_by=["trace_id"], rollups=True)
+
+    # The pending live trace is folded in once it finishes, although it
+    # started before the mark; deleted traces leave the rollups intact.
+    state = json.loads((root / ROLLUP_DIR / "state.json").read_text())
+    assert (state["since"], state["pending"]) == ((T0 + 24 * HOUR_NS) / 1e9, {"live": "p1"})
+    w = NativeTraceWriter("live", str(root))
+    w.emit("live", 9, T0 + HOUR_NS, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+    shutil.rmtree(root / "b")
+    assert update_rollups(reader).traces_added == 1
+    state = json.loads((root / ROLLUP_DIR / "state.json").read_text())
+    assert (state["recent"], state["pending"]) == (["b"], {})
+    assert sum(r["count"] for r in reader.aggregate(group_by=["project"], rollups=True)) == 6
+
+
+def test_rollups_list_only_traces_after_the_mark():
+    root = _make_tmp()
+    _write(root, "old", "p", T0, [10])
+    reader = TraceReader(root)
+    update_rollups(reader)
+
+    _write(root, "new", "p", T0 + HOUR_NS, [20])
+    calls = []
+    list_traces = reader.list_traces
+    reader.list_traces = lambda **kw: calls.append(kw) or list_traces(**kw)
+    report = update_rollups(reader)
+    assert calls == [{"since": T0 / 1e9}]
+    assert (report.traces_added, report.events_added) == (1, 1)
+    assert update_rollups(reader).traces_added == 0
+    assert calls[-1] == {"since": (T0 + HOUR_NS) / 1e9}
+
+
+def test_rollups_not_double_counted_after_lost_state():
+    root = _make_tmp()
+    _write(root, "a", "p", T0, [10, 20])
+    reader = TraceReader(root)
+    assert update_rollups(reader).events_added == 2
+    # A pass that died after writing the day files but before state.json.
+    (root / ROLLUP_DIR / "state.json").unlink()
+    report = update_rollups(reader)
+    assert (report.events_added, report.days_written) == (0, 0)
+    assert [r["count"] for r in reader.aggregate(group_by=["project"], rollups=True)] == [2]
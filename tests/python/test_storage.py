@@ -0,0 +1,128 @@
+"""Tests for the flat and partitioned storage layouts."""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from agenttrace import Tracer
+from agenttrace.reader import TraceReader
+from agenttrace.storage import (
+    find_trace_dir,
+    iter_trace_dirs,
+    migrate_layout,
+    partition_path,
+    project_dir_name,
+    _window_ns,
+)
+from agenttrace._native import NativeTraceWriter
+
+# 2024-02-29T12:00:00Z and 2024-03-05T12:00:00Z
+DAY_A = 1_709_208_000_000_000_000
+DAY_B = 1_709_640_000_000_000_000
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_storage_"))
+
+
+def _write_trace(root: Path, trace_id: str, project, ts: int, partition=None, finish=True):
+    w = NativeTraceWriter(trace_id, str(root), partition=partition)
+    w.emit(trace_id, 1, ts, "trace_start", None, None, "info", "{}",
+           json.dumps({"trace_name": trace_id, "project": project}))
+    if finish:
+        w.emit(trace_id, 2, ts + 1, "trace_end", None, None, "info", "{}", "{}")
+    w.finish()
+
+
+def test_partition_path():
+    assert partition_path("my app/v2", DAY_A) == "my_app_v2/2024/02/29"
+    assert partition_path(None, 0) == "default/1970/01/01"
+    assert project_dir_name("_hidden") == "hidden"
+
+
+def test_reader_finds_partitioned_traces():
+    root = _make_tmp()
+    _write_trace(root, "flat1", "p", DAY_A)
+    _write_trace(root, "part1", "p", DAY_A, partition=partition_path("p", DAY_A))
+    (root / "_rollups").mkdir()
+
+    assert find_trace_dir(root, "part1") == root / "p" / "2024" / "02" / "29" / "part1"
+    assert find_trace_dir(root, "missing") is None
+
+    reader = TraceReader(root=root)
+    assert {t["id"] for t in reader.list_traces()} == {"flat1", "part1"}
+    trace = reader.get_trace("part1")
+    assert trace["project"] == "p"
+    assert [e["kind"] for e in trace["events"]] == ["trace_start", "trace_end"]
+
+
+def test_list_traces_prunes_partitions():
+    root = _make_tmp()
+    _write_trace(root, "a", "p", DAY_A, partition=partition_path("p", DAY_A))
+    _write_trace(root, "b", "p", DAY_B, partition=partition_path("p", DAY_B))
+    _write_trace(root, "c", "q", DAY_B, partition=partition_path("q", DAY_B))
+
+    since = DAY_B / 1e9 - 3600
+    assert [l.id for l in iter_trace_dirs(root, project="p", since_ns=int(since * 1e9))] == ["b"]
+
+    reader = TraceReader(root=root)
+    assert [t["id"] for t in reader.list_traces(project="p")] == ["b", "a"]
+    assert {t["id"] for t in reader.list_traces(since=since)} == {"b", "c"}
+    assert [t["id"] for t in reader.list_traces(until=DAY_A / 1e9)] == ["a"]
+
+
+def test_iter_trace_dirs_skips_vanished_day():
+    root = _make_tmp()
+    _write_trace(root, "a", "p", DAY_A, partition=partition_path("p", DAY_A))
+    _write_trace(root, "b", "p", DAY_B, partition=partition_path("p", DAY_B))
+    gone = root / partition_path("p", DAY_A)
+    scandir = os.scandir
+
+    def racing_scandir(path):
+        # The day was listed under its month, then pruned before being read.
+        if Path(path) == gone:
+            raise FileNotFoundError(path)
+        return scandir(path)
+
+    with mock.patch("agenttrace.storage.os.scandir", side_effect=racing_scandir):
+        assert [l.id for l in iter_trace_dirs(root)] == ["b"]
+
+def test_window_bounds_keep_exact_times():
+    for ms in range(DAY_A // 1_000_000, DAY_A // 1_000_000 + 5000, 7):
+        ts = ms * 1_000_000 + 123
+        lo, hi = _window_ns(ts / 1e9, ts / 1e9)
+        assert lo <= ts <= hi
+    assert _window_ns(None, None) == (None, None)
+
+def test_migrate_layout_roundtrip():
+    root = _make_tmp()
+    _write_trace(root, "done", "p", DAY_A)
+    _write_trace(root, "live", "p", DAY_A, finish=False)
+
+    moves = migrate_layout(root, dry_run=True)
+    assert len(moves) == 1
+    assert (root / "done").exists()
+
+    migrate_layout(root)
+    assert find_trace_dir(root, "done") == root / "p" / "2024" / "02" / "29" / "done"
+    assert (root / "live").exists()
+    assert len(TraceReader(root=root).get_trace("done")["events"]) == 2
+
+    migrate_layout(root, to="flat")
+    assert (root / "done" / "events.jsonl").exists()
+    assert not (root / "p").exists()
+
+
+def test_tracer_writes_partitioned_layout():
+    root = _make_tmp()
+    with mock.patch.dict(os.environ, {"AGENTTRACE_LAYOUT": "partitioned"}):
+        with Tracer(trace_name="t", project="proj", root_dir=root) as tracer:
+            tracer.emit("user_input", payload={"text": "hi"})
+    trace_dir = find_trace_dir(root, tracer.trace_id)
+    assert trace_dir is not None
+    assert trace_dir.relative_to(root).parts[0] == "proj"
+    assert TraceReader(root=root).list_traces(project="proj")[0]["id"] == tracer.trace_id
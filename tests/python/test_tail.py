@@ -0,0 +1,117 @@
+"""Tests for incremental trace tailing."""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from agenttrace._native import NativeTraceWriter
+from agenttrace.reader import TraceReader
+from agenttrace.tail import TraceFeed, TraceTail
+
+
+def _make_tmp() -> Path:
+    return Path(tempfile.mkdtemp(prefix="agenttrace_tail_"))
+
+
+def _line(seq: int, kind: str) -> str:
+    return json.dumps({"seq": seq, "kind": kind, "attrs": {}, "payload": {}}) + "\n"
+
+
+def test_tail_reads_only_new_complete_lines():
+    path = _make_tmp() / "events.jsonl"
+    path.write_text(_line(1, "trace_start"))
+
+    tail = TraceTail(path)
+    assert [e["seq"] for e in tail.read_new()] == [1]
+    assert tail.read_new() == []
+
+    # A partially written line is not consumed until its newline arrives.
+    partial = _line(2, "user_input")
+    with path.open("a") as f:
+        f.write(partial[:10])
+    assert tail.read_new() == []
+    with path.open("a") as f:
+        f.write(partial[10:] + _line(3, "trace_end"))
+    assert [e["seq"] for e in tail.read_new()] == [2, 3]
+
+
+def test_tail_from_seq_and_truncation():
+    path = _make_tmp() / "events.jsonl"
+    path.write_text(_line(1, "a") + _line(2, "b") + _line(3, "c"))
+
+    tail = TraceTail(path, from_seq=2)
+    assert [e["seq"] for e in tail.read_new()] == [2, 3]
+
+    path.write_text(_line(5, "d"))
+    assert [e["seq"] for e in tail.read_new()] == [5]
+
+
+def test_reader_follow_live_trace():
+    root = _make_tmp()
+    w = NativeTraceWriter("live", str(root))
+    w.emit("live", 1, 100, "trace_start", None, None, "info", "{}", '{"trace_name":"x"}')
+
+    def finish_later():
+        time.sleep(0.2)
+        w.emit("live", 2, 200, "user_input", None, None, "info", "{}", '{"text":"hi"}')
+        w.emit("live", 3, 300, "trace_end", None, None, "info", "{}", '{"status":"ok"}')
+        w.finish()
+
+    t = threading.Thread(target=finish_later)
+    t.start()
+    reader = TraceReader(root=root)
+    kinds = [e["kind"] for e in reader.follow("live", poll_interval=0.05, idle_timeout=5)]
+    t.join()
+    assert kinds == ["trace_start", "user_input", "trace_end"]
+
+
+def test_reader_follow_idle_timeout_without_inotify():
+    root = _make_tmp()
+    w = NativeTraceWriter("idle", str(root))
+    w.emit("idle", 1, 100, "trace_start", None, None, "info", "{}", "{}")
+
+    reader = TraceReader(root=root)
+    events = list(reader.follow("idle", poll_interval=0.01, use_inotify=False, idle_timeout=0.1))
+    w.finish()
+    assert [e["seq"] for e in events] == [1]
+
+
+def test_import_without_inotify_support():
+    # Windows has no O_NONBLOCK and no inotify; importing must not need either.
+    code = (
+        "import os, sys\n"
+        "del os.O_NONBLOCK\n"
+        "sys.platform = 'win32'\n"
+        "import agenttrace, agenttrace.tail\n"
+        "waiter = agenttrace.tail._make_waiter('events.jsonl', 0.1, True)\n"
+        "print(type(waiter).__name__)\n"
+    )
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).resolve().parents[2]))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, timeout=10)
+    assert result.returncode == 0, result.stderr
+    assert "Inotify" not in result.stdout
+
+
+def test_trace_feed_reports_new_traces_once():
+    root = _make_tmp()
+    old = NativeTraceWriter("old", str(root))
+    old.emit("old", 1, 1, "trace_start", None, None, "info", "{}", json.dumps({"trace_name": "old"}))
+    old.finish()
+
+    feed = TraceFeed(root)
+    assert feed.poll() == []
+    # Not reported until its first event is written.
+    w = NativeTraceWriter("new", str(root))
+    assert feed.poll() == []
+    w.emit("new", 1, time.time_ns(), "trace_start", None, None, "info", "{}", json.dumps({"trace_name": "demo", "project": "p"}))
+    [meta] = feed.poll()
+    assert (meta["id"], meta["name"], meta["project"], meta["event_count"]) == ("new", "demo", "p", 1)
+    w.finish()
+    assert feed.poll() == []